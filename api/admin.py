@@ -7,7 +7,8 @@ from .models import (
     User, Client, TypeLiaison, Liaison, PointDynamique, Segment, PhotoPoint,
     DetailONT, DetailPOPLS, DetailPOPFTTH, DetailChambre, DetailManchon, 
     FAT, DetailFDT, MesureOTDR, Coupure, Intervention, CommitIntervention, 
-    FicheTechnique, Notification, ParametreApplication
+    FicheTechnique, Notification, ParametreApplication, ImportOTDR, ImportReseau, ReferenceOTDR,
+    CorridorCriticite, BilanOptique, TronconCable, OccupationPorts, NoeudFTTH
 )
 
 # ===============================
@@ -68,6 +69,9 @@ class CoupureInline(admin.TabularInline):
     fields = ('status', 'point_dynamique_proche', 'date_detection')
     readonly_fields = ('date_detection',)
 
+class CoupureMesureInline(CoupureInline):
+    fk_name = 'mesure_otdr'
+
 class InterventionInline(admin.TabularInline):
     model = Intervention
     extra = 0
@@ -177,7 +181,8 @@ class PointDynamiqueAdmin(admin.ModelAdmin):
         ('Position', {
             'fields': (
                 ('latitude', 'longitude'),
-                'distance_depuis_central'
+                'distance_depuis_central',
+                ('moue_cable_totale', 'distance_optique_depuis_central')
             )
         }),
         ('Descriptions', {
@@ -185,7 +190,7 @@ class PointDynamiqueAdmin(admin.ModelAdmin):
         }),
     )
     
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('moue_cable_totale', 'distance_optique_depuis_central', 'created_at', 'updated_at')
     inlines = [PhotoPointInline, DetailONTInline, DetailPOPLSInline, DetailPOPFTTHInline, 
                DetailChambreInline, DetailManchonInline, DetailFDTInline]
     
@@ -207,12 +212,12 @@ class SegmentAdmin(admin.ModelAdmin):
             'fields': ('distance_gps', 'distance_cable')
         }),
         ('Tracé', {
-            'fields': ('trace_coords',),
+            'fields': ('trace_coords', 'longueur_trace', 'trace_sequence'),
             'classes': ('collapse',)
         }),
     )
     
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('longueur_trace', 'trace_sequence', 'created_at', 'updated_at')
 
 @admin.register(FAT)
 class FATAdmin(admin.ModelAdmin):
@@ -281,11 +286,11 @@ class MesureOTDRAdmin(admin.ModelAdmin):
     )
     
     readonly_fields = ('date_mesure',)
-    inlines = [CoupureInline]
+    inlines = [CoupureMesureInline]
 
 @admin.register(Coupure)
 class CoupureAdmin(admin.ModelAdmin):
-    list_display = ('liaison', 'status', 'point_dynamique_proche', 'date_detection', 'date_resolution')
+    list_display = ('liaison', 'status', 'point_dynamique_proche', 'nombre_signalements', 'date_detection', 'date_resolution')
     list_filter = ('status', 'date_detection', 'superviseur_notifie', 'client_notifie')
     search_fields = ('liaison__nom_liaison', 'description_diagnostic')
     ordering = ('-date_detection',)
@@ -302,9 +307,23 @@ class CoupureAdmin(admin.ModelAdmin):
                 'distance_sur_segment'
             )
         }),
+        ('Mesures aux deux extrémités', {
+            'fields': (
+                'mesure_otdr_opposee',
+                ('distance_depuis_central', 'incertitude_km'),
+                'facteur_longueur',
+                'remplacee_par'
+            )
+        }),
+        ('Corridor partagé', {
+            'fields': ('coupure_origine',)
+        }),
         ('Diagnostic', {
             'fields': ('description_diagnostic',)
         }),
+        ('Signalements', {
+            'fields': ('nombre_signalements', 'mesures_associees', 'date_dernier_signalement')
+        }),
         ('Dates', {
             'fields': ('date_detection', 'date_resolution')
         }),
@@ -315,6 +334,77 @@ class CoupureAdmin(admin.ModelAdmin):
     
     readonly_fields = ('date_detection',)
 
+@admin.register(ReferenceOTDR)
+class ReferenceOTDRAdmin(admin.ModelAdmin):
+    list_display = ('liaison', 'mesure_otdr', 'definie_par', 'updated_at')
+    search_fields = ('liaison__nom_liaison',)
+    ordering = ('liaison',)
+    
+    readonly_fields = ('created_at', 'updated_at')
+
+@admin.register(ImportOTDR)
+class ImportOTDRAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'total_fichiers', 'nombre_mesures', 'nombre_coupures', 'cree_par', 'created_at')
+    list_filter = ('status', 'created_at')
+    ordering = ('-created_at',)
+    
+    readonly_fields = ('fichiers_traites', 'erreurs', 'created_at', 'updated_at')
+
+@admin.register(ImportReseau)
+class ImportReseauAdmin(admin.ModelAdmin):
+    list_display = ('id', 'format', 'status', 'entites_lues', 'nombre_erreurs', 'cree_par', 'created_at')
+    list_filter = ('status', 'format', 'created_at')
+    ordering = ('-created_at',)
+    
+    readonly_fields = ('compteurs', 'erreurs', 'created_at', 'updated_at')
+
+# ===============================
+# Admins pour le réseau
+# ===============================
+
+@admin.register(CorridorCriticite)
+class CorridorCriticiteAdmin(admin.ModelAdmin):
+    list_display = ('id', 'nombre_clients', 'nombre_liaisons', 'nombre_segments', 'longueur_km', 'calcule_le')
+    ordering = ('-nombre_clients', '-nombre_liaisons')
+    
+    readonly_fields = ('segments', 'liaisons', 'clients', 'calcule_le')
+
+@admin.register(BilanOptique)
+class BilanOptiqueAdmin(admin.ModelAdmin):
+    list_display = ('liaison', 'statut', 'perte_attendue_db', 'attenuation_mesuree_db', 'budget_db', 'marge_db', 'calcule_le')
+    list_filter = ('statut',)
+    search_fields = ('liaison__nom_liaison',)
+    ordering = ('marge_db',)
+    
+    readonly_fields = ('mesure_otdr', 'calcule_le')
+
+@admin.register(TronconCable)
+class TronconCableAdmin(admin.ModelAdmin):
+    list_display = ('id', 'capacite', 'nombre_brins_occupes', 'calcule_le')
+    list_filter = ('capacite',)
+    ordering = ('-nombre_brins_occupes',)
+    
+    exclude = ('occupation',)
+    readonly_fields = ('brins', 'conflits', 'segments', 'calcule_le')
+
+@admin.register(OccupationPorts)
+class OccupationPortsAdmin(admin.ModelAdmin):
+    list_display = ('equipement', 'reference', 'numero', 'nombre_occupes', 'nombre_ports', 'updated_at')
+    list_filter = ('equipement',)
+    search_fields = ('reference',)
+    ordering = ('equipement', 'reference', 'numero')
+    
+    readonly_fields = ('masque', 'nombre_occupes', 'occupants', 'conflits', 'version', 'updated_at')
+
+@admin.register(NoeudFTTH)
+class NoeudFTTHAdmin(admin.ModelAdmin):
+    list_display = ('type_noeud', 'libelle', 'reference', 'profondeur', 'chemin', 'updated_at')
+    list_filter = ('type_noeud', 'profondeur')
+    search_fields = ('reference', 'libelle', 'chemin')
+    ordering = ('chemin',)
+    
+    readonly_fields = ('chemin', 'profondeur', 'updated_at')
+
 # ===============================
 # Admins pour les interventions
 # ===============================
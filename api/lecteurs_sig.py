@@ -0,0 +1,196 @@
+"""
+Lecture en flux des exports SIG du réseau : GeoJSON, KML et CSV
+
+Module sans dépendance Django : chaque lecteur produit les entités une à une,
+sous la forme (propriétés, type de géométrie, coordonnées), sans charger le
+fichier entier. Les coordonnées sont converties en [lat, lng] (Point) ou
+[[lat, lng], ...] (LineString) ; elles valent None si la géométrie est illisible.
+"""
+import csv
+import io
+import itertools
+import json
+import os
+import re
+import xml.etree.ElementTree as ET
+from typing import Dict, Iterator, List, Optional, Tuple
+
+TAILLE_TAMPON = 64 * 1024
+FORMATS = ('geojson', 'kml', 'csv')
+EXTENSIONS = {'.geojson': 'geojson', '.json': 'geojson', '.kml': 'kml', '.csv': 'csv'}
+
+Entite = Tuple[Dict[str, str], Optional[str], Optional[object]]
+
+
+def detecter_format(nom_fichier: str) -> Optional[str]:
+    return EXTENSIONS.get(os.path.splitext(nom_fichier)[1].lower())
+
+
+def _convertir(type_geometrie: Optional[str], coordonnees) -> Optional[object]:
+    """Coordonnées [lng, lat] d'origine vers [lat, lng], None si elles sont illisibles"""
+    try:
+        if type_geometrie == 'Point':
+            return [float(coordonnees[1]), float(coordonnees[0])]
+        if type_geometrie == 'LineString':
+            sommets = [[float(c[1]), float(c[0])] for c in coordonnees]
+            return sommets if len(sommets) >= 2 else None
+    except (TypeError, ValueError, IndexError):
+        pass
+    return None
+
+
+def _entite_geojson(objet: Dict) -> Entite:
+    proprietes = objet.get('properties') or {}
+    geometrie = objet.get('geometry') or {}
+    type_geometrie, coordonnees = geometrie.get('type'), geometrie.get('coordinates')
+    if type_geometrie == 'MultiLineString' and isinstance(coordonnees, list):
+        # Les parties d'un tracé exporté en plusieurs morceaux sont mises bout à bout
+        type_geometrie, coordonnees = 'LineString', [c for partie in coordonnees for c in partie]
+    return proprietes, type_geometrie, _convertir(type_geometrie, coordonnees)
+
+
+def lire_geojson(fichier) -> Iterator[Entite]:
+    """Entités d'une FeatureCollection, décodées une à une au fil de la lecture
+
+    Le tampon ne retient que l'entité en cours ; il double de taille tant qu'une
+    entité très longue (un tracé de nombreux sommets) n'y tient pas en entier.
+    """
+    texte = io.TextIOWrapper(fichier, encoding='utf-8-sig')
+    decodeur = json.JSONDecoder()
+    tampon, position = '', 0
+
+    def completer(taille: int = TAILLE_TAMPON) -> bool:
+        nonlocal tampon, position
+        bloc = texte.read(taille)
+        tampon, position = tampon[position:] + bloc, 0
+        return bool(bloc)
+
+    # Ouverture du tableau des entités
+    while True:
+        indice = tampon.find('"features"')
+        crochet = tampon.find('[', indice) if indice >= 0 else -1
+        if crochet >= 0:
+            position = crochet + 1
+            break
+        if not completer():
+            raise ValueError("Tableau features introuvable")
+
+    while True:
+        while True:
+            while position < len(tampon) and tampon[position] in ' \t\r\n,':
+                position += 1
+            if position < len(tampon) or not completer():
+                break
+        if position >= len(tampon):
+            raise ValueError("Fin de fichier inattendue dans le tableau features")
+        if tampon[position] == ']':
+            return
+        try:
+            objet, fin = decodeur.raw_decode(tampon, position)
+        except json.JSONDecodeError:
+            if not completer(max(TAILLE_TAMPON, len(tampon))):
+                raise
+            continue
+        position = fin
+        if isinstance(objet, dict):
+            yield _entite_geojson(objet)
+
+
+def _local(balise: str) -> str:
+    return balise.rsplit('}', 1)[-1]
+
+
+def _coordonnees_kml(texte: Optional[str]) -> List[List[str]]:
+    return [triplet.split(',') for triplet in (texte or '').split()]
+
+
+def lire_kml(fichier) -> Iterator[Entite]:
+    """Placemarks d'un document KML, retirés de l'arbre dès qu'ils ont été lus (iterparse)
+
+    Les propriétés viennent de ExtendedData (Data et SimpleData) ; le nom du
+    placemark est rendu sous la clé name.
+    """
+    parents = []
+    for evenement, element in ET.iterparse(fichier, events=('start', 'end')):
+        if evenement == 'start':
+            parents.append(element)
+            continue
+        parents.pop()
+        if _local(element.tag) != 'Placemark':
+            continue
+
+        proprietes, lignes, point = {}, [], None
+        for enfant in element:
+            if _local(enfant.tag) == 'name' and enfant.text:
+                proprietes['name'] = enfant.text.strip()
+        for noeud in element.iter():
+            nom = _local(noeud.tag)
+            if nom == 'Data' and noeud.get('name'):
+                valeur = next((e.text for e in noeud if _local(e.tag) == 'value'), None)
+                proprietes[noeud.get('name')] = (valeur or '').strip()
+            elif nom == 'SimpleData' and noeud.get('name'):
+                proprietes[noeud.get('name')] = (noeud.text or '').strip()
+            elif nom in ('Point', 'LineString'):
+                texte = next((e.text for e in noeud if _local(e.tag) == 'coordinates'), None)
+                if nom == 'Point':
+                    point = _coordonnees_kml(texte)[:1]
+                else:
+                    lignes.extend(_coordonnees_kml(texte))
+
+        if lignes:
+            yield proprietes, 'LineString', _convertir('LineString', lignes)
+        elif point is not None:
+            yield proprietes, 'Point', _convertir('Point', point[0] if point else None)
+        else:
+            yield proprietes, None, None
+
+        # Le placemark lu est détaché de son parent : la mémoire reste bornée
+        if parents:
+            parents[-1].remove(element)
+        element.clear()
+
+
+WKT = re.compile(r'^\s*(POINT|LINESTRING)\s*(?:Z|M|ZM)?\s*\((.*)\)\s*$', re.IGNORECASE | re.DOTALL)
+COLONNES_WKT = ('geometrie', 'wkt')
+COLONNES_LATITUDE = ('latitude', 'lat')
+COLONNES_LONGITUDE = ('longitude', 'lng', 'lon')
+
+
+def _geometrie_csv(ligne: Dict[str, str]) -> Tuple[Optional[str], Optional[object]]:
+    wkt = next((ligne[nom] for nom in COLONNES_WKT if ligne.get(nom)), None)
+    if wkt:
+        correspondance = WKT.match(wkt)
+        if not correspondance:
+            return 'inconnue', None
+        type_geometrie = 'Point' if correspondance.group(1).upper() == 'POINT' else 'LineString'
+        sommets = [paire.split() for paire in correspondance.group(2).split(',')]
+        return type_geometrie, _convertir(type_geometrie, sommets[0] if type_geometrie == 'Point' else sommets)
+
+    lat = next((ligne[nom] for nom in COLONNES_LATITUDE if ligne.get(nom)), None)
+    lng = next((ligne[nom] for nom in COLONNES_LONGITUDE if ligne.get(nom)), None)
+    if lat is None and lng is None:
+        return None, None
+    return 'Point', _convertir('Point', [str(lng).replace(',', '.'), str(lat).replace(',', '.')])
+
+
+def lire_csv(fichier) -> Iterator[Entite]:
+    """Lignes d'un CSV (séparateur ; ou ,) : colonnes latitude/longitude ou géométrie WKT"""
+    texte = io.TextIOWrapper(fichier, encoding='utf-8-sig', newline='')
+    entete = texte.readline()
+    delimiteur = ';' if entete.count(';') > entete.count(',') else ','
+    exclues = set(COLONNES_WKT + COLONNES_LATITUDE + COLONNES_LONGITUDE)
+    for ligne in csv.DictReader(itertools.chain([entete], texte), delimiter=delimiteur):
+        type_geometrie, coordonnees = _geometrie_csv(ligne)
+        proprietes = {
+            cle.strip(): (valeur or '').strip() for cle, valeur in ligne.items()
+            if cle and cle not in exclues
+        }
+        yield proprietes, type_geometrie, coordonnees
+
+
+LECTEURS = {'geojson': lire_geojson, 'kml': lire_kml, 'csv': lire_csv}
+
+
+def lire(fichier, format_fichier: str) -> Iterator[Entite]:
+    """Entités d'un fichier binaire ouvert, selon son format"""
+    return LECTEURS[format_fichier](fichier)
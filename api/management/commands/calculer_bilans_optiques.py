@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from api.models import BilanOptique
+from api.services import BilanOptiqueService
+
+
+class Command(BaseCommand):
+    help = "Recalcule le bilan de puissance optique de toutes les liaisons (tâche nocturne)"
+
+    def handle(self, *args, **options):
+        nombre = BilanOptiqueService.calculer()
+        depasses = BilanOptique.objects.filter(statut='depasse').count()
+        alertes = BilanOptique.objects.filter(statut='alerte').count()
+        self.stdout.write(self.style.SUCCESS(
+            f"{nombre} bilans calculés : {depasses} budgets dépassés, {alertes} proches du budget"
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.services import CriticiteCorridorService
+
+
+class Command(BaseCommand):
+    help = "Recalcule, pour chaque corridor du réseau, les liaisons et clients perdus en cas de coupure"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processus', type=int, default=None,
+                            help="Nombre de processus d'agrégation (défaut : nombre de cœurs)")
+
+    def handle(self, *args, **options):
+        nombre = CriticiteCorridorService.calculer(processus=options['processus'])
+        self.stdout.write(self.style.SUCCESS(f"{nombre} corridors indexés"))
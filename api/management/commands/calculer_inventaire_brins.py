@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.services import InventaireBrinsService
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'inventaire des brins occupés sur chaque portée de câble"
+
+    def handle(self, *args, **options):
+        nombre = InventaireBrinsService.calculer()
+        self.stdout.write(self.style.SUCCESS(f"{nombre} tronçons de câble inventoriés"))
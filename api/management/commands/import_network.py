@@ -0,0 +1,53 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.lecteurs_sig import FORMATS, detecter_format
+from api.models import ImportReseau, User
+from api.services import ImportReseauService
+
+
+class Command(BaseCommand):
+    help = "Importe un export SIG (GeoJSON, KML, CSV) : clients, liaisons, points dynamiques, segments et FAT"
+
+    def add_arguments(self, parser):
+        parser.add_argument('fichier', help="Chemin du fichier à importer")
+        parser.add_argument('--format', choices=FORMATS, help="Format du fichier (défaut : d'après l'extension)")
+        parser.add_argument('--lot', type=int, default=ImportReseauService.TAILLE_LOT,
+                            help="Nombre d'entités par transaction")
+        parser.add_argument('--utilisateur', help="Nom d'utilisateur auteur des liaisons créées")
+
+    def handle(self, *args, **options):
+        if not os.path.isfile(options['fichier']):
+            raise CommandError(f"Fichier {options['fichier']} introuvable")
+        format_fichier = options['format'] or detecter_format(options['fichier'])
+        if format_fichier is None:
+            raise CommandError("Format non reconnu : indiquer --format")
+
+        auteur = None
+        if options['utilisateur']:
+            try:
+                auteur = User.objects.get(username=options['utilisateur'])
+            except User.DoesNotExist:
+                raise CommandError(f"Utilisateur {options['utilisateur']} introuvable")
+
+        import_reseau = ImportReseau.objects.create(
+            chemin_fichier=os.path.abspath(options['fichier']), format=format_fichier, cree_par=auteur
+        )
+        self.stdout.write(f"Import {import_reseau.id}")
+
+        def progression(entites_lues):
+            self.stdout.write(f"  {entites_lues} entités lues")
+
+        import_reseau = ImportReseauService.traiter_import(
+            import_reseau, taille_lot=options['lot'], progression=progression
+        )
+        if import_reseau.status == 'erreur':
+            raise CommandError(f"Import en erreur : {import_reseau.erreurs[-1]['erreur']}")
+
+        compteurs = import_reseau.compteurs
+        self.stdout.write(self.style.SUCCESS(
+            f"{compteurs['liaisons_creees']} liaisons, {compteurs['points_crees']} points, "
+            f"{compteurs['segments_crees']} segments et {compteurs['fats_creees']} FAT créés, "
+            f"{import_reseau.nombre_erreurs} entités refusées"
+        ))
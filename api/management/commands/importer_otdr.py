@@ -0,0 +1,69 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import ImportOTDR, MesureOTDR, User
+from api.services import ImportOTDRService
+
+
+class Command(BaseCommand):
+    help = "Importe une archive zip de fichiers OTDR (.sor) et crée les mesures et coupures"
+
+    def add_arguments(self, parser):
+        parser.add_argument('archive', nargs='?', help="Chemin de l'archive zip")
+        parser.add_argument('--reprendre', metavar='IMPORT_ID', help="Reprend un import interrompu")
+        parser.add_argument('--lot', type=int, default=ImportOTDRService.TAILLE_LOT,
+                            help="Nombre de fichiers par transaction")
+        parser.add_argument('--processus', type=int, default=None,
+                            help="Nombre de processus de décodage (défaut : nombre de cœurs)")
+        parser.add_argument('--position', default='central',
+                            choices=[choix[0] for choix in MesureOTDR.POSITION_CHOICES])
+        parser.add_argument('--direction', default='vers_client',
+                            choices=[choix[0] for choix in MesureOTDR.DIRECTION_CHOICES])
+        parser.add_argument('--utilisateur', help="Nom d'utilisateur du technicien")
+
+    def handle(self, *args, **options):
+        if options['reprendre']:
+            try:
+                import_otdr = ImportOTDR.objects.get(id=options['reprendre'])
+            except (ImportOTDR.DoesNotExist, ValueError):
+                raise CommandError(f"Import {options['reprendre']} introuvable")
+        elif options['archive']:
+            if not os.path.isfile(options['archive']):
+                raise CommandError(f"Archive {options['archive']} introuvable")
+
+            technicien = None
+            if options['utilisateur']:
+                try:
+                    technicien = User.objects.get(username=options['utilisateur'])
+                except User.DoesNotExist:
+                    raise CommandError(f"Utilisateur {options['utilisateur']} introuvable")
+
+            import_otdr = ImportOTDR.objects.create(
+                chemin_archive=os.path.abspath(options['archive']),
+                position_technicien=options['position'],
+                direction_analyse=options['direction'],
+                cree_par=technicien
+            )
+        else:
+            raise CommandError("Indiquer une archive ou --reprendre IMPORT_ID")
+
+        self.stdout.write(f"Import {import_otdr.id}")
+
+        def progression(traites, total):
+            self.stdout.write(f"  {traites}/{total} fichiers traités")
+
+        import_otdr = ImportOTDRService.traiter_import(
+            import_otdr,
+            taille_lot=options['lot'],
+            processus=options['processus'],
+            progression=progression
+        )
+
+        if import_otdr.status == 'erreur':
+            raise CommandError(f"Import en erreur : {import_otdr.erreurs[-1]['erreur']}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{import_otdr.nombre_mesures} mesures et {import_otdr.nombre_coupures} coupures créées, "
+            f"{len(import_otdr.erreurs)} fichiers ignorés"
+        ))
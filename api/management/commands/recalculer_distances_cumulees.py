@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.services import SegmentService
+
+
+class Command(BaseCommand):
+    help = "Recalcule les distances cumulées depuis le central de tous les points du réseau"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processus', type=int, default=None,
+                            help="Nombre de processus de calcul (défaut : nombre de cœurs)")
+        parser.add_argument('--lot', type=int, default=SegmentService.TAILLE_LOT_LIAISONS,
+                            help="Nombre de liaisons par lot")
+
+    def handle(self, *args, **options):
+        nombre = SegmentService.recalculer_reseau(processus=options['processus'], taille_lot=options['lot'])
+        self.stdout.write(self.style.SUCCESS(f"{nombre} points mis à jour"))
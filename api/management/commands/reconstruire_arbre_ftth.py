@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.services import ArbreFTTHService
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'arbre FTTH (OLT, ports OLT, FDT, FAT, ONT) à partir des équipements enregistrés"
+
+    def handle(self, *args, **options):
+        nombre = ArbreFTTHService.reconstruire()
+        self.stdout.write(self.style.SUCCESS(f"{nombre} nœuds créés"))
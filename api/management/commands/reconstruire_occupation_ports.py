@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.services import OccupationPortsService
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'occupation des ports de cassettes et splitters à partir des équipements enregistrés"
+
+    def handle(self, *args, **options):
+        nombre = OccupationPortsService.reconstruire()
+        self.stdout.write(self.style.SUCCESS(f"{nombre} équipements indexés"))
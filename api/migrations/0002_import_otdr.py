@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:09
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mesureotdr',
+            name='evenements',
+            field=models.JSONField(blank=True, default=list, help_text='Table des événements lue dans le fichier OTDR'),
+        ),
+        migrations.CreateModel(
+            name='ImportOTDR',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('chemin_archive', models.CharField(help_text="Chemin de l'archive zip sur le serveur", max_length=500)),
+                ('position_technicien', models.CharField(choices=[('central', 'Au central'), ('client', 'Chez le client'), ('intermediaire', 'Point intermédiaire')], default='central', max_length=20)),
+                ('direction_analyse', models.CharField(choices=[('vers_central', 'Vers le central'), ('vers_client', 'Vers le client')], default='vers_client', max_length=20)),
+                ('status', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('termine', 'Terminé'), ('erreur', 'Erreur')], default='en_attente', max_length=20)),
+                ('total_fichiers', models.IntegerField(default=0)),
+                ('fichiers_traites', models.JSONField(blank=True, default=list, help_text='Fichiers déjà traités, utilisés pour la reprise')),
+                ('nombre_mesures', models.IntegerField(default=0)),
+                ('nombre_coupures', models.IntegerField(default=0)),
+                ('erreurs', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('cree_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Import OTDR',
+                'verbose_name_plural': 'Imports OTDR',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_import_otdr'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TraceOTDR',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre_points', models.IntegerField()),
+                ('pas_km', models.FloatField(help_text='Distance entre deux échantillons en km')),
+                ('echelle_db', models.FloatField(help_text="Valeur en dB d'une unité d'échantillon")),
+                ('fichier_points', models.FileField(upload_to='otdr_traces/')),
+                ('fichier_apercu', models.FileField(blank=True, upload_to='otdr_traces/')),
+                ('niveaux_apercu', models.JSONField(blank=True, default=list)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('mesure_otdr', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='trace', to='api.mesureotdr')),
+            ],
+            options={
+                'verbose_name': 'Trace OTDR',
+                'verbose_name_plural': 'Traces OTDR',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_trace_otdr'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceOTDR',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('evenements', models.JSONField(blank=True, default=list, help_text='Table des événements de référence')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('definie_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('liaison', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='reference_otdr', to='api.liaison')),
+                ('mesure_otdr', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='references', to='api.mesureotdr')),
+            ],
+            options={
+                'verbose_name': 'Référence OTDR',
+                'verbose_name_plural': 'Références OTDR',
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_reference_otdr'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupure',
+            name='distance_depuis_central',
+            field=models.FloatField(blank=True, help_text='Position estimée en km depuis le central', null=True),
+        ),
+        migrations.AddField(
+            model_name='coupure',
+            name='facteur_longueur',
+            field=models.FloatField(blank=True, help_text='Longueur de fibre mesurée / longueur nominale', null=True),
+        ),
+        migrations.AddField(
+            model_name='coupure',
+            name='incertitude_km',
+            field=models.FloatField(blank=True, help_text="Demi-largeur de l'intervalle de position", null=True),
+        ),
+        migrations.AddField(
+            model_name='coupure',
+            name='mesure_otdr_opposee',
+            field=models.ForeignKey(blank=True, help_text="Mesure prise depuis l'autre extrémité de la liaison", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='coupures_opposees', to='api.mesureotdr'),
+        ),
+        migrations.AddField(
+            model_name='coupure',
+            name='remplacee_par',
+            field=models.ForeignKey(blank=True, help_text='Coupure fusionnée qui remplace cette localisation à une seule extrémité', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='coupures_remplacees', to='api.coupure'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:28
+
+from django.db import migrations, models
+
+
+def calculer_profils_optiques(apps, schema_editor):
+    PointDynamique = apps.get_model('api', 'PointDynamique')
+    champs_moue = (
+        ('DetailONT', ['moue_cable']),
+        ('DetailPOPLS', ['moue_cable']),
+        ('DetailChambre', ['moue_cable_central', 'moue_cable_client']),
+        ('DetailManchon', ['moue_cable']),
+        ('FAT', ['moue_cable_poteau']),
+    )
+    moues = {}
+    for nom_modele, champs in champs_moue:
+        modele = apps.get_model('api', nom_modele)
+        for valeurs in modele.objects.filter(point_dynamique__isnull=False).values('point_dynamique_id', *champs):
+            point_id = valeurs.pop('point_dynamique_id')
+            moues[point_id] = moues.get(point_id, 0) + sum(valeurs.values())
+
+    points = []
+    moue_cumulee, liaison_courante = 0.0, None
+    for point in PointDynamique.objects.order_by('liaison_id', 'ordre'):
+        if point.liaison_id != liaison_courante:
+            moue_cumulee, liaison_courante = 0.0, point.liaison_id
+        point.moue_cable_totale = moues.get(point.id, 0)
+        point.distance_optique_depuis_central = point.distance_depuis_central + moue_cumulee / 1000
+        moue_cumulee += point.moue_cable_totale
+        points.append(point)
+    PointDynamique.objects.bulk_update(
+        points, ['moue_cable_totale', 'distance_optique_depuis_central'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_coupure_deux_extremites'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pointdynamique',
+            name='distance_optique_depuis_central',
+            field=models.FloatField(default=0, editable=False, help_text='Longueur de fibre cumulée en km depuis le central, moues des points précédents incluses'),
+        ),
+        migrations.AddField(
+            model_name='pointdynamique',
+            name='moue_cable_totale',
+            field=models.FloatField(default=0, editable=False, help_text='Moue de câble totale relevée sur le point en mètres'),
+        ),
+        migrations.RunPython(calculer_profils_optiques, migrations.RunPython.noop),
+    ]
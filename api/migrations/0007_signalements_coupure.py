@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_profil_optique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupure',
+            name='date_dernier_signalement',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='coupure',
+            name='mesures_associees',
+            field=models.ManyToManyField(blank=True, related_name='coupures_associees', to='api.mesureotdr'),
+        ),
+        migrations.AddField(
+            model_name='coupure',
+            name='nombre_signalements',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name='coupure',
+            index=models.Index(fields=['liaison', 'status', 'date_detection'], name='coupure_liaison_status_date'),
+        ),
+    ]
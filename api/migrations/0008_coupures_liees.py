@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_signalements_coupure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='coupure',
+            name='coupure_origine',
+            field=models.ForeignKey(blank=True, help_text="Coupure d'une autre liaison partageant le même corridor", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='coupures_liees', to='api.coupure'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:37
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_coupures_liees'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorridorCriticite',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('site_depart_lat', models.FloatField()),
+                ('site_depart_lng', models.FloatField()),
+                ('site_arrivee_lat', models.FloatField()),
+                ('site_arrivee_lng', models.FloatField()),
+                ('longueur_km', models.FloatField(default=0, help_text='Longueur de câble du plus long segment du corridor')),
+                ('nombre_segments', models.PositiveIntegerField(default=0)),
+                ('nombre_liaisons', models.PositiveIntegerField(default=0)),
+                ('nombre_clients', models.PositiveIntegerField(default=0)),
+                ('segments', models.JSONField(blank=True, default=list)),
+                ('liaisons', models.JSONField(blank=True, default=list)),
+                ('clients', models.JSONField(blank=True, default=list)),
+                ('calcule_le', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Criticité de corridor',
+                'verbose_name_plural': 'Criticité des corridors',
+                'ordering': ['-nombre_clients', '-nombre_liaisons'],
+                'indexes': [models.Index(fields=['nombre_clients', 'nombre_liaisons'], name='corridor_criticite')],
+            },
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:42
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_criticite_corridors'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BilanOptique',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('longueur_fibre_km', models.FloatField(default=0)),
+                ('nombre_epissures', models.PositiveIntegerField(default=0)),
+                ('nombre_connecteurs', models.PositiveIntegerField(default=0)),
+                ('nombre_passages_cassette', models.PositiveIntegerField(default=0)),
+                ('perte_attendue_db', models.FloatField()),
+                ('attenuation_mesuree_db', models.FloatField(blank=True, null=True)),
+                ('ecart_db', models.FloatField(blank=True, help_text='Atténuation mesurée - perte attendue', null=True)),
+                ('budget_db', models.FloatField()),
+                ('marge_db', models.FloatField(help_text='Budget - perte la plus élevée entre attendue et mesurée')),
+                ('statut', models.CharField(choices=[('ok', 'Dans le budget'), ('alerte', 'Proche du budget'), ('depasse', 'Budget dépassé')], default='ok', max_length=20)),
+                ('calcule_le', models.DateTimeField()),
+                ('liaison', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='bilan_optique', to='api.liaison')),
+                ('mesure_otdr', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.mesureotdr')),
+            ],
+            options={
+                'verbose_name': 'Bilan optique',
+                'verbose_name_plural': 'Bilans optiques',
+                'ordering': ['marge_db'],
+                'indexes': [models.Index(fields=['statut', 'marge_db'], name='bilan_statut_marge')],
+            },
+        ),
+    ]
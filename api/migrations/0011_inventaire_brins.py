@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:48
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_bilan_optique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TronconCable',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('site_depart_lat', models.FloatField()),
+                ('site_depart_lng', models.FloatField()),
+                ('site_arrivee_lat', models.FloatField()),
+                ('site_arrivee_lng', models.FloatField()),
+                ('capacite', models.IntegerField(choices=[(96, '96 FO'), (48, '48 FO'), (24, '24 FO'), (18, '18 FO'), (12, '12 FO'), (6, '6 FO'), (2, '2 FO')])),
+                ('occupation', models.BinaryField()),
+                ('nombre_brins_occupes', models.PositiveIntegerField(default=0)),
+                ('brins', models.JSONField(blank=True, default=dict, help_text='Liaison occupant chaque brin, par rang')),
+                ('conflits', models.JSONField(blank=True, default=list, help_text='Rangs des brins revendiqués par plusieurs liaisons')),
+                ('segments', models.JSONField(blank=True, default=list)),
+                ('calcule_le', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'Tronçon de câble',
+                'verbose_name_plural': 'Tronçons de câble',
+                'ordering': ['-nombre_brins_occupes'],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:50
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_inventaire_brins'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccupationPorts',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('equipement', models.CharField(choices=[('cassette_fdt', 'Cassette FDT'), ('cassette_odf', 'Cassette ODF (POP FTTH)'), ('splitter', 'Splitter FAT')], max_length=20)),
+                ('reference', models.CharField(help_text='Numéro de FDT, référence ODF ou numéro de FAT', max_length=100)),
+                ('numero', models.IntegerField(default=0, help_text='Numéro de cassette (0 pour un splitter)')),
+                ('nombre_ports', models.PositiveSmallIntegerField()),
+                ('masque', models.BigIntegerField(default=0, help_text='Bit n-1 à 1 : port n occupé')),
+                ('nombre_occupes', models.PositiveSmallIntegerField(default=0)),
+                ('occupants', models.JSONField(blank=True, default=dict, help_text='Occupant de chaque port, par numéro')),
+                ('conflits', models.JSONField(blank=True, default=list, help_text='Occupants refusés sur un port déjà pris')),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Occupation des ports',
+                'verbose_name_plural': 'Occupation des ports',
+                'ordering': ['equipement', 'reference', 'numero'],
+                'unique_together': {('equipement', 'reference', 'numero')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-19 05:57
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_occupation_ports'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NoeudFTTH',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('type_noeud', models.CharField(choices=[('olt', 'OLT'), ('port_olt', 'Port OLT'), ('fdt', 'FDT'), ('fat', 'FAT'), ('ont', 'ONT')], max_length=20)),
+                ('reference', models.CharField(help_text="Référence OLT, OLT/port, numéro de FDT ou de FAT, point dynamique de l'ONT", max_length=150)),
+                ('libelle', models.CharField(blank=True, max_length=150)),
+                ('objet_id', models.UUIDField(blank=True, help_text='FAT ou point dynamique représenté', null=True)),
+                ('chemin', models.CharField(max_length=500, unique=True)),
+                ('profondeur', models.PositiveSmallIntegerField(default=1)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('client', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.client')),
+                ('liaison', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.liaison')),
+            ],
+            options={
+                'verbose_name': 'Nœud FTTH',
+                'verbose_name_plural': 'Arbre FTTH',
+                'ordering': ['chemin'],
+                'indexes': [models.Index(fields=['type_noeud', 'chemin'], name='noeud_ftth_type_chemin')],
+                'unique_together': {('type_noeud', 'reference')},
+            },
+        ),
+    ]
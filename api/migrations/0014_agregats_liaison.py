@@ -0,0 +1,49 @@
+# Generated by Django 5.2.4 on 2026-10-19 06:15
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def calculer_agregats(apps, schema_editor):
+    Liaison = apps.get_model('api', 'Liaison')
+    PointDynamique = apps.get_model('api', 'PointDynamique')
+    Segment = apps.get_model('api', 'Segment')
+
+    def agregat(modele, expression):
+        return Subquery(
+            modele.objects.filter(liaison_id=OuterRef('pk')).order_by().values('liaison_id')
+            .annotate(valeur=expression).values('valeur')
+        )
+
+    Liaison.objects.update(
+        nombre_points=Coalesce(agregat(PointDynamique, Count('id')), 0),
+        nombre_segments=Coalesce(agregat(Segment, Count('id')), 0),
+        distance_totale=Coalesce(agregat(Segment, Sum('distance_cable')), 0.0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_arbre_ftth'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='liaison',
+            name='nombre_points',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='liaison',
+            name='nombre_segments',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='liaison',
+            name='topologie_modifiee_le',
+            field=models.DateTimeField(blank=True, editable=False, help_text="Dernier ajout, retrait ou déplacement d'un point ou d'un segment", null=True),
+        ),
+        migrations.RunPython(calculer_agregats, migrations.RunPython.noop),
+    ]
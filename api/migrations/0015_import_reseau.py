@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-19 06:21
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_agregats_liaison'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportReseau',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('chemin_fichier', models.CharField(help_text='Chemin du fichier sur le serveur', max_length=500)),
+                ('format', models.CharField(choices=[('geojson', 'GeoJSON'), ('kml', 'KML'), ('csv', 'CSV')], max_length=10)),
+                ('status', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('termine', 'Terminé'), ('erreur', 'Erreur')], default='en_attente', max_length=20)),
+                ('entites_lues', models.IntegerField(default=0)),
+                ('compteurs', models.JSONField(blank=True, default=dict, help_text="Créations et mises à jour par type d'objet")),
+                ('nombre_erreurs', models.IntegerField(default=0)),
+                ('erreurs', models.JSONField(blank=True, default=list, help_text='Premières entités refusées')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('cree_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Import réseau',
+                'verbose_name_plural': 'Imports réseau',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.4 on 2026-10-19 06:36
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+from api.spatial import mesurer_trace
+
+
+def mesurer_traces(apps, schema_editor):
+    Segment = apps.get_model('api', 'Segment')
+    segments = []
+    for segment in Segment.objects.only('id', 'trace_coords').iterator(chunk_size=500):
+        if not segment.trace_coords:
+            continue
+        segment.longueur_trace, emprise = mesurer_trace(segment.trace_coords)
+        segment.trace_lat_min, segment.trace_lat_max, segment.trace_lng_min, segment.trace_lng_max = emprise
+        segments.append(segment)
+    Segment.objects.bulk_update(
+        segments, ['longueur_trace', 'trace_lat_min', 'trace_lat_max', 'trace_lng_min', 'trace_lng_max'],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_import_reseau'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='segment',
+            name='longueur_trace',
+            field=models.FloatField(default=0, editable=False, help_text='Longueur du tracé en km'),
+        ),
+        migrations.AddField(
+            model_name='segment',
+            name='trace_lat_max',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='segment',
+            name='trace_lat_min',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='segment',
+            name='trace_lng_max',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='segment',
+            name='trace_lng_min',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='segment',
+            name='trace_sequence',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Numéro du dernier lot de relevé appliqué'),
+        ),
+        migrations.CreateModel(
+            name='LotTrace',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('sequence', models.PositiveIntegerField()),
+                ('coords', models.JSONField(default=list, help_text='Points retenus [[lat, lng], ...]')),
+                ('nombre_points', models.PositiveIntegerField(default=0)),
+                ('points_rejetes', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('segment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots_trace', to='api.segment')),
+            ],
+            options={
+                'ordering': ['segment', 'sequence'],
+                'unique_together': {('segment', 'sequence')},
+            },
+        ),
+        migrations.RunPython(mesurer_traces, migrations.RunPython.noop),
+    ]
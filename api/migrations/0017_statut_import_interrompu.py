@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 06:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_trace_par_lots'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='importotdr',
+            name='status',
+            field=models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('termine', 'Terminé'), ('erreur', 'Erreur'), ('interrompu', 'Interrompu')], default='en_attente', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='importreseau',
+            name='status',
+            field=models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('termine', 'Terminé'), ('erreur', 'Erreur'), ('interrompu', 'Interrompu')], default='en_attente', max_length=20),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-19 07:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def detacher_coupures_liees(apps, schema_editor):
+    # La mesure d'une coupure liée appartient à la liaison de sa coupure d'origine
+    Coupure = apps.get_model('api', 'Coupure')
+    Coupure.objects.filter(coupure_origine__isnull=False).update(mesure_otdr=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_statut_import_interrompu'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='coupure',
+            name='mesure_otdr',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='api.mesureotdr'),
+        ),
+        migrations.RunPython(detacher_coupures_liees, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-19 07:17
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_coupure_liee_sans_mesure'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mesureotdr',
+            name='date_mesure',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 07:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_date_mesure_acquisition'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mesureotdr',
+            name='distance_reference_km',
+            field=models.FloatField(blank=True, help_text="Distance de l'écart à la référence en km", null=True),
+        ),
+        migrations.AddField(
+            model_name='mesureotdr',
+            name='type_evenement_reference',
+            field=models.CharField(blank=True, choices=[('coupure', 'Coupure'), ('attenuation', 'Atténuation excessive'), ('reflet', 'Réflexion'), ('epissure', 'Épissure défectueuse')], max_length=50),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 import uuid
 import hashlib
@@ -147,16 +148,30 @@ class Liaison(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='active')
     distance_totale = models.FloatField(help_text="Distance totale calculée en km", default=0)
     
+    # Agrégats tenus à jour par les signaux des points dynamiques et des segments
+    nombre_points = models.IntegerField(default=0, editable=False)
+    nombre_segments = models.IntegerField(default=0, editable=False)
+    topologie_modifiee_le = models.DateTimeField(
+        null=True, blank=True, editable=False,
+        help_text="Dernier ajout, retrait ou déplacement d'un point ou d'un segment"
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='liaisons_creees')
 
     def calculer_distance_totale(self):
-        """Calcule la distance totale à partir des segments"""
-        total = self.segments.aggregate(total=models.Sum('distance_cable'))['total'] or 0
-        self.distance_totale = total
-        self.save()
-        return total
+        """Recalcule la distance totale et les agrégats à partir des points et segments"""
+        agregats = self.segments.aggregate(total=models.Sum('distance_cable'), nombre=models.Count('id'))
+        self.distance_totale = agregats['total'] or 0
+        self.nombre_segments = agregats['nombre']
+        self.nombre_points = self.points_dynamiques.count()
+        Liaison.objects.filter(pk=self.pk).update(
+            distance_totale=self.distance_totale,
+            nombre_segments=self.nombre_segments,
+            nombre_points=self.nombre_points
+        )
+        return self.distance_totale
 
     def __str__(self):
         return f"{self.nom_liaison} - {self.client.name}"
@@ -197,6 +212,15 @@ class PointDynamique(models.Model):
     # Position sur la liaison
     distance_depuis_central = models.FloatField(help_text="Distance cumulée en km depuis le central", default=0)
     
+    # Profil optique, tenu à jour à partir des détails du point (voir api.signals)
+    moue_cable_totale = models.FloatField(
+        default=0, editable=False, help_text="Moue de câble totale relevée sur le point en mètres"
+    )
+    distance_optique_depuis_central = models.FloatField(
+        default=0, editable=False,
+        help_text="Longueur de fibre cumulée en km depuis le central, moues des points précédents incluses"
+    )
+    
     # Informations générales
     description = models.TextField(blank=True)
     commentaire_technicien = models.TextField(blank=True)
@@ -204,6 +228,9 @@ class PointDynamique(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Champs écrits uniquement par ProfilOptiqueService, via des mises à jour en base
+    CHAMPS_PROFIL_OPTIQUE = ('moue_cable_totale', 'distance_optique_depuis_central')
+
     class Meta:
         ordering = ['liaison', 'ordre']
         verbose_name = "Point dynamique"
@@ -386,6 +413,16 @@ class Segment(models.Model):
     # Tracé
     trace_coords = models.JSONField(help_text="Coordonnées du tracé [[lat, lng], ...]", default=list)
     
+    # Mesures du tracé, lots de relevé en attente compris
+    longueur_trace = models.FloatField(default=0, editable=False, help_text="Longueur du tracé en km")
+    trace_lat_min = models.FloatField(null=True, blank=True, editable=False)
+    trace_lat_max = models.FloatField(null=True, blank=True, editable=False)
+    trace_lng_min = models.FloatField(null=True, blank=True, editable=False)
+    trace_lng_max = models.FloatField(null=True, blank=True, editable=False)
+    trace_sequence = models.PositiveIntegerField(
+        default=0, editable=False, help_text="Numéro du dernier lot de relevé appliqué"
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -396,6 +433,23 @@ class Segment(models.Model):
         unique_together = [['point_depart', 'point_arrivee']]
         ordering = ['point_depart__ordre']
 
+class LotTrace(models.Model):
+    """Lot de points GPS relevés sur le terrain, en attente d'ajout au tracé du segment"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    segment = models.ForeignKey(Segment, on_delete=models.CASCADE, related_name='lots_trace')
+    sequence = models.PositiveIntegerField()
+    coords = models.JSONField(help_text="Points retenus [[lat, lng], ...]", default=list)
+    nombre_points = models.PositiveIntegerField(default=0)
+    points_rejetes = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Lot {self.sequence} - {self.segment_id}"
+
+    class Meta:
+        unique_together = [['segment', 'sequence']]
+        ordering = ['segment', 'sequence']
+
 # ========================
 # PHOTOS
 # ========================
@@ -443,6 +497,13 @@ class MesureOTDR(models.Model):
         ('vers_client', 'Vers le client'),
     ]
     
+    TYPE_EVENEMENT_CHOICES = [
+        ('coupure', 'Coupure'),
+        ('attenuation', 'Atténuation excessive'),
+        ('reflet', 'Réflexion'),
+        ('epissure', 'Épissure défectueuse'),
+    ]
+    
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     liaison = models.ForeignKey(Liaison, related_name='mesures_otdr', on_delete=models.CASCADE)
     
@@ -454,18 +515,19 @@ class MesureOTDR(models.Model):
     # Mesures
     distance_coupure = models.FloatField(help_text="Distance de la coupure en km")
     attenuation = models.FloatField(help_text="Atténuation en dB")
-    type_evenement = models.CharField(max_length=50, choices=[
-        ('coupure', 'Coupure'),
-        ('attenuation', 'Atténuation excessive'),
-        ('reflet', 'Réflexion'),
-        ('epissure', 'Épissure défectueuse'),
-    ])
+    type_evenement = models.CharField(max_length=50, choices=TYPE_EVENEMENT_CHOICES)
+    
+    # Écart à l'empreinte de référence, sans toucher aux valeurs mesurées
+    type_evenement_reference = models.CharField(max_length=50, choices=TYPE_EVENEMENT_CHOICES, blank=True)
+    distance_reference_km = models.FloatField(null=True, blank=True, help_text="Distance de l'écart à la référence en km")
     
     # Métadonnées
     technicien = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
-    date_mesure = models.DateTimeField(auto_now_add=True)
+    # Date d'acquisition : celle du fichier .sor pour une mesure importée
+    date_mesure = models.DateTimeField(default=timezone.now)
     commentaires = models.TextField(blank=True)
     fichier_otdr = models.FileField(upload_to='otdr_files/', blank=True)
+    evenements = models.JSONField(default=list, blank=True, help_text="Table des événements lue dans le fichier OTDR")
 
     def __str__(self):
         return f"OTDR {self.liaison.nom_liaison} - {self.date_mesure.strftime('%d/%m/%Y')}"
@@ -475,6 +537,46 @@ class MesureOTDR(models.Model):
         verbose_name = "Mesure OTDR"
         verbose_name_plural = "Mesures OTDR"
 
+class TraceOTDR(models.Model):
+    """Trace de rétrodiffusion compressée d'une mesure OTDR"""
+    mesure_otdr = models.OneToOneField(MesureOTDR, on_delete=models.CASCADE, related_name='trace')
+    
+    # Échantillonnage
+    nombre_points = models.IntegerField()
+    pas_km = models.FloatField(help_text="Distance entre deux échantillons en km")
+    echelle_db = models.FloatField(help_text="Valeur en dB d'une unité d'échantillon")
+    
+    # Données : échantillons uint16 compressés et pyramide min/max non compressée
+    fichier_points = models.FileField(upload_to='otdr_traces/')
+    fichier_apercu = models.FileField(upload_to='otdr_traces/', blank=True)
+    niveaux_apercu = models.JSONField(default=list, blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Trace {self.mesure_otdr} ({self.nombre_points} points)"
+
+    class Meta:
+        verbose_name = "Trace OTDR"
+        verbose_name_plural = "Traces OTDR"
+
+class ReferenceOTDR(models.Model):
+    """Empreinte OTDR de référence d'une liaison (mesure de mise en service)"""
+    liaison = models.OneToOneField(Liaison, on_delete=models.CASCADE, related_name='reference_otdr')
+    mesure_otdr = models.ForeignKey(MesureOTDR, on_delete=models.CASCADE, related_name='references')
+    evenements = models.JSONField(default=list, blank=True, help_text="Table des événements de référence")
+    
+    definie_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Référence OTDR {self.liaison.nom_liaison}"
+
+    class Meta:
+        verbose_name = "Référence OTDR"
+        verbose_name_plural = "Références OTDR"
+
 class Coupure(models.Model):
     """Coupures détectées et leur localisation"""
     STATUS_CHOICES = [
@@ -486,7 +588,8 @@ class Coupure(models.Model):
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     liaison = models.ForeignKey(Liaison, on_delete=models.CASCADE, related_name='coupures')
-    mesure_otdr = models.ForeignKey(MesureOTDR, on_delete=models.CASCADE)
+    # Vide pour une coupure liée : sa mesure est celle de la coupure d'origine, sur une autre liaison
+    mesure_otdr = models.ForeignKey(MesureOTDR, on_delete=models.CASCADE, null=True, blank=True)
     
     # Localisation calculée
     point_estime_lat = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True)
@@ -494,10 +597,32 @@ class Coupure(models.Model):
     point_dynamique_proche = models.ForeignKey(PointDynamique, on_delete=models.SET_NULL, null=True, blank=True)
     segment_touche = models.ForeignKey(Segment, on_delete=models.SET_NULL, null=True, blank=True)
     distance_sur_segment = models.FloatField(help_text="Distance depuis le début du segment en km", null=True)
+    distance_depuis_central = models.FloatField(null=True, blank=True, help_text="Position estimée en km depuis le central")
+    
+    # Localisation par mesures aux deux extrémités
+    mesure_otdr_opposee = models.ForeignKey(
+        MesureOTDR, on_delete=models.SET_NULL, null=True, blank=True, related_name='coupures_opposees',
+        help_text="Mesure prise depuis l'autre extrémité de la liaison"
+    )
+    incertitude_km = models.FloatField(null=True, blank=True, help_text="Demi-largeur de l'intervalle de position")
+    facteur_longueur = models.FloatField(null=True, blank=True, help_text="Longueur de fibre mesurée / longueur nominale")
+    remplacee_par = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='coupures_remplacees',
+        help_text="Coupure fusionnée qui remplace cette localisation à une seule extrémité"
+    )
+    coupure_origine = models.ForeignKey(
+        'self', on_delete=models.SET_NULL, null=True, blank=True, related_name='coupures_liees',
+        help_text="Coupure d'une autre liaison partageant le même corridor"
+    )
     
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='detectee')
     description_diagnostic = models.TextField(blank=True)
     
+    # Signalements de la même coupure rattachés à cet incident
+    mesures_associees = models.ManyToManyField(MesureOTDR, blank=True, related_name='coupures_associees')
+    nombre_signalements = models.PositiveIntegerField(default=1)
+    date_dernier_signalement = models.DateTimeField(null=True, blank=True)
+    
     date_detection = models.DateTimeField(auto_now_add=True)
     date_resolution = models.DateTimeField(null=True, blank=True)
     
@@ -510,6 +635,251 @@ class Coupure(models.Model):
 
     class Meta:
         ordering = ['-date_detection']
+        indexes = [
+            models.Index(fields=['liaison', 'status', 'date_detection'], name='coupure_liaison_status_date'),
+        ]
+
+class ImportOTDR(models.Model):
+    """Import en masse d'une archive de fichiers OTDR (.sor)"""
+    STATUS_CHOICES = [
+        ('en_attente', 'En attente'),
+        ('en_cours', 'En cours'),
+        ('termine', 'Terminé'),
+        ('erreur', 'Erreur'),
+        ('interrompu', 'Interrompu'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    chemin_archive = models.CharField(max_length=500, help_text="Chemin de l'archive zip sur le serveur")
+    
+    # Valeurs appliquées aux mesures importées
+    position_technicien = models.CharField(max_length=20, choices=MesureOTDR.POSITION_CHOICES, default='central')
+    direction_analyse = models.CharField(max_length=20, choices=MesureOTDR.DIRECTION_CHOICES, default='vers_client')
+    
+    # Progression
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='en_attente')
+    total_fichiers = models.IntegerField(default=0)
+    fichiers_traites = models.JSONField(default=list, blank=True, help_text="Fichiers déjà traités, utilisés pour la reprise")
+    nombre_mesures = models.IntegerField(default=0)
+    nombre_coupures = models.IntegerField(default=0)
+    erreurs = models.JSONField(default=list, blank=True)
+    
+    cree_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Import OTDR {self.id} - {self.status}"
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Import OTDR"
+        verbose_name_plural = "Imports OTDR"
+
+class ImportReseau(models.Model):
+    """Import d'un export SIG (GeoJSON, KML, CSV) : clients, liaisons, points, segments et FAT"""
+    FORMAT_CHOICES = [
+        ('geojson', 'GeoJSON'),
+        ('kml', 'KML'),
+        ('csv', 'CSV'),
+    ]
+    
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    chemin_fichier = models.CharField(max_length=500, help_text="Chemin du fichier sur le serveur")
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    
+    # Progression
+    status = models.CharField(max_length=20, choices=ImportOTDR.STATUS_CHOICES, default='en_attente')
+    entites_lues = models.IntegerField(default=0)
+    compteurs = models.JSONField(default=dict, blank=True, help_text="Créations et mises à jour par type d'objet")
+    nombre_erreurs = models.IntegerField(default=0)
+    erreurs = models.JSONField(default=list, blank=True, help_text="Premières entités refusées")
+    
+    cree_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Import réseau {self.id} - {self.status}"
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Import réseau"
+        verbose_name_plural = "Imports réseau"
+
+# ========================
+# RÉSEAU
+# ========================
+
+class CorridorCriticite(models.Model):
+    """Impact d'une coupure sur un corridor (tronçon entre deux sites partagé par des liaisons)"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    # Sites aux extrémités du corridor (points co-localisés fusionnés)
+    site_depart_lat = models.FloatField()
+    site_depart_lng = models.FloatField()
+    site_arrivee_lat = models.FloatField()
+    site_arrivee_lng = models.FloatField()
+    longueur_km = models.FloatField(default=0, help_text="Longueur de câble du plus long segment du corridor")
+
+    # Ce qui est perdu si le corridor est coupé
+    nombre_segments = models.PositiveIntegerField(default=0)
+    nombre_liaisons = models.PositiveIntegerField(default=0)
+    nombre_clients = models.PositiveIntegerField(default=0)
+    segments = models.JSONField(default=list, blank=True)
+    liaisons = models.JSONField(default=list, blank=True)
+    clients = models.JSONField(default=list, blank=True)
+
+    calcule_le = models.DateTimeField()
+
+    def __str__(self):
+        return f"Corridor {self.nombre_liaisons} liaisons / {self.nombre_clients} clients"
+
+    class Meta:
+        ordering = ['-nombre_clients', '-nombre_liaisons']
+        verbose_name = "Criticité de corridor"
+        verbose_name_plural = "Criticité des corridors"
+        indexes = [
+            models.Index(fields=['nombre_clients', 'nombre_liaisons'], name='corridor_criticite'),
+        ]
+
+class BilanOptique(models.Model):
+    """Bilan de puissance optique d'une liaison : perte attendue, mesurée et marge restante"""
+    STATUT_CHOICES = [
+        ('ok', 'Dans le budget'),
+        ('alerte', 'Proche du budget'),
+        ('depasse', 'Budget dépassé'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    liaison = models.OneToOneField(Liaison, on_delete=models.CASCADE, related_name='bilan_optique')
+
+    # Éléments du bilan
+    longueur_fibre_km = models.FloatField(default=0)
+    nombre_epissures = models.PositiveIntegerField(default=0)
+    nombre_connecteurs = models.PositiveIntegerField(default=0)
+    nombre_passages_cassette = models.PositiveIntegerField(default=0)
+
+    # Résultat
+    perte_attendue_db = models.FloatField()
+    attenuation_mesuree_db = models.FloatField(null=True, blank=True)
+    mesure_otdr = models.ForeignKey(MesureOTDR, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    ecart_db = models.FloatField(null=True, blank=True, help_text="Atténuation mesurée - perte attendue")
+    budget_db = models.FloatField()
+    marge_db = models.FloatField(help_text="Budget - perte la plus élevée entre attendue et mesurée")
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='ok')
+
+    calcule_le = models.DateTimeField()
+
+    def __str__(self):
+        return f"Bilan {self.liaison.nom_liaison} - marge {self.marge_db:.1f} dB"
+
+    class Meta:
+        ordering = ['marge_db']
+        verbose_name = "Bilan optique"
+        verbose_name_plural = "Bilans optiques"
+        indexes = [
+            models.Index(fields=['statut', 'marge_db'], name='bilan_statut_marge'),
+        ]
+
+class TronconCable(models.Model):
+    """Portée de câble entre deux sites et occupation de ses brins par les liaisons"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+
+    site_depart_lat = models.FloatField()
+    site_depart_lng = models.FloatField()
+    site_arrivee_lat = models.FloatField()
+    site_arrivee_lng = models.FloatField()
+    capacite = models.IntegerField(choices=CAPACITE_CABLE_CHOICES)
+
+    # Bit n (petit-boutiste) à 1 : brin de rang n occupé, torons de 12 brins successifs
+    occupation = models.BinaryField()
+    nombre_brins_occupes = models.PositiveIntegerField(default=0)
+    brins = models.JSONField(default=dict, blank=True, help_text="Liaison occupant chaque brin, par rang")
+    conflits = models.JSONField(default=list, blank=True, help_text="Rangs des brins revendiqués par plusieurs liaisons")
+    segments = models.JSONField(default=list, blank=True)
+
+    calcule_le = models.DateTimeField()
+
+    def __str__(self):
+        return f"Tronçon {self.capacite} FO - {self.nombre_brins_occupes} brins occupés"
+
+    class Meta:
+        ordering = ['-nombre_brins_occupes']
+        verbose_name = "Tronçon de câble"
+        verbose_name_plural = "Tronçons de câble"
+
+class OccupationPorts(models.Model):
+    """Ports occupés d'une cassette ou d'un splitter, tenus à jour à l'enregistrement des équipements"""
+    EQUIPEMENT_CHOICES = [
+        ('cassette_fdt', 'Cassette FDT'),
+        ('cassette_odf', 'Cassette ODF (POP FTTH)'),
+        ('splitter', 'Splitter FAT'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    equipement = models.CharField(max_length=20, choices=EQUIPEMENT_CHOICES)
+    reference = models.CharField(max_length=100, help_text="Numéro de FDT, référence ODF ou numéro de FAT")
+    numero = models.IntegerField(default=0, help_text="Numéro de cassette (0 pour un splitter)")
+
+    nombre_ports = models.PositiveSmallIntegerField()
+    masque = models.BigIntegerField(default=0, help_text="Bit n-1 à 1 : port n occupé")
+    nombre_occupes = models.PositiveSmallIntegerField(default=0)
+    occupants = models.JSONField(default=dict, blank=True, help_text="Occupant de chaque port, par numéro")
+    conflits = models.JSONField(default=list, blank=True, help_text="Occupants refusés sur un port déjà pris")
+
+    # Incrémentée à chaque modification : les écritures concurrentes sont rejouées
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.get_equipement_display()} {self.reference}/{self.numero} - {self.nombre_occupes}/{self.nombre_ports}"
+
+    class Meta:
+        ordering = ['equipement', 'reference', 'numero']
+        unique_together = [['equipement', 'reference', 'numero']]
+        verbose_name = "Occupation des ports"
+        verbose_name_plural = "Occupation des ports"
+
+class NoeudFTTH(models.Model):
+    """Nœud de l'arbre FTTH OLT → port OLT → FDT → FAT → ONT, repéré par son chemin matérialisé"""
+    TYPE_NOEUD_CHOICES = [
+        ('olt', 'OLT'),
+        ('port_olt', 'Port OLT'),
+        ('fdt', 'FDT'),
+        ('fat', 'FAT'),
+        ('ont', 'ONT'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    type_noeud = models.CharField(max_length=20, choices=TYPE_NOEUD_CHOICES)
+    reference = models.CharField(
+        max_length=150, help_text="Référence OLT, OLT/port, numéro de FDT ou de FAT, point dynamique de l'ONT"
+    )
+    libelle = models.CharField(max_length=150, blank=True)
+    objet_id = models.UUIDField(null=True, blank=True, help_text="FAT ou point dynamique représenté")
+
+    # Segments « type:référence/ » des ancêtres puis du nœud : un sous-arbre est un intervalle de chemins
+    chemin = models.CharField(max_length=500, unique=True)
+    profondeur = models.PositiveSmallIntegerField(default=1)
+
+    # Abonné desservi (nœuds ONT)
+    liaison = models.ForeignKey(Liaison, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    client = models.ForeignKey(Client, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.get_type_noeud_display()} {self.libelle or self.reference}"
+
+    class Meta:
+        ordering = ['chemin']
+        unique_together = [['type_noeud', 'reference']]
+        indexes = [
+            models.Index(fields=['type_noeud', 'chemin'], name='noeud_ftth_type_chemin'),
+        ]
+        verbose_name = "Nœud FTTH"
+        verbose_name_plural = "Arbre FTTH"
 
 # ========================
 # INTERVENTIONS
@@ -0,0 +1,584 @@
+"""
+Traitement des fichiers OTDR au format Telcordia SR-4731 (.sor) : lecture,
+stockage compact des traces et comparaison à une empreinte de référence
+
+Module sans dépendance Django : il est importé par les processus de travail
+lors des imports en masse d'archives OTDR.
+"""
+import bisect
+import math
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+# Vitesse de la lumière dans le vide en km/µs
+VITESSE_LUMIERE_KM_US = 299792.458 / 1.0e6
+
+
+class _Curseur:
+    """Lecture séquentielle little-endian d'un bloc binaire"""
+
+    def __init__(self, contenu: bytes, position: int = 0):
+        self.contenu = contenu
+        self.position = position
+
+    def _lire(self, fmt: str):
+        taille = struct.calcsize(fmt)
+        if self.position + taille > len(self.contenu):
+            raise ValueError("Fichier SOR tronqué")
+        valeur = struct.unpack_from(fmt, self.contenu, self.position)
+        self.position += taille
+        return valeur
+
+    def uint16(self) -> int:
+        return self._lire('<H')[0]
+
+    def int16(self) -> int:
+        return self._lire('<h')[0]
+
+    def uint32(self) -> int:
+        return self._lire('<I')[0]
+
+    def int32(self) -> int:
+        return self._lire('<i')[0]
+
+    def fixe(self, taille: int) -> str:
+        if self.position + taille > len(self.contenu):
+            raise ValueError("Fichier SOR tronqué")
+        brut = self.contenu[self.position:self.position + taille]
+        self.position += taille
+        return brut.decode('latin-1').strip('\x00 ')
+
+    def chaine(self) -> str:
+        fin = self.contenu.find(b'\x00', self.position)
+        if fin < 0:
+            raise ValueError("Chaîne non terminée dans le fichier SOR")
+        brut = self.contenu[self.position:fin]
+        self.position = fin + 1
+        return brut.decode('latin-1').strip()
+
+
+class LecteurSOR:
+    """Lecteur des fichiers OTDR Bellcore/Telcordia SR-4731 version 2"""
+
+    @staticmethod
+    def lire(contenu: bytes) -> Dict:
+        """Décode un fichier .sor et retourne les paramètres, événements et la trace"""
+        blocs = LecteurSOR._lire_carte(contenu)
+        resultat = {
+            'version': blocs.pop('_version'),
+            'identifiant_cable': '',
+            'identifiant_fibre': '',
+            'origine': '',
+            'extremite': '',
+            'operateur': '',
+            'commentaire': '',
+            'longueur_onde_nm': None,
+            'date_mesure': None,
+            'indice_groupe': 1.4682,
+            'pas_km': None,
+            'evenements': [],
+            'perte_totale_db': None,
+            'longueur_fibre_km': None,
+            'trace': array('H'),
+            'echelle_db': 0.001,
+        }
+
+        if 'GenParams' in blocs:
+            LecteurSOR._lire_parametres_generaux(contenu, blocs['GenParams'], resultat)
+        if 'FxdParams' in blocs:
+            LecteurSOR._lire_parametres_fixes(contenu, blocs['FxdParams'], resultat)
+        if 'KeyEvents' in blocs:
+            LecteurSOR._lire_evenements(contenu, blocs['KeyEvents'], resultat)
+        if 'DataPts' in blocs:
+            LecteurSOR._lire_points(contenu, blocs['DataPts'], resultat)
+
+        return resultat
+
+    @staticmethod
+    def _lire_carte(contenu: bytes) -> Dict:
+        """Lit le bloc Map et retourne la position de début de chaque bloc"""
+        if not contenu.startswith(b'Map\x00'):
+            raise ValueError("Format SOR non supporté (seule la version 2 est lue)")
+
+        curseur = _Curseur(contenu, 4)
+        version = curseur.uint16()
+        taille_carte = curseur.uint32()
+        nombre_blocs = curseur.uint16()
+
+        blocs = {'_version': version}
+        position = taille_carte
+        for _ in range(nombre_blocs - 1):
+            nom = curseur.chaine()
+            curseur.uint16()  # version du bloc
+            taille = curseur.uint32()
+            blocs[nom] = position
+            position += taille
+
+        return blocs
+
+    @staticmethod
+    def _entete(contenu: bytes, position: int, nom: str) -> _Curseur:
+        curseur = _Curseur(contenu, position)
+        if curseur.chaine() != nom:
+            raise ValueError(f"Bloc {nom} introuvable à la position annoncée")
+        return curseur
+
+    @staticmethod
+    def _lire_parametres_generaux(contenu: bytes, position: int, resultat: Dict):
+        curseur = LecteurSOR._entete(contenu, position, 'GenParams')
+        curseur.fixe(2)  # langue
+        resultat['identifiant_cable'] = curseur.chaine()
+        resultat['identifiant_fibre'] = curseur.chaine()
+        curseur.uint16()  # type de fibre
+        resultat['longueur_onde_nm'] = curseur.uint16()
+        resultat['origine'] = curseur.chaine()
+        resultat['extremite'] = curseur.chaine()
+        curseur.chaine()  # code câble
+        curseur.fixe(2)  # condition de mesure
+        curseur.int32()  # offset utilisateur
+        curseur.int32()  # offset utilisateur en distance
+        resultat['operateur'] = curseur.chaine()
+        resultat['commentaire'] = curseur.chaine()
+
+    @staticmethod
+    def _lire_parametres_fixes(contenu: bytes, position: int, resultat: Dict):
+        curseur = LecteurSOR._entete(contenu, position, 'FxdParams')
+        horodatage = curseur.uint32()
+        if horodatage:
+            resultat['date_mesure'] = datetime.fromtimestamp(horodatage, tz=timezone.utc)
+        curseur.fixe(2)  # unités
+        longueur_onde = curseur.uint16()
+        if longueur_onde:
+            resultat['longueur_onde_nm'] = longueur_onde / 10.0
+        curseur.int32()  # offset d'acquisition
+        curseur.int32()  # offset d'acquisition en distance
+
+        nombre_impulsions = curseur.uint16()
+        for _ in range(nombre_impulsions):
+            curseur.uint16()
+        espacements = [curseur.uint32() for _ in range(nombre_impulsions)]
+        for _ in range(nombre_impulsions):
+            curseur.uint32()
+
+        indice = curseur.uint32()
+        if indice:
+            resultat['indice_groupe'] = indice / 100000.0
+        if espacements and espacements[0]:
+            # Espacement exprimé en unités de 100 ps pour 10 000 points
+            resultat['pas_km'] = (
+                espacements[0] * 1e-8 * VITESSE_LUMIERE_KM_US / resultat['indice_groupe']
+            )
+
+    @staticmethod
+    def _lire_evenements(contenu: bytes, position: int, resultat: Dict):
+        curseur = LecteurSOR._entete(contenu, position, 'KeyEvents')
+        # Temps de parcours exprimé en unités de 0,1 ns
+        facteur = 1e-4 * VITESSE_LUMIERE_KM_US / resultat['indice_groupe']
+
+        evenements = []
+        for _ in range(curseur.uint16()):
+            numero = curseur.uint16()
+            temps = curseur.uint32()
+            pente = curseur.int16()
+            perte = curseur.int16()
+            reflectance = curseur.int32()
+            code = curseur.fixe(8)
+            for _ in range(5):
+                curseur.uint32()  # marqueurs de début/fin d'événement
+            commentaire = curseur.chaine()
+
+            evenements.append({
+                'numero': numero,
+                'distance_km': temps * facteur,
+                'perte_db': perte / 1000.0,
+                'reflectance_db': reflectance / 1000.0,
+                'pente_db_km': pente / 1000.0,
+                'reflechissant': code[:1] == '1',
+                'fin_fibre': code[1:2] == 'E',
+                'code': code,
+                'commentaire': commentaire,
+            })
+
+        resultat['evenements'] = evenements
+        resultat['perte_totale_db'] = curseur.int32() / 1000.0
+        curseur.int32()  # début de fibre
+        resultat['longueur_fibre_km'] = curseur.uint32() * facteur
+
+    @staticmethod
+    def _lire_points(contenu: bytes, position: int, resultat: Dict):
+        curseur = LecteurSOR._entete(contenu, position, 'DataPts')
+        curseur.uint32()  # nombre total de points
+        if not curseur.uint16():
+            return
+        nombre_points = curseur.uint32()
+        echelle = curseur.uint16()
+
+        fin = curseur.position + nombre_points * 2
+        if fin > len(contenu):
+            raise ValueError("Trace OTDR tronquée")
+        trace = array('H')
+        trace.frombytes(contenu[curseur.position:fin])
+        if sys.byteorder == 'big':
+            trace.byteswap()
+
+        resultat['trace'] = trace
+        resultat['echelle_db'] = echelle / 1000.0 * 0.001
+
+
+def preparer_trace(resultat: Dict) -> Dict:
+    """Ajoute au fichier décodé la trace compressée et sa pyramide d'aperçu"""
+    trace = resultat['trace']
+    resultat['nombre_points'] = len(trace)
+    resultat['trace_compressee'] = CompressionTrace.compresser(trace) if trace else b''
+    resultat['pyramide'], resultat['niveaux_apercu'] = CompressionTrace.construire_pyramide(trace)
+    return resultat
+
+
+def analyser_fichier(element) -> Dict:
+    """Point d'entrée des processus de travail : (nom, contenu) -> fichier décodé"""
+    nom, contenu = element
+    try:
+        resultat = preparer_trace(LecteurSOR.lire(contenu))
+    except (ValueError, struct.error) as exc:
+        return {'nom': nom, 'erreur': str(exc)}
+    resultat['nom'] = nom
+    resultat['erreur'] = None
+    return resultat
+
+
+class CompressionTrace:
+    """Stockage compact d'une trace OTDR et pyramide min/max pour les aperçus"""
+
+    TAILLE_SEAU_BASE = 16
+    NOMBRE_SEAUX_MIN = 64
+
+    @staticmethod
+    def compresser(trace: array) -> bytes:
+        """Compresse une trace uint16 (ordre little-endian)"""
+        return zlib.compress(_vers_little_endian(trace), 6)
+
+    @staticmethod
+    def decompresser(contenu: bytes) -> array:
+        trace = array('H')
+        trace.frombytes(zlib.decompress(contenu))
+        if sys.byteorder == 'big':
+            trace.byteswap()
+        return trace
+
+    @staticmethod
+    def construire_pyramide(trace: array) -> Tuple[bytes, List[Dict]]:
+        """Construit les niveaux min/max successifs (seaux de 16, 32, 64... points).
+
+        Chaque niveau est une suite de paires (min, max) ; les niveaux sont
+        concaténés et décrits par leur position dans le fichier.
+        """
+        niveaux = []
+        valeurs = array('H')
+        taille = CompressionTrace.TAILLE_SEAU_BASE
+        if len(trace) < taille:
+            return b'', niveaux
+
+        paires = array('H')
+        for debut in range(0, len(trace), taille):
+            seau = trace[debut:debut + taille]
+            paires.append(min(seau))
+            paires.append(max(seau))
+
+        while True:
+            niveaux.append({'taille_seau': taille, 'debut': len(valeurs) // 2, 'nombre': len(paires) // 2})
+            valeurs.extend(paires)
+            if len(paires) // 2 <= CompressionTrace.NOMBRE_SEAUX_MIN:
+                break
+
+            suivant = array('H')
+            for i in range(0, len(paires), 4):
+                if i + 2 < len(paires):
+                    suivant.append(min(paires[i], paires[i + 2]))
+                    suivant.append(max(paires[i + 1], paires[i + 3]))
+                else:
+                    suivant.append(paires[i])
+                    suivant.append(paires[i + 1])
+            paires = suivant
+            taille *= 2
+
+        return _vers_little_endian(valeurs), niveaux
+
+    @staticmethod
+    def lire_niveau(fichier, niveau: Dict, premier: int, dernier: int) -> array:
+        """Lit les paires [premier, dernier[ d'un niveau de la pyramide par projection mémoire"""
+        debut = (niveau['debut'] + premier) * 4
+        fin = (niveau['debut'] + dernier) * 4
+        with mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ) as projection:
+            paires = array('H')
+            paires.frombytes(projection[debut:fin])
+        if sys.byteorder == 'big':
+            paires.byteswap()
+        return paires
+
+    @staticmethod
+    def regrouper(paires: array, largeur: int) -> List[Tuple[int, int, int]]:
+        """Réduit une suite de paires (min, max) à `largeur` seaux : (indice, min, max)"""
+        nombre = len(paires) // 2
+        largeur = max(1, min(largeur, nombre))
+        resultat = []
+        for k in range(largeur):
+            debut = k * nombre // largeur
+            fin = max((k + 1) * nombre // largeur, debut + 1)
+            resultat.append((
+                debut,
+                min(paires[2 * debut:2 * fin:2]),
+                max(paires[2 * debut + 1:2 * fin:2])
+            ))
+        return resultat
+
+
+def _vers_little_endian(valeurs: array) -> bytes:
+    if sys.byteorder == 'big':
+        valeurs = array(valeurs.typecode, valeurs)
+        valeurs.byteswap()
+    return valeurs.tobytes()
+
+
+class ComparaisonEmpreinte:
+    """Comparaison d'une mesure OTDR à l'empreinte de référence d'une liaison"""
+
+    TOLERANCE_ALIGNEMENT_KM = 0.05
+    TOLERANCE_KM = 0.005
+    TOLERANCE_RELATIVE = 0.0005
+    SEUIL_CROISSANCE_DB = 0.2
+    SEUIL_NOUVEL_EVENEMENT_DB = 0.1
+    SEUIL_ECART_TRACE_DB = 0.5
+    LONGUEUR_ECART_TRACE = 8
+
+    @staticmethod
+    def apparier(reference: List[Dict], mesure: List[Dict], decalage_km: float = 0.0,
+                 tolerance_km: float = None) -> List[Tuple[int, int]]:
+        """Apparie chaque événement mesuré à l'événement de référence le plus proche.
+
+        Recherche dichotomique dans les distances de référence triées ;
+        un événement de référence n'est apparié qu'une fois.
+        """
+        ordre = sorted(range(len(reference)), key=lambda i: reference[i]['distance_km'])
+        distances = [reference[i]['distance_km'] for i in ordre]
+        pris = set()
+        paires = []
+
+        for j, evenement in enumerate(mesure):
+            distance = evenement['distance_km'] - decalage_km
+            tolerance = tolerance_km
+            if tolerance is None:
+                tolerance = ComparaisonEmpreinte.TOLERANCE_KM + ComparaisonEmpreinte.TOLERANCE_RELATIVE * distance
+
+            position = bisect.bisect_left(distances, distance)
+            meilleur = None
+            for k in (position - 1, position, position + 1):
+                if 0 <= k < len(distances) and k not in pris:
+                    ecart = abs(distances[k] - distance)
+                    if ecart <= tolerance and (meilleur is None or ecart < meilleur[1]):
+                        meilleur = (k, ecart)
+            if meilleur:
+                pris.add(meilleur[0])
+                paires.append((ordre[meilleur[0]], j))
+
+        return paires
+
+    @staticmethod
+    def comparer(reference: List[Dict], mesure: List[Dict]) -> Dict:
+        """Diff de deux tables d'événements et type d'événement qui en découle"""
+        fin_reference = next((e['distance_km'] for e in reference if e['fin_fibre']), None)
+        fin_mesure = next((e['distance_km'] for e in mesure if e['fin_fibre']), None)
+        reference = [e for e in reference if not e['fin_fibre']]
+        intermediaires = [e for e in mesure if not e['fin_fibre']]
+
+        # Décalage global estimé sur un premier appariement large
+        paires = ComparaisonEmpreinte.apparier(
+            reference, intermediaires, tolerance_km=ComparaisonEmpreinte.TOLERANCE_ALIGNEMENT_KM
+        )
+        decalage = 0.0
+        if paires:
+            ecarts = sorted(intermediaires[j]['distance_km'] - reference[i]['distance_km'] for i, j in paires)
+            decalage = ecarts[len(ecarts) // 2]
+        paires = ComparaisonEmpreinte.apparier(reference, intermediaires, decalage)
+
+        apparies_mesure = {j for _, j in paires}
+        apparies_reference = {i for i, _ in paires}
+
+        accrus = []
+        for i, j in paires:
+            croissance = intermediaires[j]['perte_db'] - reference[i]['perte_db']
+            if croissance > ComparaisonEmpreinte.SEUIL_CROISSANCE_DB:
+                accrus.append({**intermediaires[j], 'perte_reference_db': reference[i]['perte_db'],
+                               'croissance_db': round(croissance, 3)})
+
+        nouveaux = [
+            e for j, e in enumerate(intermediaires)
+            if j not in apparies_mesure
+            and (e['reflechissant'] or e['perte_db'] > ComparaisonEmpreinte.SEUIL_NOUVEL_EVENEMENT_DB)
+        ]
+
+        fibre_raccourcie = (
+            fin_mesure is not None and fin_reference is not None
+            and fin_mesure - decalage < fin_reference - ComparaisonEmpreinte.TOLERANCE_ALIGNEMENT_KM
+        )
+        disparus = [
+            e for i, e in enumerate(reference)
+            if i not in apparies_reference and fin_mesure is not None and e['distance_km'] + decalage > fin_mesure
+        ]
+
+        type_evenement, distance = None, None
+        pertes = accrus + [e for e in nouveaux if not e['reflechissant']]
+        reflets = [e for e in nouveaux if e['reflechissant']]
+        if fibre_raccourcie:
+            type_evenement, distance = 'coupure', fin_mesure
+        elif pertes:
+            type_evenement = 'epissure'
+            distance = max(pertes, key=lambda e: e['perte_db'])['distance_km']
+        elif reflets:
+            type_evenement = 'reflet'
+            distance = max(reflets, key=lambda e: e['reflectance_db'])['distance_km']
+
+        return {
+            'decalage_km': round(decalage, 5),
+            'nombre_apparies': len(paires),
+            'accrus': accrus,
+            'nouveaux': nouveaux,
+            'disparus': disparus,
+            'fin_fibre_km': fin_mesure,
+            'fin_reference_km': fin_reference,
+            'fibre_raccourcie': fibre_raccourcie,
+            'type_evenement': type_evenement,
+            'distance_km': distance,
+        }
+
+    @staticmethod
+    def ecart_traces(reference: array, pas_reference: float, echelle_reference: float,
+                     mesure: array, pas_mesure: float, echelle_mesure: float,
+                     decalage_km: float = 0.0) -> Dict:
+        """Soustraction de la trace mesurée à la trace de référence réalignée"""
+        ratio = pas_reference / pas_mesure
+        origine = decalage_km / pas_mesure
+        # Plage d'échantillons de référence couverte par la trace mesurée
+        premier = max(0, math.ceil(-origine / ratio))
+        dernier = min(len(reference), math.ceil((len(mesure) - origine) / ratio))
+        ecarts = [
+            mesure[int(i * ratio + origine)] * echelle_mesure - reference[i] * echelle_reference
+            for i in range(premier, dernier)
+        ]
+        if not ecarts:
+            return {'ecart_max_db': None, 'position_ecart_max_km': None, 'debut_ecart_km': None}
+
+        haut, bas = max(ecarts), min(ecarts)
+        indice_max = ecarts.index(haut if haut >= -bas else bas)
+
+        # Premier dépassement du seuil maintenu sur plusieurs échantillons
+        debut_ecart = None
+        consecutifs = 0
+        for i, ecart in enumerate(ecarts):
+            consecutifs = consecutifs + 1 if ecart > ComparaisonEmpreinte.SEUIL_ECART_TRACE_DB else 0
+            if consecutifs == ComparaisonEmpreinte.LONGUEUR_ECART_TRACE:
+                debut_ecart = (premier + i - consecutifs + 1) * pas_reference
+                break
+
+        return {
+            'ecart_max_db': round(ecarts[indice_max], 3),
+            'position_ecart_max_km': round((premier + indice_max) * pas_reference, 5),
+            'debut_ecart_km': round(debut_ecart, 5) if debut_ecart is not None else None,
+        }
+
+
+class AlignementEvenements:
+    """Alignement par programmation dynamique des événements mesurés sur les points attendus"""
+
+    TOLERANCE_KM = 0.05
+    TOLERANCE_RELATIVE = 0.02
+    TOLERANCE_RELATIVE_INITIALE = 0.06
+    ITERATIONS = 4
+
+    @staticmethod
+    def aligner(mesures: List[float], attendus: List[float], facteur: float = 1.0,
+                tolerance_relative: float = None) -> List[Tuple[int, int]]:
+        """Alignement monotone minimisant l'écart des paires et les éléments laissés seuls.
+
+        Une paire coûte son écart en km (si dans la tolérance), un élément non
+        apparié coûte sa tolérance : une paire acceptée est toujours préférée.
+        """
+        if tolerance_relative is None:
+            tolerance_relative = AlignementEvenements.TOLERANCE_RELATIVE
+        tolerance = lambda distance: AlignementEvenements.TOLERANCE_KM + tolerance_relative * distance
+        attendus = [distance * facteur for distance in attendus]
+        n, m = len(mesures), len(attendus)
+
+        cout = [[0.0] * (m + 1) for _ in range(n + 1)]
+        choix = [[0] * (m + 1) for _ in range(n + 1)]
+        for i in range(1, n + 1):
+            cout[i][0] = cout[i - 1][0] + tolerance(mesures[i - 1])
+            choix[i][0] = 1
+        for j in range(1, m + 1):
+            cout[0][j] = cout[0][j - 1] + tolerance(attendus[j - 1])
+            choix[0][j] = 2
+
+        for i in range(1, n + 1):
+            for j in range(1, m + 1):
+                # 1 : événement mesuré seul, 2 : point attendu sans événement, 3 : paire
+                meilleur = cout[i - 1][j] + tolerance(mesures[i - 1])
+                direction = 1
+                candidat = cout[i][j - 1] + tolerance(attendus[j - 1])
+                if candidat < meilleur:
+                    meilleur, direction = candidat, 2
+                ecart = abs(mesures[i - 1] - attendus[j - 1])
+                if ecart <= tolerance(attendus[j - 1]) and cout[i - 1][j - 1] + ecart < meilleur:
+                    meilleur, direction = cout[i - 1][j - 1] + ecart, 3
+                cout[i][j] = meilleur
+                choix[i][j] = direction
+
+        paires = []
+        i, j = n, m
+        while i > 0 or j > 0:
+            direction = choix[i][j]
+            if direction == 3:
+                paires.append((i - 1, j - 1))
+                i, j = i - 1, j - 1
+            elif direction == 1:
+                i -= 1
+            else:
+                j -= 1
+        paires.reverse()
+        return paires
+
+    @staticmethod
+    def estimer(mesures: List[float], attendus: List[float]) -> Optional[Dict]:
+        """Estime alternativement l'alignement et le facteur d'échelle fibre/câble"""
+        facteur = 1.0
+        tolerance_relative = AlignementEvenements.TOLERANCE_RELATIVE_INITIALE
+        paires = []
+
+        for _ in range(AlignementEvenements.ITERATIONS):
+            paires = AlignementEvenements.aligner(mesures, attendus, facteur, tolerance_relative)
+            if not paires:
+                return None
+            # Moindres carrés d'une droite passant par l'origine
+            numerateur = sum(mesures[i] * attendus[j] for i, j in paires)
+            denominateur = sum(attendus[j] ** 2 for _, j in paires)
+            if denominateur > 0:
+                facteur = numerateur / denominateur
+            tolerance_relative = AlignementEvenements.TOLERANCE_RELATIVE
+
+        residu = math.sqrt(sum((mesures[i] - facteur * attendus[j]) ** 2 for i, j in paires) / len(paires))
+        return {'facteur_echelle': facteur, 'paires': paires, 'residu_km': residu}
+
+    @staticmethod
+    def recaler(distance_mesuree: float, mesures: List[float], attendus: List[float],
+                alignement: Dict) -> Tuple[Optional[int], float]:
+        """Position de la coupure rapportée au dernier point identifié avant elle"""
+        facteur = alignement['facteur_echelle']
+        avant = [(i, j) for i, j in alignement['paires'] if mesures[i] <= distance_mesuree]
+        if not avant:
+            return None, distance_mesuree / facteur
+
+        i, j = max(avant, key=lambda paire: mesures[paire[0]])
+        return j, attendus[j] + (distance_mesuree - mesures[i]) / facteur
@@ -0,0 +1,299 @@
+"""
+Graphe des corridors du réseau : sites physiques et tronçons partagés entre liaisons,
+continuité des brins d'un point à l'autre
+
+Module sans dépendance Django : les points et segments sont décrits par des tuples,
+ce qui permet d'exécuter l'agrégation dans des processus séparés.
+"""
+import heapq
+from array import array
+from collections import deque
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from .spatial import METRES_PAR_DEGRE, GrilleSpatiale
+
+# (segment_id, liaison_id, client_id, site_a, site_b, longueur_km)
+SegmentSite = Tuple[Hashable, Hashable, Hashable, int, int, float]
+
+
+class _Partition:
+    """Union-find avec compression de chemin"""
+
+    def __init__(self, taille: int):
+        self.parents = list(range(taille))
+
+    def racine(self, i: int) -> int:
+        racine = i
+        while self.parents[racine] != racine:
+            racine = self.parents[racine]
+        while self.parents[i] != racine:
+            self.parents[i], i = racine, self.parents[i]
+        return racine
+
+    def unir(self, i: int, j: int):
+        ri, rj = self.racine(i), self.racine(j)
+        if ri != rj:
+            self.parents[max(ri, rj)] = min(ri, rj)
+
+
+def regrouper_sites(points: List[Tuple[Hashable, float, float]],
+                    tolerance_m: float) -> Tuple[Dict[Hashable, int], List[Tuple[float, float]]]:
+    """Fusionne les points distants de moins de tolerance_m mètres en sites
+
+    Retourne l'indice de site de chaque point et les coordonnées moyennes des sites.
+    Le regroupement est transitif : une chaîne de points rapprochés forme un seul site.
+    """
+    grille = GrilleSpatiale(max(tolerance_m / METRES_PAR_DEGRE, 1e-6))
+    partition = _Partition(len(points))
+    for i, (_, lat, lng) in enumerate(points):
+        for j, _, _, _ in grille.rechercher(lat, lng, tolerance_m):
+            partition.unir(i, j)
+        grille.ajouter(i, [[lat, lng]])
+
+    indices_racines: Dict[int, int] = {}
+    sommes: List[List[float]] = []
+    site_par_point: Dict[Hashable, int] = {}
+    for i, (cle, lat, lng) in enumerate(points):
+        racine = partition.racine(i)
+        if racine not in indices_racines:
+            indices_racines[racine] = len(sommes)
+            sommes.append([0.0, 0.0, 0])
+        site = indices_racines[racine]
+        sommes[site][0] += lat
+        sommes[site][1] += lng
+        sommes[site][2] += 1
+        site_par_point[cle] = site
+
+    sites = [(lat / nombre, lng / nombre) for lat, lng, nombre in sommes]
+    return site_par_point, sites
+
+
+def cle_corridor(site_a: int, site_b: int) -> Tuple[int, int]:
+    """Un corridor ne dépend pas du sens de parcours"""
+    return (site_a, site_b) if site_a <= site_b else (site_b, site_a)
+
+
+def repartir_segments(segments: Iterable[SegmentSite], nombre_lots: int) -> List[List[SegmentSite]]:
+    """Répartit les segments par corridor : chaque lot possède ses corridors en propre"""
+    lots: List[List[SegmentSite]] = [[] for _ in range(max(nombre_lots, 1))]
+    for segment in segments:
+        site_a, site_b = cle_corridor(segment[3], segment[4])
+        lots[(site_a * 1000003 + site_b) % len(lots)].append(segment)
+    return [lot for lot in lots if lot]
+
+
+def agreger_corridors(segments: List[SegmentSite]) -> List[Dict]:
+    """Indice d'impact de chaque corridor du lot, en un seul passage sur ses segments
+
+    Une liaison est une chaîne de segments sans redondance : elle est perdue dès
+    qu'un corridor qu'elle emprunte est coupé.
+    """
+    corridors: Dict[Tuple[int, int], Dict] = {}
+    for segment_id, liaison_id, client_id, site_a, site_b, longueur in segments:
+        if site_a == site_b:
+            continue
+        corridor = corridors.setdefault(cle_corridor(site_a, site_b), {
+            'segments': [], 'liaisons': set(), 'clients': set(), 'longueur_km': 0.0,
+        })
+        corridor['segments'].append(segment_id)
+        corridor['liaisons'].add(liaison_id)
+        corridor['clients'].add(client_id)
+        corridor['longueur_km'] = max(corridor['longueur_km'], longueur)
+
+    return [
+        {
+            'site_a': site_a,
+            'site_b': site_b,
+            'longueur_km': corridor['longueur_km'],
+            'segments': corridor['segments'],
+            'liaisons': sorted(corridor['liaisons'], key=str),
+            'clients': sorted(corridor['clients'], key=str),
+        }
+        for (site_a, site_b), corridor in corridors.items()
+    ]
+
+
+class GrapheCSR:
+    """Graphe non orienté des sites en représentation CSR (compressed sparse row)
+
+    Les voisins du site s sont indices[indptr[s]:indptr[s + 1]], avec pour chaque
+    entrée le poids (km) et le numéro de l'arête (corridor) empruntée.
+    """
+
+    def __init__(self, nombre_sites: int, aretes: List[Tuple[int, int, float]]):
+        self.nombre_sites = nombre_sites
+        self.nombre_aretes = len(aretes)
+        degres = array('l', [0]) * (nombre_sites + 1)
+        for site_a, site_b, _ in aretes:
+            degres[site_a + 1] += 1
+            degres[site_b + 1] += 1
+        for s in range(nombre_sites):
+            degres[s + 1] += degres[s]
+        self.indptr = degres
+
+        taille = self.indptr[nombre_sites]
+        self.indices = array('l', [0]) * taille
+        self.poids = array('d', [0.0]) * taille
+        self.aretes = array('l', [0]) * taille
+        curseurs = array('l', self.indptr[:nombre_sites])
+        for numero, (site_a, site_b, poids) in enumerate(aretes):
+            for origine, destination in ((site_a, site_b), (site_b, site_a)):
+                position = curseurs[origine]
+                self.indices[position] = destination
+                self.poids[position] = poids
+                self.aretes[position] = numero
+                curseurs[origine] += 1
+
+    def voisins(self, site: int) -> Iterable[Tuple[int, float, int]]:
+        """(site voisin, poids, numéro d'arête)"""
+        for position in range(self.indptr[site], self.indptr[site + 1]):
+            yield self.indices[position], self.poids[position], self.aretes[position]
+
+    def plus_court_chemin(self, depart: int, arrivee: int,
+                          aretes_exclues: Set[int] = frozenset()) -> Optional[Tuple[float, List[int], List[int]]]:
+        """Dijkstra : (distance, sites du chemin, arêtes du chemin), ou None sans chemin"""
+        distances = {depart: 0.0}
+        precedents: Dict[int, Tuple[int, int]] = {}
+        file = [(0.0, depart)]
+        while file:
+            distance, site = heapq.heappop(file)
+            if site == arrivee:
+                break
+            if distance > distances[site]:
+                continue
+            for voisin, poids, arete in self.voisins(site):
+                if arete in aretes_exclues:
+                    continue
+                candidate = distance + poids
+                if candidate < distances.get(voisin, float('inf')):
+                    distances[voisin] = candidate
+                    precedents[voisin] = (site, arete)
+                    heapq.heappush(file, (candidate, voisin))
+
+        if arrivee not in distances:
+            return None
+        sites, aretes = [arrivee], []
+        while sites[-1] != depart:
+            site, arete = precedents[sites[-1]]
+            sites.append(site)
+            aretes.append(arete)
+        return distances[arrivee], sites[::-1], aretes[::-1]
+
+    def atteignables(self, depart: int, aretes_exclues: Set[int] = frozenset()) -> Set[int]:
+        """Sites reliés à depart sans emprunter les arêtes exclues (parcours en largeur)"""
+        vus = {depart}
+        file = deque([depart])
+        while file:
+            for voisin, _, arete in self.voisins(file.popleft()):
+                if voisin not in vus and arete not in aretes_exclues:
+                    vus.add(voisin)
+                    file.append(voisin)
+        return vus
+
+    def composantes(self) -> array:
+        """Numéro de composante connexe de chaque site"""
+        composantes = array('l', [-1]) * self.nombre_sites
+        numero = 0
+        for site in range(self.nombre_sites):
+            if composantes[site] != -1:
+                continue
+            composantes[site] = numero
+            file = deque([site])
+            while file:
+                courant = file.popleft()
+                for position in range(self.indptr[courant], self.indptr[courant + 1]):
+                    voisin = self.indices[position]
+                    if composantes[voisin] == -1:
+                        composantes[voisin] = numero
+                        file.append(voisin)
+            numero += 1
+        return composantes
+
+
+# Écarts de continuité entre le câble sortant d'un point et le câble entrant du suivant
+ECART_CAPACITE = 1
+ECART_TORON = 2
+ECART_BRIN = 4
+BRINS_PAR_TORON = 12
+
+
+def detecter_discontinuites(liaisons: array, sortie: Tuple[array, array, array],
+                            entree: Tuple[array, array, array]) -> array:
+    """Code d'écart de chaque jonction entre un point et le suivant de la même liaison
+
+    Les colonnes décrivent les points triés par liaison puis ordre ; capacités et
+    couleurs sont encodées en entiers, -1 pour une valeur inconnue (jamais comparée).
+    codes[i] porte sur la jonction i → i + 1 et vaut 0 entre deux liaisons.
+    """
+    codes = array('b', [0]) * len(liaisons)
+    for (ecart, valeurs_sortie, valeurs_entree) in zip((ECART_CAPACITE, ECART_TORON, ECART_BRIN), sortie, entree):
+        for i, (liaison, suivante, amont, aval) in enumerate(
+                zip(liaisons, liaisons[1:], valeurs_sortie, valeurs_entree[1:])):
+            if liaison == suivante and amont >= 0 and aval >= 0 and amont != aval:
+                codes[i] |= ecart
+    return codes
+
+
+def detecter_hors_capacite(capacites: array, torons: array, brins: array) -> array:
+    """Vrai pour chaque côté dont le toron ou le brin n'existe pas dans un câble de cette capacité"""
+    return array('b', (
+        capacite > 0 and (
+            brin >= min(capacite, BRINS_PAR_TORON)
+            or toron >= max(1, -(-capacite // BRINS_PAR_TORON))
+        )
+        for capacite, toron, brin in zip(capacites, torons, brins)
+    ))
+
+
+def indice_brin(toron: int, brin: int) -> int:
+    """Rang du brin dans le câble, torons successifs de BRINS_PAR_TORON brins"""
+    return toron * BRINS_PAR_TORON + brin
+
+
+def masque_complet(capacite: int) -> int:
+    return (1 << capacite) - 1
+
+
+def brins_du_masque(masque: int) -> List[int]:
+    """Rangs des bits à 1 d'un masque, dans l'ordre croissant"""
+    brins = []
+    while masque:
+        bit = masque & -masque
+        brins.append(bit.bit_length() - 1)
+        masque ^= bit
+    return brins
+
+
+def masque_vers_octets(masque: int, capacite: int) -> bytes:
+    return masque.to_bytes((capacite + 7) // 8, 'little')
+
+
+def octets_vers_masque(octets: bytes) -> int:
+    return int.from_bytes(bytes(octets), 'little')
+
+
+# (point_id, liaison_id, moue_m), points triés par liaison puis ordre
+PointCumul = Tuple[Hashable, Hashable, float]
+
+
+def cumuler_distances(points: List[PointCumul],
+                      longueurs: Dict[Tuple[Hashable, Hashable], float]) -> List[Tuple[Hashable, float, float]]:
+    """Distance câble et distance optique (km) de chaque point depuis le central
+
+    longueurs donne la longueur de câble du segment (point_depart_id, point_arrivee_id) ;
+    un segment absent entre deux points consécutifs compte pour zéro. La moue d'un
+    point (en mètres) s'ajoute à la distance optique des points qui le suivent.
+    """
+    resultats = []
+    precedent = liaison_courante = None
+    distance = moues = 0.0
+    for point_id, liaison_id, moue in points:
+        if liaison_id != liaison_courante:
+            distance = moues = 0.0
+            liaison_courante = liaison_id
+        else:
+            distance += longueurs.get((precedent, point_id)) or 0.0
+        resultats.append((point_id, distance, distance + moues / 1000))
+        moues += moue or 0.0
+        precedent = point_id
+    return resultats
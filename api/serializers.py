@@ -4,7 +4,8 @@ from .models import (
     User, Client, Liaison, TypeLiaison, PointDynamique, Segment,
     DetailONT, DetailPOPLS, DetailPOPFTTH, DetailChambre, DetailManchon, 
     FAT, DetailFDT, PhotoPoint, MesureOTDR, Coupure, Intervention, 
-    CommitIntervention, FicheTechnique, Notification, ParametreApplication,
+    CommitIntervention, FicheTechnique, Notification, ParametreApplication, ImportOTDR, ImportReseau,
+    ReferenceOTDR, CorridorCriticite, BilanOptique,
     COULEUR_CHOICES, CAPACITE_CABLE_CHOICES, CONNECTEUR_CHOICES
 )
 
@@ -85,15 +86,13 @@ class LiaisonListSerializer(serializers.ModelSerializer):
     """Serializer allégé pour les listes"""
     client_name = serializers.CharField(source='client.name', read_only=True)
     type_liaison_display = serializers.CharField(source='type_liaison.get_type_display', read_only=True)
-    points_count = serializers.SerializerMethodField()
+    points_count = serializers.IntegerField(source='nombre_points', read_only=True)
     
     class Meta:
         model = Liaison
         fields = ['id', 'nom_liaison', 'client_name', 'type_liaison_display', 
-                 'status', 'distance_totale', 'points_count', 'created_at']
-
-    def get_points_count(self, obj):
-        return obj.points_dynamiques.count()
+                 'status', 'distance_totale', 'points_count', 'nombre_segments',
+                 'topologie_modifiee_le', 'created_at']
 
 class LiaisonDetailSerializer(serializers.ModelSerializer):
     """Serializer complet avec toutes les relations"""
@@ -168,7 +167,9 @@ class PointDynamiqueListSerializer(serializers.ModelSerializer):
     class Meta:
         model = PointDynamique
         fields = ['id', 'nom', 'type_point', 'type_point_display', 'ordre',
-                 'latitude', 'longitude', 'distance_depuis_central', 'photos_count']
+                 'latitude', 'longitude', 'distance_depuis_central', 'distance_optique_depuis_central',
+                 'photos_count']
+        read_only_fields = PointDynamique.CHAMPS_PROFIL_OPTIQUE
 
     def get_photos_count(self, obj):
         return obj.photos.count()
@@ -191,6 +192,7 @@ class PointDynamiqueDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = PointDynamique
         fields = '__all__'
+        read_only_fields = PointDynamique.CHAMPS_PROFIL_OPTIQUE
 
     def get_detail_fat(self, obj):
         try:
@@ -212,6 +214,7 @@ class PointDynamiqueCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = PointDynamique
         fields = '__all__'
+        read_only_fields = PointDynamique.CHAMPS_PROFIL_OPTIQUE
 
     def create(self, validated_data):
         # Extraire les détails spécifiques
@@ -241,6 +244,21 @@ class PointDynamiqueCreateSerializer(serializers.ModelSerializer):
         
         return point
 
+    def update(self, instance, validated_data):
+        # Seuls les champs reçus sont écrits : le profil optique, tenu à jour en base par
+        # ProfilOptiqueService, n'est pas écrasé par une instance lue avant sa mise à jour
+        serializers.raise_errors_on_nested_writes('update', self, validated_data)
+        for champ, valeur in validated_data.items():
+            setattr(instance, champ, valeur)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
+        return instance
+
+class PointDynamiqueLotSerializer(serializers.ModelSerializer):
+    """Point d'une liaison créée en masse : liaison et ordre découlent de sa position dans la liste"""
+    class Meta:
+        model = PointDynamique
+        fields = ['type_point', 'nom', 'latitude', 'longitude', 'description', 'commentaire_technicien']
+
 # ========================
 # SERIALIZERS FAT
 # ========================
@@ -270,16 +288,27 @@ class MesureOTDRSerializer(serializers.ModelSerializer):
     class Meta:
         model = MesureOTDR
         fields = '__all__'
+        read_only_fields = ['date_mesure', 'type_evenement_reference', 'distance_reference_km']
 
 class MesureOTDRCreateSerializer(serializers.ModelSerializer):
     class Meta:
         model = MesureOTDR
         fields = '__all__'
+        read_only_fields = ['date_mesure', 'type_evenement_reference', 'distance_reference_km']
 
     def create(self, validated_data):
         validated_data['technicien'] = self.context['request'].user
         return super().create(validated_data)
 
+class ReferenceOTDRSerializer(serializers.ModelSerializer):
+    liaison_nom = serializers.CharField(source='liaison.nom_liaison', read_only=True)
+    date_mesure = serializers.DateTimeField(source='mesure_otdr.date_mesure', read_only=True)
+    definie_par = UserPublicSerializer(read_only=True)
+    
+    class Meta:
+        model = ReferenceOTDR
+        fields = '__all__'
+
 class CoupureSerializer(serializers.ModelSerializer):
     liaison_nom = serializers.CharField(source='liaison.nom_liaison', read_only=True)
     mesure_otdr = MesureOTDRSerializer(read_only=True)
@@ -300,6 +329,54 @@ class CoupureSerializer(serializers.ModelSerializer):
             }
         return None
 
+class ImportOTDRSerializer(serializers.ModelSerializer):
+    """Suivi d'un import d'archive OTDR (sans la liste des fichiers traités)"""
+    nombre_fichiers_traites = serializers.SerializerMethodField()
+    progression = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ImportOTDR
+        exclude = ['fichiers_traites', 'chemin_archive']
+
+    def get_nombre_fichiers_traites(self, obj):
+        return len(obj.fichiers_traites)
+
+    def get_progression(self, obj):
+        if not obj.total_fichiers:
+            return 0
+        return round(len(obj.fichiers_traites) / obj.total_fichiers * 100, 1)
+
+class ImportReseauSerializer(serializers.ModelSerializer):
+    """Suivi d'un import d'export SIG"""
+    
+    class Meta:
+        model = ImportReseau
+        exclude = ['chemin_fichier']
+
+# ========================
+# SERIALIZERS RÉSEAU
+# ========================
+
+class CorridorCriticiteSerializer(serializers.ModelSerializer):
+    """Corridor classé par impact, avec les liaisons perdues en cas de coupure"""
+    nom_liaisons = serializers.SerializerMethodField()
+
+    class Meta:
+        model = CorridorCriticite
+        exclude = ['segments']
+
+    def get_nom_liaisons(self, obj):
+        noms = self.context.get('noms_liaisons', {})
+        return [noms.get(liaison_id) for liaison_id in obj.liaisons]
+
+class BilanOptiqueSerializer(serializers.ModelSerializer):
+    """Bilan de puissance optique d'une liaison"""
+    nom_liaison = serializers.CharField(source='liaison.nom_liaison', read_only=True)
+
+    class Meta:
+        model = BilanOptique
+        fields = '__all__'
+
 # ========================
 # SERIALIZERS INTERVENTIONS
 # ========================
@@ -410,7 +487,8 @@ class CoupureCarteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Coupure
         fields = ['id', 'liaison_nom', 'client_name', 'status', 'point_estime_lat', 
-                 'point_estime_lng', 'date_detection', 'description_diagnostic']
+                 'point_estime_lng', 'incertitude_km', 'nombre_signalements', 'date_detection',
+                 'description_diagnostic']
 
 # ========================
 # SERIALIZERS AUTHENTIFICATION
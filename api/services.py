@@ -1,221 +1,3636 @@
 """
 Services pour la logique métier FiberMap
 """
+import bisect
+import contextlib
+import csv
+import functools
+import io
+import itertools
 import math
-from typing import Dict, List, Tuple, Optional
-from django.db.models import Sum, Q
+import os
+import re
+import random
+import struct
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+from array import array
+from collections import deque
+from typing import Callable, Dict, Iterable, List, Tuple, Optional
+from urllib.parse import quote
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, connection, transaction
+from django.db.models import CharField, Count, F, Max, Min, OuterRef, Subquery, Sum, Q, Value
+from django.db.models.functions import Coalesce, Concat, Greatest, Least, Substr
+from django.utils import timezone
 from geopy.distance import geodesic
 from .models import (
-    Liaison, PointDynamique, Segment, MesureOTDR, Coupure,
-    Client, FAT, Intervention, Notification
+    Liaison, TypeLiaison, PointDynamique, Segment, MesureOTDR, Coupure,
+    Client, FAT, Intervention, LotTrace, Notification, ImportOTDR, ImportReseau, TraceOTDR, ReferenceOTDR, CorridorCriticite,
+    BilanOptique, DetailPOPLS, DetailPOPFTTH, DetailChambre, DetailManchon, DetailFDT, ParametreApplication,
+    TronconCable, OccupationPorts, DetailONT, NoeudFTTH, CAPACITE_CABLE_CHOICES, CONNECTEUR_CHOICES, COULEUR_CHOICES
 )
+from .otdr import (
+    AlignementEvenements, CompressionTrace, ComparaisonEmpreinte, LecteurSOR, analyser_fichier,
+    preparer_trace
+)
+from .reseau import (
+    BRINS_PAR_TORON, ECART_BRIN, ECART_CAPACITE, ECART_TORON, GrapheCSR, agreger_corridors, cle_corridor,
+    brins_du_masque, cumuler_distances, detecter_discontinuites, detecter_hors_capacite, indice_brin, masque_complet,
+    masque_vers_octets, octets_vers_masque, regrouper_sites, repartir_segments
+)
+from .lecteurs_sig import lire as lire_entites
+from .spatial import (
+    METRES_PAR_DEGRE, GrilleSpatiale, filtrer_trace, longueurs_cumulees_km, longueurs_km, mesurer_trace,
+    sommet_le_plus_proche
+)
+
+class SegmentService:
+    """Service pour gérer les segments de liaison"""
+
+    TAILLE_LOT_LIAISONS = 200
+    TAILLE_LOT_ENREGISTREMENT = 500
+
+    @staticmethod
+    def calculer_distance_gps(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+        """Calcule la distance GPS entre deux points en km"""
+        return geodesic((lat1, lng1), (lat2, lng2)).kilometers
+
+    @staticmethod
+    def creer_segment_auto(point_depart: PointDynamique, point_arrivee: PointDynamique, 
+                          distance_cable: float = None) -> Segment:
+        """Crée automatiquement un segment entre deux points"""
+        distance_gps = SegmentService.calculer_distance_gps(
+            float(point_depart.latitude), float(point_depart.longitude),
+            float(point_arrivee.latitude), float(point_arrivee.longitude)
+        )
+        
+        # Si distance_cable n'est pas fournie, utiliser la distance GPS + 20%
+        if distance_cable is None:
+            distance_cable = distance_gps * 1.2
+        
+        segment = Segment.objects.create(
+            liaison=point_depart.liaison,
+            point_depart=point_depart,
+            point_arrivee=point_arrivee,
+            distance_gps=distance_gps,
+            distance_cable=distance_cable,
+            trace_coords=[]
+        )
+        # La distance totale de la liaison est ajustée par le signal d'enregistrement du segment
+        return segment
+
+    @staticmethod
+    def recalculer_distances_cumulees(liaison: Liaison) -> int:
+        """Recalcule les distances cumulées de tous les points d'une liaison"""
+        return SegmentService.recalculer_liaisons([liaison.id])
+
+    @staticmethod
+    def _charger_lot(liaison_ids: List) -> Tuple[List, Dict, Dict]:
+        """Points (triés par liaison puis ordre), longueurs des segments et distances enregistrées"""
+        points, actuelles = [], {}
+        for point_id, liaison_id, moue, distance, distance_optique in PointDynamique.objects.filter(
+                liaison_id__in=liaison_ids).order_by('liaison_id', 'ordre').values_list(
+                'id', 'liaison_id', 'moue_cable_totale', 'distance_depuis_central',
+                'distance_optique_depuis_central'):
+            points.append((point_id, liaison_id, moue))
+            actuelles[point_id] = (distance, distance_optique)
+
+        longueurs = {
+            (depart_id, arrivee_id): distance_cable
+            for depart_id, arrivee_id, distance_cable in Segment.objects.filter(
+                liaison_id__in=liaison_ids).values_list('point_depart_id', 'point_arrivee_id', 'distance_cable')
+        }
+        return points, longueurs, actuelles
+
+    @staticmethod
+    def _enregistrer_distances(resultats: List[Tuple], actuelles: Dict) -> int:
+        """Enregistre en une passe les distances qui ont changé"""
+        maintenant = timezone.now()
+        modifies = [
+            PointDynamique(
+                id=point_id, distance_depuis_central=distance,
+                distance_optique_depuis_central=distance_optique, updated_at=maintenant
+            )
+            for point_id, distance, distance_optique in resultats
+            if actuelles[point_id] != (distance, distance_optique)
+        ]
+        PointDynamique.objects.bulk_update(
+            modifies, ['distance_depuis_central', 'distance_optique_depuis_central', 'updated_at'],
+            batch_size=SegmentService.TAILLE_LOT_ENREGISTREMENT
+        )
+        return len(modifies)
+
+    @staticmethod
+    def recalculer_liaisons(liaison_ids: List) -> int:
+        """Recalcule les distances cumulées des points de plusieurs liaisons
+
+        Une requête pour les points, une pour les segments, le cumul en mémoire,
+        puis une mise à jour groupée des seuls points modifiés. Retourne leur nombre.
+        """
+        points, longueurs, actuelles = SegmentService._charger_lot(liaison_ids)
+        with transaction.atomic():
+            return SegmentService._enregistrer_distances(cumuler_distances(points, longueurs), actuelles)
+
+    @staticmethod
+    def recalculer_reseau(processus: int = None, taille_lot: int = None) -> int:
+        """Recalcule les distances cumulées de toutes les liaisons du réseau, par lots de liaisons
+
+        La lecture et l'écriture restent dans ce processus ; le cumul des lots est
+        réparti entre processus, avec au plus deux lots en attente par processus.
+        """
+        taille_lot = taille_lot or SegmentService.TAILLE_LOT_LIAISONS
+        liaison_ids = list(Liaison.objects.order_by('id').values_list('id', flat=True))
+        lots = [liaison_ids[i:i + taille_lot] for i in range(0, len(liaison_ids), taille_lot)]
+        nombre_processus = processus or os.cpu_count() or 1
+
+        modifies = 0
+        if nombre_processus == 1:
+            for lot in lots:
+                modifies += SegmentService.recalculer_liaisons(lot)
+            return modifies
+
+        def enregistrer(futur, actuelles):
+            with transaction.atomic():
+                return SegmentService._enregistrer_distances(futur.result(), actuelles)
+
+        en_attente = deque()
+        with ProcessPoolExecutor(max_workers=nombre_processus) as executeur:
+            for lot in lots:
+                points, longueurs, actuelles = SegmentService._charger_lot(lot)
+                en_attente.append((executeur.submit(cumuler_distances, points, longueurs), actuelles))
+                if len(en_attente) >= 2 * nombre_processus:
+                    modifies += enregistrer(*en_attente.popleft())
+            while en_attente:
+                modifies += enregistrer(*en_attente.popleft())
+        return modifies
+
+    @staticmethod
+    def lancer_en_arriere_plan(processus: int = None):
+        """Lance le recalcul du réseau dans un thread séparé"""
+        def executer():
+            try:
+                SegmentService.recalculer_reseau(processus)
+            finally:
+                connection.close()
+
+        threading.Thread(target=executer, daemon=True).start()
+
+class TraceSegmentService:
+    """Service du tracé GPS des segments relevé sur le terrain, par lots numérotés
+
+    Chaque lot est filtré et simplifié puis enregistré à part (LotTrace) : la longueur
+    et l'emprise du tracé sont mises à jour par incrément, sans réécrire trace_coords.
+    Les lots en attente y sont reportés en une fois à la fin du relevé, ou lorsqu'ils
+    dépassent POINTS_AVANT_CONSOLIDATION points.
+    """
+
+    TOLERANCE_M = 2.0
+    SAUT_MAX_M = 100.0
+    PRECISION_MAX_M = 30.0
+    POINTS_AVANT_CONSOLIDATION = 2000
+    CHAMPS_MESURES = ['longueur_trace', 'trace_lat_min', 'trace_lat_max', 'trace_lng_min', 'trace_lng_max']
+
+    @staticmethod
+    def valider_points(points) -> List[List[float]]:
+        """Points [lat, lng] ou [lat, lng, précision_m], ValueError au premier point invalide"""
+        if not isinstance(points, list):
+            raise ValueError("points doit être une liste")
+        valides = []
+        for point in points:
+            if not isinstance(point, list) or len(point) not in (2, 3):
+                raise ValueError("Chaque point doit être [latitude, longitude] ou [latitude, longitude, précision]")
+            try:
+                valeurs = [float(valeur) if valeur is not None else None for valeur in point]
+            except (TypeError, ValueError):
+                raise ValueError("Les coordonnées doivent être numériques")
+            if valeurs[0] is None or valeurs[1] is None or not (-90 <= valeurs[0] <= 90 and -180 <= valeurs[1] <= 180):
+                raise ValueError("Coordonnées hors limites")
+            valides.append(valeurs)
+        return valides
+
+    @staticmethod
+    def _dernier_point(segment_id) -> Optional[List[float]]:
+        """Dernier point du tracé : celui du dernier lot en attente, sinon celui de trace_coords"""
+        coords = LotTrace.objects.filter(segment_id=segment_id).order_by('-sequence').values_list(
+            'coords', flat=True).first()
+        if not coords:
+            coords = Segment.objects.filter(pk=segment_id).values_list('trace_coords', flat=True).first()
+        return [float(coords[-1][0]), float(coords[-1][1])] if coords else None
+
+    @staticmethod
+    def ajouter_lot(segment_id, sequence: int, points: List[List[float]], fin: bool = False) -> Optional[Dict]:
+        """Applique le lot numéro sequence, qui doit suivre le dernier lot appliqué
+
+        Un lot déjà appliqué est ignoré (réémission après une coupure réseau) ; un lot
+        qui en saute d'autres est refusé. Retourne None si le segment n'existe pas.
+        """
+        with transaction.atomic():
+            actuelle = Segment.objects.filter(pk=segment_id).values_list('trace_sequence', flat=True).first()
+            if actuelle is None:
+                return None
+            if sequence != actuelle + 1:
+                return {
+                    'statut': 'doublon' if sequence <= actuelle else 'hors_sequence',
+                    'sequence_attendue': actuelle + 1,
+                }
+
+            precedent = TraceSegmentService._dernier_point(segment_id)
+            retenus, rejetes = filtrer_trace(
+                precedent, points, TraceSegmentService.TOLERANCE_M,
+                TraceSegmentService.SAUT_MAX_M, TraceSegmentService.PRECISION_MAX_M
+            )
+            valeurs = {'trace_sequence': sequence}
+            if retenus:
+                longueur, (lat_min, lat_max, lng_min, lng_max) = mesurer_trace(
+                    ([precedent] if precedent else []) + retenus
+                )
+                valeurs.update(
+                    longueur_trace=F('longueur_trace') + longueur,
+                    trace_lat_min=Least(Coalesce('trace_lat_min', Value(lat_min)), Value(lat_min)),
+                    trace_lat_max=Greatest(Coalesce('trace_lat_max', Value(lat_max)), Value(lat_max)),
+                    trace_lng_min=Least(Coalesce('trace_lng_min', Value(lng_min)), Value(lng_min)),
+                    trace_lng_max=Greatest(Coalesce('trace_lng_max', Value(lng_max)), Value(lng_max)),
+                )
+                LotTrace.objects.create(
+                    segment_id=segment_id, sequence=sequence, coords=retenus,
+                    nombre_points=len(retenus), points_rejetes=rejetes
+                )
+            # La condition sur la séquence écarte un lot concurrent portant le même numéro
+            if not Segment.objects.filter(pk=segment_id, trace_sequence=actuelle).update(**valeurs):
+                raise IntegrityError("Lot de tracé appliqué concurremment")
+
+            en_attente = LotTrace.objects.filter(segment_id=segment_id).aggregate(
+                total=Coalesce(Sum('nombre_points'), 0))['total']
+            consolide = (fin and en_attente > 0) or en_attente > TraceSegmentService.POINTS_AVANT_CONSOLIDATION
+            if consolide:
+                TraceSegmentService.consolider(segment_id)
+
+        return {
+            'statut': 'applique',
+            'sequence': sequence,
+            'points_recus': len(points),
+            'points_retenus': len(retenus),
+            'points_rejetes': rejetes,
+            'consolide': consolide,
+            'mesures': Segment.objects.filter(pk=segment_id).values(
+                'trace_sequence', *TraceSegmentService.CHAMPS_MESURES).first(),
+        }
+
+    @staticmethod
+    def consolider(segment_id) -> int:
+        """Reporte les lots en attente dans trace_coords, en une seule écriture du tracé"""
+        with transaction.atomic():
+            lots = list(LotTrace.objects.filter(segment_id=segment_id).order_by('sequence').values_list(
+                'id', 'coords'))
+            if not lots:
+                return 0
+            segment = Segment.objects.select_related('point_depart', 'point_arrivee').get(pk=segment_id)
+            ajoutes = [coord for _, coords in lots for coord in coords]
+            segment.trace_coords = list(segment.trace_coords or []) + ajoutes
+            # Les signaux de l'enregistrement tiennent à jour l'index des coupures
+            segment.save(update_fields=['trace_coords', 'updated_at'])
+            LotTrace.objects.filter(id__in=[lot_id for lot_id, _ in lots]).delete()
+        return len(ajoutes)
+
+    @staticmethod
+    def appliquer_mesures(segment: Segment, coords: List[List[float]], longueur: float = None):
+        """Longueur et emprise d'un tracé complet reportées sur le segment (longueur si déjà connue)"""
+        if not coords:
+            longueur, emprise = 0.0, None
+        elif longueur is None:
+            longueur, emprise = mesurer_trace(coords)
+        else:
+            lats, lngs = [float(c[0]) for c in coords], [float(c[1]) for c in coords]
+            emprise = (min(lats), max(lats), min(lngs), max(lngs))
+        segment.longueur_trace = longueur
+        segment.trace_lat_min, segment.trace_lat_max, segment.trace_lng_min, segment.trace_lng_max = (
+            emprise or (None, None, None, None)
+        )
+
+    @staticmethod
+    def remplacer(segment: Segment, coords: List[List[float]]) -> Segment:
+        """Remplace le tracé entier : les lots en attente sont abandonnés, la numérotation repart de 1"""
+        segment.trace_coords = coords
+        TraceSegmentService.appliquer_mesures(segment, coords)
+        segment.trace_sequence = 0
+        with transaction.atomic():
+            LotTrace.objects.filter(segment=segment).delete()
+            segment.save()
+        return segment
+
+class ProfilOptiqueService:
+    """Service pour le profil optique des liaisons : longueur de fibre moues incluses"""
+
+    # Détails portant une moue : relation inverse sur le point et champs en mètres
+    CHAMPS_MOUE = (
+        ('detail_ont', ['moue_cable']),
+        ('detail_pop_ls', ['moue_cable']),
+        ('detail_chambre', ['moue_cable_central', 'moue_cable_client']),
+        ('detail_manchon', ['moue_cable']),
+        ('detail_fat', ['moue_cable_poteau']),
+    )
+
+    @staticmethod
+    def calculer_moue(point: PointDynamique) -> float:
+        """Moue totale relevée dans les détails d'un point, en mètres"""
+        moue = 0.0
+        for attribut, champs in ProfilOptiqueService.CHAMPS_MOUE:
+            detail = getattr(point, attribut, None)
+            if detail is not None:
+                moue += sum(getattr(detail, champ) for champ in champs)
+        return moue
+
+    @staticmethod
+    def mettre_a_jour_moue(point_id) -> None:
+        """Reporte une modification de moue sur le point et décale les points suivants"""
+        with transaction.atomic():
+            # Moue lue sous verrou : deux mises à jour concurrentes ne reportent pas le même écart
+            point = PointDynamique.objects.select_for_update().filter(id=point_id).first()
+            if not point:
+                return
+            
+            ecart = ProfilOptiqueService.calculer_moue(point) - point.moue_cable_totale
+            if not ecart:
+                return
+            
+            PointDynamique.objects.filter(id=point.id).update(
+                moue_cable_totale=F('moue_cable_totale') + ecart
+            )
+            PointDynamique.objects.filter(liaison_id=point.liaison_id, ordre__gt=point.ordre).update(
+                distance_optique_depuis_central=F('distance_optique_depuis_central') + ecart / 1000
+            )
+
+    @staticmethod
+    def initialiser_point(point: PointDynamique) -> None:
+        """Position optique d'un point nouvellement créé"""
+        moues_precedentes = PointDynamique.objects.filter(
+            liaison_id=point.liaison_id, ordre__lt=point.ordre
+        ).aggregate(total=Sum('moue_cable_totale'))['total'] or 0
+        
+        point.distance_optique_depuis_central = point.distance_depuis_central + moues_precedentes / 1000
+        PointDynamique.objects.filter(id=point.id).update(
+            distance_optique_depuis_central=point.distance_optique_depuis_central
+        )
+
+    @staticmethod
+    def profil(liaison: Liaison) -> Dict:
+        """Distances câble des points et moues cumulées avant / après chaque point (km)"""
+        distances, moues_avant, moues_apres = [], [], []
+        for distance, distance_optique, moue in liaison.points_dynamiques.order_by('ordre').values_list(
+            'distance_depuis_central', 'distance_optique_depuis_central', 'moue_cable_totale'
+        ):
+            distances.append(distance)
+            moues_avant.append(distance_optique - distance)
+            moues_apres.append(distance_optique - distance + moue / 1000)
+        
+        return {'distances': distances, 'moues_avant': moues_avant, 'moues_apres': moues_apres}
+
+    @staticmethod
+    def vers_distance_optique(profil: Dict, distance_cable: float, sens: int = 1) -> float:
+        """Longueur de fibre depuis le central jusqu'à une position sur le câble
+
+        Sur un point, la moue est comptée du côté opposé au sens de lecture :
+        une fibre lue vers le client depuis ce point traverse d'abord sa moue.
+        """
+        distances = profil['distances']
+        i = bisect.bisect_right(distances, distance_cable) - 1
+        if i < 0:
+            return distance_cable
+        if distances[i] == distance_cable:
+            moues = profil['moues_avant'] if sens > 0 else profil['moues_apres']
+            return distance_cable + moues[i]
+        return distance_cable + profil['moues_apres'][i]
+
+    @staticmethod
+    def vers_distance_cable(profil: Dict, distance_optique: float) -> float:
+        """Position sur le câble d'une longueur de fibre depuis le central"""
+        distances = profil['distances']
+        optiques_avant = [d + m for d, m in zip(distances, profil['moues_avant'])]
+        i = bisect.bisect_right(optiques_avant, distance_optique) - 1
+        if i < 0:
+            return distance_optique
+        
+        reste = distance_optique - distances[i] - profil['moues_apres'][i]
+        if reste <= 0:
+            # Dans la moue du point
+            return distances[i]
+        return distances[i] + reste
+
+class CoupureService:
+    """Service pour analyser et localiser les coupures"""
+
+    # Signalements regroupés sur une même coupure active
+    TOLERANCE_REGROUPEMENT_KM = 0.1
+    FENETRE_REGROUPEMENT = timedelta(hours=48)
+
+    @staticmethod
+    def analyser_coupure(mesure_otdr: MesureOTDR) -> Dict:
+        """Analyse une mesure OTDR et localise la coupure"""
+        liaison = mesure_otdr.liaison
+        distance_coupure = mesure_otdr.distance_coupure
+        
+        # Ajuster la distance selon la direction et la position
+        distance_absolue = CoupureService._calculer_distance_absolue(
+            mesure_otdr, distance_coupure
+        )
+        
+        # Recaler sur les manchons et chambres identifiés dans la table d'événements
+        recalage = AlignementOTDRService.recaler(mesure_otdr)
+        if recalage:
+            distance_absolue = recalage['distance_absolue']
+        
+        analyse = CoupureService.localiser(liaison, distance_absolue)
+        analyse['recalage'] = recalage
+        
+        # Bande d'incertitude le long du câble
+        incertitude = IncertitudeCoupureService.simuler(mesure_otdr, distance_absolue)
+        analyse['incertitude'] = incertitude
+        analyse['precision_estimation'] = CoupureService._calculer_precision(
+            liaison, distance_absolue, incertitude
+        )
+        return analyse
+
+    @staticmethod
+    def localiser(liaison: Liaison, distance_absolue: float) -> Dict:
+        """Localise sur la liaison une coupure située à une distance donnée du central"""
+        # Trouver le segment touché
+        segment_info = CoupureService._trouver_segment_touche(liaison, distance_absolue)
+        
+        # Calculer les coordonnées estimées
+        coords_estimees = CoupureService._calculer_coordonnees_coupure(segment_info, distance_absolue)
+        
+        # Trouver le point dynamique le plus proche
+        point_proche = CoupureService._trouver_point_proche(liaison, distance_absolue)
+        
+        return {
+            'distance_absolue': distance_absolue,
+            'segment_touche': segment_info['segment'] if segment_info else None,
+            'distance_sur_segment': segment_info['distance_sur_segment'] if segment_info else None,
+            'coordonnees_estimees': coords_estimees,
+            'point_dynamique_proche': point_proche,
+            'precision_estimation': CoupureService._calculer_precision(liaison, distance_absolue)
+        }
+
+    @staticmethod
+    def _origine_mesure(mesure_otdr: MesureOTDR) -> Tuple[float, int]:
+        """Position de l'OTDR depuis le central et sens de lecture (+1 vers le client)"""
+        if mesure_otdr.position_technicien == 'central':
+            # Une mesure depuis le central vers le central est lue comme vers le client
+            return 0.0, 1
+            
+        elif mesure_otdr.position_technicien == 'client':
+            # Quelle que soit la direction indiquée, la fibre est lue vers le central
+            return mesure_otdr.liaison.distance_totale, -1
+            
+        elif mesure_otdr.position_technicien == 'intermediaire' and mesure_otdr.point_mesure:
+            point_position = mesure_otdr.point_mesure.distance_depuis_central
+            if mesure_otdr.direction_analyse == 'vers_central':
+                return point_position, -1
+            return point_position, 1
+            
+        return 0.0, 1
+
+    @staticmethod
+    def _calculer_distance_absolue(mesure_otdr: MesureOTDR, distance_mesure: float) -> float:
+        """Calcule la distance absolue depuis le central en tenant compte de la position et direction"""
+        # La distance lue est une longueur de fibre : les moues sont retirées via le profil optique
+        origine, sens = CoupureService._origine_mesure(mesure_otdr)
+        profil = ProfilOptiqueService.profil(mesure_otdr.liaison)
+        origine_optique = ProfilOptiqueService.vers_distance_optique(profil, origine, sens)
+        return ProfilOptiqueService.vers_distance_cable(profil, origine_optique + sens * distance_mesure)
+
+    @staticmethod
+    def _trouver_segment_touche(liaison: Liaison, distance_absolue: float) -> Optional[Dict]:
+        """Trouve le segment où se situe la coupure"""
+        segments = liaison.segments.order_by('point_depart__ordre')
+        distance_parcourue = 0.0
+        
+        for segment in segments:
+            distance_fin_segment = distance_parcourue + segment.distance_cable
+            
+            if distance_parcourue <= distance_absolue <= distance_fin_segment:
+                return {
+                    'segment': segment,
+                    'distance_sur_segment': distance_absolue - distance_parcourue,
+                    'distance_debut': distance_parcourue,
+                    'distance_fin': distance_fin_segment
+                }
+            
+            distance_parcourue = distance_fin_segment
+        
+        return None
+
+    @staticmethod
+    def _calculer_coordonnees_coupure(segment_info: Optional[Dict], distance_absolue: float) -> Optional[Dict]:
+        """Calcule les coordonnées GPS estimées de la coupure"""
+        if not segment_info:
+            return None
+            
+        segment = segment_info['segment']
+        ratio = segment_info['distance_sur_segment'] / segment.distance_cable
+        
+        # Interpolation linéaire entre les deux points
+        lat_debut = float(segment.point_depart.latitude)
+        lng_debut = float(segment.point_depart.longitude)
+        lat_fin = float(segment.point_arrivee.latitude)
+        lng_fin = float(segment.point_arrivee.longitude)
+        
+        lat_estimee = lat_debut + (lat_fin - lat_debut) * ratio
+        lng_estimee = lng_debut + (lng_fin - lng_debut) * ratio
+        
+        return {
+            'latitude': lat_estimee,
+            'longitude': lng_estimee,
+            'ratio_segment': ratio
+        }
+
+    @staticmethod
+    def _trouver_point_proche(liaison: Liaison, distance_absolue: float) -> Optional[PointDynamique]:
+        """Trouve le point dynamique le plus proche de la coupure"""
+        points = liaison.points_dynamiques.all()
+        point_proche = None
+        distance_min = float('inf')
+        
+        for point in points:
+            distance_point = abs(point.distance_depuis_central - distance_absolue)
+            if distance_point < distance_min:
+                distance_min = distance_point
+                point_proche = point
+        
+        return point_proche
+
+    @staticmethod
+    def _calculer_precision(liaison: Liaison, distance_absolue: float, incertitude: Dict = None) -> str:
+        """Calcule la précision de l'estimation"""
+        # Largeur de la bande d'incertitude lorsqu'elle a pu être simulée
+        if incertitude:
+            largeur = incertitude['distance_max_km'] - incertitude['distance_min_km']
+            if largeur < 0.1:  # Moins de 100m à fouiller
+                return 'haute'
+            elif largeur < 0.5:
+                return 'moyenne'
+            return 'faible'
+        
+        # Sinon, logique basée sur la distance seule
+        if distance_absolue < 1.0:  # Moins de 1km
+            return 'haute'
+        elif distance_absolue < 5.0:  # Moins de 5km
+            return 'moyenne'
+        else:
+            return 'faible'
+
+    @staticmethod
+    def construire_coupure(mesure_otdr: MesureOTDR, analyse: Dict = None) -> Coupure:
+        """Construit (sans l'enregistrer) la coupure correspondant à une mesure OTDR"""
+        analyse = analyse or CoupureService.analyser_coupure(mesure_otdr)
+        
+        coupure = Coupure(
+            liaison=mesure_otdr.liaison,
+            mesure_otdr=mesure_otdr,
+            segment_touche=analyse['segment_touche'],
+            distance_sur_segment=analyse['distance_sur_segment'],
+            point_dynamique_proche=analyse['point_dynamique_proche'],
+            distance_depuis_central=analyse['distance_absolue']
+        )
+        
+        # Ajouter les coordonnées si disponibles
+        if analyse['coordonnees_estimees']:
+            coupure.point_estime_lat = analyse['coordonnees_estimees']['latitude']
+            coupure.point_estime_lng = analyse['coordonnees_estimees']['longitude']
+        
+        return coupure
+
+    @staticmethod
+    def creer_coupure(mesure_otdr: MesureOTDR) -> Coupure:
+        """Crée une coupure basée sur une mesure OTDR"""
+        coupure = CoupureService.construire_coupure(mesure_otdr)
+        coupure.save()
+        return coupure
+
+    @staticmethod
+    def trouver_coupure_active(liaison: Liaison, distance_absolue: float) -> Optional[Coupure]:
+        """Coupure active et récente de la liaison la plus proche d'une position donnée"""
+        tolerance = CoupureService.TOLERANCE_REGROUPEMENT_KM
+        candidates = Coupure.objects.filter(
+            liaison=liaison,
+            status__in=['detectee', 'localisee', 'en_cours'],
+            date_detection__gte=timezone.now() - CoupureService.FENETRE_REGROUPEMENT,
+            remplacee_par__isnull=True,
+            distance_depuis_central__range=(distance_absolue - tolerance, distance_absolue + tolerance)
+        )
+        return min(
+            candidates, key=lambda coupure: abs(coupure.distance_depuis_central - distance_absolue), default=None
+        )
+
+    @staticmethod
+    def coupure_de_mesure(mesure_otdr: MesureOTDR) -> Optional[Coupure]:
+        """Coupure déjà créée par cette mesure ou à laquelle elle a été rattachée"""
+        return Coupure.objects.filter(
+            Q(mesure_otdr=mesure_otdr) | Q(mesures_associees=mesure_otdr)
+        ).order_by(F('remplacee_par').asc(nulls_first=True), '-date_detection').first()
+
+    @staticmethod
+    def signaler_coupure(mesure_otdr: MesureOTDR) -> Tuple[Coupure, bool, Dict]:
+        """Crée la coupure d'une mesure, ou rattache la mesure à la coupure active déjà signalée
+
+        Retourne la coupure, un booléen indiquant si elle vient d'être créée et
+        l'analyse de la mesure (analyser_coupure), calculée une seule fois. Une mesure
+        déjà signalée n'est pas comptée une seconde fois.
+        """
+        analyse = CoupureService.analyser_coupure(mesure_otdr)
+        coupure = CoupureService.construire_coupure(mesure_otdr, analyse)
+        
+        with transaction.atomic():
+            deja_signalee = CoupureService.coupure_de_mesure(mesure_otdr)
+            if deja_signalee is not None:
+                return deja_signalee, False, analyse
+            
+            existante = CoupureService.trouver_coupure_active(
+                mesure_otdr.liaison, coupure.distance_depuis_central
+            )
+            if existante is None:
+                coupure.save()
+                return coupure, True, analyse
+            
+            existante.mesures_associees.add(mesure_otdr)
+            Coupure.objects.filter(id=existante.id).update(
+                nombre_signalements=F('nombre_signalements') + 1,
+                date_dernier_signalement=timezone.now()
+            )
+        
+        existante.refresh_from_db(fields=['nombre_signalements', 'date_dernier_signalement'])
+        return existante, False, analyse
+
+    @staticmethod
+    def signaler_coupures(mesures: List[MesureOTDR]) -> List[Tuple[Coupure, List[MesureOTDR], bool]]:
+        """Version par lot de signaler_coupure, pour des mesures déjà enregistrées
+
+        Les mesures d'une même position sont regroupées entre elles et avec les
+        coupures actives déjà signalées. Retourne, pour chaque coupure touchée, les
+        mesures qui la signalent et un booléen indiquant si elle vient d'être créée.
+        """
+        tolerance = CoupureService.TOLERANCE_REGROUPEMENT_KM
+        groupes = {}
+        creees = []
+        
+        for mesure in mesures:
+            coupure = CoupureService.construire_coupure(mesure)
+            distance = coupure.distance_depuis_central
+            # Coupures créées plus tôt dans le lot, pas encore visibles en base
+            candidates = [
+                c for c in creees
+                if c.liaison_id == mesure.liaison_id and abs(c.distance_depuis_central - distance) <= tolerance
+            ]
+            candidates.append(CoupureService.trouver_coupure_active(mesure.liaison, distance))
+            existante = min(
+                (c for c in candidates if c is not None),
+                key=lambda c: abs(c.distance_depuis_central - distance), default=None
+            )
+            if existante is None:
+                creees.append(coupure)
+                groupes[coupure.id] = (coupure, [mesure], True)
+            elif existante.id in groupes:
+                groupes[existante.id][1].append(mesure)
+            else:
+                groupes[existante.id] = (existante, [mesure], False)
+        
+        with transaction.atomic():
+            Coupure.objects.bulk_create(creees)
+            for coupure, signalements, nouvelle in groupes.values():
+                # La mesure d'une coupure créée en est le premier signalement
+                rattachees = signalements[1:] if nouvelle else signalements
+                if not rattachees:
+                    continue
+                coupure.mesures_associees.add(*rattachees)
+                Coupure.objects.filter(id=coupure.id).update(
+                    nombre_signalements=F('nombre_signalements') + len(rattachees),
+                    date_dernier_signalement=timezone.now()
+                )
+        
+        return list(groupes.values())
+
+class IncertitudeCoupureService:
+    """Service pour estimer par tirages aléatoires la bande de position d'une coupure"""
+
+    NOMBRE_TIRAGES = 10000
+    # Écarts types des sources d'erreur
+    ECART_TYPE_DISTANCE_KM = 0.005       # résolution de l'OTDR
+    ECART_TYPE_INDICE_RELATIF = 0.001    # indice de groupe de la fibre
+    ECART_TYPE_LONGUEUR_RELATIF = 0.03   # longueurs de câble estimées depuis le GPS
+    ECART_TYPE_MOUE_RELATIF = 0.3        # moues relevées sur le terrain
+    QUANTILES = (0.025, 0.975)
+
+    @staticmethod
+    def simuler(mesure_otdr: MesureOTDR, distance_absolue: float, nombre_tirages: int = None,
+                graine: int = None) -> Optional[Dict]:
+        """Bande de position de la coupure (km depuis le central) et tronçon de câble correspondant
+
+        Chaque tirage perturbe la distance lue, l'indice, les longueurs de câble
+        et les moues, puis reporte la distance optique sur le profil de la
+        liaison. L'écart à la position nominale est appliqué à distance_absolue.
+        """
+        nombre_tirages = nombre_tirages or IncertitudeCoupureService.NOMBRE_TIRAGES
+        liaison = mesure_otdr.liaison
+        profil = ProfilOptiqueService.profil(liaison)
+        distances = profil['distances']
+        moues_avant = profil['moues_avant']
+        moues_apres = profil['moues_apres']
+        nombre_points = len(distances)
+        if nombre_points < 2:
+            return None
+        
+        origine, sens = CoupureService._origine_mesure(mesure_otdr)
+        indice_origine = min(bisect.bisect_left(distances, origine), nombre_points - 1)
+        # La fibre traverse d'abord la moue du point de mesure
+        moues_origine = moues_avant if sens > 0 else moues_apres
+        optiques_nominales = [d + m for d, m in zip(distances, moues_avant)]
+        debut, fin = distances[0], distances[-1]
+        
+        def reporter(cible, facteur_longueur, facteur_moue):
+            # Dernier point atteint, à partir de l'indice du profil nominal
+            i = max(bisect.bisect_right(optiques_nominales, cible) - 1, 0)
+            while i + 1 < nombre_points and \
+                    facteur_longueur * distances[i + 1] + facteur_moue * moues_avant[i + 1] <= cible:
+                i += 1
+            while i > 0 and facteur_longueur * distances[i] + facteur_moue * moues_avant[i] > cible:
+                i -= 1
+            reste = cible - facteur_longueur * distances[i] - facteur_moue * moues_apres[i]
+            if reste <= 0:
+                # Dans la moue du point
+                return distances[i]
+            return min(max(distances[i] + reste / facteur_longueur, debut), fin)
+        
+        distance_mesuree = mesure_otdr.distance_coupure
+        position_nominale = reporter(
+            distances[indice_origine] + moues_origine[indice_origine] + sens * distance_mesuree, 1.0, 1.0
+        )
+        
+        # Erreurs de lecture et d'indice combinées en un seul tirage (au premier ordre)
+        ecart_distance = math.hypot(
+            IncertitudeCoupureService.ECART_TYPE_DISTANCE_KM,
+            IncertitudeCoupureService.ECART_TYPE_INDICE_RELATIF * distance_mesuree
+        )
+        ecart_longueur = IncertitudeCoupureService.ECART_TYPE_LONGUEUR_RELATIF
+        ecart_moue = IncertitudeCoupureService.ECART_TYPE_MOUE_RELATIF
+        distance_origine = distances[indice_origine]
+        moue_origine = moues_origine[indice_origine]
+        
+        normales = IncertitudeCoupureService._normales(random.Random(graine), 3 * nombre_tirages)
+        positions = []
+        for k in range(0, 3 * nombre_tirages, 3):
+            facteur_longueur = 1.0 + ecart_longueur * normales[k]
+            facteur_moue = max(0.0, 1.0 + ecart_moue * normales[k + 1])
+            distance = distance_mesuree + ecart_distance * normales[k + 2]
+            cible = facteur_longueur * distance_origine + facteur_moue * moue_origine + sens * distance
+            positions.append(reporter(cible, facteur_longueur, facteur_moue))
+        positions.sort()
+        
+        decalage = distance_absolue - position_nominale
+        quantile_bas, quantile_haut = IncertitudeCoupureService.QUANTILES
+        distance_min = positions[int(quantile_bas * (nombre_tirages - 1))] + decalage
+        distance_max = positions[int(quantile_haut * (nombre_tirages - 1))] + decalage
+        
+        return {
+            'distance_min_km': distance_min,
+            'distance_max_km': distance_max,
+            'distance_mediane_km': positions[nombre_tirages // 2] + decalage,
+            'nombre_tirages': nombre_tirages,
+            'troncon': IncertitudeCoupureService.extraire_troncon(liaison, distance_min, distance_max)
+        }
+
+    @staticmethod
+    def _normales(aleatoire: random.Random, nombre: int) -> List[float]:
+        """Tirages de loi normale centrée réduite (Box-Muller, deux tirages par paire)"""
+        tirage = aleatoire.random
+        normales = []
+        for _ in range((nombre + 1) // 2):
+            rayon = math.sqrt(-2.0 * math.log(1.0 - tirage()))
+            angle = 2.0 * math.pi * tirage()
+            normales.append(rayon * math.cos(angle))
+            normales.append(rayon * math.sin(angle))
+        return normales
+
+    @staticmethod
+    def extraire_troncon(liaison: Liaison, debut_km: float, fin_km: float) -> List[List[float]]:
+        """Portion du tracé [[lat, lng], ...] entre deux distances depuis le central"""
+        troncon = []
+        distance_parcourue = 0.0
+        segments = liaison.segments.select_related('point_depart', 'point_arrivee').order_by('point_depart__ordre')
+        
+        for segment in segments:
+            distance_fin = distance_parcourue + segment.distance_cable
+            if distance_fin >= debut_km and distance_parcourue <= fin_km and segment.distance_cable > 0:
+                coords = segment.trace_coords or [
+                    [float(segment.point_depart.latitude), float(segment.point_depart.longitude)],
+                    [float(segment.point_arrivee.latitude), float(segment.point_arrivee.longitude)],
+                ]
+                ratio_debut = max(0.0, (debut_km - distance_parcourue) / segment.distance_cable)
+                ratio_fin = min(1.0, (fin_km - distance_parcourue) / segment.distance_cable)
+                for coord in IncertitudeCoupureService._decouper_polyligne(coords, ratio_debut, ratio_fin):
+                    if not troncon or troncon[-1] != coord:
+                        troncon.append(coord)
+            distance_parcourue = distance_fin
+        
+        return troncon
+
+    @staticmethod
+    def _decouper_polyligne(coords: List[List[float]], ratio_debut: float, ratio_fin: float) -> List[List[float]]:
+        """Sous-polyligne entre deux fractions de sa longueur"""
+        # Longueurs planes locales : seules les proportions comptent
+        cos_lat = math.cos(math.radians(float(coords[0][0])))
+        longueurs = [0.0]
+        for (lat1, lng1), (lat2, lng2) in zip(coords, coords[1:]):
+            longueurs.append(longueurs[-1] + math.hypot(float(lat2) - float(lat1), (float(lng2) - float(lng1)) * cos_lat))
+        total = longueurs[-1]
+        if total == 0:
+            return [[float(coords[0][0]), float(coords[0][1])]]
+        
+        def interpoler(ratio):
+            cible = ratio * total
+            i = min(max(bisect.bisect_right(longueurs, cible) - 1, 0), len(coords) - 2)
+            longueur = longueurs[i + 1] - longueurs[i]
+            t = (cible - longueurs[i]) / longueur if longueur else 0.0
+            return [
+                float(coords[i][0]) + (float(coords[i + 1][0]) - float(coords[i][0])) * t,
+                float(coords[i][1]) + (float(coords[i + 1][1]) - float(coords[i][1])) * t
+            ]
+        
+        interieurs = [
+            [float(lat), float(lng)] for (lat, lng), longueur in zip(coords, longueurs)
+            if ratio_debut * total < longueur < ratio_fin * total
+        ]
+        return [interpoler(ratio_debut)] + interieurs + [interpoler(ratio_fin)]
+
+class AlignementOTDRService:
+    """Service pour recaler les coupures sur les points identifiés dans la trace OTDR"""
+
+    # Points produisant un événement (épissure ou connecteur) sur la trace
+    TYPES_EVENEMENTS = ['chambre', 'manchon', 'manchon_aerien', 'FAT', 'FDT', 'ONT', 'POP_LS', 'POP_FTTH']
+    # Les événements plus proches sont le connecteur de lancement de l'OTDR
+    DISTANCE_LANCEMENT_KM = 0.01
+
+    @staticmethod
+    def recaler(mesure_otdr: MesureOTDR) -> Optional[Dict]:
+        """Aligne la table d'événements sur les points de la liaison et recale la coupure"""
+        evenements = sorted(
+            evenement['distance_km'] for evenement in mesure_otdr.evenements or []
+            if not evenement.get('fin_fibre')
+            and evenement['distance_km'] > AlignementOTDRService.DISTANCE_LANCEMENT_KM
+        )
+        if not evenements:
+            return None
+        
+        # Longueurs de fibre attendues depuis l'OTDR, dans le sens de lecture
+        origine, sens = CoupureService._origine_mesure(mesure_otdr)
+        profil = ProfilOptiqueService.profil(mesure_otdr.liaison)
+        origine_optique = ProfilOptiqueService.vers_distance_optique(profil, origine, sens)
+        points = mesure_otdr.liaison.points_dynamiques.filter(
+            type_point__in=AlignementOTDRService.TYPES_EVENEMENTS
+        )
+        attendus = []
+        for point in points:
+            # L'événement est vu à l'entrée de la moue du point
+            distance_optique = point.distance_optique_depuis_central
+            if sens < 0:
+                distance_optique += point.moue_cable_totale / 1000
+            distance = (distance_optique - origine_optique) * sens
+            if distance > AlignementOTDRService.DISTANCE_LANCEMENT_KM:
+                attendus.append((distance, point))
+        attendus.sort(key=lambda attendu: attendu[0])
+        if not attendus:
+            return None
+        
+        distances_attendues = [distance for distance, _ in attendus]
+        alignement = AlignementEvenements.estimer(evenements, distances_attendues)
+        if not alignement:
+            return None
+        
+        indice, distance_relative = AlignementEvenements.recaler(
+            mesure_otdr.distance_coupure, evenements, distances_attendues, alignement
+        )
+        point_reference = attendus[indice][1] if indice is not None else None
+        
+        return {
+            'distance_absolue': ProfilOptiqueService.vers_distance_cable(
+                profil, origine_optique + sens * distance_relative
+            ),
+            'facteur_echelle': alignement['facteur_echelle'],
+            'residu_km': alignement['residu_km'],
+            'nombre_apparies': len(alignement['paires']),
+            'point_reference': {
+                'id': str(point_reference.id),
+                'nom': point_reference.nom,
+                'type_point': point_reference.type_point,
+                'distance_depuis_central': point_reference.distance_depuis_central
+            } if point_reference else None
+        }
+
+class FusionOTDRService:
+    """Service pour localiser une coupure à partir de mesures prises aux deux extrémités"""
+
+    FENETRE_APPARIEMENT = timedelta(hours=24)
+    # Erreur de lecture d'une distance OTDR : résolution + erreur d'indice
+    ERREUR_ABSOLUE_KM = 0.01
+    ERREUR_RELATIVE = 0.001
+    # Au-delà, les deux mesures ne voient pas la même coupure
+    FACTEUR_LONGUEUR_MIN = 0.9
+    FACTEUR_LONGUEUR_MAX = 1.2
+
+    EXTREMITES = {
+        ('central', 'vers_client'): 'central',
+        ('client', 'vers_central'): 'client',
+    }
+
+    @staticmethod
+    def fusionner_distances(distance_central: float, distance_client: float, longueur: float) -> Optional[Dict]:
+        """Position de la coupure et facteur de longueur à partir des deux distances mesurées
+
+        La fibre mesure k fois la longueur nominale L : d1 + d2 = k.L, d'où la
+        position x = L.d1 / (d1 + d2), indépendante de k.
+        """
+        somme = distance_central + distance_client
+        if somme <= 0 or longueur <= 0:
+            return None
+        
+        facteur = somme / longueur
+        if not FusionOTDRService.FACTEUR_LONGUEUR_MIN <= facteur <= FusionOTDRService.FACTEUR_LONGUEUR_MAX:
+            return None
+        
+        position = longueur * distance_central / somme
+        erreur_central = FusionOTDRService.ERREUR_ABSOLUE_KM + FusionOTDRService.ERREUR_RELATIVE * distance_central
+        erreur_client = FusionOTDRService.ERREUR_ABSOLUE_KM + FusionOTDRService.ERREUR_RELATIVE * distance_client
+        incertitude = longueur * (distance_client * erreur_central + distance_central * erreur_client) / somme ** 2
+        
+        return {
+            'distance_absolue': position,
+            'facteur_longueur': facteur,
+            'incertitude_km': incertitude,
+            'intervalle_km': [max(0.0, position - incertitude), min(longueur, position + incertitude)]
+        }
+
+    @staticmethod
+    def trouver_mesure_opposee(mesure_otdr: MesureOTDR) -> Optional[MesureOTDR]:
+        """Mesure de coupure la plus proche dans le temps prise depuis l'autre extrémité"""
+        extremite = FusionOTDRService.EXTREMITES.get(
+            (mesure_otdr.position_technicien, mesure_otdr.direction_analyse)
+        )
+        if not extremite:
+            return None
+        
+        position, direction = next(
+            cle for cle, valeur in FusionOTDRService.EXTREMITES.items() if valeur != extremite
+        )
+        fenetre = FusionOTDRService.FENETRE_APPARIEMENT
+        candidates = MesureOTDR.objects.filter(
+            liaison_id=mesure_otdr.liaison_id,
+            type_evenement='coupure',
+            position_technicien=position,
+            direction_analyse=direction,
+            date_mesure__range=(mesure_otdr.date_mesure - fenetre, mesure_otdr.date_mesure + fenetre)
+        )
+        return min(
+            candidates, key=lambda mesure: abs(mesure.date_mesure - mesure_otdr.date_mesure), default=None
+        )
+
+    @staticmethod
+    def analyser(mesure_central: MesureOTDR, mesure_client: MesureOTDR) -> Optional[Dict]:
+        """Analyse fusionnée d'un couple de mesures central / client"""
+        liaison = mesure_central.liaison
+        # Les distances mesurées sont rapportées à la longueur de fibre, moues incluses
+        profil = ProfilOptiqueService.profil(liaison)
+        fusion = FusionOTDRService.fusionner_distances(
+            mesure_central.distance_coupure, mesure_client.distance_coupure,
+            ProfilOptiqueService.vers_distance_optique(profil, liaison.distance_totale, -1)
+        )
+        if not fusion:
+            return None
+        
+        fusion['distance_absolue'] = ProfilOptiqueService.vers_distance_cable(profil, fusion['distance_absolue'])
+        fusion['intervalle_km'] = [
+            ProfilOptiqueService.vers_distance_cable(profil, borne) for borne in fusion['intervalle_km']
+        ]
+        analyse = CoupureService.localiser(liaison, fusion['distance_absolue'])
+        analyse.update(fusion)
+        return analyse
+
+    @staticmethod
+    def fusionner(mesure_otdr: MesureOTDR) -> Optional[Coupure]:
+        """Crée la coupure fusionnée si une mesure opposée existe et remplace les coupures à une extrémité"""
+        opposee = FusionOTDRService.trouver_mesure_opposee(mesure_otdr)
+        if not opposee:
+            return None
+        
+        if mesure_otdr.position_technicien == 'central':
+            mesure_central, mesure_client = mesure_otdr, opposee
+        else:
+            mesure_central, mesure_client = opposee, mesure_otdr
+        
+        analyse = FusionOTDRService.analyser(mesure_central, mesure_client)
+        if not analyse:
+            return None
+        
+        with transaction.atomic():
+            remplacees = list(Coupure.objects.filter(
+                Q(mesure_otdr__in=[mesure_central, mesure_client]) |
+                Q(mesure_otdr_opposee__in=[mesure_central, mesure_client]),
+                liaison=mesure_central.liaison,
+                remplacee_par__isnull=True
+            ))
+            
+            coupure = Coupure(
+                liaison=mesure_central.liaison,
+                mesure_otdr=mesure_central,
+                mesure_otdr_opposee=mesure_client,
+                segment_touche=analyse['segment_touche'],
+                distance_sur_segment=analyse['distance_sur_segment'],
+                point_dynamique_proche=analyse['point_dynamique_proche'],
+                distance_depuis_central=analyse['distance_absolue'],
+                incertitude_km=analyse['incertitude_km'],
+                facteur_longueur=analyse['facteur_longueur'],
+                description_diagnostic="Localisation par mesures OTDR aux deux extrémités"
+            )
+            if analyse['coordonnees_estimees']:
+                coupure.point_estime_lat = analyse['coordonnees_estimees']['latitude']
+                coupure.point_estime_lng = analyse['coordonnees_estimees']['longitude']
+            
+            # La coupure fusionnée reprend le suivi le plus avancé de celles qu'elle remplace
+            if remplacees:
+                ordre_status = [choix[0] for choix in Coupure.STATUS_CHOICES]
+                coupure.status = max((c.status for c in remplacees), key=ordre_status.index)
+                coupure.superviseur_notifie = any(c.superviseur_notifie for c in remplacees)
+                coupure.client_notifie = any(c.client_notifie for c in remplacees)
+            coupure.save()
+            
+            Coupure.objects.filter(id__in=[c.id for c in remplacees]).update(remplacee_par=coupure)
+        
+        return coupure
+
+class ImpactCoupureService:
+    """Service pour identifier les liaisons qui partagent le corridor d'une coupure"""
+
+    RAYON_IMPACT_M = 30
+    # Reconstruction périodique : les autres processus modifient aussi le réseau
+    DUREE_VALIDITE_INDEX = timedelta(minutes=10)
+
+    _index = None
+    _date_index = None
+    _verrou = threading.RLock()
+
+    @staticmethod
+    def index() -> GrilleSpatiale:
+        """Index spatial des segments et points de toutes les liaisons, construit à la demande"""
+        with ImpactCoupureService._verrou:
+            date_index = ImpactCoupureService._date_index
+            if ImpactCoupureService._index is None or \
+                    timezone.now() - date_index > ImpactCoupureService.DUREE_VALIDITE_INDEX:
+                ImpactCoupureService._index = ImpactCoupureService._construire_index()
+                ImpactCoupureService._date_index = timezone.now()
+            return ImpactCoupureService._index
+
+    @staticmethod
+    def _construire_index() -> GrilleSpatiale:
+        grille = GrilleSpatiale()
+        segments = Segment.objects.values_list(
+            'id', 'liaison_id', 'trace_coords', 'distance_cable', 'point_depart__distance_depuis_central',
+            'point_depart__latitude', 'point_depart__longitude',
+            'point_arrivee__latitude', 'point_arrivee__longitude'
+        )
+        for segment_id, liaison_id, trace, distance_cable, distance_debut, *extremites in segments:
+            grille.ajouter(
+                ('segment', segment_id),
+                ImpactCoupureService._geometrie_segment(trace, *extremites),
+                {'liaison_id': liaison_id, 'distance_debut': distance_debut, 'distance_cable': distance_cable}
+            )
+        
+        points = PointDynamique.objects.values_list('id', 'liaison_id', 'latitude', 'longitude', 'distance_depuis_central')
+        for point_id, liaison_id, latitude, longitude, distance in points:
+            grille.ajouter(
+                ('point', point_id), [[float(latitude), float(longitude)]],
+                {'liaison_id': liaison_id, 'distance_depuis_central': distance}
+            )
+        return grille
+
+    @staticmethod
+    def _geometrie_segment(trace, lat_depart, lng_depart, lat_arrivee, lng_arrivee) -> List[List[float]]:
+        """Tracé relevé du segment, ou ligne droite entre ses points"""
+        if trace:
+            return trace
+        return [[float(lat_depart), float(lng_depart)], [float(lat_arrivee), float(lng_arrivee)]]
+
+    @staticmethod
+    def indexer_segment(segment: Segment):
+        """Met à jour un segment dans l'index s'il est déjà construit"""
+        with ImpactCoupureService._verrou:
+            if ImpactCoupureService._index is None:
+                return
+            ImpactCoupureService._index.ajouter(
+                ('segment', segment.id),
+                ImpactCoupureService._geometrie_segment(
+                    segment.trace_coords,
+                    segment.point_depart.latitude, segment.point_depart.longitude,
+                    segment.point_arrivee.latitude, segment.point_arrivee.longitude
+                ),
+                {
+                    'liaison_id': segment.liaison_id,
+                    'distance_debut': segment.point_depart.distance_depuis_central,
+                    'distance_cable': segment.distance_cable
+                }
+            )
+
+    @staticmethod
+    def indexer_lot(points: List[PointDynamique], segments: List[Segment]):
+        """Ajoute à l'index des points et segments créés en masse (sans signal d'enregistrement)"""
+        with ImpactCoupureService._verrou:
+            if ImpactCoupureService._index is None:
+                return
+            for point in points:
+                ImpactCoupureService._index.ajouter(
+                    ('point', point.id), [[float(point.latitude), float(point.longitude)]],
+                    {'liaison_id': point.liaison_id, 'distance_depuis_central': point.distance_depuis_central}
+                )
+            for segment in segments:
+                ImpactCoupureService.indexer_segment(segment)
+
+    @staticmethod
+    def indexer_point(point: PointDynamique):
+        """Met à jour un point, et les segments qu'il délimite, dans l'index s'il est déjà construit"""
+        with ImpactCoupureService._verrou:
+            if ImpactCoupureService._index is None:
+                return
+            ImpactCoupureService._index.ajouter(
+                ('point', point.id), [[float(point.latitude), float(point.longitude)]],
+                {'liaison_id': point.liaison_id, 'distance_depuis_central': point.distance_depuis_central}
+            )
+            segments = Segment.objects.filter(
+                Q(point_depart=point) | Q(point_arrivee=point)
+            ).select_related('point_depart', 'point_arrivee')
+            for segment in segments:
+                ImpactCoupureService.indexer_segment(segment)
+
+    @staticmethod
+    def retirer(type_element: str, element_id):
+        """Retire un segment ou un point supprimé de l'index"""
+        with ImpactCoupureService._verrou:
+            if ImpactCoupureService._index is not None:
+                ImpactCoupureService._index.retirer((type_element, element_id))
+
+    @staticmethod
+    def analyser_impact(coupure: Coupure, rayon_m: float = None) -> Optional[List[Dict]]:
+        """Autres liaisons dont le câble passe à moins de rayon_m mètres de la coupure"""
+        if coupure.point_estime_lat is None or coupure.point_estime_lng is None:
+            return None
+        
+        rayon_m = rayon_m or ImpactCoupureService.RAYON_IMPACT_M
+        resultats = ImpactCoupureService.index().rechercher(
+            float(coupure.point_estime_lat), float(coupure.point_estime_lng), rayon_m
+        )
+        
+        # Résultats triés par distance : le premier élément de chaque liaison est le plus proche
+        impacts = {}
+        for (type_element, element_id), distance, fraction, donnees in resultats:
+            liaison_id = donnees['liaison_id']
+            if liaison_id == coupure.liaison_id or liaison_id in impacts:
+                continue
+            
+            impact = {
+                'liaison_id': liaison_id,
+                'distance_m': distance,
+                'element': type_element,
+                'element_id': element_id,
+            }
+            if type_element == 'segment':
+                impact['distance_sur_segment'] = fraction * donnees['distance_cable']
+                impact['distance_depuis_central'] = donnees['distance_debut'] + impact['distance_sur_segment']
+            else:
+                impact['distance_depuis_central'] = donnees['distance_depuis_central']
+            impacts[liaison_id] = impact
+        
+        # Une liaison supprimée entre deux reconstructions de l'index est ignorée
+        liaisons = Liaison.objects.select_related('client').in_bulk(list(impacts))
+        resultat = []
+        for liaison_id, impact in impacts.items():
+            liaison = liaisons.get(liaison_id)
+            if liaison is None:
+                continue
+            impact.update({
+                'nom_liaison': liaison.nom_liaison,
+                'client_id': liaison.client_id,
+                'client': liaison.client.name,
+            })
+            resultat.append(impact)
+        
+        return sorted(resultat, key=lambda impact: impact['distance_m'])
+
+    @staticmethod
+    def ouvrir_coupures_liees(coupure: Coupure, impacts: List[Dict]) -> List[Coupure]:
+        """Ouvre en une fois les coupures des liaisons impactées qui n'en ont pas déjà une"""
+        deja_liees = set(coupure.coupures_liees.values_list('liaison_id', flat=True))
+        
+        nouvelles = []
+        for impact in impacts:
+            if impact['liaison_id'] in deja_liees:
+                continue
+            # Coupure déjà signalée sur cette liaison au même endroit
+            liaison = Liaison(id=impact['liaison_id'])
+            if CoupureService.trouver_coupure_active(liaison, impact['distance_depuis_central']):
+                continue
+            
+            est_segment = impact['element'] == 'segment'
+            nouvelles.append(Coupure(
+                liaison_id=impact['liaison_id'],
+                coupure_origine=coupure,
+                point_estime_lat=coupure.point_estime_lat,
+                point_estime_lng=coupure.point_estime_lng,
+                segment_touche_id=impact['element_id'] if est_segment else None,
+                distance_sur_segment=impact.get('distance_sur_segment'),
+                point_dynamique_proche_id=None if est_segment else impact['element_id'],
+                distance_depuis_central=impact['distance_depuis_central'],
+                description_diagnostic=f"Corridor partagé avec la coupure de {coupure.liaison.nom_liaison}"
+            ))
+        
+        with transaction.atomic():
+            Coupure.objects.bulk_create(nouvelles)
+            NotificationService.notifier_coupures_liees(coupure, nouvelles)
+        
+        return nouvelles
+
+class CriticiteCorridorService:
+    """Service pour classer les corridors du réseau selon ce qu'une coupure ferait perdre"""
+
+    TOLERANCE_SITE_M = 5
+    TAILLE_LOT_ENREGISTREMENT = 500
+
+    @staticmethod
+    def regrouper_points() -> Tuple[Dict, List[Tuple[float, float]]]:
+        """Site de chaque point (points co-localisés fusionnés) et coordonnées des sites"""
+        points = [
+            (point_id, float(lat), float(lng))
+            for point_id, lat, lng in PointDynamique.objects.values_list('id', 'latitude', 'longitude')
+        ]
+        return regrouper_sites(points, CriticiteCorridorService.TOLERANCE_SITE_M)
+
+    @staticmethod
+    def construire_graphe() -> Tuple[Dict, List[Tuple[float, float]], List[Tuple]]:
+        """Site de chaque point, sites et segments exprimés entre sites"""
+        site_par_point, sites = CriticiteCorridorService.regrouper_points()
+
+        segments = [
+            (str(segment_id), str(liaison_id), str(client_id),
+             site_par_point[depart_id], site_par_point[arrivee_id], distance_cable or 0.0)
+            for segment_id, liaison_id, client_id, depart_id, arrivee_id, distance_cable
+            in Segment.objects.values_list(
+                'id', 'liaison_id', 'liaison__client_id', 'point_depart_id', 'point_arrivee_id', 'distance_cable'
+            ).iterator(chunk_size=2000)
+        ]
+        return site_par_point, sites, segments
+
+    @staticmethod
+    def calculer(processus: int = None) -> int:
+        """Recalcule l'indice de criticité de tous les corridors et remplace le précédent
+
+        L'agrégation est répartie par corridor entre processus : chaque lot produit
+        des corridors complets, sans fusion à faire au retour.
+        """
+        _, sites, segments = CriticiteCorridorService.construire_graphe()
+        nombre_lots = processus or os.cpu_count() or 1
+        lots = repartir_segments(segments, nombre_lots)
+
+        if nombre_lots == 1:
+            resultats = [agreger_corridors(lot) for lot in lots]
+        else:
+            with ProcessPoolExecutor(max_workers=nombre_lots) as executeur:
+                resultats = list(executeur.map(agreger_corridors, lots))
+
+        calcule_le = timezone.now()
+        corridors = []
+        for resultat in resultats:
+            for corridor in resultat:
+                depart, arrivee = sites[corridor['site_a']], sites[corridor['site_b']]
+                corridors.append(CorridorCriticite(
+                    site_depart_lat=depart[0],
+                    site_depart_lng=depart[1],
+                    site_arrivee_lat=arrivee[0],
+                    site_arrivee_lng=arrivee[1],
+                    longueur_km=corridor['longueur_km'],
+                    nombre_segments=len(corridor['segments']),
+                    nombre_liaisons=len(corridor['liaisons']),
+                    nombre_clients=len(corridor['clients']),
+                    segments=corridor['segments'],
+                    liaisons=corridor['liaisons'],
+                    clients=corridor['clients'],
+                    calcule_le=calcule_le
+                ))
+
+        with transaction.atomic():
+            CorridorCriticite.objects.all().delete()
+            CorridorCriticite.objects.bulk_create(
+                corridors, batch_size=CriticiteCorridorService.TAILLE_LOT_ENREGISTREMENT
+            )
+        return len(corridors)
+
+    @staticmethod
+    def lancer_en_arriere_plan(processus: int = None):
+        """Lance le recalcul dans un thread séparé"""
+        def executer():
+            try:
+                CriticiteCorridorService.calculer(processus)
+            finally:
+                connection.close()
+
+        threading.Thread(target=executer, daemon=True).start()
+
+class GrapheReseauService:
+    """Service de requêtes sur le graphe des sites physiques partagés par les liaisons"""
+
+    # Reconstruction périodique : les autres processus modifient aussi le réseau
+    DUREE_VALIDITE_GRAPHE = timedelta(minutes=10)
+    CHAMPS_TOPOLOGIE_POINT = {'latitude', 'longitude'}
+    CHAMPS_TOPOLOGIE_SEGMENT = {'point_depart', 'point_arrivee', 'distance_cable'}
+
+    _graphe = None
+    _date_graphe = None
+    _verrou = threading.RLock()
+
+    @staticmethod
+    def graphe() -> Dict:
+        """Graphe CSR des sites et tables d'association, construit à la demande"""
+        with GrapheReseauService._verrou:
+            date_graphe = GrapheReseauService._date_graphe
+            if GrapheReseauService._graphe is None or \
+                    timezone.now() - date_graphe > GrapheReseauService.DUREE_VALIDITE_GRAPHE:
+                GrapheReseauService._graphe = GrapheReseauService._construire_graphe()
+                GrapheReseauService._date_graphe = timezone.now()
+            return GrapheReseauService._graphe
+
+    @staticmethod
+    def invalider(champs_modifies=None, champs_topologie=None):
+        """Oublie le graphe si la modification touche la géométrie ou la topologie"""
+        if champs_modifies is not None and champs_topologie is not None \
+                and not set(champs_modifies) & champs_topologie:
+            return
+        with GrapheReseauService._verrou:
+            GrapheReseauService._graphe = None
+
+    @staticmethod
+    def _construire_graphe() -> Dict:
+        site_par_point, sites, segments = CriticiteCorridorService.construire_graphe()
+
+        corridors: Dict[Tuple[int, int], int] = {}
+        aretes, segments_par_corridor, corridor_par_segment = [], [], {}
+        liaisons_par_site = [set() for _ in sites]
+        for segment_id, liaison_id, _, site_a, site_b, longueur in segments:
+            liaisons_par_site[site_a].add(liaison_id)
+            liaisons_par_site[site_b].add(liaison_id)
+            if site_a == site_b:
+                continue
+            cle = cle_corridor(site_a, site_b)
+            if cle not in corridors:
+                corridors[cle] = len(aretes)
+                aretes.append((site_a, site_b, longueur))
+                segments_par_corridor.append([])
+            numero = corridors[cle]
+            # Le plus court des câbles parallèles porte le poids du corridor
+            if longueur < aretes[numero][2]:
+                aretes[numero] = (aretes[numero][0], aretes[numero][1], longueur)
+            segments_par_corridor[numero].append((segment_id, liaison_id))
+            corridor_par_segment[segment_id] = numero
+
+        points_par_site = [[] for _ in sites]
+        for point_id, site in site_par_point.items():
+            points_par_site[site].append(str(point_id))
+
+        return {
+            'csr': GrapheCSR(len(sites), aretes),
+            'sites': sites,
+            'site_par_point': {str(point_id): site for point_id, site in site_par_point.items()},
+            'points_par_site': points_par_site,
+            'liaisons_par_site': liaisons_par_site,
+            'segments_par_corridor': segments_par_corridor,
+            'corridor_par_segment': corridor_par_segment,
+        }
+
+    @staticmethod
+    def site_du_point(point_id) -> Optional[int]:
+        return GrapheReseauService.graphe()['site_par_point'].get(str(point_id))
+
+    @staticmethod
+    def _corridors_exclus(graphe: Dict, segments_exclus) -> set:
+        return {
+            graphe['corridor_par_segment'][str(segment_id)]
+            for segment_id in segments_exclus
+            if str(segment_id) in graphe['corridor_par_segment']
+        }
+
+    @staticmethod
+    def _decrire_site(graphe: Dict, site: int) -> Dict:
+        latitude, longitude = graphe['sites'][site]
+        return {
+            'site': site,
+            'latitude': round(latitude, 8),
+            'longitude': round(longitude, 8),
+            'points': graphe['points_par_site'][site],
+        }
+
+    @staticmethod
+    def plus_court_chemin(depart_id, arrivee_id, segments_exclus=()) -> Optional[Dict]:
+        """Plus court chemin entre deux points par les corridors existants, hors segments exclus"""
+        graphe = GrapheReseauService.graphe()
+        depart = graphe['site_par_point'][str(depart_id)]
+        arrivee = graphe['site_par_point'][str(arrivee_id)]
+        corridors_exclus = GrapheReseauService._corridors_exclus(graphe, segments_exclus)
+
+        chemin = graphe['csr'].plus_court_chemin(depart, arrivee, corridors_exclus)
+        if chemin is None:
+            return None
+        distance, sites, corridors = chemin
+        return {
+            'distance_km': round(distance, 4),
+            'sites': [GrapheReseauService._decrire_site(graphe, site) for site in sites],
+            'corridors': [
+                {
+                    'segments': [segment_id for segment_id, _ in graphe['segments_par_corridor'][corridor]],
+                    'liaisons': sorted({liaison_id for _, liaison_id in graphe['segments_par_corridor'][corridor]}),
+                }
+                for corridor in corridors
+            ],
+        }
+
+    @staticmethod
+    def composantes() -> Dict:
+        """Composantes connexes du réseau, de la plus grande à la plus petite"""
+        graphe = GrapheReseauService.graphe()
+        tailles: Dict[int, int] = {}
+        for composante in graphe['csr'].composantes():
+            tailles[composante] = tailles.get(composante, 0) + 1
+        return {
+            'nombre_sites': graphe['csr'].nombre_sites,
+            'nombre_corridors': graphe['csr'].nombre_aretes,
+            'nombre_composantes': len(tailles),
+            'tailles': sorted(tailles.values(), reverse=True),
+        }
+
+    @staticmethod
+    def atteignables(depart_id, segments_exclus=()) -> Dict:
+        """Isolement d'un défaut : ce qui reste relié au point de départ sans les segments exclus
+
+        Les liaisons coupées empruntent un segment exclu ; celles qui restent
+        atteignables par d'autres corridors peuvent être reroutées.
+        """
+        graphe = GrapheReseauService.graphe()
+        csr = graphe['csr']
+        depart = graphe['site_par_point'][str(depart_id)]
+        corridors_exclus = GrapheReseauService._corridors_exclus(graphe, segments_exclus)
+
+        composante = csr.atteignables(depart)
+        atteints = csr.atteignables(depart, corridors_exclus) if corridors_exclus else composante
+        isoles = composante - atteints
+
+        liaisons_isolees = set()
+        for site in isoles:
+            liaisons_isolees.update(graphe['liaisons_par_site'][site])
+        liaisons_coupees = {
+            liaison_id
+            for corridor in corridors_exclus
+            for _, liaison_id in graphe['segments_par_corridor'][corridor]
+        }
+        return {
+            'nombre_sites_atteignables': len(atteints),
+            'nombre_sites_isoles': len(isoles),
+            'sites_isoles': [GrapheReseauService._decrire_site(graphe, site) for site in sorted(isoles)],
+            'liaisons_coupees': sorted(liaisons_coupees),
+            'liaisons_isolees': sorted(liaisons_isolees),
+            'liaisons_reroutables': sorted(liaisons_coupees - liaisons_isolees),
+        }
+
+class BilanOptiqueService:
+    """Service de calcul du bilan de puissance optique de toutes les liaisons"""
+
+    # Valeurs par défaut, remplaçables par un ParametreApplication de même clé
+    PARAMETRES = {
+        'bilan_attenuation_fibre_db_km': 0.35,
+        'bilan_perte_epissure_db': 0.1,
+        'bilan_perte_connecteur_fc_db': 0.5,
+        'bilan_perte_connecteur_lc_db': 0.3,
+        'bilan_perte_connecteur_sc_db': 0.3,
+        'bilan_perte_passage_cassette_db': 0.5,
+        'bilan_budget_ls_db': 15.0,
+        'bilan_budget_ftth_db': 28.0,
+        'bilan_marge_alerte_db': 3.0,
+    }
+    TYPES_EPISSURE = ('manchon', 'manchon_aerien')
+    # Un FDT est traversé par une cassette côté transport et une côté distribution
+    PASSAGES_CASSETTE_FDT = 2
+    TAILLE_LOT_ENREGISTREMENT = 500
+
+    @staticmethod
+    def parametres() -> Dict[str, float]:
+        parametres = dict(BilanOptiqueService.PARAMETRES)
+        for cle, valeur in ParametreApplication.objects.filter(cle__in=parametres).values_list('cle', 'valeur'):
+            try:
+                parametres[cle] = float(valeur)
+            except ValueError:
+                continue
+        return parametres
+
+    @staticmethod
+    def calculer(liaison_ids=None) -> int:
+        """Recalcule le bilan de toutes les liaisons (ou de celles indiquées)
+
+        Chaque facteur de perte est compté pour tout le réseau en une requête
+        agrégée, puis les bilans sont calculés colonne par colonne.
+        """
+        parametres = BilanOptiqueService.parametres()
+        liaisons = Liaison.objects.all()
+        if liaison_ids is not None:
+            liaisons = liaisons.filter(id__in=liaison_ids)
+        liaisons = list(liaisons.values_list('id', 'type_liaison__type'))
+        position = {liaison_id: i for i, (liaison_id, _) in enumerate(liaisons)}
+        nombre = len(liaisons)
+
+        def par_liaison(queryset, champ_liaison='liaison_id'):
+            if liaison_ids is not None:
+                queryset = queryset.filter(**{f'{champ_liaison}__in': position})
+            return queryset
+
+        # Longueur de fibre : profil optique (moues comprises), à défaut longueur de câble
+        longueurs = array('d', [0.0]) * nombre
+        for liaison_id, longueur in par_liaison(Segment.objects.all()).values('liaison_id') \
+                .annotate(total=Sum('distance_cable')).values_list('liaison_id', 'total'):
+            longueurs[position[liaison_id]] = longueur or 0.0
+        for liaison_id, longueur in par_liaison(PointDynamique.objects.all()).values('liaison_id') \
+                .annotate(total=Max('distance_optique_depuis_central')).values_list('liaison_id', 'total'):
+            longueurs[position[liaison_id]] = max(longueurs[position[liaison_id]], longueur or 0.0)
+
+        epissures = array('l', [0]) * nombre
+        cassettes = array('l', [0]) * nombre
+        comptages = par_liaison(PointDynamique.objects.filter(
+            type_point__in=BilanOptiqueService.TYPES_EPISSURE + ('FDT',)
+        )).values('liaison_id', 'type_point').annotate(nombre=Count('id')).values_list('liaison_id', 'type_point', 'nombre')
+        for liaison_id, type_point, nombre_points in comptages:
+            if type_point == 'FDT':
+                cassettes[position[liaison_id]] += BilanOptiqueService.PASSAGES_CASSETTE_FDT * nombre_points
+            else:
+                epissures[position[liaison_id]] += nombre_points
+        for liaison_id in par_liaison(DetailPOPFTTH.objects.all(), 'point_dynamique__liaison_id') \
+                .values_list('point_dynamique__liaison_id', flat=True):
+            cassettes[position[liaison_id]] += 1
+
+        # Connecteurs du convertisseur et du tiroir optique des POP LS, par type
+        connecteurs = {type_connecteur: array('l', [0]) * nombre for type_connecteur, _ in CONNECTEUR_CHOICES}
+        for liaison_id, convertisseur, tiroir in par_liaison(DetailPOPLS.objects.all(), 'point_dynamique__liaison_id') \
+                .values_list('point_dynamique__liaison_id', 'type_connecteur_convertisseur', 'type_connecteur_tiroir'):
+            for type_connecteur in (convertisseur, tiroir):
+                if type_connecteur in connecteurs:
+                    connecteurs[type_connecteur][position[liaison_id]] += 1
+
+        # Dernière mesure de bout en bout (les mesures de coupure s'arrêtent au défaut)
+        mesures = {}
+        for liaison_id, mesure_id, attenuation in par_liaison(MesureOTDR.objects.exclude(type_evenement='coupure')) \
+                .order_by('liaison_id', '-date_mesure').values_list('liaison_id', 'id', 'attenuation'):
+            mesures.setdefault(liaison_id, (mesure_id, attenuation))
+
+        pertes = array('d', (
+            longueur * parametres['bilan_attenuation_fibre_db_km']
+            + nombre_epissures * parametres['bilan_perte_epissure_db']
+            + nombre_cassettes * parametres['bilan_perte_passage_cassette_db']
+            for longueur, nombre_epissures, nombre_cassettes in zip(longueurs, epissures, cassettes)
+        ))
+        nombre_connecteurs = array('l', [0]) * nombre
+        for type_connecteur, comptes in connecteurs.items():
+            perte_connecteur = parametres[f'bilan_perte_connecteur_{type_connecteur.lower()}_db']
+            for i, compte in enumerate(comptes):
+                if compte:
+                    pertes[i] += compte * perte_connecteur
+                    nombre_connecteurs[i] += compte
+
+        calcule_le = timezone.now()
+        bilans = []
+        for i, (liaison_id, type_liaison) in enumerate(liaisons):
+            budget = parametres.get(f'bilan_budget_{(type_liaison or "ls").lower()}_db', parametres['bilan_budget_ls_db'])
+            mesure_id, attenuation = mesures.get(liaison_id, (None, None))
+            perte = round(pertes[i], 3)
+            marge = round(budget - max(perte, attenuation if attenuation is not None else perte), 3)
+            if marge < 0:
+                statut = 'depasse'
+            elif marge < parametres['bilan_marge_alerte_db']:
+                statut = 'alerte'
+            else:
+                statut = 'ok'
+            bilans.append(BilanOptique(
+                liaison_id=liaison_id,
+                longueur_fibre_km=round(longueurs[i], 4),
+                nombre_epissures=epissures[i],
+                nombre_connecteurs=nombre_connecteurs[i],
+                nombre_passages_cassette=cassettes[i],
+                perte_attendue_db=perte,
+                attenuation_mesuree_db=attenuation,
+                mesure_otdr_id=mesure_id,
+                ecart_db=round(attenuation - perte, 3) if attenuation is not None else None,
+                budget_db=budget,
+                marge_db=marge,
+                statut=statut,
+                calcule_le=calcule_le
+            ))
+
+        BilanOptique.objects.bulk_create(
+            bilans,
+            batch_size=BilanOptiqueService.TAILLE_LOT_ENREGISTREMENT,
+            update_conflicts=True,
+            unique_fields=['liaison'],
+            update_fields=[
+                'longueur_fibre_km', 'nombre_epissures', 'nombre_connecteurs', 'nombre_passages_cassette',
+                'perte_attendue_db', 'attenuation_mesuree_db', 'mesure_otdr', 'ecart_db', 'budget_db',
+                'marge_db', 'statut', 'calcule_le'
+            ]
+        )
+        return len(bilans)
+
+    @staticmethod
+    def lancer_en_arriere_plan():
+        """Lance le recalcul dans un thread séparé"""
+        def executer():
+            try:
+                BilanOptiqueService.calculer()
+            finally:
+                connection.close()
+
+        threading.Thread(target=executer, daemon=True).start()
+
+class ContinuiteFibreService:
+    """Service de contrôle de la continuité des toron/brin d'un point à l'autre des liaisons"""
+
+    COULEURS = {couleur: indice for indice, (couleur, _) in enumerate(COULEUR_CHOICES)}
+    # Par modèle de détail : champs (capacité, toron, brin) du câble entrant puis sortant
+    COTES_DETAILS = {
+        DetailChambre: (
+            ('capacite_cable_central', 'couleur_toron_central', 'couleur_brin_central'),
+            ('capacite_cable_client', 'couleur_toron_client', 'couleur_brin_client'),
+        ),
+        DetailManchon: (
+            ('capacite_cable_entrant', 'couleur_toron_entrant', 'couleur_brin_entrant'),
+            ('capacite_cable_sortant', 'couleur_toron_sortant', 'couleur_brin_sortant'),
+        ),
+        DetailFDT: (
+            ('capacite_cable_transport', 'couleur_toron_transport', 'couleur_brin_transport'),
+            ('capacite_cable_distribution', 'couleur_toron_distribution', 'couleur_brin_distribution'),
+        ),
+        DetailPOPLS: (None, ('capacite_cable', 'couleur_toron', 'couleur_brin')),
+        DetailPOPFTTH: (None, ('capacite_cable', 'couleur_toron', 'couleur_brin')),
+        FAT: (('capacite_cable_entrant', 'couleur_toron', 'couleur_brin'), None),
+    }
+    INCONNU = (-1, -1, -1)
+    ECARTS = ((ECART_CAPACITE, 'capacite'), (ECART_TORON, 'toron'), (ECART_BRIN, 'brin'))
+
+    @staticmethod
+    def _encoder(capacite, toron, brin) -> Tuple[int, int, int]:
+        couleurs = ContinuiteFibreService.COULEURS
+        return (capacite or -1, couleurs.get(toron, -1), couleurs.get(brin, -1))
+
+    @staticmethod
+    def cotes(modele, valeurs: Dict) -> Dict[str, Tuple[int, int, int]]:
+        """Câbles entrant et sortant encodés d'un détail décrit par ses valeurs de champs"""
+        cotes = {}
+        for cote, champs in zip(('entree', 'sortie'), ContinuiteFibreService.COTES_DETAILS[modele]):
+            cotes[cote] = ContinuiteFibreService._encoder(*(valeurs.get(champ) for champ in champs)) \
+                if champs else ContinuiteFibreService.INCONNU
+        return cotes
+
+    @staticmethod
+    def _charger_cotes(liaison_ids=None) -> Dict:
+        """Câbles entrant et sortant de chaque point détaillé, une requête par modèle de détail"""
+        cotes = {}
+        for modele, (entree, sortie) in ContinuiteFibreService.COTES_DETAILS.items():
+            champs = [champ for cote in (entree, sortie) if cote for champ in cote]
+            details = modele.objects.filter(point_dynamique__isnull=False)
+            if liaison_ids is not None:
+                details = details.filter(point_dynamique__liaison_id__in=liaison_ids)
+            for point_id, *valeurs in details.values_list('point_dynamique_id', *champs):
+                cotes[point_id] = ContinuiteFibreService.cotes(modele, dict(zip(champs, valeurs)))
+        return cotes
+
+    @staticmethod
+    def verifier(liaison_ids=None, remplacements: Dict = None) -> Dict:
+        """Discontinuités et brins hors capacité sur tout le réseau (ou les liaisons indiquées)
+
+        remplacements permet de vérifier des détails avant leur enregistrement.
+        """
+        cotes = ContinuiteFibreService._charger_cotes(liaison_ids)
+        cotes.update(remplacements or {})
+
+        points = PointDynamique.objects.order_by('liaison_id', 'ordre')
+        if liaison_ids is not None:
+            points = points.filter(liaison_id__in=liaison_ids)
+        points = [point for point in points.values_list('id', 'liaison_id', 'nom') if point[0] in cotes]
+
+        # Colonnes entières : liaison, puis capacité/toron/brin de chaque côté
+        numeros_liaisons: Dict = {}
+        liaisons = array('l', (numeros_liaisons.setdefault(liaison_id, len(numeros_liaisons))
+                               for _, liaison_id, _ in points))
+        colonnes = {
+            cote: tuple(array('h', (cotes[point_id][cote][k] for point_id, _, _ in points)) for k in range(3))
+            for cote in ('entree', 'sortie')
+        }
+        codes = detecter_discontinuites(liaisons, colonnes['sortie'], colonnes['entree'])
+
+        def decrire(indice, cote):
+            capacite, toron, brin = (colonne[indice] for colonne in colonnes[cote])
+            return {
+                'capacite': capacite if capacite >= 0 else None,
+                'couleur_toron': COULEUR_CHOICES[toron][0] if toron >= 0 else None,
+                'couleur_brin': COULEUR_CHOICES[brin][0] if brin >= 0 else None,
+            }
+
+        def point(indice):
+            return {'id': points[indice][0], 'nom': points[indice][2]}
+
+        anomalies = []
+        for i, code in enumerate(codes):
+            if code:
+                anomalies.append({
+                    'type': 'discontinuite',
+                    'liaison_id': points[i][1],
+                    'point_amont': point(i),
+                    'point_aval': point(i + 1),
+                    'ecarts': [nom for bit, nom in ContinuiteFibreService.ECARTS if code & bit],
+                    'amont': decrire(i, 'sortie'),
+                    'aval': decrire(i + 1, 'entree'),
+                })
+        for cote in ('entree', 'sortie'):
+            for i, hors_capacite in enumerate(detecter_hors_capacite(*colonnes[cote])):
+                if hors_capacite:
+                    anomalies.append({
+                        'type': 'hors_capacite',
+                        'liaison_id': points[i][1],
+                        'point': point(i),
+                        'cote': cote,
+                        'valeurs': decrire(i, cote),
+                    })
+
+        return {
+            'nombre_points_verifies': len(points),
+            'nombre_anomalies': len(anomalies),
+            'anomalies': anomalies,
+        }
+
+    @staticmethod
+    def verifier_modification(point: PointDynamique, modele, valeurs: Dict) -> List[Dict]:
+        """Anomalies qu'introduirait l'enregistrement de ces valeurs de détail sur le point
+
+        Les anomalies déjà présentes avec les valeurs enregistrées ne sont pas reprises :
+        seule une modification qui crée ou aggrave une anomalie est signalée.
+        """
+        if modele not in ContinuiteFibreService.COTES_DETAILS:
+            return []
+
+        def cle(anomalie):
+            return (
+                anomalie['type'], anomalie.get('point', {}).get('id'), anomalie.get('point_amont', {}).get('id'),
+                anomalie.get('point_aval', {}).get('id'), anomalie.get('cote'), tuple(anomalie.get('ecarts', ())),
+                tuple(sorted(anomalie.get('valeurs', {}).items())),
+            )
+
+        def autour_du_point(rapport):
+            return [
+                anomalie for anomalie in rapport['anomalies']
+                if point.id in (anomalie.get('point', {}).get('id'),
+                                anomalie.get('point_amont', {}).get('id'),
+                                anomalie.get('point_aval', {}).get('id'))
+            ]
+
+        existantes = {cle(anomalie) for anomalie in autour_du_point(ContinuiteFibreService.verifier([point.liaison_id]))}
+        rapport = ContinuiteFibreService.verifier(
+            [point.liaison_id], {point.id: ContinuiteFibreService.cotes(modele, valeurs)}
+        )
+        return [anomalie for anomalie in autour_du_point(rapport) if cle(anomalie) not in existantes]
+
+class InventaireBrinsService:
+    """Service d'inventaire des brins occupés et libres de chaque portée de câble"""
+
+    DUREE_VALIDITE_INDEX = timedelta(minutes=10)
+    TAILLE_LOT_ENREGISTREMENT = 500
+
+    _index = None
+    _date_index = None
+    _verrou = threading.RLock()
+
+    @staticmethod
+    def calculer() -> int:
+        """Reconstruit l'inventaire à partir des toron/brin relevés sur les points des liaisons
+
+        Une portée est identifiée par ses deux sites et sa capacité ; le brin d'un
+        segment est celui du câble sortant du point de départ, à défaut celui du
+        câble entrant du point d'arrivée.
+        """
+        site_par_point, sites = CriticiteCorridorService.regrouper_points()
+        cotes = ContinuiteFibreService._charger_cotes()
+
+        portees: Dict[Tuple[int, int, int], Dict] = {}
+        for segment_id, liaison_id, depart_id, arrivee_id in Segment.objects.values_list(
+                'id', 'liaison_id', 'point_depart_id', 'point_arrivee_id').iterator(chunk_size=2000):
+            cable = cotes.get(depart_id, {}).get('sortie', ContinuiteFibreService.INCONNU)
+            if cable[0] < 0:
+                cable = cotes.get(arrivee_id, {}).get('entree', ContinuiteFibreService.INCONNU)
+            capacite, toron, brin = cable
+            site_a, site_b = cle_corridor(site_par_point[depart_id], site_par_point[arrivee_id])
+            if capacite < 0 or site_a == site_b:
+                continue
+
+            portee = portees.setdefault((site_a, site_b, capacite), {
+                'masque': 0, 'brins': {}, 'conflits': set(), 'segments': [],
+            })
+            portee['segments'].append(str(segment_id))
+            if toron < 0 or brin < 0 or indice_brin(toron, brin) >= capacite:
+                continue
+            rang = indice_brin(toron, brin)
+            occupant = portee['brins'].setdefault(str(rang), str(liaison_id))
+            if occupant != str(liaison_id):
+                portee['conflits'].add(rang)
+            portee['masque'] |= 1 << rang
+
+        calcule_le = timezone.now()
+        troncons = [
+            TronconCable(
+                site_depart_lat=sites[site_a][0],
+                site_depart_lng=sites[site_a][1],
+                site_arrivee_lat=sites[site_b][0],
+                site_arrivee_lng=sites[site_b][1],
+                capacite=capacite,
+                occupation=masque_vers_octets(portee['masque'], capacite),
+                nombre_brins_occupes=bin(portee['masque']).count('1'),
+                brins=portee['brins'],
+                conflits=sorted(portee['conflits']),
+                segments=portee['segments'],
+                calcule_le=calcule_le
+            )
+            for (site_a, site_b, capacite), portee in portees.items()
+        ]
+        with transaction.atomic():
+            TronconCable.objects.all().delete()
+            TronconCable.objects.bulk_create(troncons, batch_size=InventaireBrinsService.TAILLE_LOT_ENREGISTREMENT)
+
+        with InventaireBrinsService._verrou:
+            InventaireBrinsService._index = None
+        return len(troncons)
+
+    @staticmethod
+    def index() -> Dict:
+        """Portées (capacité, masque d'occupation) indexées par segment, chargées à la demande"""
+        with InventaireBrinsService._verrou:
+            date_index = InventaireBrinsService._date_index
+            if InventaireBrinsService._index is None or \
+                    timezone.now() - date_index > InventaireBrinsService.DUREE_VALIDITE_INDEX:
+                troncons, par_segment = {}, {}
+                for troncon_id, capacite, occupation, segments in TronconCable.objects.values_list(
+                        'id', 'capacite', 'occupation', 'segments'):
+                    troncons[troncon_id] = (capacite, octets_vers_masque(occupation))
+                    for segment_id in segments:
+                        par_segment.setdefault(segment_id, set()).add(troncon_id)
+                InventaireBrinsService._index = {'troncons': troncons, 'par_segment': par_segment}
+                InventaireBrinsService._date_index = timezone.now()
+            return InventaireBrinsService._index
+
+    @staticmethod
+    def decrire_brin(rang: int) -> Dict:
+        toron, brin = divmod(rang, BRINS_PAR_TORON)
+        return {
+            'numero': rang + 1,
+            'couleur_toron': COULEUR_CHOICES[toron][0] if toron < len(COULEUR_CHOICES) else None,
+            'couleur_brin': COULEUR_CHOICES[brin][0],
+        }
+
+    @staticmethod
+    def brins_libres_chemin(depart_id, arrivee_id, capacite: int = None) -> Optional[Dict]:
+        """Brins libres de bout en bout entre deux points, par ET binaire le long d'un même câble
+
+        Le chemin suit les corridors du graphe réseau. Une portée prolonge celles du
+        corridor précédent qu'une même liaison emprunte : les masques libres sont
+        combinés par ET le long de ces câbles continus, jamais entre câbles parallèles.
+        Sans inventaire sur l'un des corridors, aucun brin n'est garanti (statut inconnu).
+        """
+        chemin = GrapheReseauService.plus_court_chemin(depart_id, arrivee_id)
+        if chemin is None:
+            return None
+        index = InventaireBrinsService.index()
+        liaison_par_segment = {
+            str(segment_id): liaison_id
+            for segment_id, liaison_id in Segment.objects.filter(
+                id__in=[segment_id for corridor in chemin['corridors'] for segment_id in corridor['segments']]
+            ).values_list('id', 'liaison_id')
+        }
+
+        # Câbles continus arrivant au corridor courant : portée -> (masque libre, capacité min, liaisons)
+        cables, non_inventories = None, 0
+        for corridor in chemin['corridors']:
+            liaisons_par_troncon = {}
+            for segment_id in corridor['segments']:
+                for troncon_id in index['par_segment'].get(segment_id, ()):
+                    if capacite is None or index['troncons'][troncon_id][0] == capacite:
+                        liaisons_par_troncon.setdefault(troncon_id, set()).add(liaison_par_segment.get(segment_id))
+            if not liaisons_par_troncon:
+                non_inventories += 1
+            suivants = {}
+            for troncon_id, liaisons in liaisons_par_troncon.items():
+                capacite_troncon, occupation = index['troncons'][troncon_id]
+                libres = masque_complet(capacite_troncon) & ~occupation
+                liaisons.discard(None)
+                if cables is None:
+                    suivants[troncon_id] = (libres, capacite_troncon, liaisons)
+                    continue
+                precedents = [cable for cable in cables.values() if cable[2] & liaisons]
+                if not precedents:
+                    continue
+                masque = 0
+                for masque_precedent, _, _ in precedents:
+                    masque |= masque_precedent
+                capacite_cable = min(capacite_troncon, max(cable[1] for cable in precedents))
+                suivants[troncon_id] = (libres & masque, capacite_cable, liaisons)
+            cables = suivants
+
+        libres, capacite_min = 0, None
+        if not non_inventories:
+            for masque, capacite_cable, _ in (cables or {}).values():
+                libres |= masque
+                capacite_min = capacite_cable if capacite_min is None else max(capacite_min, capacite_cable)
+        rangs = brins_du_masque(libres)
+        return {
+            'distance_km': chemin['distance_km'],
+            'nombre_corridors': len(chemin['corridors']),
+            'corridors_non_inventories': non_inventories,
+            'statut': 'inconnu' if non_inventories else 'inventorie',
+            'capacite_min': capacite_min,
+            'nombre_brins_libres': len(rangs),
+            'brins_libres': [InventaireBrinsService.decrire_brin(rang) for rang in rangs],
+        }
+
+    @staticmethod
+    def lancer_en_arriere_plan():
+        """Lance la reconstruction de l'inventaire dans un thread séparé"""
+        def executer():
+            try:
+                InventaireBrinsService.calculer()
+            finally:
+                connection.close()
+
+        threading.Thread(target=executer, daemon=True).start()
+
+class OccupationPortsService:
+    """Service d'occupation des ports de cassettes et splitters pour la commercialisation FTTH
+
+    Chaque équipement tient un masque de bits sur une seule ligne : la disponibilité
+    se lit en une requête indexée, et les modifications passent par une mise à jour
+    conditionnée à la version lue (compare-and-swap), rejouée en cas de concurrence.
+    """
+
+    PORTS_PAR_EQUIPEMENT = {'cassette_fdt': 12, 'cassette_odf': 12, 'splitter': 8}
+    PORTS_MAX = 63
+    TENTATIVES = 10
+    SEUIL_SATURATION = 0.9
+
+    @staticmethod
+    def ports_de(instance) -> List[Tuple[Tuple[str, str, int], int, str]]:
+        """Ports occupés par un équipement enregistré : (clé d'équipement, port, occupant)"""
+        if isinstance(instance, DetailFDT):
+            return [
+                (('cassette_fdt', instance.numero_fdt, instance.cassette_transport),
+                 instance.port_cassette_transport, f'detail_fdt:{instance.pk}:transport'),
+                (('cassette_fdt', instance.numero_fdt, instance.cassette_distribution),
+                 instance.port_cassette_distribution, f'detail_fdt:{instance.pk}:distribution'),
+            ]
+        if isinstance(instance, DetailPOPFTTH):
+            return [(('cassette_odf', instance.reference_odf, instance.quantieme_cassette),
+                     instance.numero_port_cassette, f'pop_ftth:{instance.pk}')]
+        if isinstance(instance, FAT):
+            port = re.search(r'\d+', instance.port_splitter or '')
+            if port:
+                return [(('splitter', instance.numero_fat, 0), int(port.group()), f'fat:{instance.pk}')]
+        return []
+
+    @staticmethod
+    def _equipement(cle: Tuple[str, str, int]) -> OccupationPorts:
+        equipement, reference, numero = cle
+        try:
+            return OccupationPorts.objects.get_or_create(
+                equipement=equipement, reference=reference, numero=numero,
+                defaults={'nombre_ports': OccupationPortsService.PORTS_PAR_EQUIPEMENT[equipement]}
+            )[0]
+        except IntegrityError:
+            # Créé entre-temps par une requête concurrente
+            return OccupationPorts.objects.get(equipement=equipement, reference=reference, numero=numero)
+
+    @staticmethod
+    def _modifier(cle: Tuple[str, str, int], modification: Callable) -> Tuple[OccupationPorts, object]:
+        """Applique modification(occupation) -> résultat et l'écrit si la version n'a pas changé
+
+        modification modifie nombre_ports, masque, occupants et conflits de l'instance lue.
+        """
+        for _ in range(OccupationPortsService.TENTATIVES):
+            occupation = OccupationPortsService._equipement(cle)
+            version = occupation.version
+            resultat = modification(occupation)
+            ecrits = OccupationPorts.objects.filter(id=occupation.id, version=version).update(
+                nombre_ports=occupation.nombre_ports,
+                masque=occupation.masque,
+                nombre_occupes=bin(occupation.masque).count('1'),
+                occupants=occupation.occupants,
+                conflits=occupation.conflits,
+                version=version + 1,
+                updated_at=timezone.now()
+            )
+            if ecrits:
+                occupation.version = version + 1
+                occupation.nombre_occupes = bin(occupation.masque).count('1')
+                return occupation, resultat
+        raise RuntimeError(f"Occupation des ports {cle} modifiée en continu, abandon après "
+                           f"{OccupationPortsService.TENTATIVES} tentatives")
+
+    @staticmethod
+    def occuper(cle: Tuple[str, str, int], port: int, occupant: str) -> bool:
+        """Marque un port occupé ; faux (et conflit consigné) s'il est déjà pris par un autre équipement"""
+        def modification(occupation):
+            if not 1 <= port <= OccupationPortsService.PORTS_MAX:
+                return False
+            # Un splitter numéroté au-delà de sa taille par défaut est plus grand
+            occupation.nombre_ports = max(occupation.nombre_ports, port)
+            actuel = occupation.occupants.get(str(port))
+            if actuel not in (None, occupant) and not actuel.startswith('reservation:'):
+                if occupant not in occupation.conflits:
+                    occupation.conflits.append(occupant)
+                return False
+            occupation.masque |= 1 << (port - 1)
+            occupation.occupants[str(port)] = occupant
+            return True
+        return OccupationPortsService._modifier(cle, modification)[1]
+
+    @staticmethod
+    def liberer(cle: Tuple[str, str, int], port: int, occupant: str = None) -> bool:
+        """Libère un port (seulement s'il est tenu par cet occupant, quand il est indiqué)"""
+        def modification(occupation):
+            if occupant in occupation.conflits:
+                occupation.conflits.remove(occupant)
+            if occupant is not None and occupation.occupants.get(str(port)) != occupant:
+                return False
+            occupation.masque &= ~(1 << (port - 1))
+            occupation.occupants.pop(str(port), None)
+            return True
+        return OccupationPortsService._modifier(cle, modification)[1]
+
+    @staticmethod
+    def allouer(cle: Tuple[str, str, int], occupant: str) -> Optional[int]:
+        """Réserve le premier port libre de l'équipement, None s'il est complet"""
+        def modification(occupation):
+            libres = ~occupation.masque & masque_complet(occupation.nombre_ports)
+            if not libres:
+                return None
+            port = (libres & -libres).bit_length()
+            occupation.masque |= 1 << (port - 1)
+            occupation.occupants[str(port)] = occupant
+            return port
+        return OccupationPortsService._modifier(cle, modification)[1]
+
+    @staticmethod
+    def reserver(cle: Tuple[str, str, int], port: int, occupant: str) -> bool:
+        """Réserve un port précis s'il est libre"""
+        def modification(occupation):
+            if not 1 <= port <= OccupationPortsService.PORTS_MAX or str(port) in occupation.occupants:
+                return False
+            occupation.nombre_ports = max(occupation.nombre_ports, port)
+            occupation.masque |= 1 << (port - 1)
+            occupation.occupants[str(port)] = occupant
+            return True
+        return OccupationPortsService._modifier(cle, modification)[1]
+
+    @staticmethod
+    def disponibilite(cle: Tuple[str, str, int]) -> Dict:
+        equipement, reference, numero = cle
+        occupation = OccupationPorts.objects.filter(
+            equipement=equipement, reference=reference, numero=numero
+        ).first()
+        nombre_ports = occupation.nombre_ports if occupation else OccupationPortsService.PORTS_PAR_EQUIPEMENT[equipement]
+        masque = occupation.masque if occupation else 0
+        libres = ~masque & masque_complet(nombre_ports)
+        return {
+            'equipement': equipement,
+            'reference': reference,
+            'numero': numero,
+            'nombre_ports': nombre_ports,
+            'nombre_occupes': bin(masque).count('1'),
+            'nombre_libres': bin(libres).count('1'),
+            'premier_port_libre': (libres & -libres).bit_length() or None,
+            'ports_libres': [rang + 1 for rang in brins_du_masque(libres)],
+        }
+
+    @staticmethod
+    def synchroniser(instance, ports_precedents=()):
+        """Reporte l'enregistrement d'un équipement : libère ses anciens ports, occupe les nouveaux"""
+        ports = OccupationPortsService.ports_de(instance)
+        for cle, port, occupant in ports_precedents:
+            if (cle, port, occupant) not in ports:
+                OccupationPortsService.liberer(cle, port, occupant)
+        for cle, port, occupant in ports:
+            if (cle, port, occupant) not in ports_precedents:
+                OccupationPortsService.occuper(cle, port, occupant)
+
+    @staticmethod
+    def reconstruire() -> int:
+        """Reconstruit l'index à partir de tous les équipements enregistrés
+
+        Les réservations commerciales (allouer) ne découlent d'aucun équipement : elles
+        sont reprises sur les ports que les équipements laissent libres.
+        """
+        with transaction.atomic():
+            reservations = [
+                ((equipement, reference, numero), int(port), occupant)
+                for equipement, reference, numero, occupants in OccupationPorts.objects.values_list(
+                    'equipement', 'reference', 'numero', 'occupants')
+                for port, occupant in occupants.items() if occupant.startswith('reservation:')
+            ]
+            OccupationPorts.objects.all().delete()
+            nombre = 0
+            for modele in (DetailFDT, DetailPOPFTTH, FAT):
+                for instance in modele.objects.iterator():
+                    OccupationPortsService.synchroniser(instance)
+                    nombre += 1
+            for cle, port, occupant in reservations:
+                OccupationPortsService.reserver(cle, port, occupant)
+        return nombre
+
+    @staticmethod
+    def utilisation(equipement: str = None, reference: str = None) -> Dict:
+        """Taux d'occupation par référence (FDT, ODF, FAT) et équipements saturés"""
+        occupations = OccupationPorts.objects.all()
+        if equipement:
+            occupations = occupations.filter(equipement=equipement)
+        if reference:
+            occupations = occupations.filter(reference=reference)
+
+        references: Dict[Tuple[str, str], Dict] = {}
+        satures = []
+        for equipement_id, ref, numero, ports, occupes, conflits in occupations.values_list(
+                'equipement', 'reference', 'numero', 'nombre_ports', 'nombre_occupes', 'conflits'):
+            ligne = references.setdefault((equipement_id, ref), {
+                'equipement': equipement_id, 'reference': ref,
+                'nombre_equipements': 0, 'nombre_ports': 0, 'nombre_occupes': 0, 'nombre_conflits': 0,
+            })
+            ligne['nombre_equipements'] += 1
+            ligne['nombre_ports'] += ports
+            ligne['nombre_occupes'] += occupes
+            ligne['nombre_conflits'] += len(conflits)
+            if occupes >= ports * OccupationPortsService.SEUIL_SATURATION:
+                satures.append({'equipement': equipement_id, 'reference': ref, 'numero': numero,
+                                'nombre_ports': ports, 'nombre_occupes': occupes})
+
+        for ligne in references.values():
+            ligne['taux_occupation'] = round(ligne['nombre_occupes'] / ligne['nombre_ports'] * 100, 1) \
+                if ligne['nombre_ports'] else 0
+        return {
+            'references': sorted(references.values(), key=lambda ligne: -ligne['taux_occupation']),
+            'equipements_satures': satures,
+        }
+
+class ProximiteFATService:
+    """Service de recherche des FAT les plus proches ayant encore des ports de splitter libres"""
+
+    RAYON_MAX_M = 5000
+    TAILLE_CELLULE_DEG = 0.001
+    TAILLE_LOT = 16
+    DUREE_VALIDITE_INDEX = timedelta(minutes=10)
+
+    _index = None
+    _date_index = None
+    _verrou = threading.RLock()
+
+    @staticmethod
+    def index() -> GrilleSpatiale:
+        """Index spatial des FAT, construit à la demande puis tenu à jour par les signaux"""
+        with ProximiteFATService._verrou:
+            date_index = ProximiteFATService._date_index
+            if ProximiteFATService._index is None or \
+                    timezone.now() - date_index > ProximiteFATService.DUREE_VALIDITE_INDEX:
+                grille = GrilleSpatiale(ProximiteFATService.TAILLE_CELLULE_DEG)
+                for fat_id, numero_fat, numero_fdt, lat, lng in FAT.objects.values_list(
+                        'id', 'numero_fat', 'numero_fdt', 'latitude', 'longitude'):
+                    grille.ajouter(fat_id, [[float(lat), float(lng)]], (numero_fat, numero_fdt))
+                ProximiteFATService._index = grille
+                ProximiteFATService._date_index = timezone.now()
+            return ProximiteFATService._index
+
+    @staticmethod
+    def indexer_fat(fat: FAT):
+        with ProximiteFATService._verrou:
+            if ProximiteFATService._index is not None:
+                ProximiteFATService._index.ajouter(
+                    fat.id, [[float(fat.latitude), float(fat.longitude)]], (fat.numero_fat, fat.numero_fdt)
+                )
+
+    @staticmethod
+    def retirer_fat(fat_id):
+        with ProximiteFATService._verrou:
+            if ProximiteFATService._index is not None:
+                ProximiteFATService._index.retirer(fat_id)
+
+    @staticmethod
+    def distance_marche_m(lat: float, lng: float, lat_fat: float, lng_fat: float) -> float:
+        """Estimation d'un trajet à pied par des rues en grille (distance de Manhattan locale)"""
+        cos_lat = math.cos(math.radians(lat))
+        return (abs(lat_fat - lat) + abs(lng_fat - lng) * cos_lat) * METRES_PAR_DEGRE
+
+    @staticmethod
+    def plus_proches(lat: float, lng: float, k: int = 5, tri: str = 'droite',
+                     rayon_max_m: float = None) -> List[Dict]:
+        """Les k FAT les plus proches avec au moins un port de splitter libre
+
+        Les FAT sont parcourues par distance croissante et leur occupation est lue
+        par lots ; le parcours s'arrête dès que les suivantes ne peuvent plus entrer
+        dans le classement (les deux distances sont au moins la distance à vol d'oiseau).
+        """
+        rayon_max_m = rayon_max_m or ProximiteFATService.RAYON_MAX_M
+        grille = ProximiteFATService.index()
+        ports_splitter = OccupationPortsService.PORTS_PAR_EQUIPEMENT['splitter']
+        resultats = []
+
+        def traiter(lot):
+            occupations = {
+                reference: (nombre_ports, masque)
+                for reference, nombre_ports, masque in OccupationPorts.objects.filter(
+                    equipement='splitter', reference__in=[donnees[0] for _, _, donnees in lot]
+                ).values_list('reference', 'nombre_ports', 'masque')
+            }
+            for fat_id, distance, (numero_fat, numero_fdt) in lot:
+                nombre_ports, masque = occupations.get(numero_fat, (ports_splitter, 0))
+                libres = ~masque & masque_complet(nombre_ports)
+                if not libres:
+                    continue
+                lat_fat, lng_fat = grille.elements[fat_id][0][0]
+                marche = ProximiteFATService.distance_marche_m(lat, lng, lat_fat, lng_fat)
+                resultats.append({
+                    'id': fat_id,
+                    'numero_fat': numero_fat,
+                    'numero_fdt': numero_fdt,
+                    'latitude': lat_fat,
+                    'longitude': lng_fat,
+                    'distance_m': round(distance, 1),
+                    'distance_marche_m': round(marche, 1),
+                    'ports_libres': bin(libres).count('1'),
+                    'premier_port_libre': (libres & -libres).bit_length(),
+                })
+            cle_tri = 'distance_marche_m' if tri == 'marche' else 'distance_m'
+            resultats.sort(key=lambda resultat: resultat[cle_tri])
+            del resultats[k:]
+            return resultats[-1][cle_tri] if len(resultats) == k else None
+
+        lot = []
+        for element in grille.parcourir(lat, lng, rayon_max_m):
+            lot.append(element)
+            if len(lot) == ProximiteFATService.TAILLE_LOT:
+                seuil = traiter(lot)
+                if seuil is not None and lot[-1][1] >= seuil:
+                    break
+                lot = []
+        else:
+            if lot:
+                traiter(lot)
+        return resultats
+
+class ArbreFTTHService:
+    """Service de l'arbre FTTH OLT → port OLT → FDT → FAT → ONT
+
+    Chaque nœud porte dans son chemin les segments « type:référence/ » de ses ancêtres :
+    le sous-arbre d'un nœud est l'intervalle [chemin, borne_sous_arbre(chemin)[, lu par
+    un seul parcours de l'index unique sur chemin. Un nœud qui change de parent
+    déplace son sous-arbre entier en une requête.
+    Une FDT sans port OLT connu, une FAT sans FDT ou un ONT sans FAT sur sa liaison
+    sont placés à la racine.
+    """
+
+    TYPES_INTERMEDIAIRES = ('olt', 'port_olt', 'fdt')
+
+    @staticmethod
+    def segment(type_noeud: str, valeur) -> str:
+        return f"{type_noeud}:{quote(str(valeur), safe='')}/"
+
+    @staticmethod
+    def borne_sous_arbre(chemin: str) -> str:
+        # '0' suit immédiatement '/' : tout chemin commençant par chemin est inférieur à la borne
+        return chemin[:-1] + '0'
+
+    @staticmethod
+    def chemin_parent(chemin: str) -> str:
+        return chemin[:chemin.rfind('/', 0, len(chemin) - 1) + 1]
+
+    @staticmethod
+    def sous_arbre(noeud: NoeudFTTH, type_noeud: str = None, inclure_noeud: bool = False):
+        noeuds = NoeudFTTH.objects.filter(chemin__lt=ArbreFTTHService.borne_sous_arbre(noeud.chemin))
+        noeuds = noeuds.filter(chemin__gte=noeud.chemin) if inclure_noeud else noeuds.filter(chemin__gt=noeud.chemin)
+        if type_noeud:
+            noeuds = noeuds.filter(type_noeud=type_noeud)
+        return noeuds
+
+    @staticmethod
+    def ancetres(noeud: NoeudFTTH):
+        prefixes = []
+        chemin = ArbreFTTHService.chemin_parent(noeud.chemin)
+        while chemin:
+            prefixes.append(chemin)
+            chemin = ArbreFTTHService.chemin_parent(chemin)
+        return NoeudFTTH.objects.filter(chemin__in=prefixes).order_by('profondeur')
+
+    @staticmethod
+    def _placer(type_noeud: str, reference: str, valeur_segment, parent: Optional[NoeudFTTH],
+                objet_id=None, **champs) -> NoeudFTTH:
+        """Crée le nœud sous parent, ou l'y déplace avec son sous-arbre s'il était ailleurs"""
+        chemin = (parent.chemin if parent else '') + ArbreFTTHService.segment(type_noeud, valeur_segment)
+        profondeur = parent.profondeur + 1 if parent else 1
+        filtre = {'objet_id': objet_id} if objet_id else {'reference': reference}
+        noeud = NoeudFTTH.objects.filter(type_noeud=type_noeud, **filtre).first()
+        if noeud is None:
+            noeud, cree = NoeudFTTH.objects.get_or_create(
+                type_noeud=type_noeud, reference=reference,
+                defaults={'chemin': chemin, 'profondeur': profondeur, 'objet_id': objet_id, **champs}
+            )
+            if cree:
+                return noeud
+
+        if noeud.chemin != chemin:
+            ancien_parent = ArbreFTTHService.chemin_parent(noeud.chemin)
+            NoeudFTTH.objects.filter(
+                chemin__gte=noeud.chemin, chemin__lt=ArbreFTTHService.borne_sous_arbre(noeud.chemin)
+            ).update(
+                chemin=Concat(Value(chemin), Substr('chemin', len(noeud.chemin) + 1), output_field=CharField()),
+                profondeur=F('profondeur') + (profondeur - noeud.profondeur),
+                updated_at=timezone.now()
+            )
+            noeud.chemin, noeud.profondeur = chemin, profondeur
+            ArbreFTTHService.elaguer(ancien_parent)
+
+        champs['reference'] = reference
+        modifies = {champ: valeur for champ, valeur in champs.items() if getattr(noeud, champ) != valeur}
+        if modifies:
+            NoeudFTTH.objects.filter(id=noeud.id).update(**modifies, updated_at=timezone.now())
+            for champ, valeur in modifies.items():
+                setattr(noeud, champ, valeur)
+        return noeud
+
+    @staticmethod
+    def _reference_utilisee(noeud: NoeudFTTH) -> bool:
+        if noeud.type_noeud == 'olt':
+            return DetailPOPFTTH.objects.filter(reference_olt=noeud.reference).exists()
+        if noeud.type_noeud == 'port_olt':
+            reference_olt, _, port_olt = noeud.reference.rpartition('/')
+            return DetailPOPFTTH.objects.filter(reference_olt=reference_olt, port_olt=port_olt).exists()
+        numero = noeud.reference
+        return DetailFDT.objects.filter(numero_fdt=numero).exists() or \
+            FAT.objects.filter(numero_fdt=numero).exists() or \
+            DetailPOPFTTH.objects.filter(numero_fdt=numero).exists()
+
+    @staticmethod
+    def elaguer(chemin: str):
+        """Supprime en remontant les OLT, ports et FDT devenus vides et plus référencés"""
+        while chemin:
+            noeud = NoeudFTTH.objects.filter(chemin=chemin).first()
+            if noeud is None or noeud.type_noeud not in ArbreFTTHService.TYPES_INTERMEDIAIRES or \
+                    ArbreFTTHService.sous_arbre(noeud).exists() or ArbreFTTHService._reference_utilisee(noeud):
+                return
+            noeud.delete()
+            chemin = ArbreFTTHService.chemin_parent(chemin)
+
+    @staticmethod
+    def retirer_si_inutilise(type_noeud: str, reference: str):
+        chemin = NoeudFTTH.objects.filter(type_noeud=type_noeud, reference=reference).values_list(
+            'chemin', flat=True).first()
+        if chemin:
+            ArbreFTTHService.elaguer(chemin)
+
+    @staticmethod
+    def placer_port(reference_olt: str, port_olt: str) -> NoeudFTTH:
+        olt = ArbreFTTHService._placer('olt', reference_olt, reference_olt, None, libelle=reference_olt)
+        return ArbreFTTHService._placer(
+            'port_olt', f'{reference_olt}/{port_olt}', port_olt, olt, libelle=f'{reference_olt} port {port_olt}'
+        )
+
+    @staticmethod
+    def placer_fdt(numero_fdt: str) -> Optional[NoeudFTTH]:
+        """Place la FDT sous le port OLT qui la dessert (premier POP FTTH qui la cite)"""
+        if not numero_fdt:
+            return None
+        pop = DetailPOPFTTH.objects.filter(numero_fdt=numero_fdt).order_by('reference_olt', 'port_olt').first()
+        parent = ArbreFTTHService.placer_port(pop.reference_olt, pop.port_olt) if pop else None
+        return ArbreFTTHService._placer('fdt', numero_fdt, numero_fdt, parent, libelle=numero_fdt)
+
+    @staticmethod
+    def _placer_fat_seule(fat: FAT) -> NoeudFTTH:
+        parent = ArbreFTTHService.placer_fdt(fat.numero_fdt)
+        return ArbreFTTHService._placer(
+            'fat', fat.numero_fat, fat.numero_fat, parent, objet_id=fat.id, libelle=fat.numero_fat
+        )
+
+    @staticmethod
+    def _fat_de_liaison(liaison_id) -> Optional[FAT]:
+        return FAT.objects.filter(
+            Q(liaison_id=liaison_id) | Q(point_dynamique__liaison_id=liaison_id)
+        ).order_by('numero_fat').first()
+
+    @staticmethod
+    def placer_ont(point_id) -> Optional[NoeudFTTH]:
+        """Place l'ONT sous la FAT de sa liaison"""
+        ont = DetailONT.objects.filter(point_dynamique_id=point_id).values(
+            'numero_serie', 'point_dynamique__liaison_id', 'point_dynamique__liaison__client_id'
+        ).first()
+        if ont is None:
+            return None
+        fat = ArbreFTTHService._fat_de_liaison(ont['point_dynamique__liaison_id'])
+        parent = ArbreFTTHService._placer_fat_seule(fat) if fat else None
+        return ArbreFTTHService._placer(
+            'ont', str(point_id), point_id, parent, objet_id=point_id, libelle=ont['numero_serie'],
+            liaison_id=ont['point_dynamique__liaison_id'], client_id=ont['point_dynamique__liaison__client_id']
+        )
+
+    @staticmethod
+    def placer_fat(fat: FAT, liaisons_precedentes=()):
+        """Place la FAT puis replace les ONT qu'elle dessert ou desservait"""
+        noeud = ArbreFTTHService._placer_fat_seule(fat)
+        liaisons = {fat.liaison_id, *liaisons_precedentes}
+        if fat.point_dynamique_id:
+            liaisons.add(PointDynamique.objects.filter(id=fat.point_dynamique_id).values_list(
+                'liaison_id', flat=True).first())
+        points = set(DetailONT.objects.filter(
+            point_dynamique__liaison_id__in=liaisons - {None}
+        ).values_list('point_dynamique_id', flat=True))
+        points.update(ArbreFTTHService.sous_arbre(noeud, 'ont').values_list('objet_id', flat=True))
+        for point_id in points:
+            ArbreFTTHService.placer_ont(point_id)
+
+    @staticmethod
+    def liaisons_de_fat(fat: FAT) -> List:
+        """Liaisons desservies par la FAT enregistrée (avant modification)"""
+        return list(FAT.objects.filter(id=fat.id).values_list('liaison_id', 'point_dynamique__liaison_id').first() or ())
+
+    @staticmethod
+    def retirer(type_noeud: str, objet_id=None, reference: str = None):
+        """Retire un nœud ; les ONT d'une FAT retirée sont replacées"""
+        filtre = {'objet_id': objet_id} if objet_id else {'reference': reference}
+        noeud = NoeudFTTH.objects.filter(type_noeud=type_noeud, **filtre).first()
+        if noeud is None:
+            return
+        if type_noeud == 'fat':
+            for point_id in ArbreFTTHService.sous_arbre(noeud, 'ont').values_list('objet_id', flat=True):
+                ArbreFTTHService.placer_ont(point_id)
+        noeud.delete()
+        ArbreFTTHService.elaguer(ArbreFTTHService.chemin_parent(noeud.chemin))
+
+    @staticmethod
+    def reconstruire() -> int:
+        """Reconstruit l'arbre en mémoire à partir des équipements enregistrés"""
+        noeuds: Dict[Tuple[str, str], NoeudFTTH] = {}
+
+        def ajouter(type_noeud, reference, valeur_segment, parent, **champs):
+            chemin = (parent.chemin if parent else '') + ArbreFTTHService.segment(type_noeud, valeur_segment)
+            noeud = NoeudFTTH(
+                type_noeud=type_noeud, reference=reference, chemin=chemin,
+                profondeur=parent.profondeur + 1 if parent else 1, **champs
+            )
+            noeuds[(type_noeud, reference)] = noeud
+            return noeud
+
+        port_par_fdt = {}
+        for reference_olt, port_olt, numero_fdt in DetailPOPFTTH.objects.order_by(
+                'reference_olt', 'port_olt').values_list('reference_olt', 'port_olt', 'numero_fdt'):
+            olt = noeuds.get(('olt', reference_olt)) or \
+                ajouter('olt', reference_olt, reference_olt, None, libelle=reference_olt)
+            reference = f'{reference_olt}/{port_olt}'
+            port = noeuds.get(('port_olt', reference)) or \
+                ajouter('port_olt', reference, port_olt, olt, libelle=f'{reference_olt} port {port_olt}')
+            if numero_fdt:
+                port_par_fdt.setdefault(numero_fdt, port)
+
+        def fdt(numero_fdt):
+            if not numero_fdt:
+                return None
+            return noeuds.get(('fdt', numero_fdt)) or \
+                ajouter('fdt', numero_fdt, numero_fdt, port_par_fdt.get(numero_fdt), libelle=numero_fdt)
+
+        for numero_fdt in [*port_par_fdt, *DetailFDT.objects.values_list('numero_fdt', flat=True)]:
+            fdt(numero_fdt)
+
+        fat_par_liaison = {}
+        for fat_id, numero_fat, numero_fdt, liaison_id, liaison_point_id in FAT.objects.order_by(
+                'numero_fat').values_list('id', 'numero_fat', 'numero_fdt', 'liaison_id',
+                                          'point_dynamique__liaison_id'):
+            noeud = ajouter('fat', numero_fat, numero_fat, fdt(numero_fdt), objet_id=fat_id, libelle=numero_fat)
+            for liaison in (liaison_id, liaison_point_id):
+                if liaison:
+                    fat_par_liaison.setdefault(liaison, noeud)
+
+        for point_id, numero_serie, liaison_id, client_id in DetailONT.objects.values_list(
+                'point_dynamique_id', 'numero_serie', 'point_dynamique__liaison_id',
+                'point_dynamique__liaison__client_id'):
+            ajouter('ont', str(point_id), point_id, fat_par_liaison.get(liaison_id), objet_id=point_id,
+                    libelle=numero_serie, liaison_id=liaison_id, client_id=client_id)
+
+        with transaction.atomic():
+            NoeudFTTH.objects.all().delete()
+            NoeudFTTH.objects.bulk_create(noeuds.values(), batch_size=500)
+        return len(noeuds)
+
+    @staticmethod
+    def decrire(noeud: NoeudFTTH) -> Dict:
+        return {
+            'id': noeud.id,
+            'type_noeud': noeud.type_noeud,
+            'reference': noeud.reference,
+            'libelle': noeud.libelle,
+            'objet_id': noeud.objet_id,
+            'profondeur': noeud.profondeur,
+            'liaison_id': noeud.liaison_id,
+            'client_id': noeud.client_id,
+        }
+
+    @staticmethod
+    def impact(noeud: NoeudFTTH, type_descendants: str = None, limite: int = 500) -> Dict:
+        """Contenu du sous-arbre : nombre de nœuds par type, abonnés desservis, descendants"""
+        nombre_par_type = dict(
+            ArbreFTTHService.sous_arbre(noeud).values_list('type_noeud').annotate(nombre=Count('id'))
+        )
+        abonnes = ArbreFTTHService.sous_arbre(noeud, 'ont', inclure_noeud=True).exclude(liaison=None)
+        descendants = ArbreFTTHService.sous_arbre(noeud, type_descendants)
+        return {
+            'noeud': ArbreFTTHService.decrire(noeud),
+            'ancetres': [ArbreFTTHService.decrire(ancetre) for ancetre in ArbreFTTHService.ancetres(noeud)],
+            'nombre_par_type': nombre_par_type,
+            'nombre_liaisons': abonnes.values('liaison').distinct().count(),
+            'nombre_clients': abonnes.values('client').distinct().count(),
+            'descendants': [ArbreFTTHService.decrire(descendant) for descendant in descendants[:limite]],
+        }
+
+class CouvertureService:
+    """Service d'analyse de couverture : actif du réseau le plus proche d'adresses prospectes
+
+    Les actifs retenus (FAT et points dynamiques des types choisis) sont chargés dans une
+    grille, puis les adresses sont lues et jointes par lots : un fichier de plusieurs
+    dizaines de milliers de lignes est traité au fil de la lecture et de l'écriture.
+    """
+
+    RAYON_DEFAUT_M = 150
+    RAYON_MAX_M = 2000
+    TYPES_DEFAUT = ('FAT', 'chambre')
+    TAILLE_LOT = 1000
+    TAILLE_TAMPON = 64 * 1024
+    COLONNES_LATITUDE = ('latitude', 'lat')
+    COLONNES_LONGITUDE = ('longitude', 'lng', 'lon')
+    COLONNES_RESULTAT = ['couvert', 'type_actif', 'actif_id', 'reference_actif', 'distance_m', 'erreur']
+
+    @staticmethod
+    def index_actifs(types, type_liaison: str = None, rayon_m: float = None) -> GrilleSpatiale:
+        """Grille des actifs : FAT si 'FAT' figure dans types, points dynamiques des autres types
+
+        type_liaison (LS ou FTTH) restreint les points dynamiques aux liaisons de ce type.
+        Des cellules de la taille du rayon de recherche limitent les cellules lues par adresse.
+        """
+        rayon_m = rayon_m or CouvertureService.RAYON_DEFAUT_M
+        grille = GrilleSpatiale(min(max(rayon_m / METRES_PAR_DEGRE, 0.0005), 0.02))
+        if 'FAT' in types:
+            for fat_id, numero_fat, lat, lng in FAT.objects.values_list('id', 'numero_fat', 'latitude', 'longitude'):
+                grille.ajouter(('FAT', fat_id), [[float(lat), float(lng)]], ('FAT', numero_fat))
+
+        types_points = [type_point for type_point in types if type_point != 'FAT']
+        if types_points:
+            points = PointDynamique.objects.filter(type_point__in=types_points)
+            if type_liaison:
+                points = points.filter(liaison__type_liaison__type=type_liaison)
+            for point_id, type_point, nom, lat, lng in points.values_list(
+                    'id', 'type_point', 'nom', 'latitude', 'longitude'):
+                grille.ajouter(('point', point_id), [[float(lat), float(lng)]], (type_point, nom))
+        return grille
+
+    @staticmethod
+    def lire_csv(fichier) -> Tuple[List[str], Iterable[Dict], str]:
+        """Colonnes, lignes (lues à la demande) et séparateur d'un fichier CSV téléversé"""
+        texte = io.TextIOWrapper(fichier, encoding='utf-8-sig', newline='')
+        entete = texte.readline()
+        delimiteur = ';' if entete.count(';') > entete.count(',') else ','
+        lecteur = csv.DictReader(itertools.chain([entete], texte), delimiter=delimiteur)
+        return lecteur.fieldnames or [], lecteur, delimiteur
+
+    @staticmethod
+    def colonnes_coordonnees(colonnes: List[str]) -> bool:
+        return any(nom in colonnes for nom in CouvertureService.COLONNES_LATITUDE) and \
+            any(nom in colonnes for nom in CouvertureService.COLONNES_LONGITUDE)
+
+    @staticmethod
+    def _coordonnees(ligne: Dict) -> Tuple[float, float]:
+        valeurs = []
+        for noms in (CouvertureService.COLONNES_LATITUDE, CouvertureService.COLONNES_LONGITUDE):
+            valeur = next((ligne[nom] for nom in noms if ligne.get(nom) not in (None, '')), None)
+            valeurs.append(float(str(valeur).strip().replace(',', '.')) if valeur is not None else math.nan)
+        lat, lng = valeurs
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError(f"Coordonnées invalides : {lat}, {lng}")
+        return lat, lng
+
+    @staticmethod
+    def analyser(lignes: Iterable[Dict], grille: GrilleSpatiale, rayon_m: float):
+        """(ligne, résultat) pour chaque adresse, dans l'ordre de lecture"""
+        lot = []
+        for ligne in lignes:
+            lot.append(ligne)
+            if len(lot) == CouvertureService.TAILLE_LOT:
+                yield from CouvertureService._analyser_lot(lot, grille, rayon_m)
+                lot = []
+        if lot:
+            yield from CouvertureService._analyser_lot(lot, grille, rayon_m)
+
+    @staticmethod
+    def _analyser_lot(lot: List[Dict], grille: GrilleSpatiale, rayon_m: float):
+        points, erreurs = [], {}
+        for rang, ligne in enumerate(lot):
+            try:
+                points.append((rang, *CouvertureService._coordonnees(ligne)))
+            except (TypeError, ValueError):
+                erreurs[rang] = 'coordonnées invalides'
+        proches = dict(zip((rang for rang, _, _ in points), grille.joindre(points, rayon_m)))
+
+        for rang, ligne in enumerate(lot):
+            proche = proches.get(rang)
+            resultat = dict.fromkeys(CouvertureService.COLONNES_RESULTAT, '')
+            if rang in erreurs:
+                resultat['erreur'] = erreurs[rang]
+            elif proche is None:
+                resultat['couvert'] = 'non'
+            else:
+                (_, actif_id), distance, (type_actif, reference) = proche
+                resultat.update(couvert='oui', type_actif=type_actif, actif_id=str(actif_id),
+                                reference_actif=reference, distance_m=round(distance, 1))
+            yield ligne, resultat
+
+    @staticmethod
+    def exporter_csv(lignes: Iterable[Dict], colonnes: List[str], grille: GrilleSpatiale,
+                     rayon_m: float, delimiteur: str = ','):
+        """Lignes d'origine complétées du résultat, produites par blocs au fil de la lecture"""
+        tampon = io.StringIO()
+        ecrivain = csv.writer(tampon, delimiter=delimiteur)
+        colonnes = [colonne for colonne in colonnes if colonne not in CouvertureService.COLONNES_RESULTAT]
+        ecrivain.writerow(colonnes + CouvertureService.COLONNES_RESULTAT)
+        for ligne, resultat in CouvertureService.analyser(lignes, grille, rayon_m):
+            ecrivain.writerow(
+                [ligne.get(colonne, '') for colonne in colonnes] +
+                [resultat[colonne] for colonne in CouvertureService.COLONNES_RESULTAT]
+            )
+            if tampon.tell() >= CouvertureService.TAILLE_TAMPON:
+                yield tampon.getvalue()
+                tampon.seek(0)
+                tampon.truncate()
+        yield tampon.getvalue()
+
+class TraceOTDRService:
+    """Service pour le stockage compressé et l'aperçu des traces OTDR"""
+
+    LARGEUR_APERCU = 300
+
+    @staticmethod
+    def enregistrer_trace(mesure_otdr: MesureOTDR, resultat: Dict) -> Optional[TraceOTDR]:
+        """Enregistre la trace préparée par preparer_trace() à côté de la mesure"""
+        if not resultat['nombre_points'] or not resultat['pas_km']:
+            return None
+        
+        trace_otdr = TraceOTDR(
+            mesure_otdr=mesure_otdr,
+            nombre_points=resultat['nombre_points'],
+            pas_km=resultat['pas_km'],
+            echelle_db=resultat['echelle_db'],
+            niveaux_apercu=resultat['niveaux_apercu']
+        )
+        trace_otdr.fichier_points.save(
+            f'{mesure_otdr.id}.trace.z', ContentFile(resultat['trace_compressee']), save=False
+        )
+        if resultat['pyramide']:
+            trace_otdr.fichier_apercu.save(
+                f'{mesure_otdr.id}.apercu', ContentFile(resultat['pyramide']), save=False
+            )
+        trace_otdr.save()
+        return trace_otdr
+
+    @staticmethod
+    def importer_fichier(mesure_otdr: MesureOTDR) -> Optional[TraceOTDR]:
+        """Décode le fichier .sor joint à une mesure : table d'événements et trace"""
+        with mesure_otdr.fichier_otdr.open('rb') as fichier:
+            contenu = fichier.read()
+        
+        try:
+            resultat = preparer_trace(LecteurSOR.lire(contenu))
+        except (ValueError, struct.error):
+            return None
+        
+        mesure_otdr.evenements = resultat['evenements']
+        mesure_otdr.save(update_fields=['evenements'])
+        return TraceOTDRService.enregistrer_trace(mesure_otdr, resultat)
+
+    @staticmethod
+    def charger(trace_otdr: TraceOTDR) -> array:
+        """Charge la trace complète (échantillons bruts)"""
+        with trace_otdr.fichier_points.open('rb') as fichier:
+            return CompressionTrace.decompresser(fichier.read())
+
+    @staticmethod
+    def apercu(trace_otdr: TraceOTDR, debut_km: float = None, fin_km: float = None,
+               largeur: int = None) -> Dict:
+        """Aperçu min/max de la trace sur une fenêtre, sans charger la trace complète"""
+        largeur = largeur or TraceOTDRService.LARGEUR_APERCU
+        pas = trace_otdr.pas_km
+        nombre_points = trace_otdr.nombre_points
+        
+        premier = 0 if debut_km is None else int(debut_km / pas)
+        dernier = nombre_points if fin_km is None else math.ceil(fin_km / pas)
+        premier = min(max(premier, 0), nombre_points - 1)
+        dernier = min(max(dernier, premier + 1), nombre_points)
+        taille_voulue = (dernier - premier) / largeur
+        
+        # Niveau le plus grossier qui reste plus fin que la résolution demandée
+        niveau = None
+        for candidat in trace_otdr.niveaux_apercu:
+            if candidat['taille_seau'] <= taille_voulue:
+                niveau = candidat
+        
+        if niveau:
+            taille_seau = niveau['taille_seau']
+            premier_seau = premier // taille_seau
+            dernier_seau = min(math.ceil(dernier / taille_seau), niveau['nombre'])
+            with trace_otdr.fichier_apercu.open('rb') as fichier:
+                paires = CompressionTrace.lire_niveau(fichier, niveau, premier_seau, dernier_seau)
+            origine = premier_seau * taille_seau
+        else:
+            taille_seau = 1
+            valeurs = TraceOTDRService.charger(trace_otdr)[premier:dernier]
+            paires = array('H', bytes(4 * len(valeurs)))
+            paires[0::2] = valeurs
+            paires[1::2] = valeurs
+            origine = premier
+        
+        echelle = trace_otdr.echelle_db
+        return {
+            'nombre_points_total': nombre_points,
+            'pas_km': pas,
+            'taille_seau': taille_seau,
+            'debut_km': round(premier * pas, 5),
+            'fin_km': round(dernier * pas, 5),
+            # [distance_km, niveau_min_db, niveau_max_db]
+            'points': [
+                [round((origine + indice * taille_seau) * pas, 5), round(mini * echelle, 3), round(maxi * echelle, 3)]
+                for indice, mini, maxi in CompressionTrace.regrouper(paires, largeur)
+            ]
+        }
+
+class EmpreinteOTDRService:
+    """Service pour comparer les mesures OTDR à l'empreinte de référence d'une liaison"""
+
+    @staticmethod
+    def definir_reference(mesure_otdr: MesureOTDR, utilisateur=None) -> ReferenceOTDR:
+        """Fait d'une mesure l'empreinte de référence de sa liaison"""
+        reference, _ = ReferenceOTDR.objects.update_or_create(
+            liaison=mesure_otdr.liaison,
+            defaults={
+                'mesure_otdr': mesure_otdr,
+                'evenements': mesure_otdr.evenements,
+                'definie_par': utilisateur
+            }
+        )
+        return reference
+
+    @staticmethod
+    def reference_de(liaison: Liaison) -> Optional[ReferenceOTDR]:
+        try:
+            return liaison.reference_otdr
+        except ReferenceOTDR.DoesNotExist:
+            return None
+
+    @staticmethod
+    def comparer(mesure_otdr: MesureOTDR) -> Optional[Dict]:
+        """Diff des événements et des traces entre une mesure et la référence"""
+        reference = EmpreinteOTDRService.reference_de(mesure_otdr.liaison)
+        if not reference or reference.mesure_otdr_id == mesure_otdr.id or not mesure_otdr.evenements:
+            return None
+        
+        comparaison = ComparaisonEmpreinte.comparer(reference.evenements, mesure_otdr.evenements)
+        comparaison['trace'] = None
+        
+        try:
+            trace_reference = reference.mesure_otdr.trace
+            trace_mesure = mesure_otdr.trace
+        except TraceOTDR.DoesNotExist:
+            return comparaison
+        
+        comparaison['trace'] = ComparaisonEmpreinte.ecart_traces(
+            TraceOTDRService.charger(trace_reference), trace_reference.pas_km, trace_reference.echelle_db,
+            TraceOTDRService.charger(trace_mesure), trace_mesure.pas_km, trace_mesure.echelle_db,
+            comparaison['decalage_km']
+        )
+        return comparaison
+
+    @staticmethod
+    def appliquer(mesure_otdr: MesureOTDR) -> Optional[Dict]:
+        """Enregistre sur la mesure l'écart à la référence, à côté des valeurs relevées par le technicien"""
+        comparaison = EmpreinteOTDRService.comparer(mesure_otdr)
+        
+        if comparaison and comparaison['type_evenement']:
+            mesure_otdr.type_evenement_reference = comparaison['type_evenement']
+            mesure_otdr.distance_reference_km = comparaison['distance_km']
+            mesure_otdr.save(update_fields=['type_evenement_reference', 'distance_reference_km'])
+        
+        return comparaison
+
+class ImportOTDRService:
+    """Service pour l'import en masse d'archives de fichiers OTDR"""
+
+    TAILLE_LOT = 50
+    TOLERANCE_FIN_FIBRE_KM = 0.05
+    SEUIL_PERTE_EPISSURE_DB = 0.5
+    SEUIL_REFLECTANCE_DB = -35.0
+
+    @staticmethod
+    def traiter_import(import_otdr: ImportOTDR, taille_lot: int = None, processus: int = None,
+                       progression: Callable[[int, int], None] = None) -> ImportOTDR:
+        """Traite (ou reprend) un import : décodage parallèle puis écriture par lots"""
+        taille_lot = taille_lot or ImportOTDRService.TAILLE_LOT
+        import_otdr.status = 'en_cours'
+        import_otdr.save(update_fields=['status', 'updated_at'])
+        
+        index_liaisons = ImportOTDRService._indexer_liaisons()
+        deja_traites = set(import_otdr.fichiers_traites)
+        
+        try:
+            with zipfile.ZipFile(import_otdr.chemin_archive) as archive:
+                noms = [
+                    nom for nom in archive.namelist()
+                    if nom.lower().endswith('.sor') and not nom.endswith('/')
+                ]
+                import_otdr.total_fichiers = len(noms)
+                import_otdr.save(update_fields=['total_fichiers', 'updated_at'])
+                restants = [nom for nom in noms if nom not in deja_traites]
+                
+                # Un seul processus : décodage dans le processus courant
+                executeur = ProcessPoolExecutor(max_workers=processus) if processus != 1 else None
+                try:
+                    for debut in range(0, len(restants), taille_lot):
+                        lot = restants[debut:debut + taille_lot]
+                        contenus = ((nom, archive.read(nom)) for nom in lot)
+                        if executeur:
+                            resultats = list(executeur.map(analyser_fichier, contenus))
+                        else:
+                            resultats = [analyser_fichier(contenu) for contenu in contenus]
+                        
+                        ImportOTDRService._enregistrer_lot(import_otdr, resultats, index_liaisons)
+                        if progression:
+                            progression(len(import_otdr.fichiers_traites), import_otdr.total_fichiers)
+                finally:
+                    if executeur:
+                        executeur.shutdown()
+        except Exception as exc:
+            # Archive illisible, décodeur ou écriture d'un lot : les lots déjà enregistrés restent acquis
+            import_otdr.status = 'erreur'
+            import_otdr.erreurs.append({'fichier': None, 'erreur': str(exc)})
+            import_otdr.save(update_fields=['status', 'erreurs', 'updated_at'])
+            return import_otdr
+        except BaseException:
+            # Arrêt de la commande (Ctrl+C) : l'import pourra être repris
+            import_otdr.status = 'interrompu'
+            import_otdr.save(update_fields=['status', 'updated_at'])
+            raise
+        
+        import_otdr.status = 'termine'
+        import_otdr.save(update_fields=['status', 'updated_at'])
+        return import_otdr
+
+    @staticmethod
+    def lancer_en_arriere_plan(import_otdr: ImportOTDR):
+        """Lance le traitement d'un import dans un thread séparé"""
+        def executer():
+            try:
+                ImportOTDRService.traiter_import(import_otdr)
+            finally:
+                connection.close()
+        
+        threading.Thread(target=executer, daemon=True).start()
+
+    @staticmethod
+    def _indexer_liaisons() -> Dict:
+        """Index des liaisons par nom (insensible à la casse)"""
+        liaisons = {
+            liaison.nom_liaison.strip().lower(): liaison
+            for liaison in Liaison.objects.select_related('reference_otdr')
+        }
+        return {
+            'par_nom': liaisons,
+            # Les noms les plus longs d'abord pour la recherche dans les noms de fichiers
+            'noms_tries': sorted(liaisons, key=len, reverse=True),
+        }
+
+    @staticmethod
+    def _associer_liaison(resultat: Dict, index_liaisons: Dict) -> Optional[Liaison]:
+        """Associe un fichier à une liaison via ses métadonnées ou son nom"""
+        par_nom = index_liaisons['par_nom']
+        nom_fichier = os.path.splitext(os.path.basename(resultat['nom']))[0].lower()
+        
+        candidats = [
+            resultat['identifiant_cable'], resultat['identifiant_fibre'],
+            resultat['extremite'], resultat['origine'], nom_fichier
+        ]
+        for candidat in candidats:
+            cle = candidat.strip().lower()
+            if cle and cle in par_nom:
+                return par_nom[cle]
+        
+        for nom in index_liaisons['noms_tries']:
+            if nom and nom in nom_fichier:
+                return par_nom[nom]
+        
+        return None
+
+    @staticmethod
+    def _classifier(resultat: Dict, liaison: Liaison) -> Tuple[str, float]:
+        """Déduit le type d'événement et sa distance à partir de la table d'événements"""
+        evenements = resultat['evenements']
+        fin_fibre = next((e for e in evenements if e['fin_fibre']), None)
+        distance_fin = fin_fibre['distance_km'] if fin_fibre else (resultat['longueur_fibre_km'] or 0.0)
+        
+        # Avec une empreinte de référence, seuls les écarts à la référence comptent
+        reference = EmpreinteOTDRService.reference_de(liaison)
+        if reference and reference.evenements:
+            comparaison = ComparaisonEmpreinte.comparer(reference.evenements, evenements)
+            if comparaison['type_evenement']:
+                return comparaison['type_evenement'], comparaison['distance_km']
+            return 'attenuation', distance_fin
+        
+        if (fin_fibre and liaison.distance_totale
+                and fin_fibre['distance_km'] < liaison.distance_totale - ImportOTDRService.TOLERANCE_FIN_FIBRE_KM):
+            return 'coupure', fin_fibre['distance_km']
+        
+        intermediaires = [e for e in evenements if not e['fin_fibre']]
+        epissures = [
+            e for e in intermediaires
+            if not e['reflechissant'] and e['perte_db'] > ImportOTDRService.SEUIL_PERTE_EPISSURE_DB
+        ]
+        if epissures:
+            return 'epissure', max(epissures, key=lambda e: e['perte_db'])['distance_km']
+        
+        reflets = [
+            e for e in intermediaires
+            if e['reflechissant'] and e['reflectance_db'] > ImportOTDRService.SEUIL_REFLECTANCE_DB
+        ]
+        if reflets:
+            return 'reflet', max(reflets, key=lambda e: e['reflectance_db'])['distance_km']
+        
+        return 'attenuation', distance_fin
+
+    @staticmethod
+    def _enregistrer_lot(import_otdr: ImportOTDR, resultats: List[Dict], index_liaisons: Dict):
+        """Écrit les mesures et coupures d'un lot et la progression dans une même transaction"""
+        mesures = []
+        traces = []
+        erreurs = []
+        
+        for resultat in resultats:
+            if resultat['erreur']:
+                erreurs.append({'fichier': resultat['nom'], 'erreur': resultat['erreur']})
+                continue
+            
+            liaison = ImportOTDRService._associer_liaison(resultat, index_liaisons)
+            if not liaison:
+                erreurs.append({'fichier': resultat['nom'], 'erreur': 'Aucune liaison correspondante'})
+                continue
+            
+            type_evenement, distance = ImportOTDRService._classifier(resultat, liaison)
+            perte_totale = resultat['perte_totale_db']
+            if perte_totale is None:
+                perte_totale = sum(e['perte_db'] for e in resultat['evenements'])
+            
+            mesure = MesureOTDR(
+                liaison=liaison,
+                position_technicien=import_otdr.position_technicien,
+                direction_analyse=import_otdr.direction_analyse,
+                distance_coupure=distance,
+                attenuation=perte_totale,
+                type_evenement=type_evenement,
+                technicien=import_otdr.cree_par,
+                commentaires=f"Importé depuis {resultat['nom']}",
+                evenements=resultat['evenements'],
+                date_mesure=resultat['date_mesure'] or timezone.now()
+            )
+            mesures.append(mesure)
+            traces.append((mesure, resultat))
+        
+        def enregistrer_traces():
+            for mesure, resultat in traces:
+                TraceOTDRService.enregistrer_trace(mesure, resultat)
+        
+        with transaction.atomic():
+            MesureOTDR.objects.bulk_create(mesures)
+            # Regroupement avec les coupures déjà signalées, comme pour une saisie manuelle
+            signalements = CoupureService.signaler_coupures(
+                [mesure for mesure in mesures if mesure.type_evenement == 'coupure']
+            )
+            # Les signalements d'une même coupure partagent la mesure opposée : une fusion suffit
+            for coupure, mesures_coupure, nouvelle in signalements:
+                FusionOTDRService.fusionner(mesures_coupure[0])
+            # Fichiers de trace écrits seulement si le lot est validé
+            transaction.on_commit(enregistrer_traces)
+            
+            import_otdr.fichiers_traites.extend(resultat['nom'] for resultat in resultats)
+            import_otdr.erreurs.extend(erreurs)
+            import_otdr.nombre_mesures += len(mesures)
+            import_otdr.nombre_coupures += sum(1 for _, _, nouvelle in signalements if nouvelle)
+            import_otdr.save(update_fields=[
+                'fichiers_traites', 'erreurs', 'nombre_mesures', 'nombre_coupures', 'updated_at'
+            ])
+
+class ImportReseauService:
+    """Service d'import des exports SIG du réseau (GeoJSON, KML, CSV)
+
+    Premier passage : les entités sont lues en flux, validées et enregistrées par lots
+    (clients, liaisons, points dynamiques, FAT), en mises à jour idempotentes par
+    nom_liaison, (liaison, nom) et numero_fat. Second passage : le fichier est relu pour
+    les seuls tracés, et l'ordre des points puis les segments des liaisons touchées sont
+    reconstruits par groupes de liaisons. Seul le rang des points importés reste en
+    mémoire d'un passage à l'autre ; les tracés ne sont retenus que le temps d'un groupe.
+    """
+
+    TAILLE_LOT = 500
+    TAILLE_LOT_LIAISONS = 200
+    MAX_SOMMETS_EN_ATTENTE = 200000
+    MAX_ERREURS_CONSERVEES = 1000
+    CHAMPS_LIAISON = [
+        'client', 'type_liaison', 'status', 'point_central_lat', 'point_central_lng',
+        'point_client_lat', 'point_client_lng', 'updated_at'
+    ]
+    CHAMPS_POINT = ['type_point', 'latitude', 'longitude', 'description', 'commentaire_technicien', 'updated_at']
+    CHAMPS_FAT = [
+        'numero_fdt', 'port_splitter', 'capacite_cable_entrant', 'couleur_toron', 'couleur_brin',
+        'moue_cable_poteau', 'commentaire'
+    ]
+    CHAMPS_FAT_OBLIGATOIRES = ('numero_fdt', 'port_splitter', 'capacite_cable_entrant', 'couleur_toron', 'couleur_brin')
+    COMPTEURS = (
+        'clients_crees', 'liaisons_creees', 'liaisons_modifiees', 'points_crees', 'points_modifies',
+        'points_reordonnes', 'fats_creees', 'fats_modifiees', 'segments_crees', 'segments_modifies',
+        'segments_supprimes'
+    )
+
+    @staticmethod
+    def traiter_import(import_reseau: ImportReseau, taille_lot: int = None,
+                       progression: Callable[[int], None] = None) -> ImportReseau:
+        """Traite un import : enregistrement des entités par lots, puis reconstruction des liaisons"""
+        taille_lot = taille_lot or ImportReseauService.TAILLE_LOT
+        import_reseau.status = 'en_cours'
+        import_reseau.entites_lues = 0
+        import_reseau.compteurs = dict.fromkeys(ImportReseauService.COMPTEURS, 0)
+        import_reseau.nombre_erreurs, import_reseau.erreurs = 0, []
+        import_reseau.save(update_fields=['status', 'entites_lues', 'compteurs', 'nombre_erreurs', 'erreurs', 'updated_at'])
+
+        # Clés d'ordre provisoires des nouveaux points, sous toutes les clés existantes ;
+        # les points d'une liaison créée par l'import reçoivent d'emblée leur clé d'arrivée
+        ordre_min = PointDynamique.objects.aggregate(minimum=Min('ordre'))['minimum'] or 0
+        etat = {
+            'liaisons': set(), 'topologie': set(), 'rangs': {}, 'compteurs_rang': {}, 'nouvelles': {},
+            'ordre_provisoire': min(ordre_min, 0) - 1, 'types': {}, 'fats': False,
+        }
+        try:
+            with open(import_reseau.chemin_fichier, 'rb') as fichier:
+                lot = []
+                for numero, entite in enumerate(lire_entites(fichier, import_reseau.format), start=1):
+                    lot.append((numero, entite))
+                    if len(lot) == taille_lot:
+                        ImportReseauService._enregistrer_lot(import_reseau, lot, etat)
+                        lot = []
+                        if progression:
+                            progression(import_reseau.entites_lues)
+                if lot:
+                    ImportReseauService._enregistrer_lot(import_reseau, lot, etat)
+            ImportReseauService._reconstruire_liaisons(import_reseau, etat)
+        except Exception as exc:
+            # Fichier illisible ou lot impossible à écrire : l'import s'arrête en erreur
+            import_reseau.status = 'erreur'
+            import_reseau.erreurs.append({'entite': None, 'erreur': str(exc)})
+            import_reseau.save(update_fields=['status', 'erreurs', 'updated_at'])
+            return import_reseau
+        finally:
+            ImportReseauService._invalider_index(etat)
+
+        import_reseau.status = 'termine'
+        import_reseau.save(update_fields=['status', 'compteurs', 'updated_at'])
+        return import_reseau
+
+    @staticmethod
+    def lancer_en_arriere_plan(import_reseau: ImportReseau):
+        """Lance le traitement d'un import dans un thread séparé"""
+        def executer():
+            try:
+                ImportReseauService.traiter_import(import_reseau)
+            finally:
+                connection.close()
+
+        threading.Thread(target=executer, daemon=True).start()
+
+    @staticmethod
+    def _erreur(import_reseau: ImportReseau, numero: Optional[int], message: str):
+        import_reseau.nombre_erreurs += 1
+        if len(import_reseau.erreurs) < ImportReseauService.MAX_ERREURS_CONSERVEES:
+            import_reseau.erreurs.append({'entite': numero, 'erreur': message})
+
+    @staticmethod
+    def _compter(import_reseau: ImportReseau, compteur: str, nombre: int):
+        import_reseau.compteurs[compteur] = import_reseau.compteurs.get(compteur, 0) + nombre
+
+    # Validation
+
+    @staticmethod
+    def classer(proprietes: Dict) -> Optional[str]:
+        """Nature de l'entité d'après ses propriétés : fat, point ou liaison"""
+        if proprietes.get('numero_fat'):
+            return 'fat'
+        if proprietes.get('type_point'):
+            return 'point'
+        if proprietes.get('nom_liaison'):
+            return 'liaison'
+        return None
+
+    @staticmethod
+    def _texte(proprietes: Dict, cle: str) -> str:
+        valeur = proprietes.get(cle)
+        return '' if valeur is None else str(valeur).strip()
+
+    @staticmethod
+    def _decimal(valeur: float) -> Decimal:
+        return Decimal(f'{valeur:.8f}')
+
+    @staticmethod
+    def _position(lat, lng) -> Tuple[Decimal, Decimal]:
+        lat, lng = float(str(lat).replace(',', '.')), float(str(lng).replace(',', '.'))
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError(f"Coordonnées invalides : {lat}, {lng}")
+        return ImportReseauService._decimal(lat), ImportReseauService._decimal(lng)
+
+    @staticmethod
+    def _choix(valeur: str, choix, nom: str) -> str:
+        if valeur and valeur not in {code for code, _ in choix}:
+            raise ValueError(f"{nom} invalide : {valeur}")
+        return valeur
 
-class SegmentService:
-    """Service pour gérer les segments de liaison"""
+    @staticmethod
+    def valider(proprietes: Dict, type_geometrie: Optional[str], coordonnees) -> Tuple[str, Dict]:
+        """Nature et valeurs normalisées d'une entité, ValueError si elle est refusée"""
+        nature = ImportReseauService.classer(proprietes)
+        if nature is None:
+            raise ValueError("Entité sans numero_fat, type_point ni nom_liaison")
+        if type_geometrie is not None and coordonnees is None:
+            raise ValueError("Géométrie illisible")
+        texte = functools.partial(ImportReseauService._texte, proprietes)
+
+        if nature == 'liaison':
+            donnees = {
+                'nom_liaison': texte('nom_liaison'),
+                'client': texte('client'),
+                'type_liaison': ImportReseauService._choix(texte('type_liaison').upper(), TypeLiaison.LIAISON_TYPES, 'type_liaison'),
+                'status': ImportReseauService._choix(texte('status'), Liaison.STATUS_CHOICES, 'status'),
+                'type_organisation': ImportReseauService._choix(
+                    texte('type_organisation') or 'entreprise', Client.TYPE_ORGANISATION_CHOICES, 'type_organisation'),
+                'adresse': texte('adresse'),
+                'central': None, 'extremite_client': None,
+            }
+            for cle, prefixe, rang in (('central', 'point_central', 0), ('extremite_client', 'point_client', -1)):
+                if texte(f'{prefixe}_lat') and texte(f'{prefixe}_lng'):
+                    donnees[cle] = ImportReseauService._position(texte(f'{prefixe}_lat'), texte(f'{prefixe}_lng'))
+                elif type_geometrie == 'LineString':
+                    donnees[cle] = ImportReseauService._position(*coordonnees[rang])
+            return nature, donnees
+
+        if type_geometrie != 'Point':
+            raise ValueError("Un point ou une FAT doit avoir une géométrie Point")
+        latitude, longitude = ImportReseauService._position(*coordonnees)
+
+        if nature == 'point':
+            nom = texte('nom') or texte('name')
+            if not nom or not texte('nom_liaison'):
+                raise ValueError("Un point doit avoir un nom et un nom_liaison")
+            ordre = texte('ordre')
+            return nature, {
+                'nom_liaison': texte('nom_liaison'),
+                'nom': nom,
+                'type_point': ImportReseauService._choix(texte('type_point'), PointDynamique.TYPE_CHOICES, 'type_point'),
+                'rang': int(float(ordre)) if ordre else None,
+                'latitude': latitude, 'longitude': longitude,
+                'description': texte('description'),
+                'commentaire_technicien': texte('commentaire_technicien'),
+            }
+
+        donnees = {'numero_fat': texte('numero_fat'), 'latitude': latitude, 'longitude': longitude,
+                   'nom_liaison': texte('nom_liaison')}
+        for champ in ImportReseauService.CHAMPS_FAT:
+            if texte(champ):
+                donnees[champ] = texte(champ)
+        if 'capacite_cable_entrant' in donnees:
+            donnees['capacite_cable_entrant'] = int(float(donnees['capacite_cable_entrant']))
+            ImportReseauService._choix(donnees['capacite_cable_entrant'], CAPACITE_CABLE_CHOICES, 'capacite_cable_entrant')
+        for champ in ('couleur_toron', 'couleur_brin'):
+            ImportReseauService._choix(donnees.get(champ, ''), COULEUR_CHOICES, champ)
+        if 'moue_cable_poteau' in donnees:
+            donnees['moue_cable_poteau'] = float(donnees['moue_cable_poteau'].replace(',', '.'))
+        return nature, donnees
+
+    # Premier passage : entités
 
     @staticmethod
-    def calculer_distance_gps(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
-        """Calcule la distance GPS entre deux points en km"""
-        return geodesic((lat1, lng1), (lat2, lng2)).kilometers
+    def _enregistrer_lot(import_reseau: ImportReseau, lot: List[Tuple[int, Tuple]], etat: Dict):
+        """Valide un lot d'entités puis l'enregistre en une transaction"""
+        par_nature = {'liaison': [], 'point': [], 'fat': []}
+        for numero, (proprietes, type_geometrie, coordonnees) in lot:
+            try:
+                nature, donnees = ImportReseauService.valider(proprietes, type_geometrie, coordonnees)
+            except (TypeError, ValueError, IndexError, OverflowError) as exc:
+                ImportReseauService._erreur(import_reseau, numero, str(exc))
+                continue
+            par_nature[nature].append((numero, donnees))
+
+        with transaction.atomic():
+            ImportReseauService._ecrire_liaisons(import_reseau, par_nature['liaison'], etat)
+            ImportReseauService._ecrire_points(import_reseau, par_nature['point'], etat)
+            ImportReseauService._ecrire_fats(import_reseau, par_nature['fat'])
+            import_reseau.entites_lues += len(lot)
+            import_reseau.save(update_fields=['entites_lues', 'compteurs', 'nombre_erreurs', 'erreurs', 'updated_at'])
+        etat['fats'] = etat['fats'] or bool(par_nature['fat'])
 
     @staticmethod
-    def creer_segment_auto(point_depart: PointDynamique, point_arrivee: PointDynamique, 
-                          distance_cable: float = None) -> Segment:
-        """Crée automatiquement un segment entre deux points"""
-        distance_gps = SegmentService.calculer_distance_gps(
-            float(point_depart.latitude), float(point_depart.longitude),
-            float(point_arrivee.latitude), float(point_arrivee.longitude)
-        )
-        
-        # Si distance_cable n'est pas fournie, utiliser la distance GPS + 20%
-        if distance_cable is None:
-            distance_cable = distance_gps * 1.2
-        
-        segment = Segment.objects.create(
-            liaison=point_depart.liaison,
-            point_depart=point_depart,
-            point_arrivee=point_arrivee,
-            distance_gps=distance_gps,
-            distance_cable=distance_cable,
-            trace_coords=[]
-        )
-        
-        # Recalculer la distance totale de la liaison
-        point_depart.liaison.calculer_distance_totale()
-        
-        return segment
+    def _type_liaison(code: str, etat: Dict) -> TypeLiaison:
+        if code not in etat['types']:
+            etat['types'][code] = TypeLiaison.objects.filter(type=code).first() or \
+                TypeLiaison.objects.create(type=code)
+        return etat['types'][code]
 
     @staticmethod
-    def recalculer_distances_cumulees(liaison: Liaison):
-        """Recalcule les distances cumulées de tous les points d'une liaison"""
-        points = liaison.points_dynamiques.order_by('ordre')
-        distance_cumulee = 0.0
-        
-        for i, point in enumerate(points):
-            point.distance_depuis_central = distance_cumulee
-            point.save()
-            
-            # Trouver le segment vers le point suivant
-            if i < len(points) - 1:
-                try:
-                    segment = Segment.objects.get(
-                        point_depart=point,
-                        point_arrivee=points[i + 1]
+    def _clients(import_reseau: ImportReseau, liaisons: List[Tuple[int, Dict]]) -> Dict[str, Client]:
+        """Clients des liaisons du lot par nom, créés s'ils n'existent pas"""
+        demandes = {donnees['client']: donnees for _, donnees in liaisons if donnees['client']}
+        clients = {}
+        for client in Client.objects.filter(name__in=demandes).order_by('created_at'):
+            clients.setdefault(client.name, client)
+        nouveaux = [
+            Client(
+                name=nom, type_client=donnees['type_liaison'] or 'LS',
+                type_organisation=donnees['type_organisation'], address=donnees['adresse'], phone=''
+            )
+            for nom, donnees in demandes.items() if nom not in clients
+        ]
+        Client.objects.bulk_create(nouveaux)
+        ImportReseauService._compter(import_reseau, 'clients_crees', len(nouveaux))
+        clients.update((client.name, client) for client in nouveaux)
+        return clients
+
+    @staticmethod
+    def _ecrire_liaisons(import_reseau: ImportReseau, liaisons: List[Tuple[int, Dict]], etat: Dict):
+        if not liaisons:
+            return
+        existantes = {
+            liaison.nom_liaison: liaison
+            for liaison in Liaison.objects.filter(nom_liaison__in={donnees['nom_liaison'] for _, donnees in liaisons})
+        }
+        clients = ImportReseauService._clients(import_reseau, liaisons)
+        nouvelles, modifiees, maintenant = {}, {}, timezone.now()
+
+        for numero, donnees in liaisons:
+            nom = donnees['nom_liaison']
+            valeurs = {}
+            if donnees['client']:
+                valeurs['client_id'] = clients[donnees['client']].id
+            if donnees['type_liaison']:
+                valeurs['type_liaison_id'] = ImportReseauService._type_liaison(donnees['type_liaison'], etat).id
+            if donnees['status']:
+                valeurs['status'] = donnees['status']
+            for cle, prefixe in (('central', 'point_central'), ('extremite_client', 'point_client')):
+                if donnees[cle]:
+                    valeurs[f'{prefixe}_lat'], valeurs[f'{prefixe}_lng'] = donnees[cle]
+
+            liaison = existantes.get(nom) or nouvelles.get(nom)
+            if liaison is None:
+                if not (donnees['client'] and donnees['central'] and donnees['extremite_client']):
+                    ImportReseauService._erreur(
+                        import_reseau, numero, f"Liaison {nom} : client, central et extrémité client requis"
                     )
-                    distance_cumulee += segment.distance_cable
-                except Segment.DoesNotExist:
-                    pass
+                    continue
+                valeurs.setdefault('type_liaison_id', ImportReseauService._type_liaison('LS', etat).id)
+                nouvelles[nom] = Liaison(
+                    nom_liaison=nom, created_by=import_reseau.cree_par, topologie_modifiee_le=maintenant, **valeurs
+                )
+                continue
 
-class CoupureService:
-    """Service pour analyser et localiser les coupures"""
+            differences = {champ: valeur for champ, valeur in valeurs.items() if getattr(liaison, champ) != valeur}
+            for champ, valeur in differences.items():
+                setattr(liaison, champ, valeur)
+            if differences and nom in existantes:
+                liaison.updated_at = maintenant
+                modifiees[nom] = liaison
 
-    @staticmethod
-    def analyser_coupure(mesure_otdr: MesureOTDR) -> Dict:
-        """Analyse une mesure OTDR et localise la coupure"""
-        liaison = mesure_otdr.liaison
-        distance_coupure = mesure_otdr.distance_coupure
-        
-        # Ajuster la distance selon la direction et la position
-        distance_absolue = CoupureService._calculer_distance_absolue(
-            mesure_otdr, distance_coupure
+        Liaison.objects.bulk_create(nouvelles.values(), batch_size=ImportReseauService.TAILLE_LOT)
+        Liaison.objects.bulk_update(
+            modifiees.values(), ImportReseauService.CHAMPS_LIAISON, batch_size=ImportReseauService.TAILLE_LOT
         )
-        
-        # Trouver le segment touché
-        segment_info = CoupureService._trouver_segment_touche(liaison, distance_absolue)
-        
-        # Calculer les coordonnées estimées
-        coords_estimees = CoupureService._calculer_coordonnees_coupure(segment_info, distance_absolue)
-        
-        # Trouver le point dynamique le plus proche
-        point_proche = CoupureService._trouver_point_proche(liaison, distance_absolue)
-        
-        return {
-            'distance_absolue': distance_absolue,
-            'segment_touche': segment_info['segment'] if segment_info else None,
-            'distance_sur_segment': segment_info['distance_sur_segment'] if segment_info else None,
-            'coordonnees_estimees': coords_estimees,
-            'point_dynamique_proche': point_proche,
-            'precision_estimation': CoupureService._calculer_precision(liaison, distance_absolue)
-        }
+        etat['nouvelles'].update(dict.fromkeys((liaison.id for liaison in nouvelles.values()), 0))
+        ImportReseauService._compter(import_reseau, 'liaisons_creees', len(nouvelles))
+        ImportReseauService._compter(import_reseau, 'liaisons_modifiees', len(modifiees))
+        etat['liaisons'].update(liaison.id for liaison in itertools.chain(existantes.values(), nouvelles.values()))
 
     @staticmethod
-    def _calculer_distance_absolue(mesure_otdr: MesureOTDR, distance_mesure: float) -> float:
-        """Calcule la distance absolue depuis le central en tenant compte de la position et direction"""
-        if mesure_otdr.position_technicien == 'central':
-            if mesure_otdr.direction_analyse == 'vers_client':
-                return distance_mesure
-            else:
-                # Mesure depuis central vers central (impossible normalement)
-                return distance_mesure
-                
-        elif mesure_otdr.position_technicien == 'client':
-            if mesure_otdr.direction_analyse == 'vers_central':
-                # Distance totale - distance mesurée
-                return mesure_otdr.liaison.distance_totale - distance_mesure
-            else:
-                # Mesure depuis client vers client
-                return mesure_otdr.liaison.distance_totale - distance_mesure
-                
-        elif mesure_otdr.position_technicien == 'intermediaire' and mesure_otdr.point_mesure:
-            point_position = mesure_otdr.point_mesure.distance_depuis_central
-            if mesure_otdr.direction_analyse == 'vers_central':
-                return point_position - distance_mesure
+    def _ecrire_points(import_reseau: ImportReseau, points: List[Tuple[int, Dict]], etat: Dict):
+        if not points:
+            return
+        liaisons = dict(Liaison.objects.filter(
+            nom_liaison__in={donnees['nom_liaison'] for _, donnees in points}
+        ).values_list('nom_liaison', 'id'))
+        existants = {
+            (point.liaison_id, point.nom): point
+            for point in PointDynamique.objects.filter(
+                liaison_id__in=liaisons.values(), nom__in={donnees['nom'] for _, donnees in points}
+            ).only('id', 'liaison_id', 'nom', *ImportReseauService.CHAMPS_POINT)
+        }
+        nouveaux, modifies, maintenant = {}, {}, timezone.now()
+
+        for numero, donnees in points:
+            liaison_id = liaisons.get(donnees['nom_liaison'])
+            if liaison_id is None:
+                ImportReseauService._erreur(
+                    import_reseau, numero, f"Liaison {donnees['nom_liaison']} inconnue : elle doit précéder ses points"
+                )
+                continue
+            cle = (liaison_id, donnees['nom'])
+            valeurs = {champ: donnees[champ] for champ in ImportReseauService.CHAMPS_POINT if champ in donnees}
+
+            point = existants.get(cle) or nouveaux.get(cle)
+            if point is None:
+                if liaison_id in etat['nouvelles']:
+                    etat['nouvelles'][liaison_id] += 1
+                    ordre = etat['nouvelles'][liaison_id] * LiaisonService.ESPACEMENT_ORDRE
+                else:
+                    ordre = etat['ordre_provisoire']
+                    etat['ordre_provisoire'] -= 1
+                point = PointDynamique(liaison_id=liaison_id, nom=donnees['nom'], ordre=ordre, **valeurs)
+                nouveaux[cle] = point
+                etat['topologie'].add(liaison_id)
             else:
-                return point_position + distance_mesure
-                
-        return distance_mesure
+                differences = {champ: valeur for champ, valeur in valeurs.items() if getattr(point, champ) != valeur}
+                for champ, valeur in differences.items():
+                    setattr(point, champ, valeur)
+                if differences and cle in existants:
+                    point.updated_at = maintenant
+                    modifies[cle] = point
+                    if {'latitude', 'longitude'} & differences.keys():
+                        etat['topologie'].add(liaison_id)
+
+            # Rang dans le fichier : ordre explicite, sinon à la suite du précédent point de la liaison
+            rang = donnees['rang']
+            if rang is None:
+                rang = etat['compteurs_rang'].get(liaison_id, 0) + 1
+            etat['compteurs_rang'][liaison_id] = max(etat['compteurs_rang'].get(liaison_id, 0), rang)
+            etat['rangs'].setdefault(liaison_id, []).append((rang, numero, point.id))
+            etat['liaisons'].add(liaison_id)
+
+        PointDynamique.objects.bulk_create(nouveaux.values(), batch_size=ImportReseauService.TAILLE_LOT)
+        PointDynamique.objects.bulk_update(
+            modifies.values(), ImportReseauService.CHAMPS_POINT, batch_size=ImportReseauService.TAILLE_LOT
+        )
+        ImportReseauService._compter(import_reseau, 'points_crees', len(nouveaux))
+        ImportReseauService._compter(import_reseau, 'points_modifies', len(modifies))
 
     @staticmethod
-    def _trouver_segment_touche(liaison: Liaison, distance_absolue: float) -> Optional[Dict]:
-        """Trouve le segment où se situe la coupure"""
-        segments = liaison.segments.order_by('point_depart__ordre')
-        distance_parcourue = 0.0
-        
-        for segment in segments:
-            distance_fin_segment = distance_parcourue + segment.distance_cable
-            
-            if distance_parcourue <= distance_absolue <= distance_fin_segment:
-                return {
-                    'segment': segment,
-                    'distance_sur_segment': distance_absolue - distance_parcourue,
-                    'distance_debut': distance_parcourue,
-                    'distance_fin': distance_fin_segment
-                }
-            
-            distance_parcourue = distance_fin_segment
-        
-        return None
+    def _ecrire_fats(import_reseau: ImportReseau, fats: List[Tuple[int, Dict]]):
+        if not fats:
+            return
+        existantes = {fat.numero_fat: fat for fat in FAT.objects.filter(
+            numero_fat__in={donnees['numero_fat'] for _, donnees in fats})}
+        liaisons = dict(Liaison.objects.filter(
+            nom_liaison__in={donnees['nom_liaison'] for _, donnees in fats if donnees['nom_liaison']}
+        ).values_list('nom_liaison', 'id'))
+        nouvelles, modifiees, maintenant = {}, {}, timezone.now()
+
+        for numero, donnees in fats:
+            numero_fat = donnees['numero_fat']
+            valeurs = {champ: donnees[champ] for champ in ['latitude', 'longitude', *ImportReseauService.CHAMPS_FAT]
+                       if champ in donnees}
+            if donnees['nom_liaison']:
+                if donnees['nom_liaison'] not in liaisons:
+                    ImportReseauService._erreur(import_reseau, numero, f"Liaison {donnees['nom_liaison']} inconnue")
+                    continue
+                valeurs['liaison_id'] = liaisons[donnees['nom_liaison']]
+
+            fat = existantes.get(numero_fat) or nouvelles.get(numero_fat)
+            if fat is None:
+                manquants = [champ for champ in ImportReseauService.CHAMPS_FAT_OBLIGATOIRES if champ not in valeurs]
+                if manquants:
+                    ImportReseauService._erreur(
+                        import_reseau, numero, f"FAT {numero_fat} : {', '.join(manquants)} requis"
+                    )
+                    continue
+                nouvelles[numero_fat] = FAT(numero_fat=numero_fat, **valeurs)
+                continue
+
+            differences = {champ: valeur for champ, valeur in valeurs.items() if getattr(fat, champ) != valeur}
+            for champ, valeur in differences.items():
+                setattr(fat, champ, valeur)
+            if differences and numero_fat in existantes:
+                fat.updated_at = maintenant
+                modifiees[numero_fat] = fat
+
+        FAT.objects.bulk_create(nouvelles.values(), batch_size=ImportReseauService.TAILLE_LOT)
+        FAT.objects.bulk_update(
+            modifiees.values(), ['latitude', 'longitude', 'liaison', *ImportReseauService.CHAMPS_FAT, 'updated_at'],
+            batch_size=ImportReseauService.TAILLE_LOT
+        )
+        ImportReseauService._compter(import_reseau, 'fats_creees', len(nouvelles))
+        ImportReseauService._compter(import_reseau, 'fats_modifiees', len(modifiees))
+
+    # Second passage : ordre des points et segments
 
     @staticmethod
-    def _calculer_coordonnees_coupure(segment_info: Optional[Dict], distance_absolue: float) -> Optional[Dict]:
-        """Calcule les coordonnées GPS estimées de la coupure"""
-        if not segment_info:
-            return None
-            
-        segment = segment_info['segment']
-        ratio = segment_info['distance_sur_segment'] / segment.distance_cable
-        
-        # Interpolation linéaire entre les deux points
-        lat_debut = float(segment.point_depart.latitude)
-        lng_debut = float(segment.point_depart.longitude)
-        lat_fin = float(segment.point_arrivee.latitude)
-        lng_fin = float(segment.point_arrivee.longitude)
-        
-        lat_estimee = lat_debut + (lat_fin - lat_debut) * ratio
-        lng_estimee = lng_debut + (lng_fin - lng_debut) * ratio
-        
-        return {
-            'latitude': lat_estimee,
-            'longitude': lng_estimee,
-            'ratio_segment': ratio
-        }
+    def _reconstruire_liaisons(import_reseau: ImportReseau, etat: Dict):
+        """Relit le fichier pour les tracés et reconstruit les liaisons touchées par groupes"""
+        restantes = set(etat['liaisons'])
+        if not restantes:
+            return
+        par_nom = dict(Liaison.objects.filter(id__in=restantes).values_list('nom_liaison', 'id'))
+
+        traces, sommets = {}, 0
+        with open(import_reseau.chemin_fichier, 'rb') as fichier:
+            for proprietes, type_geometrie, coordonnees in lire_entites(fichier, import_reseau.format):
+                if type_geometrie != 'LineString' or not coordonnees or \
+                        ImportReseauService.classer(proprietes) != 'liaison':
+                    continue
+                liaison_id = par_nom.get(ImportReseauService._texte(proprietes, 'nom_liaison'))
+                if liaison_id not in restantes:
+                    continue
+                traces[liaison_id] = coordonnees
+                sommets += len(coordonnees)
+                if len(traces) >= ImportReseauService.TAILLE_LOT_LIAISONS or \
+                        sommets >= ImportReseauService.MAX_SOMMETS_EN_ATTENTE:
+                    ImportReseauService._reconstruire_lot(import_reseau, traces, etat)
+                    restantes.difference_update(traces)
+                    traces, sommets = {}, 0
+        if traces:
+            ImportReseauService._reconstruire_lot(import_reseau, traces, etat)
+            restantes.difference_update(traces)
+
+        # Liaisons sans tracé dans le fichier : segments en ligne droite
+        restantes = list(restantes)
+        for debut in range(0, len(restantes), ImportReseauService.TAILLE_LOT_LIAISONS):
+            ImportReseauService._reconstruire_lot(
+                import_reseau, dict.fromkeys(restantes[debut:debut + ImportReseauService.TAILLE_LOT_LIAISONS]), etat
+            )
 
     @staticmethod
-    def _trouver_point_proche(liaison: Liaison, distance_absolue: float) -> Optional[PointDynamique]:
-        """Trouve le point dynamique le plus proche de la coupure"""
-        points = liaison.points_dynamiques.all()
-        point_proche = None
-        distance_min = float('inf')
-        
-        for point in points:
-            distance_point = abs(point.distance_depuis_central - distance_absolue)
-            if distance_point < distance_min:
-                distance_min = distance_point
-                point_proche = point
-        
-        return point_proche
+    def _reconstruire_lot(import_reseau: ImportReseau, traces: Dict, etat: Dict):
+        """Ordre des points, segments, distances cumulées et agrégats d'un groupe de liaisons"""
+        liaison_ids = list(traces)
+        with transaction.atomic():
+            sequences = ImportReseauService._reordonner(import_reseau, liaison_ids, etat)
+            modifiees = ImportReseauService._ecrire_segments(import_reseau, sequences, traces)
+            SegmentService.recalculer_liaisons(liaison_ids)
+            LiaisonService.recalculer_agregats(liaison_ids)
+            topologie = modifiees | (etat['topologie'] & set(liaison_ids))
+            if topologie:
+                Liaison.objects.filter(id__in=topologie).update(topologie_modifiee_le=timezone.now())
+            import_reseau.save(update_fields=['compteurs', 'updated_at'])
 
     @staticmethod
-    def _calculer_precision(liaison: Liaison, distance_absolue: float) -> str:
-        """Calcule la précision de l'estimation"""
-        # Logique pour estimer la précision basée sur divers facteurs
-        if distance_absolue < 1.0:  # Moins de 1km
-            return 'haute'
-        elif distance_absolue < 5.0:  # Moins de 5km
-            return 'moyenne'
-        else:
-            return 'faible'
+    def _reordonner(import_reseau: ImportReseau, liaison_ids: List, etat: Dict) -> Dict[object, List[Tuple]]:
+        """Points de chaque liaison dans l'ordre du fichier, suivis des points absents du fichier
+
+        Les clés d'ordre sont renumérotées à intervalle régulier ; les points concernés
+        passent d'abord par des clés hors de la plage utilisée, pour que la contrainte
+        d'unicité (liaison, ordre) reste vérifiée à chaque mise à jour.
+        """
+        points = {}
+        for point_id, liaison_id, ordre, lat, lng in PointDynamique.objects.filter(
+                liaison_id__in=liaison_ids).order_by('liaison_id', 'ordre').values_list(
+                'id', 'liaison_id', 'ordre', 'latitude', 'longitude'):
+            points.setdefault(liaison_id, {})[point_id] = (ordre, float(lat), float(lng))
+
+        sequences, changements, borne = {}, [], 0
+        for liaison_id in liaison_ids:
+            points_liaison = points.get(liaison_id, {})
+            fichier = [point_id for _, _, point_id in sorted(etat['rangs'].pop(liaison_id, []))]
+            sequence = list(dict.fromkeys(point_id for point_id in fichier if point_id in points_liaison))
+            dans_fichier = set(sequence)
+            sequence += [point_id for point_id in points_liaison if point_id not in dans_fichier]
+
+            borne = max(borne, len(sequence) * LiaisonService.ESPACEMENT_ORDRE,
+                        *(abs(ordre) for ordre, _, _ in points_liaison.values()))
+            for rang, point_id in enumerate(sequence):
+                ordre = (rang + 1) * LiaisonService.ESPACEMENT_ORDRE
+                if points_liaison[point_id][0] != ordre:
+                    changements.append((point_id, ordre))
+            sequences[liaison_id] = [(point_id, *points_liaison[point_id][1:]) for point_id in sequence]
+
+        if changements:
+            for cles in (
+                [borne + 1 + rang for rang in range(len(changements))],
+                [ordre for _, ordre in changements],
+            ):
+                PointDynamique.objects.bulk_update(
+                    [PointDynamique(id=point_id, ordre=cle) for (point_id, _), cle in zip(changements, cles)],
+                    ['ordre'], batch_size=ImportReseauService.TAILLE_LOT
+                )
+            ImportReseauService._compter(import_reseau, 'points_reordonnes', len(changements))
+        return sequences
 
     @staticmethod
-    def creer_coupure(mesure_otdr: MesureOTDR) -> Coupure:
-        """Crée une coupure basée sur une mesure OTDR"""
-        analyse = CoupureService.analyser_coupure(mesure_otdr)
-        
-        coupure = Coupure.objects.create(
-            liaison=mesure_otdr.liaison,
-            mesure_otdr=mesure_otdr,
-            segment_touche=analyse['segment_touche'],
-            distance_sur_segment=analyse['distance_sur_segment'],
-            point_dynamique_proche=analyse['point_dynamique_proche']
+    def _geometries(sequence: List[Tuple], trace: Optional[List[List[float]]]) -> List[Tuple[List, Optional[float]]]:
+        """Tracé et longueur (km) de chaque segment entre points consécutifs
+
+        Avec un tracé, chaque point est rattaché au sommet le plus proche en avançant
+        le long du tracé, et le segment en reprend les sommets intermédiaires ; sans
+        tracé, la longueur est calculée plus loin, en ligne droite.
+        """
+        if not trace:
+            return [([], None)] * max(len(sequence) - 1, 0)
+        lats = array('d', (c[0] for c in trace))
+        lngs = array('d', (c[1] for c in trace))
+        rangs, debut = [], 0
+        for _, lat, lng in sequence:
+            debut = sommet_le_plus_proche(lats, lngs, lat, lng, debut)
+            rangs.append(debut)
+
+        geometries = []
+        for (depart, arrivee), (rang_depart, rang_arrivee) in zip(zip(sequence, sequence[1:]), zip(rangs, rangs[1:])):
+            coords = [[depart[1], depart[2]], *trace[rang_depart + 1:rang_arrivee], [arrivee[1], arrivee[2]]]
+            geometries.append((coords, longueurs_cumulees_km(coords)[-1]))
+        return geometries
+
+    @staticmethod
+    def _ecrire_segments(import_reseau: ImportReseau, sequences: Dict, traces: Dict) -> set:
+        """Crée, met à jour ou supprime les segments pour qu'ils relient les points consécutifs
+
+        La longueur de câble d'un segment existant n'est recalculée (distance GPS + 20 %)
+        que si sa longueur GPS change. Retourne les liaisons dont les segments ont changé.
+        """
+        voulus = []
+        for liaison_id, sequence in sequences.items():
+            for (depart, arrivee), (coords, longueur) in zip(
+                    zip(sequence, sequence[1:]), ImportReseauService._geometries(sequence, traces[liaison_id])):
+                voulus.append([liaison_id, depart, arrivee, coords, longueur])
+
+        # Longueurs en ligne droite calculées colonne par colonne pour tout le groupe
+        droits = [voulu for voulu in voulus if voulu[4] is None]
+        for voulu, longueur in zip(droits, longueurs_km(
+                array('d', (voulu[1][1] for voulu in droits)), array('d', (voulu[1][2] for voulu in droits)),
+                array('d', (voulu[2][1] for voulu in droits)), array('d', (voulu[2][2] for voulu in droits)))):
+            voulu[4] = longueur
+
+        existants = {
+            (segment.point_depart_id, segment.point_arrivee_id): segment
+            for segment in Segment.objects.filter(liaison_id__in=sequences.keys())
+        }
+        nouveaux, modifies, modifiees, maintenant = [], [], set(), timezone.now()
+        for liaison_id, depart, arrivee, coords, longueur in voulus:
+            segment = existants.pop((depart[0], arrivee[0]), None)
+            if segment is None:
+                segment = Segment(
+                    liaison_id=liaison_id, point_depart_id=depart[0], point_arrivee_id=arrivee[0],
+                    distance_gps=longueur, distance_cable=longueur * 1.2, trace_coords=coords
+                )
+                TraceSegmentService.appliquer_mesures(segment, coords, longueur)
+                nouveaux.append(segment)
+                modifiees.add(liaison_id)
+            elif segment.distance_gps != longueur or segment.trace_coords != coords:
+                if segment.distance_gps != longueur:
+                    segment.distance_cable = longueur * 1.2
+                segment.distance_gps, segment.trace_coords, segment.updated_at = longueur, coords, maintenant
+                TraceSegmentService.appliquer_mesures(segment, coords, longueur)
+                modifies.append(segment)
+                modifiees.add(liaison_id)
+
+        # Segments qui ne relient plus deux points consécutifs
+        if existants:
+            Segment.objects.filter(id__in=[segment.id for segment in existants.values()]).delete()
+            modifiees.update(segment.liaison_id for segment in existants.values())
+        Segment.objects.bulk_create(nouveaux, batch_size=ImportReseauService.TAILLE_LOT)
+        Segment.objects.bulk_update(
+            modifies, ['distance_gps', 'distance_cable', 'trace_coords', 'updated_at', *TraceSegmentService.CHAMPS_MESURES],
+            batch_size=ImportReseauService.TAILLE_LOT
         )
-        
-        # Ajouter les coordonnées si disponibles
-        if analyse['coordonnees_estimees']:
-            coupure.point_estime_lat = analyse['coordonnees_estimees']['latitude']
-            coupure.point_estime_lng = analyse['coordonnees_estimees']['longitude']
-            coupure.save()
-        
-        return coupure
+        ImportReseauService._compter(import_reseau, 'segments_crees', len(nouveaux))
+        ImportReseauService._compter(import_reseau, 'segments_modifies', len(modifies))
+        ImportReseauService._compter(import_reseau, 'segments_supprimes', len(existants))
+        return modifiees
+
+    @staticmethod
+    def _invalider_index(etat: Dict):
+        """Les écritures groupées n'émettent pas les signaux qui tiennent les index à jour"""
+        if not etat['liaisons'] and not etat['fats']:
+            return
+        GrapheReseauService.invalider()
+        with ImpactCoupureService._verrou:
+            ImpactCoupureService._index = None
+        if etat['fats']:
+            with ProximiteFATService._verrou:
+                ProximiteFATService._index = None
+            OccupationPortsService.reconstruire()
+        ArbreFTTHService.reconstruire()
 
 class NavigationService:
     """Service pour la navigation et le guidage GPS"""
@@ -364,10 +3779,12 @@ class StatistiquesService:
     @staticmethod
     def _stats_coupures() -> Dict:
         """Statistiques des coupures"""
-        total = Coupure.objects.count()
-        detectees = Coupure.objects.filter(status='detectee').count()
-        en_cours = Coupure.objects.filter(status='en_cours').count()
-        reparees = Coupure.objects.filter(status='reparee').count()
+        # Les coupures remplacées par une localisation fusionnée ne sont pas recomptées
+        coupures = Coupure.objects.filter(remplacee_par__isnull=True)
+        total = coupures.count()
+        detectees = coupures.filter(status='detectee').count()
+        en_cours = coupures.filter(status='en_cours').count()
+        reparees = coupures.filter(status='reparee').count()
         
         return {
             'total': total,
@@ -392,48 +3809,195 @@ class StatistiquesService:
 class LiaisonService:
     """Service pour la gestion des liaisons"""
 
+    TAILLE_LOT = 500
+    # Intervalle entre les clés d'ordre de points consécutifs, laissé libre pour les insertions
+    ESPACEMENT_ORDRE = 1024
+    # Champs dont la modification change les agrégats ou la topologie de la liaison
+    CHAMPS_AGREGATS_POINT = {'liaison', 'latitude', 'longitude', 'ordre'}
+    CHAMPS_AGREGATS_SEGMENT = {'liaison', 'point_depart', 'point_arrivee', 'distance_cable'}
+    # Liaisons touchées dans le bloc topologie_differee en cours, propre à chaque thread
+    _differe = threading.local()
+
+    @staticmethod
+    @contextlib.contextmanager
+    def topologie_differee():
+        """Reporte à la sortie du bloc les recalculs de topologie des liaisons touchées
+
+        Agrégats, date de modification de la topologie et distances cumulées des points
+        sont recalculés une fois par liaison, en quelques requêtes groupées, au lieu
+        d'une mise à jour par écriture. Rien n'est recalculé si le bloc échoue ; un bloc
+        imbriqué se fond dans le bloc englobant. Retourne les liaisons recalculées.
+        """
+        liaisons = set()
+        if getattr(LiaisonService._differe, 'liaisons', None) is not None:
+            yield liaisons
+            return
+        LiaisonService._differe.liaisons = liaisons
+        try:
+            yield liaisons
+        finally:
+            LiaisonService._differe.liaisons = None
+        if liaisons:
+            liaison_ids = list(liaisons)
+            LiaisonService.recalculer_agregats(liaison_ids)
+            Liaison.objects.filter(id__in=liaison_ids).update(topologie_modifiee_le=timezone.now())
+            SegmentService.recalculer_liaisons(liaison_ids)
+
+    @staticmethod
+    def recalculer_agregats(liaison_ids: List):
+        """Recalcule en une requête les agrégats de liaisons écrites par insertions groupées"""
+        def agregat(modele, expression):
+            return Subquery(
+                modele.objects.filter(liaison_id=OuterRef('pk')).order_by().values('liaison_id')
+                .annotate(valeur=expression).values('valeur')
+            )
+
+        Liaison.objects.filter(id__in=liaison_ids).update(
+            nombre_points=Coalesce(agregat(PointDynamique, Count('id')), 0),
+            nombre_segments=Coalesce(agregat(Segment, Count('id')), 0),
+            distance_totale=Coalesce(agregat(Segment, Sum('distance_cable')), 0.0),
+        )
+
+    @staticmethod
+    def ajuster_agregats(liaison_id, points: int = 0, segments: int = 0, distance: float = 0.0):
+        """Reporte sur la liaison un changement de topologie sans relire ses points ni ses segments
+
+        Mise à jour en base par expressions F : deux modifications simultanées de la
+        même liaison s'additionnent, et updated_at n'est pas touché. Dans un bloc
+        topologie_differee, la liaison est seulement notée pour la fin du bloc.
+        """
+        differees = getattr(LiaisonService._differe, 'liaisons', None)
+        if differees is not None:
+            differees.add(liaison_id)
+            return
+        champs = {'topologie_modifiee_le': timezone.now()}
+        if points:
+            champs['nombre_points'] = F('nombre_points') + points
+        if segments:
+            champs['nombre_segments'] = F('nombre_segments') + segments
+        if distance:
+            champs['distance_totale'] = F('distance_totale') + distance
+        Liaison.objects.filter(id=liaison_id).update(**champs)
+
     @staticmethod
     def creer_liaison_complete(liaison_data: Dict, points_data: List[Dict]) -> Liaison:
-        """Crée une liaison avec tous ses points dynamiques"""
-        # Créer la liaison
-        liaison = Liaison.objects.create(**liaison_data)
-        
-        # Créer les points dynamiques
-        points_crees = []
-        for i, point_data in enumerate(points_data):
-            point_data['liaison'] = liaison
-            point_data['ordre'] = i
-            point = PointDynamique.objects.create(**point_data)
-            points_crees.append(point)
-        
-        # Créer les segments automatiquement
-        for i in range(len(points_crees) - 1):
-            SegmentService.creer_segment_auto(points_crees[i], points_crees[i + 1])
-        
-        return liaison
+        """Crée une liaison avec tous ses points dynamiques et les segments qui les relient"""
+        return LiaisonService.creer_liaisons([(liaison_data, points_data)])[0]
+
+    @staticmethod
+    def creer_liaisons(liaisons: List[Tuple[Dict, List[Dict]]]) -> List[Liaison]:
+        """Crée des liaisons complètes en une transaction, par insertions groupées
+
+        Distances des segments, distances cumulées des points et distance totale de
+        chaque liaison sont calculées en mémoire en un seul passage avant l'écriture :
+        ni agrégat ni réenregistrement de la liaison par segment.
+        """
+        instances, points, segments = [], [], []
+        for liaison_data, points_data in liaisons:
+            liaison = Liaison(**liaison_data)
+            points_liaison = [
+                PointDynamique(**{
+                    **point_data, 'liaison': liaison, 'ordre': (rang + 1) * LiaisonService.ESPACEMENT_ORDRE
+                })
+                for rang, point_data in enumerate(points_data)
+            ]
+            distances_gps = [
+                SegmentService.calculer_distance_gps(
+                    float(depart.latitude), float(depart.longitude),
+                    float(arrivee.latitude), float(arrivee.longitude)
+                )
+                for depart, arrivee in zip(points_liaison, points_liaison[1:])
+            ]
+
+            distance_cumulee = 0.0
+            for rang, point in enumerate(points_liaison):
+                if rang:
+                    segment = Segment(
+                        liaison=liaison, point_depart=points_liaison[rang - 1], point_arrivee=point,
+                        distance_gps=distances_gps[rang - 1], distance_cable=distances_gps[rang - 1] * 1.2,
+                        trace_coords=[]
+                    )
+                    segments.append(segment)
+                    distance_cumulee += segment.distance_cable
+                # Pas encore de détail, donc pas de moue : distance optique = distance câble
+                point.distance_depuis_central = distance_cumulee
+                point.distance_optique_depuis_central = distance_cumulee
+            liaison.distance_totale = distance_cumulee
+            liaison.nombre_points = len(points_liaison)
+            liaison.nombre_segments = max(len(points_liaison) - 1, 0)
+            liaison.topologie_modifiee_le = timezone.now()
+            instances.append(liaison)
+            points.extend(points_liaison)
+
+        with transaction.atomic():
+            Liaison.objects.bulk_create(instances, batch_size=LiaisonService.TAILLE_LOT)
+            PointDynamique.objects.bulk_create(points, batch_size=LiaisonService.TAILLE_LOT)
+            Segment.objects.bulk_create(segments, batch_size=LiaisonService.TAILLE_LOT)
+
+        # bulk_create n'émet pas les signaux d'enregistrement qui tiennent les index à jour
+        ImpactCoupureService.indexer_lot(points, segments)
+        if points:
+            GrapheReseauService.invalider()
+        return instances
+
+    @staticmethod
+    def ordre_pour_position(liaison: Liaison, position: int = None) -> int:
+        """Clé d'ordre d'un point inséré au rang position (en fin de liaison par défaut)
+
+        Le point prend le milieu de l'intervalle entre ses voisins sans qu'aucun autre
+        point ne soit modifié ; la liaison n'est renumérotée que lorsque cet intervalle
+        est épuisé. À appeler dans la transaction qui crée le point : la ligne de la
+        liaison reste verrouillée jusqu'à sa validation, et deux insertions concurrentes
+        ne peuvent pas lire les mêmes voisins.
+        """
+        Liaison.objects.select_for_update().only('id').get(pk=liaison.pk)
+        ordres = liaison.points_dynamiques.order_by('ordre').values_list('ordre', flat=True)
+        if position is not None:
+            position = max(position, 0)
+            for _ in range(2):
+                voisins = list(ordres[max(position - 1, 0):position + 1])
+                if position == 0:
+                    precedent, suivant = -1, voisins[0] if voisins else None
+                else:
+                    precedent, suivant = voisins[0] if voisins else None, voisins[1] if len(voisins) > 1 else None
+                if suivant is None:
+                    break
+                if suivant - precedent >= 2:
+                    return (precedent + suivant) // 2
+                LiaisonService.reequilibrer_ordres(liaison)
+
+        dernier = liaison.points_dynamiques.aggregate(dernier=Max('ordre'))['dernier']
+        return LiaisonService.ESPACEMENT_ORDRE if dernier is None else dernier + LiaisonService.ESPACEMENT_ORDRE
+
+    @staticmethod
+    def reequilibrer_ordres(liaison: Liaison):
+        """Renumérote les points de la liaison à ESPACEMENT_ORDRE d'intervalle, en deux requêtes"""
+        with transaction.atomic():
+            points = list(
+                PointDynamique.objects.select_for_update().filter(liaison=liaison).order_by('ordre').only('id', 'ordre')
+            )
+            if not points:
+                return
+            # Décalage au-delà des anciennes et des nouvelles clés : (liaison, ordre) reste unique à chaque ligne
+            base = max(points[-1].ordre, len(points) * LiaisonService.ESPACEMENT_ORDRE) + 1
+            PointDynamique.objects.filter(liaison=liaison).update(ordre=F('ordre') - points[0].ordre + base)
+            for rang, point in enumerate(points):
+                point.ordre = (rang + 1) * LiaisonService.ESPACEMENT_ORDRE
+            PointDynamique.objects.bulk_update(points, ['ordre'], batch_size=LiaisonService.TAILLE_LOT)
 
     @staticmethod
     def ajouter_point_dynamique(liaison: Liaison, point_data: Dict, position: int = None) -> PointDynamique:
-        """Ajoute un point dynamique à une liaison existante"""
-        if position is None:
-            position = liaison.points_dynamiques.count()
-        
-        # Décaler les points suivants
-        points_suivants = liaison.points_dynamiques.filter(ordre__gte=position)
-        for point in points_suivants:
-            point.ordre += 1
-            point.save()
-        
-        # Créer le nouveau point
-        point_data['liaison'] = liaison
-        point_data['ordre'] = position
-        nouveau_point = PointDynamique.objects.create(**point_data)
-        
-        # Recréer les segments affectés
-        LiaisonService._recreer_segments_autour_point(nouveau_point)
-        
-        # Recalculer les distances
-        SegmentService.recalculer_distances_cumulees(liaison)
+        """Ajoute un point dynamique à une liaison existante, au rang position (en fin par défaut)"""
+        with transaction.atomic():
+            point_data['liaison'] = liaison
+            point_data['ordre'] = LiaisonService.ordre_pour_position(liaison, position)
+            nouveau_point = PointDynamique.objects.create(**point_data)
+            
+            # Recréer les segments affectés
+            LiaisonService._recreer_segments_autour_point(nouveau_point)
+            
+            # Recalculer les distances
+            SegmentService.recalculer_distances_cumulees(liaison)
         
         return nouveau_point
 
@@ -484,6 +4048,35 @@ class NotificationService:
                 coupure_concernee=coupure
             )
 
+    @staticmethod
+    def notifier_coupures_liees(coupure: Coupure, coupures_liees: List[Coupure]):
+        """Notifie en un seul message par superviseur les liaisons touchées par une même coupure"""
+        from .models import User
+        
+        if not coupures_liees:
+            return
+        
+        liaisons = Liaison.objects.select_related('client').in_bulk(
+            [coupure_liee.liaison_id for coupure_liee in coupures_liees]
+        )
+        lignes = [
+            f"- {liaison.nom_liaison} ({liaison.client.name})" for liaison in liaisons.values()
+        ]
+        
+        Notification.objects.bulk_create([
+            Notification(
+                destinataire=superviseur,
+                type_notification='coupure',
+                priorite='urgente',
+                titre=f"Coupure multi-liaisons - {coupure.liaison.nom_liaison}",
+                message=f"La coupure de la liaison {coupure.liaison.nom_liaison} touche "
+                       f"{len(coupures_liees)} autre(s) liaison(s) du même corridor :\n" + "\n".join(lignes),
+                liaison_concernee=coupure.liaison,
+                coupure_concernee=coupure
+            )
+            for superviseur in User.objects.filter(role='superviseur')
+        ])
+
     @staticmethod
     def notifier_intervention_planifiee(intervention: Intervention):
         """Notifie une intervention planifiée"""
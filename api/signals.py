@@ -0,0 +1,279 @@
+"""
+Signaux FiberMap : maintien des agrégats et du profil optique des liaisons, de l'index spatial,
+du graphe réseau, de l'occupation des ports, de l'index des FAT et de l'arbre FTTH
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .models import (
+    DetailChambre, DetailFDT, DetailManchon, DetailONT, DetailPOPFTTH, DetailPOPLS, FAT, PointDynamique, Segment
+)
+from .services import (
+    ArbreFTTHService, GrapheReseauService, ImpactCoupureService, LiaisonService, OccupationPortsService,
+    ProfilOptiqueService, ProximiteFATService
+)
+
+MODELES_MOUE = (DetailONT, DetailPOPLS, DetailChambre, DetailManchon, FAT)
+MODELES_PORTS = (DetailFDT, DetailPOPFTTH, FAT)
+
+
+@receiver(pre_save, sender=PointDynamique)
+def memoriser_topologie_point(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Mémorise la liaison et la position du point avant modification"""
+    instance._topologie_precedente = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not LiaisonService.CHAMPS_AGREGATS_POINT & set(update_fields):
+        return
+    instance._topologie_precedente = PointDynamique.objects.filter(pk=instance.pk).values_list(
+        'liaison_id', 'latitude', 'longitude', 'ordre').first()
+
+
+@receiver(post_save, sender=PointDynamique)
+def agreger_point(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        LiaisonService.ajuster_agregats(instance.liaison_id, points=1)
+        return
+    precedent = getattr(instance, '_topologie_precedente', None)
+    if precedent is None:
+        return
+    liaison_id, latitude, longitude, ordre = precedent
+    if liaison_id != instance.liaison_id:
+        LiaisonService.ajuster_agregats(liaison_id, points=-1)
+        LiaisonService.ajuster_agregats(instance.liaison_id, points=1)
+    elif (latitude, longitude, ordre) != (
+            Decimal(str(instance.latitude)), Decimal(str(instance.longitude)), instance.ordre):
+        LiaisonService.ajuster_agregats(liaison_id)
+
+
+@receiver(post_delete, sender=PointDynamique)
+def desagreger_point(sender, instance, **kwargs):
+    LiaisonService.ajuster_agregats(instance.liaison_id, points=-1)
+
+
+@receiver(pre_save, sender=Segment)
+def memoriser_topologie_segment(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Mémorise la liaison, les extrémités et la longueur du segment avant modification"""
+    instance._topologie_precedente = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not LiaisonService.CHAMPS_AGREGATS_SEGMENT & set(update_fields):
+        return
+    instance._topologie_precedente = Segment.objects.filter(pk=instance.pk).values_list(
+        'liaison_id', 'point_depart_id', 'point_arrivee_id', 'distance_cable').first()
+
+
+@receiver(post_save, sender=Segment)
+def agreger_segment(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        LiaisonService.ajuster_agregats(instance.liaison_id, segments=1, distance=instance.distance_cable)
+        return
+    precedent = getattr(instance, '_topologie_precedente', None)
+    if precedent is None:
+        return
+    liaison_id, depart_id, arrivee_id, distance_cable = precedent
+    if liaison_id != instance.liaison_id:
+        LiaisonService.ajuster_agregats(liaison_id, segments=-1, distance=-distance_cable)
+        LiaisonService.ajuster_agregats(instance.liaison_id, segments=1, distance=instance.distance_cable)
+    elif precedent != (instance.liaison_id, instance.point_depart_id, instance.point_arrivee_id,
+                       instance.distance_cable):
+        LiaisonService.ajuster_agregats(liaison_id, distance=instance.distance_cable - distance_cable)
+
+
+@receiver(post_delete, sender=Segment)
+def desagreger_segment(sender, instance, **kwargs):
+    LiaisonService.ajuster_agregats(instance.liaison_id, segments=-1, distance=-instance.distance_cable)
+
+
+@receiver(post_save, sender=PointDynamique)
+def initialiser_profil_point(sender, instance, created, raw=False, **kwargs):
+    """Position optique d'un nouveau point à partir des moues des points précédents"""
+    if created and not raw:
+        ProfilOptiqueService.initialiser_point(instance)
+
+
+@receiver(pre_save, sender=FAT)
+def memoriser_point_fat(sender, instance, raw=False, **kwargs):
+    """Mémorise le point auquel la FAT était rattachée avant modification"""
+    if raw or instance._state.adding:
+        instance._point_dynamique_precedent_id = None
+        return
+    instance._point_dynamique_precedent_id = (
+        FAT.objects.filter(pk=instance.pk).values_list('point_dynamique_id', flat=True).first()
+    )
+
+
+def mettre_a_jour_moue(sender, instance, raw=False, **kwargs):
+    """Reporte la moue d'un détail sur le profil optique de la liaison"""
+    if raw:
+        return
+    points = {instance.point_dynamique_id, getattr(instance, '_point_dynamique_precedent_id', None)}
+    for point_id in points - {None}:
+        ProfilOptiqueService.mettre_a_jour_moue(point_id)
+
+
+for modele in MODELES_MOUE:
+    post_save.connect(mettre_a_jour_moue, sender=modele, dispatch_uid=f'moue_{modele.__name__}_save')
+    post_delete.connect(mettre_a_jour_moue, sender=modele, dispatch_uid=f'moue_{modele.__name__}_delete')
+
+
+# Les index en mémoire sont partagés entre les requêtes : ils ne suivent que les écritures validées,
+# dans l'ordre où elles ont eu lieu dans la transaction
+
+@receiver(post_save, sender=Segment)
+def indexer_segment(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: ImpactCoupureService.indexer_segment(instance))
+
+
+@receiver(post_save, sender=PointDynamique)
+def indexer_point(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: ImpactCoupureService.indexer_point(instance))
+
+
+@receiver(post_delete, sender=Segment)
+def desindexer_segment(sender, instance, **kwargs):
+    segment_id = instance.id
+    transaction.on_commit(lambda: ImpactCoupureService.retirer('segment', segment_id))
+
+
+@receiver(post_delete, sender=PointDynamique)
+def desindexer_point(sender, instance, **kwargs):
+    point_id = instance.id
+    transaction.on_commit(lambda: ImpactCoupureService.retirer('point', point_id))
+
+
+@receiver(post_save, sender=Segment)
+def invalider_graphe_segment(sender, instance, raw=False, update_fields=None, **kwargs):
+    GrapheReseauService.invalider(update_fields, GrapheReseauService.CHAMPS_TOPOLOGIE_SEGMENT)
+
+
+@receiver(post_save, sender=PointDynamique)
+def invalider_graphe_point(sender, instance, raw=False, update_fields=None, **kwargs):
+    GrapheReseauService.invalider(update_fields, GrapheReseauService.CHAMPS_TOPOLOGIE_POINT)
+
+
+@receiver(post_delete, sender=Segment)
+@receiver(post_delete, sender=PointDynamique)
+def invalider_graphe(sender, instance, **kwargs):
+    GrapheReseauService.invalider()
+
+
+def memoriser_ports(sender, instance, raw=False, **kwargs):
+    """Mémorise les ports occupés par l'équipement avant modification"""
+    instance._ports_precedents = []
+    if raw or instance._state.adding:
+        return
+    precedent = sender.objects.filter(pk=instance.pk).first()
+    if precedent is not None:
+        instance._ports_precedents = OccupationPortsService.ports_de(precedent)
+
+
+def synchroniser_ports(sender, instance, raw=False, **kwargs):
+    if not raw:
+        OccupationPortsService.synchroniser(instance, getattr(instance, '_ports_precedents', []))
+
+
+def liberer_ports(sender, instance, **kwargs):
+    for cle, port, occupant in OccupationPortsService.ports_de(instance):
+        OccupationPortsService.liberer(cle, port, occupant)
+
+
+for modele in MODELES_PORTS:
+    pre_save.connect(memoriser_ports, sender=modele, dispatch_uid=f'ports_{modele.__name__}_pre_save')
+    post_save.connect(synchroniser_ports, sender=modele, dispatch_uid=f'ports_{modele.__name__}_save')
+    post_delete.connect(liberer_ports, sender=modele, dispatch_uid=f'ports_{modele.__name__}_delete')
+
+
+@receiver(post_save, sender=FAT)
+def indexer_fat(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: ProximiteFATService.indexer_fat(instance))
+
+
+@receiver(post_delete, sender=FAT)
+def desindexer_fat(sender, instance, **kwargs):
+    fat_id = instance.id
+    transaction.on_commit(lambda: ProximiteFATService.retirer_fat(fat_id))
+
+
+@receiver(pre_save, sender=DetailPOPFTTH)
+@receiver(pre_save, sender=DetailFDT)
+@receiver(pre_save, sender=FAT)
+def memoriser_position_arbre(sender, instance, raw=False, **kwargs):
+    """Mémorise ce qui place l'équipement dans l'arbre FTTH avant modification"""
+    instance._arbre_precedent = None
+    if raw or instance._state.adding:
+        return
+    if sender is FAT:
+        instance._arbre_precedent = ArbreFTTHService.liaisons_de_fat(instance)
+    elif sender is DetailPOPFTTH:
+        instance._arbre_precedent = DetailPOPFTTH.objects.filter(pk=instance.pk).values_list(
+            'reference_olt', 'port_olt', 'numero_fdt').first()
+    else:
+        instance._arbre_precedent = DetailFDT.objects.filter(pk=instance.pk).values_list(
+            'numero_fdt', flat=True).first()
+
+
+@receiver(post_save, sender=DetailPOPFTTH)
+def placer_pop_ftth(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    ArbreFTTHService.placer_port(instance.reference_olt, instance.port_olt)
+    ArbreFTTHService.placer_fdt(instance.numero_fdt)
+    precedent = getattr(instance, '_arbre_precedent', None)
+    if precedent and precedent != (instance.reference_olt, instance.port_olt, instance.numero_fdt):
+        reference_olt, port_olt, numero_fdt = precedent
+        ArbreFTTHService.placer_fdt(numero_fdt)
+        ArbreFTTHService.retirer_si_inutilise('port_olt', f'{reference_olt}/{port_olt}')
+
+
+@receiver(post_delete, sender=DetailPOPFTTH)
+def retirer_pop_ftth(sender, instance, **kwargs):
+    ArbreFTTHService.placer_fdt(instance.numero_fdt)
+    ArbreFTTHService.retirer_si_inutilise('port_olt', f'{instance.reference_olt}/{instance.port_olt}')
+
+
+@receiver(post_save, sender=DetailFDT)
+def placer_fdt(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    ArbreFTTHService.placer_fdt(instance.numero_fdt)
+    precedent = getattr(instance, '_arbre_precedent', None)
+    if precedent and precedent != instance.numero_fdt:
+        ArbreFTTHService.retirer_si_inutilise('fdt', precedent)
+
+
+@receiver(post_delete, sender=DetailFDT)
+def retirer_fdt(sender, instance, **kwargs):
+    ArbreFTTHService.retirer_si_inutilise('fdt', instance.numero_fdt)
+
+
+@receiver(post_save, sender=FAT)
+def placer_fat(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ArbreFTTHService.placer_fat(instance, getattr(instance, '_arbre_precedent', None) or ())
+
+
+@receiver(post_delete, sender=FAT)
+def retirer_fat(sender, instance, **kwargs):
+    ArbreFTTHService.retirer('fat', objet_id=instance.id)
+
+
+@receiver(post_save, sender=DetailONT)
+def placer_ont(sender, instance, raw=False, **kwargs):
+    if not raw:
+        ArbreFTTHService.placer_ont(instance.point_dynamique_id)
+
+
+@receiver(post_delete, sender=DetailONT)
+def retirer_ont(sender, instance, **kwargs):
+    ArbreFTTHService.retirer('ont', objet_id=instance.point_dynamique_id)
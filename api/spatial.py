@@ -0,0 +1,322 @@
+"""
+Index spatial en grille pour les recherches de proximité (tracés, points, équipements)
+
+Module sans dépendance Django : les éléments sont identifiés par une clé libre
+et décrits par une liste de coordonnées [[lat, lng], ...].
+"""
+import heapq
+import itertools
+import math
+from array import array
+from typing import Dict, Hashable, Iterator, List, Optional, Set, Tuple
+
+RAYON_TERRE_M = 6371008.8
+METRES_PAR_DEGRE = math.pi * RAYON_TERRE_M / 180
+
+
+def distance_polyligne(lat: float, lng: float, coords: List[List[float]]) -> Tuple[float, float]:
+    """Distance en mètres d'un point à une polyligne et fraction de longueur de son projeté
+
+    Projection plane locale (équirectangulaire), suffisante à l'échelle d'un tracé.
+    """
+    cos_lat = math.cos(math.radians(lat))
+    sommets = [
+        ((float(c[1]) - lng) * cos_lat * METRES_PAR_DEGRE, (float(c[0]) - lat) * METRES_PAR_DEGRE)
+        for c in coords
+    ]
+    if len(sommets) == 1:
+        return math.hypot(*sommets[0]), 0.0
+
+    meilleure_distance, longueur_projete, longueur_totale = float('inf'), 0.0, 0.0
+    for (x1, y1), (x2, y2) in zip(sommets, sommets[1:]):
+        dx, dy = x2 - x1, y2 - y1
+        longueur = math.hypot(dx, dy)
+        t = 0.0
+        if longueur:
+            t = min(1.0, max(0.0, -(x1 * dx + y1 * dy) / (longueur * longueur)))
+        distance = math.hypot(x1 + t * dx, y1 + t * dy)
+        if distance < meilleure_distance:
+            meilleure_distance = distance
+            longueur_projete = longueur_totale + t * longueur
+        longueur_totale += longueur
+
+    fraction = longueur_projete / longueur_totale if longueur_totale else 0.0
+    return meilleure_distance, fraction
+
+
+def longueurs_km(lats1: array, lngs1: array, lats2: array, lngs2: array) -> array:
+    """Distances orthodromiques (haversine) en km entre points deux à deux, colonne par colonne"""
+    rayon_km = RAYON_TERRE_M / 1000
+    radians, sin, cos, asin, sqrt = math.radians, math.sin, math.cos, math.asin, math.sqrt
+    return array('d', (
+        2 * rayon_km * asin(sqrt(
+            sin(radians(la2 - la1) / 2) ** 2
+            + cos(radians(la1)) * cos(radians(la2)) * sin(radians(ln2 - ln1) / 2) ** 2
+        ))
+        for la1, ln1, la2, ln2 in zip(lats1, lngs1, lats2, lngs2)
+    ))
+
+
+def longueurs_cumulees_km(coords: List[List[float]]) -> array:
+    """Longueur de la polyligne depuis son premier sommet jusqu'à chacun de ses sommets, en km"""
+    lats = array('d', (float(c[0]) for c in coords))
+    lngs = array('d', (float(c[1]) for c in coords))
+    return array('d', itertools.accumulate(
+        longueurs_km(lats, lngs, lats[1:], lngs[1:]), initial=0.0
+    ))
+
+
+def mesurer_trace(coords: List[List[float]]) -> Tuple[float, Optional[Tuple[float, float, float, float]]]:
+    """Longueur en km d'un tracé et son emprise (lat_min, lat_max, lng_min, lng_max), None s'il est vide"""
+    if not coords:
+        return 0.0, None
+    lats = array('d', (float(c[0]) for c in coords))
+    lngs = array('d', (float(c[1]) for c in coords))
+    longueur = math.fsum(longueurs_km(lats, lngs, lats[1:], lngs[1:]))
+    return longueur, (min(lats), max(lats), min(lngs), max(lngs))
+
+
+def _ecart_m(a: List[float], b: List[float]) -> float:
+    cos_lat = math.cos(math.radians(a[0]))
+    return math.hypot(b[0] - a[0], (b[1] - a[1]) * cos_lat) * METRES_PAR_DEGRE
+
+
+def filtrer_trace(precedent: Optional[List[float]], points: List[List[float]], tolerance_m: float,
+                  saut_max_m: float, precision_max_m: float) -> Tuple[List[List[float]], int]:
+    """Points d'un lot de relevé GPS à ajouter au tracé, et nombre de points rejetés
+
+    Chaque point est [lat, lng] ou [lat, lng, précision_m]. Sont rejetés : les points
+    moins précis que precision_max_m, et les pics isolés, à plus de saut_max_m du
+    dernier point retenu alors que le point suivant en est plus proche que du pic.
+    Le lot est ensuite simplifié à tolerance_m près (distance radiale puis
+    Douglas-Peucker) en partant de precedent, dernier point déjà enregistré.
+    """
+    valides = [
+        [float(point[0]), float(point[1])] for point in points
+        if len(point) < 3 or point[2] is None or float(point[2]) <= precision_max_m
+    ]
+    rejetes = len(points) - len(valides)
+
+    retenus, reference = [], precedent
+    for rang, point in enumerate(valides):
+        suivant = valides[rang + 1] if rang + 1 < len(valides) else None
+        if (reference is not None and suivant is not None and _ecart_m(reference, point) > saut_max_m
+                and _ecart_m(reference, suivant) < _ecart_m(point, suivant)):
+            rejetes += 1
+            continue
+        if reference is not None and _ecart_m(reference, point) < tolerance_m:
+            continue
+        retenus.append(point)
+        reference = point
+    if not retenus:
+        return [], rejetes
+
+    # Douglas-Peucker ancré sur le dernier point enregistré
+    sommets = ([precedent] if precedent is not None else []) + retenus
+    conserves = [False] * len(sommets)
+    conserves[0] = conserves[-1] = True
+    pile = [(0, len(sommets) - 1)]
+    while pile:
+        debut, fin = pile.pop()
+        if fin - debut < 2:
+            continue
+        ecart, rang = max(
+            (distance_polyligne(sommets[k][0], sommets[k][1], [sommets[debut], sommets[fin]])[0], k)
+            for k in range(debut + 1, fin)
+        )
+        if ecart > tolerance_m:
+            conserves[rang] = True
+            pile.extend(((debut, rang), (rang, fin)))
+    simplifies = [sommet for sommet, conserve in zip(sommets, conserves) if conserve]
+    return (simplifies[1:] if precedent is not None else simplifies), rejetes
+
+
+def sommet_le_plus_proche(lats: array, lngs: array, lat: float, lng: float, debut: int = 0) -> int:
+    """Rang du sommet le plus proche du point parmi les sommets debut et suivants"""
+    cos_lat = math.cos(math.radians(lat))
+    return min(
+        range(debut, len(lats)),
+        key=lambda rang: (lats[rang] - lat) ** 2 + ((lngs[rang] - lng) * cos_lat) ** 2
+    )
+
+
+class GrilleSpatiale:
+    """Grille régulière en degrés : chaque cellule liste les éléments qui la traversent
+
+    Les éléments peuvent être ajoutés et retirés un à un, ce qui permet de tenir
+    l'index à jour au fil des modifications sans le reconstruire.
+    """
+
+    TAILLE_CELLULE_DEG = 0.002  # environ 220 m en latitude
+
+    def __init__(self, taille_cellule_deg: float = None):
+        self.taille = taille_cellule_deg or self.TAILLE_CELLULE_DEG
+        self.cellules: Dict[Tuple[int, int], Set[Hashable]] = {}
+        self.elements: Dict[Hashable, Tuple[List[List[float]], object]] = {}
+        self._cellules_element: Dict[Hashable, Set[Tuple[int, int]]] = {}
+
+    def __len__(self):
+        return len(self.elements)
+
+    def __contains__(self, cle):
+        return cle in self.elements
+
+    def _cellule(self, lat: float, lng: float) -> Tuple[int, int]:
+        return int(math.floor(lat / self.taille)), int(math.floor(lng / self.taille))
+
+    def _cellules_troncon(self, debut: List[float], fin: List[float]) -> Set[Tuple[int, int]]:
+        """Cellules traversées par un tronçon, échantillonné à la demi-cellule"""
+        lat1, lng1 = float(debut[0]), float(debut[1])
+        lat2, lng2 = float(fin[0]), float(fin[1])
+        i1, j1 = self._cellule(lat1, lng1)
+        i2, j2 = self._cellule(lat2, lng2)
+        etapes = 2 * max(abs(i2 - i1), abs(j2 - j1)) + 1
+
+        cellules = {(i1, j1)}
+        precedente = (i1, j1)
+        for k in range(1, etapes + 1):
+            t = k / etapes
+            cellule = self._cellule(lat1 + (lat2 - lat1) * t, lng1 + (lng2 - lng1) * t)
+            # Coins franchis en diagonale entre deux échantillons
+            cellules.update((cellule, (precedente[0], cellule[1]), (cellule[0], precedente[1])))
+            precedente = cellule
+        return cellules
+
+    def ajouter(self, cle: Hashable, coords: List[List[float]], donnees: object = None):
+        """Ajoute (ou remplace) un élément décrit par ses coordonnées"""
+        if cle in self.elements:
+            self.retirer(cle)
+        if not coords:
+            return
+
+        cellules = set()
+        if len(coords) == 1:
+            cellules.add(self._cellule(float(coords[0][0]), float(coords[0][1])))
+        for debut, fin in zip(coords, coords[1:]):
+            cellules.update(self._cellules_troncon(debut, fin))
+
+        for cellule in cellules:
+            self.cellules.setdefault(cellule, set()).add(cle)
+        self.elements[cle] = (coords, donnees)
+        self._cellules_element[cle] = cellules
+
+    def retirer(self, cle: Hashable):
+        """Retire un élément de l'index (sans effet s'il est absent)"""
+        for cellule in self._cellules_element.pop(cle, ()):
+            contenu = self.cellules.get(cellule)
+            if contenu is not None:
+                contenu.discard(cle)
+                if not contenu:
+                    del self.cellules[cellule]
+        self.elements.pop(cle, None)
+
+    def _candidats(self, lat: float, lng: float, rayon_m: float) -> Set[Hashable]:
+        delta_lat = rayon_m / METRES_PAR_DEGRE
+        delta_lng = delta_lat / max(math.cos(math.radians(lat)), 1e-6)
+        i1, j1 = self._cellule(lat - delta_lat, lng - delta_lng)
+        i2, j2 = self._cellule(lat + delta_lat, lng + delta_lng)
+
+        candidats = set()
+        for i in range(i1, i2 + 1):
+            for j in range(j1, j2 + 1):
+                candidats.update(self.cellules.get((i, j), ()))
+        return candidats
+
+    def rechercher(self, lat: float, lng: float, rayon_m: float) -> List[Tuple[Hashable, float, float, object]]:
+        """Éléments à moins de rayon_m mètres : (clé, distance_m, fraction, données), du plus proche"""
+        resultats = []
+        for cle in self._candidats(lat, lng, rayon_m):
+            coords, donnees = self.elements[cle]
+            distance, fraction = distance_polyligne(lat, lng, coords)
+            if distance <= rayon_m:
+                resultats.append((cle, distance, fraction, donnees))
+        resultats.sort(key=lambda resultat: resultat[1])
+        return resultats
+
+    def _couronne(self, i: int, j: int, rang: int) -> Iterator[Tuple[int, int]]:
+        """Cellules à exactement rang cellules de (i, j)"""
+        if rang == 0:
+            yield i, j
+            return
+        for dj in range(-rang, rang + 1):
+            yield i - rang, j + dj
+            yield i + rang, j + dj
+        for di in range(-rang + 1, rang):
+            yield i + di, j - rang
+            yield i + di, j + rang
+
+    def parcourir(self, lat: float, lng: float, rayon_max_m: float = None) -> Iterator[Tuple[Hashable, float, object]]:
+        """Éléments du plus proche au plus lointain : (clé, distance_m, données)
+
+        Les cellules sont visitées par couronnes successives ; un élément n'est rendu
+        que lorsqu'aucun élément des couronnes suivantes ne peut être plus proche,
+        si bien que le parcours peut être interrompu dès que l'appelant a assez de résultats.
+        """
+        i, j = self._cellule(lat, lng)
+        cote_m = self.taille * METRES_PAR_DEGRE * min(1.0, max(math.cos(math.radians(lat)), 1e-6))
+        tas, vus, compteur = [], set(), itertools.count()
+        rang = 0
+        while True:
+            for cellule in self._couronne(i, j, rang):
+                for cle in self.cellules.get(cellule, ()):
+                    if cle not in vus:
+                        vus.add(cle)
+                        coords, donnees = self.elements[cle]
+                        distance = distance_polyligne(lat, lng, coords)[0]
+                        heapq.heappush(tas, (distance, next(compteur), cle, donnees))
+
+            # Tout élément non encore vu est au-delà de la couronne courante
+            garanti = rang * cote_m
+            termine = len(vus) == len(self.elements) or (rayon_max_m is not None and garanti >= rayon_max_m)
+            while tas and (termine or tas[0][0] <= garanti):
+                distance, _, cle, donnees = heapq.heappop(tas)
+                if rayon_max_m is not None and distance > rayon_max_m:
+                    return
+                yield cle, distance, donnees
+            if termine:
+                return
+            rang += 1
+
+    def plus_proches(self, lat: float, lng: float, k: int, rayon_max_m: float = None) -> List[Tuple[Hashable, float, object]]:
+        """Les k éléments les plus proches : (clé, distance_m, données)"""
+        return list(itertools.islice(self.parcourir(lat, lng, rayon_max_m), k))
+
+    def joindre(self, points: List[Tuple[Hashable, float, float]],
+                rayon_m: float) -> List[Optional[Tuple[Hashable, float, object]]]:
+        """Élément le plus proche à moins de rayon_m de chaque point : (clé, distance_m, données) ou None
+
+        Les points sont regroupés par cellule : les candidats d'une cellule sont lus une
+        seule fois pour tous ses points, et les distances aux éléments ponctuels sont
+        calculées colonne par colonne. Les résultats suivent l'ordre de points.
+        """
+        par_cellule: Dict[Tuple[int, int], List[int]] = {}
+        for rang, (_, lat, lng) in enumerate(points):
+            par_cellule.setdefault(self._cellule(lat, lng), []).append(rang)
+
+        resultats: List[Optional[Tuple[Hashable, float, object]]] = [None] * len(points)
+        # Un point de la cellule est à moins d'une demi-cellule de son centre sur chaque axe
+        marge_m = 0.75 * self.taille * METRES_PAR_DEGRE
+        for (i, j), rangs in par_cellule.items():
+            candidats = self._candidats((i + 0.5) * self.taille, (j + 0.5) * self.taille, rayon_m + marge_m)
+            ponctuels = [cle for cle in candidats if len(self.elements[cle][0]) == 1]
+            lignes = [cle for cle in candidats if len(self.elements[cle][0]) > 1]
+            lats = [float(self.elements[cle][0][0][0]) for cle in ponctuels]
+            lngs = [float(self.elements[cle][0][0][1]) for cle in ponctuels]
+
+            for rang in rangs:
+                _, lat, lng = points[rang]
+                meilleur, meilleure_distance = None, rayon_m
+                if ponctuels:
+                    cos_lat = math.cos(math.radians(lat))
+                    carres = [(la - lat) ** 2 + ((ln - lng) * cos_lat) ** 2 for la, ln in zip(lats, lngs)]
+                    indice = min(range(len(carres)), key=carres.__getitem__)
+                    distance = math.sqrt(carres[indice]) * METRES_PAR_DEGRE
+                    if distance <= meilleure_distance:
+                        meilleur, meilleure_distance = ponctuels[indice], distance
+                for cle in lignes:
+                    distance = distance_polyligne(lat, lng, self.elements[cle][0])[0]
+                    if distance <= meilleure_distance:
+                        meilleur, meilleure_distance = cle, distance
+                if meilleur is not None:
+                    resultats[rang] = (meilleur, meilleure_distance, self.elements[meilleur][1])
+        return resultats
@@ -3,21 +3,97 @@ from django.contrib.auth import get_user_model
 from django.urls import reverse
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
+from django.test import override_settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from django.core.files.uploadedfile import SimpleUploadedFile
 from decimal import Decimal
 from unittest.mock import patch, MagicMock
+import csv
+import datetime
+import io
 import json
+import os
+import random
+import struct
+import tempfile
+import zipfile
 
 from .models import (
     Client, Liaison, TypeLiaison, PointDynamique, Segment,
     DetailONT, DetailPOPLS, DetailPOPFTTH, DetailChambre, DetailManchon,
     FAT, DetailFDT, PhotoPoint, MesureOTDR, Coupure, Intervention,
-    CommitIntervention, FicheTechnique, Notification, ParametreApplication
+    CommitIntervention, FicheTechnique, Notification, ParametreApplication, ImportOTDR, ImportReseau,
+    CorridorCriticite, BilanOptique, TronconCable, OccupationPorts, NoeudFTTH, LotTrace, TraceOTDR
 )
-from .services import CoupureService, NavigationService, SegmentService, StatistiquesService
+from .services import (
+    CoupureService, NavigationService, SegmentService, StatistiquesService, ImportOTDRService,
+    TraceOTDRService, EmpreinteOTDRService, AlignementOTDRService, FusionOTDRService,
+    IncertitudeCoupureService, ProfilOptiqueService, ImpactCoupureService,
+    CriticiteCorridorService, GrapheReseauService, BilanOptiqueService,
+    ContinuiteFibreService, InventaireBrinsService, OccupationPortsService, ProximiteFATService,
+    ArbreFTTHService, LiaisonService, ImportReseauService, TraceSegmentService
+)
+from .serializers import PointDynamiqueCreateSerializer
+from . import lecteurs_sig
+from .otdr import LecteurSOR, VITESSE_LUMIERE_KM_US, preparer_trace, ComparaisonEmpreinte, AlignementEvenements
+from .reseau import GrapheCSR, masque_vers_octets, regrouper_sites
+from .spatial import GrilleSpatiale, filtrer_trace, mesurer_trace
+from array import array
 
 User = get_user_model()
 
 
+def evenement_otdr(distance_km, perte_db=0.0, reflechissant=False, fin_fibre=False, reflectance_db=0.0):
+    """Événement OTDR au format produit par LecteurSOR"""
+    return {
+        'distance_km': distance_km, 'perte_db': perte_db, 'reflectance_db': reflectance_db,
+        'reflechissant': reflechissant, 'fin_fibre': fin_fibre
+    }
+
+
+def construire_fichier_sor(identifiant_cable='', evenements=(), points=(), indice=1.4682):
+    """Construit un fichier .sor SR-4731 v2 minimal.
+
+    evenements : liste de (distance_km, perte_db, reflectance_db, code)
+    """
+    def chaine(texte):
+        return texte.encode('latin-1') + b'\x00'
+
+    facteur = 1e-4 * VITESSE_LUMIERE_KM_US / indice
+    gen = (
+        chaine('GenParams') + b'FR' + chaine(identifiant_cable) + chaine('F01')
+        + struct.pack('<HH', 0, 1310) + chaine('CENTRAL') + chaine('CLIENT') + chaine('')
+        + b'BC' + struct.pack('<ii', 0, 0) + chaine('technicien') + chaine('')
+    )
+    fxd = (
+        chaine('FxdParams') + struct.pack('<I', 1700000000) + b'mt' + struct.pack('<H', 13100)
+        + struct.pack('<iiH', 0, 0, 1) + struct.pack('<HII', 100, 50000, len(points))
+        + struct.pack('<I', round(indice * 100000))
+    )
+    evts = chaine('KeyEvents') + struct.pack('<H', len(evenements))
+    for numero, (distance, perte, reflectance, code) in enumerate(evenements, 1):
+        evts += (
+            struct.pack('<HIhhi', numero, round(distance / facteur), 0, round(perte * 1000),
+                        round(reflectance * 1000))
+            + code.encode().ljust(8)[:8] + struct.pack('<5I', 0, 0, 0, 0, 0) + chaine('')
+        )
+    perte_totale = sum(evenement[1] for evenement in evenements)
+    longueur = max((evenement[0] for evenement in evenements), default=0)
+    evts += struct.pack('<iiIHiI', round(perte_totale * 1000), 0, round(longueur / facteur), 0, 0, 0)
+    data = (
+        chaine('DataPts') + struct.pack('<IHIH', len(points), 1, len(points), 1000)
+        + struct.pack(f'<{len(points)}H', *points)
+    )
+
+    blocs = [('GenParams', gen), ('FxdParams', fxd), ('KeyEvents', evts), ('DataPts', data)]
+    corps_carte = b''.join(chaine(nom) + struct.pack('<HI', 200, len(contenu)) for nom, contenu in blocs)
+    carte = b'Map\x00' + struct.pack('<HIH', 200, 12 + len(corps_carte), len(blocs) + 1) + corps_carte
+    return carte + b''.join(contenu for _, contenu in blocs)
+
+
 class UserModelTest(TestCase):
     """Tests pour le modèle User"""
     
@@ -275,6 +351,21 @@ class CoupureServiceTest(TestCase):
         self.assertEqual(coupure.mesure_otdr, self.mesure)
         self.assertEqual(coupure.status, 'detectee')
     
+    def test_signaler_coupure_idempotent(self):
+        coupure, nouvelle, _ = CoupureService.signaler_coupure(self.mesure)
+        self.assertTrue(nouvelle)
+        mesure = MesureOTDR.objects.create(
+            liaison=self.liaison, distance_coupure=1.2, attenuation=5.0, type_evenement='coupure',
+            position_technicien='central', direction_analyse='vers_client', technicien=self.user
+        )
+        for _ in range(3):
+            rattachee, nouvelle, _ = CoupureService.signaler_coupure(mesure)
+            self.assertEqual((rattachee, nouvelle), (coupure, False))
+        CoupureService.signaler_coupure(self.mesure)
+        
+        coupure.refresh_from_db()
+        self.assertEqual(coupure.nombre_signalements, 2)
+    
     def test_analyser_coupure(self):
         analyse = CoupureService.analyser_coupure(self.mesure)
         self.assertIn('distance_absolue', analyse)
@@ -499,10 +590,47 @@ class CoupureAPITest(APITestCase):
             'attenuation': 5.0,
             'commentaires': 'Test de détection'
         }
-        response = self.client.post(url, data, format='json')
+        with patch.object(CoupureService, 'analyser_coupure', wraps=CoupureService.analyser_coupure) as analyser:
+            response = self.client.post(url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertIn('coupure', response.data)
         self.assertIn('analyse', response.data)
+        # L'analyse de signaler_coupure est reprise dans la réponse
+        analyser.assert_called_once()
+    
+    def test_detecter_coupure_regroupe_signalements(self):
+        User.objects.create_user(username='superviseur', password='test', role='superviseur')
+        url = reverse('detecter-coupure')
+        data = {'liaison_id': str(self.liaison.id), 'distance_coupure': 1.5}
+        
+        premiere = self.client.post(url, data, format='json')
+        seconde = self.client.post(url, dict(data, distance_coupure=1.55), format='json')
+        
+        self.assertEqual(seconde.status_code, status.HTTP_200_OK)
+        self.assertFalse(seconde.data['nouvelle_coupure'])
+        self.assertEqual(seconde.data['coupure']['id'], premiere.data['coupure']['id'])
+        self.assertEqual(Coupure.objects.count(), 1)
+        self.assertEqual(Coupure.objects.get().nombre_signalements, 2)
+        self.assertEqual(Notification.objects.filter(type_notification='coupure').count(), 1)
+        
+        # Une coupure éloignée ou une coupure réparée ouvre un nouvel incident
+        self.client.post(url, dict(data, distance_coupure=3.0), format='json')
+        Coupure.objects.update(status='reparee')
+        nouvelle = self.client.post(url, data, format='json')
+        self.assertEqual(nouvelle.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Coupure.objects.count(), 3)
+    
+    def test_reanalyse_mesure_rattachee(self):
+        url = reverse('detecter-coupure')
+        data = {'liaison_id': str(self.liaison.id), 'distance_coupure': 1.5}
+        self.client.post(url, data, format='json')
+        seconde = self.client.post(url, data, format='json')
+        
+        url = reverse('mesure-analyser-coupure', kwargs={'pk': seconde.data['mesure_otdr']['id']})
+        for _ in range(3):
+            response = self.client.post(url)
+            self.assertEqual(response.data['message'], 'Coupure déjà analysée')
+        self.assertEqual(Coupure.objects.get().nombre_signalements, 2)
     
     def test_detecter_coupure_liaison_inexistante(self):
         url = reverse('detecter-coupure')
@@ -670,6 +798,2187 @@ class RechercheGeographiqueAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
+class LecteurSORTest(TestCase):
+    """Tests pour le décodage des fichiers .sor"""
+    
+    def test_lire_fichier_sor(self):
+        contenu = construire_fichier_sor(
+            identifiant_cable='LIA001',
+            evenements=[(0.0, 0.0, -45.0, '1F9999LS'), (1.25, 0.3, 0.0, '0F9999LS'), (2.5, 0.0, -14.0, '1E9999LS')],
+            points=[1000, 1200, 1400]
+        )
+        resultat = LecteurSOR.lire(contenu)
+        
+        self.assertEqual(resultat['identifiant_cable'], 'LIA001')
+        self.assertEqual(resultat['longueur_onde_nm'], 1310.0)
+        self.assertEqual(len(resultat['evenements']), 3)
+        self.assertAlmostEqual(resultat['evenements'][1]['distance_km'], 1.25, places=3)
+        self.assertAlmostEqual(resultat['evenements'][1]['perte_db'], 0.3)
+        self.assertTrue(resultat['evenements'][2]['fin_fibre'])
+        self.assertEqual(list(resultat['trace']), [1000, 1200, 1400])
+    
+    def test_lire_fichier_invalide(self):
+        with self.assertRaises(ValueError):
+            LecteurSOR.lire(b'pas un fichier sor')
+
+
+class ImportOTDRServiceTest(TestCase):
+    """Tests pour l'import en masse d'archives OTDR"""
+    
+    def setUp(self):
+        client = Client.objects.create(
+            name='Test Client',
+            type_client='LS',
+            type_organisation='entreprise',
+            address='123 Test Street',
+            phone='+33123456789'
+        )
+        self.liaison = Liaison.objects.create(
+            nom_liaison='LIA001',
+            client=client,
+            type_liaison=TypeLiaison.objects.create(type='LS'),
+            point_central_lat='48.8566',
+            point_central_lng='2.3522',
+            point_client_lat='48.8606',
+            point_client_lng='2.3376',
+            distance_totale=3.0
+        )
+        self.dossier = tempfile.TemporaryDirectory()
+        self.chemin_archive = os.path.join(self.dossier.name, 'district.zip')
+        with zipfile.ZipFile(self.chemin_archive, 'w') as archive:
+            archive.writestr('mesures/coupure.sor', construire_fichier_sor(
+                identifiant_cable='LIA001',
+                evenements=[(0.0, 0.0, -45.0, '1F9999LS'), (1.2, 0.0, -14.0, '1E9999LS')]
+            ))
+            archive.writestr('mesures/LIA001_1550.sor', construire_fichier_sor(
+                evenements=[(0.0, 0.0, -45.0, '1F9999LS'), (1.0, 0.8, 0.0, '0F9999LS'), (3.0, 0.0, -14.0, '1E9999LS')]
+            ))
+            archive.writestr('mesures/inconnue.sor', construire_fichier_sor(identifiant_cable='LIA999'))
+            archive.writestr('mesures/corrompu.sor', b'corrompu')
+    
+    def tearDown(self):
+        self.dossier.cleanup()
+    
+    def test_traiter_import(self):
+        import_otdr = ImportOTDR.objects.create(chemin_archive=self.chemin_archive)
+        ImportOTDRService.traiter_import(import_otdr, taille_lot=2, processus=1)
+        
+        import_otdr.refresh_from_db()
+        self.assertEqual(import_otdr.status, 'termine')
+        self.assertEqual(import_otdr.total_fichiers, 4)
+        self.assertEqual(import_otdr.nombre_mesures, 2)
+        self.assertEqual(import_otdr.nombre_coupures, 1)
+        self.assertEqual(len(import_otdr.erreurs), 2)
+        
+        types = sorted(self.liaison.mesures_otdr.values_list('type_evenement', flat=True))
+        self.assertEqual(types, ['coupure', 'epissure'])
+        coupure = Coupure.objects.get(liaison=self.liaison)
+        self.assertAlmostEqual(coupure.mesure_otdr.distance_coupure, 1.2, places=3)
+        # La date d'acquisition du fichier remplace la date d'import
+        self.assertEqual(coupure.mesure_otdr.date_mesure,
+                         datetime.datetime.fromtimestamp(1700000000, tz=datetime.timezone.utc))
+    
+    def test_reprise_import(self):
+        import_otdr = ImportOTDR.objects.create(
+            chemin_archive=self.chemin_archive,
+            fichiers_traites=['mesures/coupure.sor', 'mesures/LIA001_1550.sor']
+        )
+        ImportOTDRService.traiter_import(import_otdr, processus=1)
+        
+        import_otdr.refresh_from_db()
+        self.assertEqual(import_otdr.nombre_mesures, 0)
+        self.assertEqual(len(import_otdr.fichiers_traites), 4)
+        self.assertFalse(MesureOTDR.objects.exists())
+    
+    def test_signalements_regroupes(self):
+        for _ in range(2):
+            import_otdr = ImportOTDR.objects.create(chemin_archive=self.chemin_archive)
+            ImportOTDRService.traiter_import(import_otdr, processus=1)
+        
+        # Le second import rattache sa mesure à la coupure déjà signalée
+        import_otdr.refresh_from_db()
+        self.assertEqual(import_otdr.nombre_coupures, 0)
+        coupure = Coupure.objects.get(liaison=self.liaison)
+        self.assertEqual(coupure.nombre_signalements, 2)
+        self.assertEqual(coupure.mesures_associees.count(), 1)
+    
+    def test_traces_ecrites_apres_validation(self):
+        chemin = os.path.join(self.dossier.name, 'traces.zip')
+        with zipfile.ZipFile(chemin, 'w') as archive:
+            archive.writestr('LIA001.sor', construire_fichier_sor(points=[1000 + i % 50 for i in range(500)]))
+        import_otdr = ImportOTDR.objects.create(chemin_archive=chemin)
+        
+        with override_settings(MEDIA_ROOT=self.dossier.name):
+            with self.captureOnCommitCallbacks() as rappels:
+                ImportOTDRService.traiter_import(import_otdr, processus=1)
+            self.assertFalse(TraceOTDR.objects.exists())
+            for rappel in rappels:
+                rappel()
+        
+        self.assertEqual(TraceOTDR.objects.get().nombre_points, 500)
+    
+    @patch.object(ImportOTDRService, '_enregistrer_lot', side_effect=ValueError('lot invalide'))
+    def test_erreur_lot(self, enregistrer_lot):
+        import_otdr = ImportOTDR.objects.create(chemin_archive=self.chemin_archive)
+        ImportOTDRService.traiter_import(import_otdr, processus=1)
+        
+        import_otdr.refresh_from_db()
+        self.assertEqual(import_otdr.status, 'erreur')
+        self.assertEqual(import_otdr.erreurs[-1]['erreur'], 'lot invalide')
+
+
+class ImportOTDRAPITest(APITestCase):
+    """Tests pour l'API d'import d'archives OTDR"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass123')
+        self.client.force_authenticate(user=self.user)
+        self.media = tempfile.TemporaryDirectory()
+    
+    def tearDown(self):
+        self.media.cleanup()
+    
+    @patch.object(ImportOTDRService, 'lancer_en_arriere_plan')
+    def test_importer_archive(self, lancer):
+        with override_settings(MEDIA_ROOT=self.media.name):
+            contenu = io.BytesIO()
+            with zipfile.ZipFile(contenu, 'w') as archive:
+                archive.writestr('a.sor', construire_fichier_sor())
+            fichier = SimpleUploadedFile('district.zip', contenu.getvalue())
+            response = self.client.post(reverse('importer-archive-otdr'), {'archive': fichier}, format='multipart')
+        
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        lancer.assert_called_once()
+        
+        response = self.client.get(reverse('suivi-import-otdr', kwargs={'import_id': response.data['import']['id']}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'en_attente')
+    
+    def test_importer_archive_non_zip(self):
+        fichier = SimpleUploadedFile('mesures.txt', b'pas une archive')
+        response = self.client.post(reverse('importer-archive-otdr'), {'archive': fichier}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_importer_archive_position_invalide(self):
+        fichier = SimpleUploadedFile('district.zip', b'PK')
+        response = self.client.post(
+            reverse('importer-archive-otdr'), {'archive': fichier, 'position_technicien': 'toit'}, format='multipart'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    @patch.object(ImportOTDRService, 'lancer_en_arriere_plan')
+    def test_reprendre_import(self, lancer):
+        import_otdr = ImportOTDR.objects.create(chemin_archive='district.zip', status='erreur')
+        url = reverse('reprendre-import-otdr', kwargs={'import_id': import_otdr.id})
+        
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['import']['status'], 'en_cours')
+        
+        # Un second appel ne relance pas un import déjà en cours
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        lancer.assert_called_once()
+
+
+class TraceOTDRServiceTest(TestCase):
+    """Tests pour le stockage compressé et les aperçus de traces"""
+    
+    def setUp(self):
+        self.media = tempfile.TemporaryDirectory()
+        self.override = override_settings(MEDIA_ROOT=self.media.name)
+        self.override.enable()
+        
+        client = Client.objects.create(
+            name='Test Client', type_client='LS', type_organisation='entreprise',
+            address='123 Test Street', phone='+33123456789'
+        )
+        liaison = Liaison.objects.create(
+            nom_liaison='LIA001', client=client, type_liaison=TypeLiaison.objects.create(type='LS'),
+            point_central_lat='48.8566', point_central_lng='2.3522',
+            point_client_lat='48.8606', point_client_lng='2.3376'
+        )
+        self.mesure = MesureOTDR.objects.create(
+            liaison=liaison, distance_coupure=1.0, attenuation=3.0, type_evenement='attenuation',
+            position_technicien='central', direction_analyse='vers_client'
+        )
+        self.points = [(i * 7919) % 5000 + 1000 for i in range(10000)]
+        resultat = preparer_trace(LecteurSOR.lire(construire_fichier_sor(points=self.points)))
+        self.trace = TraceOTDRService.enregistrer_trace(self.mesure, resultat)
+    
+    def tearDown(self):
+        self.override.disable()
+        self.media.cleanup()
+    
+    def test_trace_compressee(self):
+        self.assertEqual(self.trace.nombre_points, 10000)
+        self.assertLess(self.trace.fichier_points.size, 20000)
+        self.assertTrue(self.trace.niveaux_apercu)
+    
+    def test_apercu_complet(self):
+        apercu = TraceOTDRService.apercu(self.trace, largeur=100)
+        self.assertEqual(len(apercu['points']), 100)
+        self.assertGreater(apercu['taille_seau'], 1)
+        minimum = min(point[1] for point in apercu['points'])
+        maximum = max(point[2] for point in apercu['points'])
+        self.assertAlmostEqual(minimum, min(self.points) * self.trace.echelle_db, places=3)
+        self.assertAlmostEqual(maximum, max(self.points) * self.trace.echelle_db, places=3)
+    
+    def test_apercu_zoom_points_bruts(self):
+        fin_km = 50 * self.trace.pas_km
+        apercu = TraceOTDRService.apercu(self.trace, debut_km=0, fin_km=fin_km, largeur=100)
+        self.assertEqual(apercu['taille_seau'], 1)
+        self.assertEqual(len(apercu['points']), 50)
+        self.assertAlmostEqual(apercu['points'][3][1], self.points[3] * self.trace.echelle_db, places=3)
+
+
+class EmpreinteOTDRTest(TestCase):
+    """Tests pour la comparaison à l'empreinte OTDR de référence"""
+    
+    def setUp(self):
+        self.reference = [
+            evenement_otdr(0.0, reflechissant=True, reflectance_db=-45.0),
+            evenement_otdr(1.0, 0.1),
+            evenement_otdr(2.0, 0.5, reflechissant=True, reflectance_db=-50.0),
+            evenement_otdr(3.0, reflechissant=True, fin_fibre=True),
+        ]
+    
+    def test_comparer_evenements(self):
+        mesure = [
+            evenement_otdr(0.003, reflechissant=True, reflectance_db=-45.0),
+            evenement_otdr(1.003, 0.6),
+            evenement_otdr(1.503, 0.4),
+            evenement_otdr(2.003, 0.5, reflechissant=True, reflectance_db=-50.0),
+            evenement_otdr(3.003, reflechissant=True, fin_fibre=True),
+        ]
+        comparaison = ComparaisonEmpreinte.comparer(self.reference, mesure)
+        
+        self.assertAlmostEqual(comparaison['decalage_km'], 0.003)
+        self.assertEqual(len(comparaison['accrus']), 1)
+        self.assertEqual(len(comparaison['nouveaux']), 1)
+        self.assertFalse(comparaison['fibre_raccourcie'])
+        self.assertEqual(comparaison['type_evenement'], 'epissure')
+        self.assertAlmostEqual(comparaison['distance_km'], 1.003)
+    
+    def test_ecart_traces(self):
+        reference = array('H', [i for i in range(1000)])
+        mesure = array('H', [i + (1000 if i >= 600 else 0) for i in range(1000)])
+        ecart = ComparaisonEmpreinte.ecart_traces(reference, 0.001, 0.001, mesure, 0.001, 0.001)
+        self.assertAlmostEqual(ecart['debut_ecart_km'], 0.6)
+        self.assertAlmostEqual(ecart['ecart_max_db'], 1.0)
+    
+    def test_appliquer_coupure(self):
+        client = Client.objects.create(
+            name='Test Client', type_client='LS', type_organisation='entreprise',
+            address='123 Test Street', phone='+33123456789'
+        )
+        liaison = Liaison.objects.create(
+            nom_liaison='LIA001', client=client, type_liaison=TypeLiaison.objects.create(type='LS'),
+            point_central_lat='48.8566', point_central_lng='2.3522',
+            point_client_lat='48.8606', point_client_lng='2.3376'
+        )
+        valeurs = {
+            'liaison': liaison, 'attenuation': 1.0, 'position_technicien': 'central',
+            'direction_analyse': 'vers_client'
+        }
+        mesure_reference = MesureOTDR.objects.create(
+            distance_coupure=3.0, type_evenement='attenuation', evenements=self.reference, **valeurs
+        )
+        EmpreinteOTDRService.definir_reference(mesure_reference)
+        
+        mesure = MesureOTDR.objects.create(
+            distance_coupure=1.25, type_evenement='attenuation',
+            evenements=self.reference[:2] + [evenement_otdr(1.2, reflechissant=True, fin_fibre=True)],
+            **valeurs
+        )
+        comparaison = EmpreinteOTDRService.appliquer(mesure)
+        
+        self.assertTrue(comparaison['fibre_raccourcie'])
+        mesure.refresh_from_db()
+        self.assertEqual(mesure.type_evenement_reference, 'coupure')
+        self.assertAlmostEqual(mesure.distance_reference_km, 1.2)
+        # Les valeurs relevées par le technicien sont conservées
+        self.assertEqual(mesure.type_evenement, 'attenuation')
+        self.assertEqual(mesure.distance_coupure, 1.25)
+        self.assertIsNone(EmpreinteOTDRService.comparer(mesure_reference))
+
+
+class AlignementOTDRTest(TestCase):
+    """Tests pour le recalage des coupures sur les points identifiés de la trace"""
+    
+    def test_aligner_evenements(self):
+        # Un événement parasite (courbure à 1.5 km) et un manchon sans événement visible (4 km)
+        mesures = [1.05, 1.5, 2.1, 3.15]
+        attendus = [1.0, 2.0, 3.0, 4.0]
+        alignement = AlignementEvenements.estimer(mesures, attendus)
+        
+        self.assertEqual(alignement['paires'], [(0, 0), (2, 1), (3, 2)])
+        self.assertAlmostEqual(alignement['facteur_echelle'], 1.05)
+        indice, distance = AlignementEvenements.recaler(2.625, mesures, attendus, alignement)
+        self.assertEqual(indice, 1)
+        self.assertAlmostEqual(distance, 2.5)
+    
+    def test_analyser_coupure_recalee(self):
+        client = Client.objects.create(
+            name='Test Client', type_client='LS', type_organisation='entreprise',
+            address='123 Test Street', phone='+33123456789'
+        )
+        liaison = Liaison.objects.create(
+            nom_liaison='LIA001', client=client, type_liaison=TypeLiaison.objects.create(type='LS'),
+            point_central_lat='48.8566', point_central_lng='2.3522',
+            point_client_lat='48.8606', point_client_lng='2.3376', distance_totale=4.0
+        )
+        for ordre, (type_point, distance) in enumerate([('manchon', 1.0), ('chambre', 2.0), ('FDT', 3.0)]):
+            PointDynamique.objects.create(
+                liaison=liaison, type_point=type_point, nom=f'P{ordre}', ordre=ordre,
+                latitude='48.857', longitude='2.35', distance_depuis_central=distance
+            )
+        mesure = MesureOTDR.objects.create(
+            liaison=liaison, distance_coupure=2.625, attenuation=1.0, type_evenement='coupure',
+            position_technicien='client', direction_analyse='vers_central',
+            evenements=[evenement_otdr(1.05, 0.2), evenement_otdr(2.1, 0.1), evenement_otdr(3.15, 0.3)]
+        )
+        
+        analyse = CoupureService.analyser_coupure(mesure)
+        
+        # Lus depuis le client : FDT à 1 km, chambre à 2 km, manchon à 3 km
+        self.assertAlmostEqual(analyse['distance_absolue'], 1.5)
+        self.assertEqual(analyse['recalage']['point_reference']['nom'], 'P1')
+        self.assertEqual(analyse['recalage']['nombre_apparies'], 3)
+    
+    def test_sans_evenements(self):
+        client = Client.objects.create(
+            name='Test Client', type_client='LS', type_organisation='entreprise',
+            address='123 Test Street', phone='+33123456789'
+        )
+        liaison = Liaison.objects.create(
+            nom_liaison='LIA001', client=client, type_liaison=TypeLiaison.objects.create(type='LS'),
+            point_central_lat='48.8566', point_central_lng='2.3522',
+            point_client_lat='48.8606', point_client_lng='2.3376'
+        )
+        mesure = MesureOTDR.objects.create(
+            liaison=liaison, distance_coupure=1.2, attenuation=1.0, type_evenement='coupure',
+            position_technicien='central', direction_analyse='vers_client'
+        )
+        self.assertIsNone(AlignementOTDRService.recaler(mesure))
+        self.assertAlmostEqual(CoupureService.analyser_coupure(mesure)['distance_absolue'], 1.2)
+
+
+class FusionOTDRTest(TestCase):
+    """Tests pour la localisation par mesures aux deux extrémités"""
+    
+    def setUp(self):
+        client = Client.objects.create(
+            name='Test Client', type_client='LS', type_organisation='entreprise',
+            address='123 Test Street', phone='+33123456789'
+        )
+        self.liaison = Liaison.objects.create(
+            nom_liaison='LIA001', client=client, type_liaison=TypeLiaison.objects.create(type='LS'),
+            point_central_lat='48.8566', point_central_lng='2.3522',
+            point_client_lat='48.8606', point_client_lng='2.3376', distance_totale=10.0
+        )
+    
+    def creer_mesure(self, position, direction, distance):
+        return MesureOTDR.objects.create(
+            liaison=self.liaison, distance_coupure=distance, attenuation=1.0, type_evenement='coupure',
+            position_technicien=position, direction_analyse=direction
+        )
+    
+    def test_fusionner_distances(self):
+        fusion = FusionOTDRService.fusionner_distances(3.15, 7.35, 10.0)
+        self.assertAlmostEqual(fusion['distance_absolue'], 3.0)
+        self.assertAlmostEqual(fusion['facteur_longueur'], 1.05)
+        self.assertLess(fusion['intervalle_km'][0], 3.0)
+        self.assertGreater(fusion['intervalle_km'][1], 3.0)
+        
+        # Deux coupures différentes : les distances ne couvrent pas la liaison
+        self.assertIsNone(FusionOTDRService.fusionner_distances(2.0, 3.0, 10.0))
+    
+    def test_fusionner_remplace_coupures(self):
+        mesure_central = self.creer_mesure('central', 'vers_client', 3.15)
+        coupure_central = CoupureService.creer_coupure(mesure_central)
+        coupure_central.status = 'localisee'
+        coupure_central.save()
+        mesure_client = self.creer_mesure('client', 'vers_central', 7.35)
+        coupure_client = CoupureService.creer_coupure(mesure_client)
+        
+        coupure = FusionOTDRService.fusionner(mesure_client)
+        
+        self.assertEqual(coupure.mesure_otdr, mesure_central)
+        self.assertEqual(coupure.mesure_otdr_opposee, mesure_client)
+        self.assertAlmostEqual(coupure.distance_depuis_central, 3.0)
+        self.assertEqual(coupure.status, 'localisee')
+        coupure_central.refresh_from_db()
+        coupure_client.refresh_from_db()
+        self.assertEqual(coupure_central.remplacee_par, coupure)
+        self.assertEqual(coupure_client.remplacee_par, coupure)
+        
+        user = User.objects.create_user(username='tech', password='test')
+        api_client = APIClient()
+        api_client.force_authenticate(user=user)
+        response = api_client.get('/api/coupures/actives/')
+        resultats = response.data['results'] if 'results' in response.data else response.data
+        self.assertEqual([c['id'] for c in resultats], [str(coupure.id)])
+    
+    def test_sans_mesure_opposee(self):
+        mesure = self.creer_mesure('central', 'vers_client', 3.15)
+        self.creer_mesure('central', 'vers_client', 3.2)
+        self.assertIsNone(FusionOTDRService.fusionner(mesure))
+
+
+class IncertitudeCoupureTest(TestCase):
+    """Tests pour la bande d'incertitude de position des coupures"""
+    
+    def setUp(self):
+        client = Client.objects.create(
+            name='Test Client', type_client='LS', type_organisation='entreprise',
+            address='123 Test Street', phone='+33123456789'
+        )
+        self.liaison = Liaison.objects.create(
+            nom_liaison='LIA001', client=client, type_liaison=TypeLiaison.objects.create(type='LS'),
+            point_central_lat='48.8566', point_central_lng='2.3522',
+            point_client_lat='48.8606', point_client_lng='2.3376', distance_totale=5.0
+        )
+        points = []
+        for ordre, (type_point, distance, latitude) in enumerate(
+            [('POP_LS', 0.0, '48.80'), ('chambre', 2.0, '48.82'), ('ONT', 5.0, '48.85')]
+        ):
+            points.append(PointDynamique.objects.create(
+                liaison=self.liaison, type_point=type_point, nom=f'P{ordre}', ordre=ordre,
+                latitude=latitude, longitude='2.35', distance_depuis_central=distance
+            ))
+        DetailChambre.objects.create(
+            point_dynamique=points[1], capacite_cable_central=48, couleur_toron_central='blue',
+            couleur_brin_central='blue', moue_cable_central=30, capacite_cable_client=48,
+            couleur_toron_client='blue', couleur_brin_client='blue', moue_cable_client=20
+        )
+        Segment.objects.create(
+            liaison=self.liaison, point_depart=points[0], point_arrivee=points[1],
+            distance_gps=1.8, distance_cable=2.0
+        )
+        Segment.objects.create(
+            liaison=self.liaison, point_depart=points[1], point_arrivee=points[2],
+            distance_gps=2.7, distance_cable=3.0, trace_coords=[[48.82, 2.35], [48.835, 2.35], [48.85, 2.35]]
+        )
+    
+    def test_profil_moues(self):
+        profil = ProfilOptiqueService.profil(self.liaison)
+        self.assertEqual(profil['distances'], [0.0, 2.0, 5.0])
+        self.assertAlmostEqual(profil['moues_apres'][1], 0.05)
+        self.assertAlmostEqual(profil['moues_avant'][2], 0.05)
+    
+    def test_simuler_bande(self):
+        mesure = MesureOTDR.objects.create(
+            liaison=self.liaison, distance_coupure=3.5, attenuation=1.0, type_evenement='coupure',
+            position_technicien='central', direction_analyse='vers_client'
+        )
+        bande = IncertitudeCoupureService.simuler(mesure, 3.5, graine=1)
+        
+        self.assertEqual(bande['nombre_tirages'], IncertitudeCoupureService.NOMBRE_TIRAGES)
+        self.assertLess(bande['distance_min_km'], 3.5)
+        self.assertGreater(bande['distance_max_km'], 3.5)
+        self.assertAlmostEqual(bande['distance_mediane_km'], 3.5, delta=0.02)
+        # Le tronçon suit le tracé du second segment
+        self.assertIn([48.835, 2.35], bande['troncon'])
+        
+        analyse = CoupureService.analyser_coupure(mesure)
+        self.assertIsNotNone(analyse['incertitude'])
+        self.assertNotEqual(analyse['precision_estimation'], 'haute')
+    
+    def test_coupure_dans_la_moue(self):
+        mesure = MesureOTDR.objects.create(
+            liaison=self.liaison, distance_coupure=2.02, attenuation=1.0, type_evenement='coupure',
+            position_technicien='central', direction_analyse='vers_client'
+        )
+        bande = IncertitudeCoupureService.simuler(mesure, 2.0, graine=1)
+        self.assertAlmostEqual(bande['distance_mediane_km'], 2.0, places=6)
+
+
+class ProfilOptiqueTest(TestCase):
+    """Tests pour le profil optique (moues incluses) des liaisons"""
+    
+    def setUp(self):
+        client = Client.objects.create(
+            name='Test Client', type_client='LS', type_organisation='entreprise',
+            address='123 Test Street', phone='+33123456789'
+        )
+        self.liaison = Liaison.objects.create(
+            nom_liaison='LIA001', client=client, type_liaison=TypeLiaison.objects.create(type='LS'),
+            point_central_lat='48.8566', point_central_lng='2.3522',
+            point_client_lat='48.8606', point_client_lng='2.3376', distance_totale=5.0
+        )
+        self.points = [
+            PointDynamique.objects.create(
+                liaison=self.liaison, type_point=type_point, nom=f'P{ordre}', ordre=ordre,
+                latitude='48.857', longitude='2.35', distance_depuis_central=distance
+            )
+            for ordre, (type_point, distance) in enumerate([('POP_LS', 0.0), ('manchon', 2.0), ('ONT', 5.0)])
+        ]
+        self.manchon = DetailManchon.objects.create(
+            point_dynamique=self.points[1], capacite_cable_entrant=48, couleur_toron_entrant='blue',
+            couleur_brin_entrant='blue', capacite_cable_sortant=48, couleur_toron_sortant='blue',
+            couleur_brin_sortant='blue', moue_cable=50
+        )
+    
+    def test_moue_maintenue(self):
+        ont = PointDynamique.objects.get(id=self.points[2].id)
+        self.assertEqual(PointDynamique.objects.get(id=self.points[1].id).moue_cable_totale, 50)
+        self.assertAlmostEqual(ont.distance_optique_depuis_central, 5.05)
+        
+        # Une instance chargée avant la modification ne réécrit pas le profil
+        serializer = PointDynamiqueCreateSerializer(self.points[1], data={'nom': 'Manchon 1'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.manchon.moue_cable = 20
+        self.manchon.save()
+        ont.refresh_from_db()
+        self.assertAlmostEqual(ont.distance_optique_depuis_central, 5.02)
+        
+        self.manchon.delete()
+        ont.refresh_from_db()
+        self.assertAlmostEqual(ont.distance_optique_depuis_central, 5.0)
+        
+        # Un point ajouté après le manchon tient compte de sa moue
+        point = PointDynamique.objects.create(
+            liaison=self.liaison, type_point='chambre', nom='P3', ordre=3,
+            latitude='48.857', longitude='2.35', distance_depuis_central=6.0
+        )
+        self.assertAlmostEqual(point.distance_optique_depuis_central, 6.0)
+    
+    def test_profil_en_lecture_seule(self):
+        serializer = PointDynamiqueCreateSerializer(
+            self.points[1], data={'moue_cable_totale': 0, 'distance_optique_depuis_central': 9.0}, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        point = PointDynamique.objects.get(id=self.points[1].id)
+        self.assertEqual((point.moue_cable_totale, point.distance_optique_depuis_central), (50, 2.0))
+        
+        # Un enregistrement complet d'une ligne supprimée entre-temps la recrée
+        ont = self.points[2]
+        PointDynamique.objects.filter(id=ont.id).delete()
+        ont.save()
+        self.assertTrue(PointDynamique.objects.filter(id=ont.id).exists())
+    
+    def test_distance_absolue_sans_moue(self):
+        mesure = MesureOTDR.objects.create(
+            liaison=self.liaison, distance_coupure=3.55, attenuation=1.0, type_evenement='coupure',
+            position_technicien='central', direction_analyse='vers_client'
+        )
+        self.assertAlmostEqual(CoupureService._calculer_distance_absolue(mesure, 3.55), 3.5)
+        
+        mesure.position_technicien = 'client'
+        mesure.direction_analyse = 'vers_central'
+        self.assertAlmostEqual(CoupureService._calculer_distance_absolue(mesure, 1.5), 3.5)
+        # Coupure dans la moue du manchon
+        self.assertAlmostEqual(CoupureService._calculer_distance_absolue(mesure, 3.02), 2.0)
+    
+    def test_recalcul_distances(self):
+        Segment.objects.create(
+            liaison=self.liaison, point_depart=self.points[0], point_arrivee=self.points[1],
+            distance_gps=2.0, distance_cable=2.5
+        )
+        Segment.objects.create(
+            liaison=self.liaison, point_depart=self.points[1], point_arrivee=self.points[2],
+            distance_gps=3.0, distance_cable=3.0
+        )
+        SegmentService.recalculer_distances_cumulees(self.liaison)
+        
+        profil = ProfilOptiqueService.profil(self.liaison)
+        self.assertEqual(profil['distances'], [0.0, 2.5, 5.5])
+        self.assertAlmostEqual(ProfilOptiqueService.vers_distance_optique(profil, 5.5), 5.55)
+    
+    def creer_segments(self):
+        for depart, arrivee, longueur in zip(self.points, self.points[1:], [2.5, 3.0]):
+            Segment.objects.create(
+                liaison=self.liaison, point_depart=depart, point_arrivee=arrivee,
+                distance_gps=longueur, distance_cable=longueur
+            )
+    
+    def test_recalcul_requetes_groupees(self):
+        self.creer_segments()
+        with CaptureQueriesContext(connection) as requetes:
+            modifies = SegmentService.recalculer_distances_cumulees(self.liaison)
+        self.assertEqual(modifies, 2)
+        self.assertEqual(len([r for r in requetes if not r['sql'].startswith(('SAVEPOINT', 'RELEASE'))]), 3)
+        
+        # Un second passage ne réécrit rien
+        self.assertEqual(SegmentService.recalculer_distances_cumulees(self.liaison), 0)
+    
+    def test_recalcul_reseau(self):
+        self.creer_segments()
+        for processus in (1, 2):
+            PointDynamique.objects.update(distance_depuis_central=0.0, distance_optique_depuis_central=0.0)
+            SegmentService.recalculer_reseau(processus=processus, taille_lot=1)
+            distances = list(self.liaison.points_dynamiques.order_by('ordre').values_list(
+                'distance_depuis_central', 'distance_optique_depuis_central'))
+            self.assertEqual([distance for distance, _ in distances], [0.0, 2.5, 5.5])
+            self.assertAlmostEqual(distances[2][1], 5.55)
+
+
+class ImpactCoupureTest(APITestCase):
+    """Tests pour l'analyse d'impact d'une coupure sur les liaisons du même corridor"""
+    
+    def setUp(self):
+        ImpactCoupureService._index = None
+        self.user = User.objects.create_user(username='superviseur', password='test', role='superviseur')
+        self.client.force_authenticate(user=self.user)
+        type_liaison = TypeLiaison.objects.create(type='LS')
+        
+        # Trois liaisons : deux dans la même tranchée, une à 1 km
+        self.liaisons = []
+        for numero, decalage_lng in enumerate([0.0, 0.0001, 0.013]):
+            client = Client.objects.create(
+                name=f'Client {numero}', type_client='LS', type_organisation='entreprise',
+                address='123 Test Street', phone='+33123456789'
+            )
+            liaison = Liaison.objects.create(
+                nom_liaison=f'LIA00{numero}', client=client, type_liaison=type_liaison,
+                point_central_lat='48.8500', point_central_lng='2.3500',
+                point_client_lat='48.8600', point_client_lng='2.3500'
+            )
+            depart = PointDynamique.objects.create(
+                liaison=liaison, type_point='POP_LS', nom='Départ', ordre=0,
+                latitude='48.8500', longitude=str(2.35 + decalage_lng), distance_depuis_central=0.0
+            )
+            arrivee = PointDynamique.objects.create(
+                liaison=liaison, type_point='ONT', nom='Arrivée', ordre=1,
+                latitude='48.8600', longitude=str(2.35 + decalage_lng), distance_depuis_central=1.2
+            )
+            Segment.objects.create(
+                liaison=liaison, point_depart=depart, point_arrivee=arrivee,
+                distance_gps=1.1, distance_cable=1.2
+            )
+            self.liaisons.append(liaison)
+        
+        mesure = MesureOTDR.objects.create(
+            liaison=self.liaisons[0], distance_coupure=0.6, attenuation=1.0, type_evenement='coupure',
+            position_technicien='central', direction_analyse='vers_client'
+        )
+        self.coupure = CoupureService.creer_coupure(mesure)
+    
+    def test_analyser_impact(self):
+        impacts = ImpactCoupureService.analyser_impact(self.coupure)
+        
+        self.assertEqual([impact['liaison_id'] for impact in impacts], [self.liaisons[1].id])
+        self.assertEqual(impacts[0]['element'], 'segment')
+        self.assertAlmostEqual(impacts[0]['distance_m'], 7.3, delta=0.5)
+        self.assertAlmostEqual(impacts[0]['distance_depuis_central'], 0.6, places=2)
+    
+    def test_index_mis_a_jour(self):
+        ImpactCoupureService.index()
+        # Le tracé relevé de la troisième liaison emprunte la tranchée
+        segment = self.liaisons[2].segments.get()
+        segment.trace_coords = [[48.85, 2.363], [48.855, 2.3501], [48.86, 2.363]]
+        with self.captureOnCommitCallbacks(execute=True):
+            segment.save()
+        
+        impacts = ImpactCoupureService.analyser_impact(self.coupure)
+        self.assertEqual(len(impacts), 2)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            segment.delete()
+        impacts = ImpactCoupureService.analyser_impact(self.coupure)
+        self.assertEqual(len(impacts), 1)
+    
+    def test_index_ignore_ecritures_annulees(self):
+        ImpactCoupureService.index()
+        segment = self.liaisons[2].segments.get()
+        segment.trace_coords = [[48.85, 2.363], [48.855, 2.3501], [48.86, 2.363]]
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    segment.save()
+                    raise IntegrityError('lot refusé')
+            except IntegrityError:
+                pass
+        
+        impacts = ImpactCoupureService.analyser_impact(self.coupure)
+        self.assertEqual(len(impacts), 1)
+    
+    def test_ouvrir_coupures_liees(self):
+        url = reverse('coupure-impact', kwargs={'pk': self.coupure.id})
+        response = self.client.post(url, {'rayon_m': 50, 'ouvrir_coupures': True}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['nombre_clients'], 1)
+        self.assertEqual(len(response.data['coupures_liees']), 1)
+        coupure_liee = Coupure.objects.get(coupure_origine=self.coupure)
+        self.assertEqual(coupure_liee.liaison, self.liaisons[1])
+        self.assertEqual(Notification.objects.filter(priorite='urgente').count(), 1)
+        
+        # Les coupures déjà ouvertes ne sont pas dupliquées
+        response = self.client.post(url, {'ouvrir_coupures': True}, format='json')
+        self.assertEqual(response.data['coupures_liees'], [])
+    
+    def test_coupure_liee_hors_fusion(self):
+        url = reverse('coupure-impact', kwargs={'pk': self.coupure.id})
+        self.client.post(url, {'rayon_m': 50, 'ouvrir_coupures': True}, format='json')
+        coupure_liee = Coupure.objects.get(coupure_origine=self.coupure)
+        self.assertIsNone(coupure_liee.mesure_otdr)
+        
+        # La fusion sur la liaison d'origine ne remplace que ses propres coupures
+        mesure_client = MesureOTDR.objects.create(
+            liaison=self.liaisons[0], distance_coupure=0.6, attenuation=1.0, type_evenement='coupure',
+            position_technicien='client', direction_analyse='vers_central'
+        )
+        fusionnee = FusionOTDRService.fusionner(mesure_client)
+        self.assertIsNotNone(fusionnee)
+        self.coupure.refresh_from_db()
+        coupure_liee.refresh_from_db()
+        self.assertEqual(self.coupure.remplacee_par, fusionnee)
+        self.assertIsNone(coupure_liee.remplacee_par)
+        
+        response = self.client.post(reverse('coupure-recalculer-position', kwargs={'pk': coupure_liee.id}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CriticiteCorridorTest(APITestCase):
+    """Tests pour l'indice de criticité des corridors"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='superviseur', password='test', role='superviseur')
+        self.client.force_authenticate(user=self.user)
+        type_liaison = TypeLiaison.objects.create(type='LS')
+        
+        # Deux liaisons partent du même POP et passent par la même chambre, puis divergent
+        self.liaisons = []
+        for numero, (decalage, lat_client, lng_client) in enumerate([(0.0, 48.86, 2.35), (0.00001, 48.855, 2.36)]):
+            client = Client.objects.create(
+                name=f'Client {numero}', type_client='LS', type_organisation='entreprise',
+                address='123 Test Street', phone='+33123456789'
+            )
+            liaison = Liaison.objects.create(
+                nom_liaison=f'LIA00{numero}', client=client, type_liaison=type_liaison,
+                point_central_lat='48.8500', point_central_lng='2.3500',
+                point_client_lat=str(lat_client), point_client_lng=str(lng_client)
+            )
+            coordonnees = [(48.85, 2.35 + decalage), (48.855, 2.35 + decalage), (lat_client, lng_client)]
+            points = [
+                PointDynamique.objects.create(
+                    liaison=liaison, type_point=type_point, nom=type_point, ordre=ordre,
+                    latitude=str(lat), longitude=str(lng), distance_depuis_central=0.6 * ordre
+                )
+                for ordre, (type_point, (lat, lng)) in enumerate(zip(['POP_LS', 'chambre', 'ONT'], coordonnees))
+            ]
+            for depart, arrivee in zip(points, points[1:]):
+                Segment.objects.create(
+                    liaison=liaison, point_depart=depart, point_arrivee=arrivee,
+                    distance_gps=0.55, distance_cable=0.6
+                )
+            self.liaisons.append(liaison)
+    
+    def test_regrouper_sites(self):
+        site_par_point, sites = regrouper_sites(
+            [('a', 48.85, 2.35), ('b', 48.85, 2.35004), ('c', 48.85, 2.35008), ('d', 48.86, 2.35)], 5
+        )
+        
+        # Regroupement transitif : a-b et b-c à 3 m, a-c à 6 m
+        self.assertEqual(len(sites), 2)
+        self.assertEqual(site_par_point['a'], site_par_point['c'])
+        self.assertNotEqual(site_par_point['a'], site_par_point['d'])
+        self.assertAlmostEqual(sites[site_par_point['a']][1], 2.35004, places=6)
+    
+    def test_calculer(self):
+        nombre = CriticiteCorridorService.calculer(processus=1)
+        
+        # Un corridor partagé et deux antennes propres à chaque liaison
+        self.assertEqual(nombre, 3)
+        corridor = CorridorCriticite.objects.first()
+        self.assertEqual(corridor.nombre_liaisons, 2)
+        self.assertEqual(corridor.nombre_clients, 2)
+        self.assertEqual(corridor.nombre_segments, 2)
+        self.assertEqual(set(corridor.liaisons), {str(liaison.id) for liaison in self.liaisons})
+        
+        # Le recalcul remplace l'indice précédent
+        CriticiteCorridorService.calculer(processus=1)
+        self.assertEqual(CorridorCriticite.objects.count(), 3)
+    
+    def test_corridors_critiques(self):
+        CriticiteCorridorService.calculer(processus=1)
+        url = reverse('corridors-critiques')
+        
+        response = self.client.get(url, {'limite': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_corridors'], 3)
+        self.assertEqual(len(response.data['corridors']), 2)
+        self.assertEqual(sorted(response.data['corridors'][0]['nom_liaisons']), ['LIA000', 'LIA001'])
+        
+        response = self.client.get(url, {'tri': 'distance'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class GrapheReseauTest(APITestCase):
+    """Tests pour le graphe des sites partagés entre liaisons"""
+    
+    def setUp(self):
+        GrapheReseauService._graphe = None
+        self.user = User.objects.create_user(username='superviseur', password='test', role='superviseur')
+        self.client.force_authenticate(user=self.user)
+        type_liaison = TypeLiaison.objects.create(type='LS')
+        
+        # Deux liaisons entre le même POP et le même bâtiment forment un anneau,
+        # une troisième est isolée à plusieurs kilomètres
+        parcours = [
+            [(48.85, 2.35), (48.855, 2.35), (48.86, 2.35)],
+            [(48.85, 2.35001), (48.855, 2.357), (48.86, 2.35001)],
+            [(48.90, 2.40), (48.91, 2.40)],
+        ]
+        self.liaisons, self.points, self.segments = [], [], []
+        for numero, coordonnees in enumerate(parcours):
+            client = Client.objects.create(
+                name=f'Client {numero}', type_client='LS', type_organisation='entreprise',
+                address='123 Test Street', phone='+33123456789'
+            )
+            liaison = Liaison.objects.create(
+                nom_liaison=f'LIA00{numero}', client=client, type_liaison=type_liaison,
+                point_central_lat=str(coordonnees[0][0]), point_central_lng=str(coordonnees[0][1]),
+                point_client_lat=str(coordonnees[-1][0]), point_client_lng=str(coordonnees[-1][1])
+            )
+            points = [
+                PointDynamique.objects.create(
+                    liaison=liaison, type_point='chambre', nom=f'Point {ordre}', ordre=ordre,
+                    latitude=str(lat), longitude=str(lng), distance_depuis_central=0.6 * ordre
+                )
+                for ordre, (lat, lng) in enumerate(coordonnees)
+            ]
+            segments = [
+                Segment.objects.create(
+                    liaison=liaison, point_depart=depart, point_arrivee=arrivee,
+                    distance_gps=0.55 + 0.1 * numero, distance_cable=0.6 + 0.1 * numero
+                )
+                for depart, arrivee in zip(points, points[1:])
+            ]
+            self.liaisons.append(liaison)
+            self.points.append(points)
+            self.segments.append(segments)
+    
+    def test_graphe_csr(self):
+        graphe = GrapheCSR(4, [(0, 1, 1.0), (1, 2, 1.0), (0, 2, 5.0)])
+        
+        self.assertEqual(list(graphe.indptr), [0, 2, 4, 6, 6])
+        self.assertEqual(graphe.plus_court_chemin(0, 2), (2.0, [0, 1, 2], [0, 1]))
+        self.assertEqual(graphe.plus_court_chemin(0, 2, {1})[1], [0, 2])
+        self.assertIsNone(graphe.plus_court_chemin(0, 3))
+        self.assertEqual(list(graphe.composantes()), [0, 0, 0, 1])
+    
+    def test_chemin_de_reroutage(self):
+        url = reverse('graphe-chemin')
+        pop, batiment = self.points[0][0], self.points[0][2]
+        
+        response = self.client.get(url, {'depart': pop.id, 'arrivee': batiment.id})
+        self.assertTrue(response.data['chemin_trouve'])
+        self.assertAlmostEqual(response.data['distance_km'], 1.2)
+        self.assertIn(str(self.points[1][0].id), response.data['sites'][0]['points'])
+        
+        # Sans le dernier segment de LIA000, le chemin passe par le manchon de LIA001
+        response = self.client.get(url, {
+            'depart': pop.id, 'arrivee': batiment.id, 'exclure_segments': str(self.segments[0][1].id)
+        })
+        self.assertAlmostEqual(response.data['distance_km'], 1.4)
+        self.assertEqual(
+            {liaison for corridor in response.data['corridors'] for liaison in corridor['liaisons']},
+            {str(self.liaisons[1].id)}
+        )
+        
+        response = self.client.get(url, {'depart': pop.id, 'arrivee': self.points[2][0].id})
+        self.assertFalse(response.data['chemin_trouve'])
+    
+    def test_isolement_defaut(self):
+        url = reverse('graphe-atteignables')
+        pop = self.points[0][0]
+        
+        response = self.client.get(url, {'depart': pop.id, 'exclure_segments': str(self.segments[0][0].id)})
+        self.assertEqual(response.data['nombre_sites_isoles'], 0)
+        self.assertEqual(response.data['liaisons_reroutables'], [str(self.liaisons[0].id)])
+        
+        exclus = ','.join(str(segment.id) for segment in self.segments[0])
+        response = self.client.get(url, {'depart': pop.id, 'exclure_segments': exclus})
+        self.assertEqual(response.data['nombre_sites_isoles'], 1)
+        self.assertEqual(response.data['liaisons_isolees'], [str(self.liaisons[0].id)])
+        self.assertEqual(response.data['liaisons_reroutables'], [])
+    
+    def test_composantes_et_invalidation(self):
+        url = reverse('graphe-composantes')
+        
+        response = self.client.get(url)
+        self.assertEqual(response.data['nombre_composantes'], 2)
+        self.assertEqual(response.data['tailles'], [4, 2])
+        
+        self.segments[2][0].delete()
+        response = self.client.get(url)
+        self.assertEqual(response.data['nombre_composantes'], 3)
+        
+        response = self.client.get(reverse('graphe-atteignables'), {'depart': self.points[2][0].id})
+        self.assertEqual(response.data['nombre_sites_atteignables'], 1)
+
+
+class BilanOptiqueTest(APITestCase):
+    """Tests pour le bilan de puissance optique des liaisons"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='superviseur', password='test', role='superviseur')
+        self.client.force_authenticate(user=self.user)
+        client = Client.objects.create(
+            name='Client Test', type_client='LS', type_organisation='entreprise',
+            address='123 Test Street', phone='+33123456789'
+        )
+        self.liaison = Liaison.objects.create(
+            nom_liaison='LIA001', client=client, type_liaison=TypeLiaison.objects.create(type='LS'),
+            point_central_lat='48.8500', point_central_lng='2.3500',
+            point_client_lat='48.9400', point_client_lng='2.3500'
+        )
+        points = [
+            PointDynamique.objects.create(
+                liaison=self.liaison, type_point=type_point, nom=type_point, ordre=ordre,
+                latitude=str(48.85 + 0.03 * ordre), longitude='2.3500', distance_depuis_central=distance
+            )
+            for ordre, (type_point, distance) in enumerate([('POP_LS', 0.0), ('manchon', 4.0), ('FDT', 7.0), ('ONT', 10.0)])
+        ]
+        DetailPOPLS.objects.create(
+            point_dynamique=points[0], nombre_brins_convertisseur=1, type_connecteur_convertisseur='SC',
+            nombre_brins_tiroir=1, capacite_cable=12, couleur_toron='blue', couleur_brin='blue',
+            numero_port_tiroir=1, type_connecteur_tiroir='LC'
+        )
+        for depart, arrivee in zip(points, points[1:]):
+            Segment.objects.create(
+                liaison=self.liaison, point_depart=depart, point_arrivee=arrivee,
+                distance_gps=arrivee.distance_depuis_central - depart.distance_depuis_central,
+                distance_cable=arrivee.distance_depuis_central - depart.distance_depuis_central
+            )
+    
+    def test_calculer(self):
+        BilanOptiqueService.calculer()
+        bilan = BilanOptique.objects.get(liaison=self.liaison)
+        
+        # 10 km × 0.35 + 1 épissure × 0.1 + 2 cassettes × 0.5 + SC 0.3 + LC 0.3
+        self.assertEqual(bilan.nombre_epissures, 1)
+        self.assertEqual(bilan.nombre_connecteurs, 2)
+        self.assertEqual(bilan.nombre_passages_cassette, 2)
+        self.assertAlmostEqual(bilan.perte_attendue_db, 5.2)
+        self.assertAlmostEqual(bilan.marge_db, 9.8)
+        self.assertEqual(bilan.statut, 'ok')
+        self.assertIsNone(bilan.attenuation_mesuree_db)
+    
+    def test_comparaison_mesure_et_parametres(self):
+        MesureOTDR.objects.create(
+            liaison=self.liaison, distance_coupure=10.0, attenuation=13.0, type_evenement='attenuation',
+            position_technicien='central', direction_analyse='vers_client'
+        )
+        # Une mesure de coupure ne couvre pas toute la fibre
+        MesureOTDR.objects.create(
+            liaison=self.liaison, distance_coupure=3.0, attenuation=1.0, type_evenement='coupure',
+            position_technicien='central', direction_analyse='vers_client'
+        )
+        BilanOptiqueService.calculer()
+        bilan = BilanOptique.objects.get(liaison=self.liaison)
+        self.assertAlmostEqual(bilan.ecart_db, 7.8)
+        self.assertAlmostEqual(bilan.marge_db, 2.0)
+        self.assertEqual(bilan.statut, 'alerte')
+        
+        ParametreApplication.objects.create(type_parametre='otdr', cle='bilan_budget_ls_db', valeur='12')
+        BilanOptiqueService.calculer()
+        bilan.refresh_from_db()
+        self.assertEqual(bilan.statut, 'depasse')
+        self.assertEqual(BilanOptique.objects.count(), 1)
+    
+    def test_bilans_optiques(self):
+        BilanOptiqueService.calculer()
+        url = reverse('bilans-optiques')
+        
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total'], 1)
+        self.assertEqual(response.data['bilans'][0]['nom_liaison'], 'LIA001')
+        
+        response = self.client.get(url, {'statut': 'depasse'})
+        self.assertEqual(response.data['bilans'], [])
+
+
+class ContinuiteFibreTest(APITestCase):
+    """Tests pour le contrôle de continuité des toron/brin le long des liaisons"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='technicien', password='test', role='technicien')
+        self.client.force_authenticate(user=self.user)
+        client = Client.objects.create(
+            name='Client Test', type_client='LS', type_organisation='entreprise',
+            address='123 Test Street', phone='+33123456789'
+        )
+        self.liaison = Liaison.objects.create(
+            nom_liaison='LIA001', client=client, type_liaison=TypeLiaison.objects.create(type='LS'),
+            point_central_lat='48.8500', point_central_lng='2.3500',
+            point_client_lat='48.8600', point_client_lng='2.3500'
+        )
+        self.pop, self.chambre, self.manchon = [
+            PointDynamique.objects.create(
+                liaison=self.liaison, type_point=type_point, nom=type_point, ordre=ordre,
+                latitude=str(48.85 + 0.005 * ordre), longitude='2.3500'
+            )
+            for ordre, type_point in enumerate(['POP_LS', 'chambre', 'manchon'])
+        ]
+        DetailPOPLS.objects.create(
+            point_dynamique=self.pop, nombre_brins_convertisseur=1, type_connecteur_convertisseur='SC',
+            nombre_brins_tiroir=1, capacite_cable=48, couleur_toron='orange', couleur_brin='vert',
+            numero_port_tiroir=1, type_connecteur_tiroir='LC'
+        )
+        DetailChambre.objects.create(
+            point_dynamique=self.chambre,
+            capacite_cable_central=48, couleur_toron_central='orange', couleur_brin_central='vert',
+            capacite_cable_client=12, couleur_toron_client='blue', couleur_brin_client='rouge'
+        )
+    
+    def test_verifier(self):
+        self.assertEqual(ContinuiteFibreService.verifier()['nombre_anomalies'], 0)
+        
+        # Le manchon reçoit un autre brin que celui sortant de la chambre, et un toron inexistant en 12 FO
+        DetailManchon.objects.create(
+            point_dynamique=self.manchon,
+            capacite_cable_entrant=12, couleur_toron_entrant='blue', couleur_brin_entrant='noir',
+            capacite_cable_sortant=12, couleur_toron_sortant='orange', couleur_brin_sortant='noir'
+        )
+        rapport = ContinuiteFibreService.verifier([self.liaison.id])
+        
+        self.assertEqual(rapport['nombre_points_verifies'], 3)
+        discontinuite, hors_capacite = rapport['anomalies']
+        self.assertEqual(discontinuite['type'], 'discontinuite')
+        self.assertEqual(discontinuite['point_amont']['id'], self.chambre.id)
+        self.assertEqual(discontinuite['ecarts'], ['brin'])
+        self.assertEqual(discontinuite['aval']['couleur_brin'], 'noir')
+        self.assertEqual(hors_capacite['type'], 'hors_capacite')
+        self.assertEqual(hors_capacite['cote'], 'sortie')
+        
+        response = self.client.get(reverse('continuite-fibre'), {'liaison': self.liaison.id})
+        self.assertEqual(response.data['nombre_anomalies'], 2)
+    
+    def test_controle_avant_mise_a_jour_details(self):
+        url = reverse('point-details', args=[self.chambre.id])
+        
+        response = self.client.put(url, {'couleur_toron_central': 'vert'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['anomalies'][0]['ecarts'], ['toron'])
+        self.chambre.detail_chambre.refresh_from_db()
+        self.assertEqual(self.chambre.detail_chambre.couleur_toron_central, 'orange')
+        
+        response = self.client.put(url, {'couleur_toron_central': 'vert', 'ignorer_continuite': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        # L'anomalie déjà enregistrée ne bloque pas une modification qui n'y touche pas
+        response = self.client.put(url, {'moue_cable_central': 3}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.put(url, {'couleur_brin_central': 'rouge'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        
+        response = self.client.put(url, {'couleur_toron_central': 'orange', 'moue_cable_central': 5}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class InventaireBrinsTest(APITestCase):
+    """Tests pour l'inventaire des brins par portée de câble"""
+    
+    def setUp(self):
+        GrapheReseauService._graphe = None
+        InventaireBrinsService._index = None
+        self.user = User.objects.create_user(username='superviseur', password='test', role='superviseur')
+        self.client.force_authenticate(user=self.user)
+        type_liaison = TypeLiaison.objects.create(type='LS')
+        
+        # Deux liaisons sur les brins bleu et orange du même câble 12 FO jusqu'à la chambre
+        self.points = []
+        for numero, (brin, lng_client) in enumerate([('blue', 2.35), ('orange', 2.36)]):
+            client = Client.objects.create(
+                name=f'Client {numero}', type_client='LS', type_organisation='entreprise',
+                address='123 Test Street', phone='+33123456789'
+            )
+            liaison = Liaison.objects.create(
+                nom_liaison=f'LIA00{numero}', client=client, type_liaison=type_liaison,
+                point_central_lat='48.8500', point_central_lng='2.3500',
+                point_client_lat='48.8600', point_client_lng=str(lng_client)
+            )
+            points = [
+                PointDynamique.objects.create(
+                    liaison=liaison, type_point=type_point, nom=type_point, ordre=ordre,
+                    latitude=str(lat), longitude=str(lng)
+                )
+                for ordre, (type_point, lat, lng) in enumerate(
+                    [('POP_LS', 48.85, 2.35), ('chambre', 48.855, 2.35), ('ONT', 48.86, lng_client)]
+                )
+            ]
+            DetailPOPLS.objects.create(
+                point_dynamique=points[0], nombre_brins_convertisseur=1, type_connecteur_convertisseur='SC',
+                nombre_brins_tiroir=1, capacite_cable=12, couleur_toron='blue', couleur_brin=brin,
+                numero_port_tiroir=1, type_connecteur_tiroir='LC'
+            )
+            DetailChambre.objects.create(
+                point_dynamique=points[1],
+                capacite_cable_central=12, couleur_toron_central='blue', couleur_brin_central=brin,
+                capacite_cable_client=12, couleur_toron_client='blue', couleur_brin_client=brin
+            )
+            for depart, arrivee in zip(points, points[1:]):
+                Segment.objects.create(
+                    liaison=liaison, point_depart=depart, point_arrivee=arrivee, distance_gps=0.6, distance_cable=0.6
+                )
+            self.points.append(points)
+    
+    def test_calculer(self):
+        self.assertEqual(InventaireBrinsService.calculer(), 3)
+        
+        partage = TronconCable.objects.first()
+        self.assertEqual(partage.nombre_brins_occupes, 2)
+        self.assertEqual(bytes(partage.occupation), bytes([0b11, 0]))
+        self.assertEqual(len(partage.segments), 2)
+        self.assertEqual(partage.conflits, [])
+    
+    def test_brins_libres(self):
+        InventaireBrinsService.calculer()
+        url = reverse('brins-libres')
+        
+        response = self.client.get(url, {'depart': self.points[0][0].id, 'arrivee': self.points[0][1].id})
+        self.assertEqual(response.data['nombre_brins_libres'], 10)
+        self.assertEqual(response.data['brins_libres'][0], {'numero': 3, 'couleur_toron': 'blue', 'couleur_brin': 'vert'})
+        
+        # Jusqu'au client de LIA001 : ET entre la portée partagée et sa portée propre
+        response = self.client.get(url, {'depart': self.points[0][0].id, 'arrivee': self.points[1][2].id})
+        self.assertEqual(response.data['nombre_corridors'], 2)
+        self.assertEqual(response.data['nombre_brins_libres'], 10)
+        self.assertEqual(response.data['capacite_min'], 12)
+        
+        response = self.client.get(url, {'depart': self.points[0][0].id, 'arrivee': self.points[0][1].id, 'capacite': 48})
+        self.assertEqual(response.data['corridors_non_inventories'], 1)
+        self.assertEqual(response.data['nombre_brins_libres'], 0)
+        
+        response = self.client.get(reverse('inventaire-brins'))
+        self.assertEqual(response.data['par_capacite'][0]['brins_occupes'], 4)
+    
+    def test_brins_libres_par_cable_continu(self):
+        # Deux câbles parallèles jusqu'à la chambre, LIA001 seul continue vers son client
+        def troncon(liaison, depart, masque):
+            segment = Segment.objects.get(liaison=self.points[liaison][0].liaison, point_depart=self.points[liaison][depart])
+            return TronconCable.objects.create(
+                site_depart_lat=0, site_depart_lng=0, site_arrivee_lat=0, site_arrivee_lng=0, capacite=12,
+                occupation=masque_vers_octets(masque, 12), segments=[str(segment.id)], calcule_le=timezone.now()
+            )
+        troncon(0, 0, 0b000000111111)
+        troncon(1, 0, 0b111111000000)
+        propre = troncon(1, 1, 0)
+        url = reverse('brins-libres')
+        
+        response = self.client.get(url, {'depart': self.points[0][0].id, 'arrivee': self.points[1][2].id})
+        self.assertEqual(response.data['statut'], 'inventorie')
+        self.assertEqual([brin['numero'] for brin in response.data['brins_libres']], [1, 2, 3, 4, 5, 6])
+        
+        # Portée finale non inventoriée : aucun brin garanti
+        propre.delete()
+        InventaireBrinsService._index = None
+        response = self.client.get(url, {'depart': self.points[0][0].id, 'arrivee': self.points[1][2].id})
+        self.assertEqual(response.data['statut'], 'inconnu')
+        self.assertEqual(response.data['corridors_non_inventories'], 1)
+        self.assertEqual(response.data['nombre_brins_libres'], 0)
+
+
+class OccupationPortsTest(APITestCase):
+    """Tests pour l'index d'occupation des ports de cassettes et splitters"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='commercial', password='test', role='superviseur')
+        self.client.force_authenticate(user=self.user)
+        client = Client.objects.create(
+            name='Client Test', type_client='FTTH', type_organisation='particulier',
+            address='123 Test Street', phone='+33123456789'
+        )
+        liaison = Liaison.objects.create(
+            nom_liaison='FTTH001', client=client, type_liaison=TypeLiaison.objects.create(type='FTTH'),
+            point_central_lat='48.8500', point_central_lng='2.3500',
+            point_client_lat='48.8600', point_client_lng='2.3500'
+        )
+        self.point_fdt = PointDynamique.objects.create(
+            liaison=liaison, type_point='FDT', nom='FDT 01', ordre=1, latitude='48.855', longitude='2.35'
+        )
+        self.cle_cassette = ('cassette_fdt', 'FDT01', 2)
+    
+    def creer_fdt(self, **valeurs):
+        champs = dict(
+            point_dynamique=self.point_fdt, numero_fdt='FDT01',
+            capacite_cable_transport=48, couleur_brin_transport='blue', couleur_toron_transport='blue',
+            cassette_transport=1, port_cassette_transport=1,
+            capacite_cable_distribution=12, couleur_brin_distribution='blue', couleur_toron_distribution='blue',
+            cassette_distribution=2, port_cassette_distribution=1
+        )
+        champs.update(valeurs)
+        return DetailFDT.objects.create(**champs)
+    
+    def test_maintenu_a_l_enregistrement(self):
+        detail = self.creer_fdt()
+        FAT.objects.create(
+            numero_fat='FAT001', numero_fdt='FDT01', latitude='48.856', longitude='2.35',
+            port_splitter='P3', capacite_cable_entrant=12, couleur_toron='blue', couleur_brin='blue'
+        )
+        
+        self.assertEqual(OccupationPortsService.disponibilite(self.cle_cassette)['premier_port_libre'], 2)
+        splitter = OccupationPorts.objects.get(equipement='splitter', reference='FAT001')
+        self.assertEqual(splitter.masque, 0b100)
+        self.assertEqual(splitter.nombre_ports, 8)
+        
+        # Changement de port : l'ancien est libéré
+        detail.port_cassette_distribution = 4
+        detail.save()
+        occupation = OccupationPorts.objects.get(equipement='cassette_fdt', reference='FDT01', numero=2)
+        self.assertEqual(occupation.masque, 0b1000)
+        self.assertEqual(occupation.occupants, {'4': f'detail_fdt:{detail.pk}:distribution'})
+        
+        detail.delete()
+        occupation.refresh_from_db()
+        self.assertEqual(occupation.nombre_occupes, 0)
+    
+    def test_allocation_et_conflit(self):
+        url = reverse('allouer-port')
+        donnees = {'equipement': 'cassette_fdt', 'reference': 'FDT01', 'numero': 2}
+        
+        ports = [self.client.post(url, donnees, format='json').data['port'] for _ in range(12)]
+        self.assertEqual(ports, list(range(1, 13)))
+        response = self.client.post(url, donnees, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        
+        # Un équipement enregistré remplace la réservation de son port
+        self.creer_fdt()
+        occupation = OccupationPorts.objects.get(equipement='cassette_fdt', reference='FDT01', numero=2)
+        self.assertTrue(occupation.occupants['1'].startswith('detail_fdt:'))
+        
+        self.assertFalse(OccupationPortsService.occuper(self.cle_cassette, 1, 'pop_ftth:autre'))
+        occupation.refresh_from_db()
+        self.assertEqual(occupation.conflits, ['pop_ftth:autre'])
+        
+        response = self.client.post(reverse('liberer-port'), {**donnees, 'port': 5}, format='json')
+        self.assertEqual(response.data['ports_libres'], [5])
+        
+        # Le port d'un équipement enregistré ne se libère pas par l'API, ni un port hors limites
+        response = self.client.post(reverse('liberer-port'), {**donnees, 'port': 1}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        response = self.client.post(reverse('liberer-port'), {**donnees, 'port': 0}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        response = self.client.get(reverse('utilisation-ports'), {'reference': 'FDT01'})
+        self.assertEqual(response.data['references'][0]['nombre_conflits'], 1)
+        self.assertEqual(len(response.data['equipements_satures']), 1)
+    
+    def test_reconstruction_garde_les_reservations(self):
+        OccupationPortsService.allouer(self.cle_cassette, 'reservation:commercial')
+        OccupationPortsService.allouer(self.cle_cassette, 'reservation:commercial')
+        self.creer_fdt()
+        
+        OccupationPortsService.reconstruire()
+        occupation = OccupationPorts.objects.get(equipement='cassette_fdt', reference='FDT01', numero=2)
+        # Le port 1 revient à la FDT, la réservation du port 2 est conservée
+        self.assertEqual(occupation.masque, 0b11)
+        self.assertEqual(occupation.occupants['2'], 'reservation:commercial')
+        self.assertTrue(occupation.occupants['1'].startswith('detail_fdt:'))
+    
+    def test_ecriture_concurrente_rejouee(self):
+        tentatives = []
+        
+        def modification(occupation):
+            tentatives.append(occupation.version)
+            if len(tentatives) == 1:
+                # Une autre requête occupe le port 1 entre la lecture et l'écriture
+                OccupationPorts.objects.filter(id=occupation.id).update(masque=1, version=F('version') + 1)
+            libres = ~occupation.masque & 0xFFF
+            port = (libres & -libres).bit_length()
+            occupation.masque |= 1 << (port - 1)
+            return port
+        
+        occupation, port = OccupationPortsService._modifier(self.cle_cassette, modification)
+        self.assertEqual(tentatives, [0, 1])
+        self.assertEqual(port, 2)
+        self.assertEqual(occupation.masque, 0b11)
+
+
+class ProximiteFATTest(APITestCase):
+    """Tests pour la recherche des FAT proches ayant des ports libres"""
+    
+    def setUp(self):
+        ProximiteFATService._index = None
+        self.user = User.objects.create_user(username='commercial', password='test', role='superviseur')
+        self.client.force_authenticate(user=self.user)
+        self.origine = (48.85, 2.35)
+        # Environ 71 m à l'est et 71 m au nord, 110 m au nord, 300 m au nord
+        self.fats = [
+            self.creer_fat('FAT-DIAG', 48.85 + 71 / 111195, 2.35 + 71 / (111195 * 0.6587)),
+            self.creer_fat('FAT-NORD', 48.85 + 110 / 111195, 2.35),
+            self.creer_fat('FAT-LOIN', 48.85 + 300 / 111195, 2.35),
+        ]
+    
+    def creer_fat(self, numero, lat, lng):
+        return FAT.objects.create(
+            numero_fat=numero, numero_fdt='FDT01', latitude=str(round(lat, 8)), longitude=str(round(lng, 8)),
+            port_splitter='', capacite_cable_entrant=12, couleur_toron='blue', couleur_brin='blue'
+        )
+    
+    def test_grille_plus_proches(self):
+        grille = GrilleSpatiale()
+        for numero in range(10):
+            grille.ajouter(numero, [[48.85 + numero * 0.001, 2.35]])
+        
+        self.assertEqual([cle for cle, _, _ in grille.plus_proches(48.8531, 2.35, 3)], [3, 4, 2])
+        self.assertEqual(len(grille.plus_proches(48.85, 2.35, 10, rayon_max_m=250)), 3)
+        self.assertEqual(GrilleSpatiale().plus_proches(48.85, 2.35, 3), [])
+    
+    def test_tri_et_ports_libres(self):
+        url = reverse('fats-proches')
+        position = {'latitude': self.origine[0], 'longitude': self.origine[1], 'k': 2}
+        
+        response = self.client.get(url, position)
+        self.assertEqual([fat['numero_fat'] for fat in response.data['fats']], ['FAT-DIAG', 'FAT-NORD'])
+        self.assertAlmostEqual(response.data['fats'][0]['distance_m'], 100, delta=2)
+        self.assertEqual(response.data['fats'][0]['ports_libres'], 8)
+        
+        response = self.client.get(url, {**position, 'tri': 'marche'})
+        self.assertEqual([fat['numero_fat'] for fat in response.data['fats']], ['FAT-NORD', 'FAT-DIAG'])
+        
+        # Splitter complet : la FAT suivante prend sa place
+        for _ in range(8):
+            OccupationPortsService.allouer(('splitter', 'FAT-DIAG', 0), 'reservation:test')
+        response = self.client.get(url, position)
+        self.assertEqual([fat['numero_fat'] for fat in response.data['fats']], ['FAT-NORD', 'FAT-LOIN'])
+        
+        response = self.client.get(url, {'latitude': 'nord'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_index_mis_a_jour(self):
+        ProximiteFATService.index()
+        with self.captureOnCommitCallbacks(execute=True):
+            fat = self.creer_fat('FAT-NEUF', 48.85, 2.35001)
+        self.assertEqual(ProximiteFATService.plus_proches(*self.origine, k=1)[0]['numero_fat'], 'FAT-NEUF')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            fat.delete()
+        self.assertEqual(ProximiteFATService.plus_proches(*self.origine, k=1)[0]['numero_fat'], 'FAT-DIAG')
+    
+    def test_index_ignore_fat_annulee(self):
+        ProximiteFATService.index()
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.creer_fat('FAT-NEUF', 48.85, 2.35001)
+                    raise IntegrityError('lot refusé')
+            except IntegrityError:
+                pass
+        self.assertEqual(ProximiteFATService.plus_proches(*self.origine, k=1)[0]['numero_fat'], 'FAT-DIAG')
+
+
+class ArbreFTTHTest(APITestCase):
+    """Tests pour l'arbre FTTH à chemins matérialisés"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='superviseur', password='test', role='superviseur')
+        self.client.force_authenticate(user=self.user)
+        type_ftth = TypeLiaison.objects.create(type='FTTH')
+        self.liaisons = []
+        for numero in range(2):
+            abonne = Client.objects.create(
+                name=f'Abonné {numero}', type_client='FTTH', type_organisation='particulier',
+                address='123 Test Street', phone='+33123456789'
+            )
+            liaison = Liaison.objects.create(
+                nom_liaison=f'FTTH00{numero}', client=abonne, type_liaison=type_ftth,
+                point_central_lat='48.8500', point_central_lng='2.3500',
+                point_client_lat='48.8600', point_client_lng='2.3500'
+            )
+            self.liaisons.append(liaison)
+        
+        point_pop = self.creer_point(self.liaisons[0], 'POP_FTTH', 1)
+        self.pop = DetailPOPFTTH.objects.create(
+            point_dynamique=point_pop, reference_olt='OLT-NORD', port_olt='3', reference_odf='ODF1',
+            numero_fdt='FDT12', quantieme_cassette=1, numero_port_cassette=1, capacite_cable=48,
+            couleur_toron='blue', couleur_brin='blue'
+        )
+        self.fats = [
+            FAT.objects.create(
+                numero_fat=f'FAT00{numero}', numero_fdt='FDT12', latitude='48.856', longitude='2.35',
+                port_splitter=f'P{numero + 1}', capacite_cable_entrant=12, couleur_toron='blue',
+                couleur_brin='blue', liaison=liaison
+            )
+            for numero, liaison in enumerate(self.liaisons)
+        ]
+        self.onts = [
+            DetailONT.objects.create(
+                point_dynamique=self.creer_point(liaison, 'ONT', 9), numero_serie=f'ONT-{numero}',
+                numero_ligne='0123456789', nom_ligne='Abonné', couleur_brin_fat='blue'
+            )
+            for numero, liaison in enumerate(self.liaisons)
+        ]
+    
+    def creer_point(self, liaison, type_point, ordre):
+        return PointDynamique.objects.create(
+            liaison=liaison, type_point=type_point, nom=f'{type_point} {ordre}', ordre=ordre,
+            latitude='48.855', longitude='2.35'
+        )
+    
+    def noeud(self, type_noeud, reference):
+        return NoeudFTTH.objects.get(type_noeud=type_noeud, reference=reference)
+    
+    def test_sous_arbres(self):
+        fdt = self.noeud('fdt', 'FDT12')
+        self.assertEqual(fdt.chemin, 'olt:OLT-NORD/port_olt:3/fdt:FDT12/')
+        self.assertEqual(fdt.profondeur, 3)
+        
+        onts = ArbreFTTHService.sous_arbre(fdt, 'ont')
+        self.assertEqual({ont.libelle for ont in onts}, {'ONT-0', 'ONT-1'})
+        self.assertEqual({ont.client_id for ont in onts}, {liaison.client_id for liaison in self.liaisons})
+        port = self.noeud('port_olt', 'OLT-NORD/3')
+        self.assertEqual(ArbreFTTHService.sous_arbre(port, 'fat').count(), 2)
+        self.assertEqual(ArbreFTTHService.sous_arbre(self.noeud('fat', 'FAT000')).get().libelle, 'ONT-0')
+        
+        response = self.client.get(reverse('arbre-ftth'), {'type': 'fdt', 'reference': 'FDT12', 'descendants': 'fat'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['nombre_par_type'], {'fat': 2, 'ont': 2})
+        self.assertEqual(response.data['nombre_clients'], 2)
+        self.assertEqual([noeud['type_noeud'] for noeud in response.data['ancetres']], ['olt', 'port_olt'])
+        self.assertEqual([noeud['reference'] for noeud in response.data['descendants']], ['FAT000', 'FAT001'])
+        
+        response = self.client.get(reverse('arbre-ftth'), {'type': 'fdt', 'reference': 'FDT99'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get(reverse('arbre-ftth'), {'type': 'splitter', 'reference': 'FDT12'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_deplacements(self):
+        # Le POP dessert désormais la FDT depuis un autre port : tout le sous-arbre suit
+        self.pop.port_olt = '7'
+        self.pop.save()
+        self.assertFalse(NoeudFTTH.objects.filter(type_noeud='port_olt', reference='OLT-NORD/3').exists())
+        ont = self.noeud('ont', str(self.onts[1].point_dynamique_id))
+        self.assertEqual(ont.chemin, f'olt:OLT-NORD/port_olt:7/fdt:FDT12/fat:FAT001/{ont.chemin.split("/")[-2]}/')
+        self.assertEqual(ont.profondeur, 5)
+        
+        # Une FAT rattachée à une autre FDT emporte son ONT
+        self.fats[1].numero_fdt = 'FDT13'
+        self.fats[1].save()
+        self.assertEqual(self.noeud('ont', str(self.onts[1].point_dynamique_id)).chemin.split('/')[0], 'fdt:FDT13')
+        
+        # Sans FAT, l'ONT remonte à la racine
+        self.fats[0].delete()
+        ont = self.noeud('ont', str(self.onts[0].point_dynamique_id))
+        self.assertEqual(ont.profondeur, 1)
+        self.assertFalse(NoeudFTTH.objects.filter(type_noeud='fat', reference='FAT000').exists())
+        
+        self.onts[0].point_dynamique.delete()
+        self.assertFalse(NoeudFTTH.objects.filter(type_noeud='ont', reference=ont.reference).exists())
+    
+    def test_reconstruire_identique(self):
+        self.fats[1].numero_fdt = 'FDT13'
+        self.fats[1].save()
+        chemins = set(NoeudFTTH.objects.values_list('type_noeud', 'reference', 'chemin', 'profondeur'))
+        
+        self.assertEqual(ArbreFTTHService.reconstruire(), len(chemins))
+        self.assertEqual(set(NoeudFTTH.objects.values_list('type_noeud', 'reference', 'chemin', 'profondeur')), chemins)
+
+
+class CouvertureTest(APITestCase):
+    """Tests pour l'analyse de couverture d'adresses prospectes"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='commercial', password='test', role='commercial')
+        self.client.force_authenticate(user=self.user)
+        client = Client.objects.create(
+            name='Banque', type_client='LS', type_organisation='banque',
+            address='123 Test Street', phone='+33123456789'
+        )
+        liaison = Liaison.objects.create(
+            nom_liaison='LS001', client=client, type_liaison=TypeLiaison.objects.create(type='LS'),
+            point_central_lat='48.8500', point_central_lng='2.3500',
+            point_client_lat='48.8600', point_client_lng='2.3500'
+        )
+        self.chambre = PointDynamique.objects.create(
+            liaison=liaison, type_point='chambre', nom='Chambre 12', ordre=1, latitude='48.86', longitude='2.35'
+        )
+        self.fat = FAT.objects.create(
+            numero_fat='FAT001', numero_fdt='FDT01', latitude='48.85', longitude='2.35',
+            port_splitter='P1', capacite_cable_entrant=12, couleur_toron='blue', couleur_brin='blue'
+        )
+    
+    def lire(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        contenu = b''.join(response.streaming_content).decode()
+        return list(csv.DictReader(io.StringIO(contenu), delimiter=';' if ';' in contenu.splitlines()[0] else ','))
+    
+    def test_fichier_csv(self):
+        fichier = SimpleUploadedFile('adresses.csv', (
+            "nom;latitude;longitude\n"
+            "Près FAT;48,8504;2,35\n"
+            "Près chambre;48.8598;2.35\n"
+            "Loin;48.90;2.35\n"
+            "Sans position;;\n"
+        ).encode(), content_type='text/csv')
+        lignes = self.lire(self.client.post(reverse('couverture'), {'fichier': fichier, 'rayon_m': 100}))
+        
+        self.assertEqual([ligne['nom'] for ligne in lignes], ['Près FAT', 'Près chambre', 'Loin', 'Sans position'])
+        self.assertEqual([ligne['couvert'] for ligne in lignes], ['oui', 'oui', 'non', ''])
+        self.assertEqual(lignes[0]['reference_actif'], 'FAT001')
+        self.assertAlmostEqual(float(lignes[0]['distance_m']), 44.5, delta=1)
+        self.assertEqual((lignes[1]['type_actif'], lignes[1]['actif_id']), ('chambre', str(self.chambre.id)))
+        self.assertEqual(lignes[3]['erreur'], 'coordonnées invalides')
+    
+    def test_points_json(self):
+        points = [{'id': 1, 'lat': 48.8598, 'lng': 2.35}]
+        lignes = self.lire(self.client.post(reverse('couverture'), {'points': points, 'types': ['FAT']}, format='json'))
+        self.assertEqual(lignes[0]['couvert'], 'non')
+        
+        lignes = self.lire(self.client.post(
+            reverse('couverture'), {'points': points, 'types': 'chambre', 'type_liaison': 'FTTH'}, format='json'
+        ))
+        self.assertEqual(lignes[0]['couvert'], 'non')
+        
+        response = self.client.post(reverse('couverture'), {'points': [{'x': 1}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('couverture'), {'points': points, 'types': 'poteau'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_jointure_grille(self):
+        aleatoire = random.Random(3)
+        grille = GrilleSpatiale()
+        for numero in range(300):
+            grille.ajouter(numero, [[48.85 + aleatoire.random() * 0.05, 2.35 + aleatoire.random() * 0.05]])
+        points = [(rang, 48.85 + aleatoire.random() * 0.05, 2.35 + aleatoire.random() * 0.05) for rang in range(200)]
+        
+        for (_, lat, lng), proche in zip(points, grille.joindre(points, 250)):
+            attendu = grille.rechercher(lat, lng, 250)
+            self.assertEqual(proche[0] if proche else None, attendu[0][0] if attendu else None)
+
+
+class CreationLiaisonsEnMasseTest(APITestCase):
+    """Tests pour la création groupée de liaisons complètes"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='superviseur', password='test', role='superviseur')
+        self.client.force_authenticate(user=self.user)
+        self.abonne = Client.objects.create(
+            name='Client Test', type_client='LS', type_organisation='entreprise',
+            address='123 Test Street', phone='+33123456789'
+        )
+        self.type_ls = TypeLiaison.objects.create(type='LS')
+    
+    def donnees_liaison(self, nom, nombre_points):
+        return {
+            'nom_liaison': nom, 'client': self.abonne.id, 'type_liaison': self.type_ls.id,
+            'point_central_lat': '48.85000000', 'point_central_lng': '2.35000000',
+            'point_client_lat': '48.86000000', 'point_client_lng': '2.35000000',
+            'points': [
+                {'type_point': 'chambre', 'nom': f'Chambre {rang}', 'latitude': f'{48.85 + rang * 0.001:.6f}',
+                 'longitude': '2.350000'}
+                for rang in range(nombre_points)
+            ]
+        }
+    
+    def test_requetes_groupees(self):
+        donnees = self.donnees_liaison('LS-MASSE', 40)
+        points = donnees.pop('points')
+        donnees.update(client=self.abonne, type_liaison=self.type_ls)
+        with CaptureQueriesContext(connection) as requetes:
+            liaison = LiaisonService.creer_liaison_complete(donnees, points)
+        self.assertLessEqual(len(requetes), 6)
+        
+        self.assertEqual(liaison.segments.count(), 39)
+        total = liaison.segments.aggregate(total=Sum('distance_cable'))['total']
+        self.assertAlmostEqual(Liaison.objects.get(id=liaison.id).distance_totale, total)
+        
+        distances = list(liaison.points_dynamiques.order_by('ordre').values_list(
+            'distance_depuis_central', 'distance_optique_depuis_central'))
+        SegmentService.recalculer_distances_cumulees(liaison)
+        recalculees = list(liaison.points_dynamiques.order_by('ordre').values_list(
+            'distance_depuis_central', 'distance_optique_depuis_central'))
+        for (distance, optique), (attendue, optique_attendue) in zip(distances, recalculees):
+            self.assertAlmostEqual(distance, attendue)
+            self.assertAlmostEqual(optique, optique_attendue)
+        self.assertAlmostEqual(distances[-1][0], total)
+    
+    def test_endpoint(self):
+        url = reverse('liaison-creer-en-masse')
+        response = self.client.post(url, {'liaisons': [
+            self.donnees_liaison('LS-A', 3), self.donnees_liaison('LS-B', 2)
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((response.data['nombre_liaisons'], response.data['nombre_points']), (2, 5))
+        self.assertEqual(Segment.objects.count(), 3)
+        self.assertEqual(Liaison.objects.get(nom_liaison='LS-A').created_by, self.user)
+        
+        invalide = self.donnees_liaison('LS-C', 2)
+        invalide['points'][1]['type_point'] = 'poteau'
+        response = self.client.post(url, {'liaisons': [
+            self.donnees_liaison('LS-D', 2), self.donnees_liaison('LS-D', 2), invalide
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([erreur['index'] for erreur in response.data['erreurs']], [1, 2])
+        self.assertIn('points', response.data['erreurs'][1])
+        self.assertFalse(Liaison.objects.filter(nom_liaison__in=['LS-C', 'LS-D']).exists())
+
+
+class OrdrePointsTest(TestCase):
+    """Tests pour les clés d'ordre espacées des points d'une liaison"""
+    
+    def setUp(self):
+        client = Client.objects.create(
+            name='Client Test', type_client='LS', type_organisation='entreprise',
+            address='123 Test Street', phone='+33123456789'
+        )
+        self.donnees_liaison = dict(
+            client=client, type_liaison=TypeLiaison.objects.create(type='LS'),
+            point_central_lat='48.8500', point_central_lng='2.3500',
+            point_client_lat='48.8600', point_client_lng='2.3500'
+        )
+    
+    def point(self, nom, rang):
+        return {'type_point': 'chambre', 'nom': nom, 'latitude': f'{48.85 + rang * 0.002:.6f}', 'longitude': '2.35'}
+    
+    def noms(self, liaison):
+        return list(liaison.points_dynamiques.order_by('ordre').values_list('nom', flat=True))
+    
+    def test_insertion_sans_renumerotation(self):
+        liaison = LiaisonService.creer_liaison_complete(
+            {**self.donnees_liaison, 'nom_liaison': 'LS-ORDRE'}, [self.point(nom, rang) for rang, nom in enumerate('ACD')]
+        )
+        ordres = dict(liaison.points_dynamiques.values_list('nom', 'ordre'))
+        
+        LiaisonService.ajouter_point_dynamique(liaison, self.point('B', 0.5), position=1)
+        LiaisonService.ajouter_point_dynamique(liaison, self.point('E', 3))
+        LiaisonService.ajouter_point_dynamique(liaison, self.point('0', -1), position=0)
+        
+        self.assertEqual(self.noms(liaison), ['0', 'A', 'B', 'C', 'D', 'E'])
+        self.assertEqual({nom: ordre for nom, ordre in liaison.points_dynamiques.values_list('nom', 'ordre')
+                          if nom in ordres}, ordres)
+        self.assertEqual(liaison.segments.count(), 5)
+    
+    def test_reequilibrage(self):
+        liaison = Liaison.objects.create(nom_liaison='LS-CONTIGU', **self.donnees_liaison)
+        for rang, nom in enumerate('ABC'):
+            PointDynamique.objects.create(liaison=liaison, ordre=rang, **self.point(nom, rang))
+        
+        # Aucun intervalle libre entre des clés contiguës : la liaison est renumérotée
+        LiaisonService.ajouter_point_dynamique(liaison, self.point('X', 1.5), position=2)
+        self.assertEqual(self.noms(liaison), ['A', 'B', 'X', 'C'])
+        ordres = list(liaison.points_dynamiques.order_by('ordre').values_list('ordre', flat=True))
+        self.assertEqual(ordres[:2], [LiaisonService.ESPACEMENT_ORDRE, 2 * LiaisonService.ESPACEMENT_ORDRE])
+        
+        for _ in range(12):
+            LiaisonService.ajouter_point_dynamique(liaison, self.point('Y', 0.2), position=1)
+        self.assertEqual(len(set(liaison.points_dynamiques.values_list('ordre', flat=True))), 16)
+        self.assertEqual(self.noms(liaison)[0], 'A')
+    
+    def test_insertion_atomique(self):
+        liaison = LiaisonService.creer_liaison_complete(
+            {**self.donnees_liaison, 'nom_liaison': 'LS-ATOMIQUE'}, [self.point(nom, rang) for rang, nom in enumerate('AC')]
+        )
+        
+        # Un échec du recalcul des distances n'abandonne ni point ni segment orphelin
+        with patch.object(SegmentService, 'recalculer_distances_cumulees', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                LiaisonService.ajouter_point_dynamique(liaison, self.point('B', 0.5), position=1)
+        self.assertEqual(self.noms(liaison), ['A', 'C'])
+        self.assertEqual(liaison.segments.count(), 1)
+
+
+class AgregatsLiaisonTest(APITestCase):
+    """Tests pour les agrégats de liaison tenus à jour par les signaux"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='superviseur', password='test', role='superviseur')
+        self.client.force_authenticate(user=self.user)
+        self.abonne = Client.objects.create(
+            name='Client Test', type_client='LS', type_organisation='entreprise',
+            address='123 Test Street', phone='+33123456789'
+        )
+        self.type_ls = TypeLiaison.objects.create(type='LS')
+        self.liaison = self.creer_liaison('LS-AGREGATS')
+    
+    def creer_liaison(self, nom, nombre_points=3):
+        liaison = Liaison.objects.create(
+            nom_liaison=nom, client=self.abonne, type_liaison=self.type_ls,
+            point_central_lat='48.8500', point_central_lng='2.3500',
+            point_client_lat='48.8600', point_client_lng='2.3500'
+        )
+        points = [
+            PointDynamique.objects.create(
+                liaison=liaison, type_point='chambre', nom=f'{nom} {rang}', ordre=rang,
+                latitude=f'{48.85 + rang * 0.001:.6f}', longitude='2.350000'
+            )
+            for rang in range(nombre_points)
+        ]
+        for depart, arrivee in zip(points, points[1:]):
+            SegmentService.creer_segment_auto(depart, arrivee, distance_cable=1.0)
+        return liaison
+    
+    def agregats(self, liaison=None):
+        return Liaison.objects.filter(id=(liaison or self.liaison).id).values_list(
+            'nombre_points', 'nombre_segments', 'distance_totale').get()
+    
+    def test_creation_et_modification(self):
+        self.assertEqual(self.agregats(), (3, 2, 2.0))
+        modifiee_le = Liaison.objects.get(id=self.liaison.id).updated_at
+        
+        segment = self.liaison.segments.first()
+        segment.distance_cable = 1.5
+        segment.save()
+        segment.trace_coords = [[48.85, 2.35]]
+        segment.save(update_fields=['trace_coords'])
+        self.assertEqual(self.agregats(), (3, 2, 2.5))
+        # Les agrégats ne passent pas par save() : updated_at est inchangé
+        self.assertEqual(Liaison.objects.get(id=self.liaison.id).updated_at, modifiee_le)
+    
+    def test_suppression_point(self):
+        # La suppression du point emporte ses deux segments
+        self.liaison.points_dynamiques.get(ordre=1).delete()
+        self.assertEqual(self.agregats(), (2, 0, 0.0))
+    
+    def test_changement_de_liaison(self):
+        autre = self.creer_liaison('LS-AUTRE', nombre_points=1)
+        point = self.liaison.points_dynamiques.get(ordre=2)
+        point.liaison = autre
+        point.save()
+        self.assertEqual(self.agregats(), (2, 2, 2.0))
+        self.assertEqual(self.agregats(autre)[0], 2)
+    
+    def test_date_de_topologie(self):
+        Liaison.objects.filter(id=self.liaison.id).update(topologie_modifiee_le=None)
+        point = self.liaison.points_dynamiques.get(ordre=1)
+        point.nom = 'Chambre renommée'
+        point.save()
+        self.assertIsNone(Liaison.objects.get(id=self.liaison.id).topologie_modifiee_le)
+        point.latitude = '48.851500'
+        point.save()
+        self.assertIsNotNone(Liaison.objects.get(id=self.liaison.id).topologie_modifiee_le)
+    
+    def test_liste_sans_comptage(self):
+        for numero in range(4):
+            self.creer_liaison(f'LS-{numero}')
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('liaison-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        resultats = response.data['results'] if isinstance(response.data, dict) else response.data
+        self.assertTrue(all(
+            (liaison['points_count'], liaison['nombre_segments']) == (3, 2) for liaison in resultats
+        ))
+        self.assertLessEqual(len(requetes), 4)
+
+
+class ImportReseauTest(APITestCase):
+    """Tests pour l'import en flux des exports SIG"""
+    
+    # Tracé central → client vers le nord, avec un coude entre la chambre et l'ONT
+    TRACE = [[48.85, 2.35], [48.852, 2.35], [48.854, 2.35], [48.856, 2.352], [48.858, 2.35]]
+    POINTS = [('POP_LS', 'POP', 48.85, 2.35), ('chambre', 'CH1', 48.854, 2.35), ('ONT', 'ONT', 48.858, 2.35)]
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='superviseur', password='test', role='superviseur')
+        self.client.force_authenticate(user=self.user)
+        self.dossier = tempfile.TemporaryDirectory()
+    
+    def tearDown(self):
+        self.dossier.cleanup()
+    
+    def entites(self, points=None):
+        liaison = {'type': 'Feature', 'properties': {
+            'nom_liaison': 'LS-IMPORT', 'client': 'Banque Import', 'type_liaison': 'LS', 'type_organisation': 'banque'
+        }, 'geometry': {'type': 'LineString', 'coordinates': [[lng, lat] for lat, lng in self.TRACE]}}
+        entites = [liaison] + [
+            {'type': 'Feature', 'properties': {'nom_liaison': 'LS-IMPORT', 'type_point': type_point, 'nom': nom},
+             'geometry': {'type': 'Point', 'coordinates': [lng, lat]}}
+            for type_point, nom, lat, lng in (points or self.POINTS)
+        ]
+        entites.append({'type': 'Feature', 'properties': {
+            'numero_fat': 'FAT-900', 'numero_fdt': 'FDT-9', 'port_splitter': '1/8', 'capacite_cable_entrant': '12',
+            'couleur_toron': 'blue', 'couleur_brin': 'rouge'
+        }, 'geometry': {'type': 'Point', 'coordinates': [2.351, 48.853]}})
+        entites.append({'type': 'Feature', 'properties': {'nom': 'sans nature'}, 'geometry': None})
+        entites.append({'type': 'Feature', 'properties': {
+            'nom_liaison': 'LS-ABSENTE', 'type_point': 'chambre', 'nom': 'CH9'
+        }, 'geometry': {'type': 'Point', 'coordinates': [2.35, 48.85]}})
+        return entites
+    
+    def importer(self, nom, contenu, format_fichier, taille_lot=2):
+        chemin = os.path.join(self.dossier.name, nom)
+        with open(chemin, 'w', encoding='utf-8') as fichier:
+            fichier.write(contenu)
+        import_reseau = ImportReseau.objects.create(chemin_fichier=chemin, format=format_fichier)
+        return ImportReseauService.traiter_import(import_reseau, taille_lot=taille_lot)
+    
+    def importer_geojson(self, points=None):
+        contenu = json.dumps({'type': 'FeatureCollection', 'features': self.entites(points)}, indent=1)
+        return self.importer('reseau.geojson', contenu, 'geojson')
+    
+    def verifier_liaison(self, noms=('POP', 'CH1', 'ONT')):
+        liaison = Liaison.objects.get(nom_liaison='LS-IMPORT')
+        self.assertEqual(liaison.client.type_organisation, 'banque')
+        self.assertEqual((liaison.nombre_points, liaison.nombre_segments), (3, 2))
+        self.assertEqual((float(liaison.point_central_lat), float(liaison.point_client_lat)), (48.85, 48.858))
+        self.assertEqual(list(liaison.points_dynamiques.order_by('ordre').values_list('nom', flat=True)), list(noms))
+        
+        segments = list(liaison.segments.order_by('point_depart__ordre'))
+        total = sum(segment.distance_cable for segment in segments)
+        self.assertAlmostEqual(liaison.distance_totale, total)
+        self.assertAlmostEqual(liaison.points_dynamiques.order_by('ordre').last().distance_depuis_central, total)
+        return liaison, segments
+    
+    def test_geojson(self):
+        import_reseau = self.importer_geojson()
+        self.assertEqual(import_reseau.status, 'termine')
+        self.assertEqual(import_reseau.entites_lues, 7)
+        self.assertEqual(import_reseau.nombre_erreurs, 2)
+        self.assertEqual(import_reseau.compteurs['segments_crees'], 2)
+        
+        _, segments = self.verifier_liaison()
+        # Le second segment suit le coude du tracé
+        self.assertEqual(segments[0].trace_coords, [[48.85, 2.35], [48.852, 2.35], [48.854, 2.35]])
+        self.assertEqual(segments[1].trace_coords, [[48.854, 2.35], [48.856, 2.352], [48.858, 2.35]])
+        self.assertGreater(segments[1].distance_gps, segments[0].distance_gps)
+        self.assertAlmostEqual(segments[0].distance_gps, 0.4448, places=3)
+        self.assertEqual(FAT.objects.get(numero_fat='FAT-900').capacite_cable_entrant, 12)
+    
+    def test_reimport_idempotent(self):
+        self.importer_geojson()
+        modifiee_le = Liaison.objects.get(nom_liaison='LS-IMPORT').topologie_modifiee_le
+        
+        import_reseau = self.importer_geojson()
+        self.assertEqual(set(import_reseau.compteurs.values()), {0})
+        self.assertEqual(Liaison.objects.get(nom_liaison='LS-IMPORT').topologie_modifiee_le, modifiee_le)
+        self.assertEqual((Client.objects.count(), FAT.objects.count(), Segment.objects.count()), (1, 1, 2))
+    
+    def test_reimport_reordonne(self):
+        self.importer_geojson()
+        points = [self.POINTS[0], self.POINTS[2], self.POINTS[1]]
+        import_reseau = self.importer_geojson(points)
+        self.assertEqual(import_reseau.compteurs['points_reordonnes'], 2)
+        self.assertEqual(import_reseau.compteurs['segments_supprimes'], 2)
+        self.verifier_liaison(('POP', 'ONT', 'CH1'))
+    
+    def test_lecture_geojson_par_petits_blocs(self):
+        contenu = json.dumps({'type': 'FeatureCollection', 'features': self.entites()}).encode()
+        with patch.object(lecteurs_sig, 'TAILLE_TAMPON', 16):
+            entites = list(lecteurs_sig.lire_geojson(io.BytesIO(contenu)))
+        self.assertEqual(len(entites), 7)
+        self.assertEqual(entites[0][1:], ('LineString', self.TRACE))
+    
+    def test_kml(self):
+        placemarks = ''.join(
+            f'<Placemark><name>{nom}</name><ExtendedData>'
+            f'<Data name="nom_liaison"><value>LS-IMPORT</value></Data>'
+            f'<Data name="type_point"><value>{type_point}</value></Data></ExtendedData>'
+            f'<Point><coordinates>{lng},{lat},0</coordinates></Point></Placemark>'
+            for type_point, nom, lat, lng in self.POINTS
+        )
+        contenu = (
+            '<?xml version="1.0" encoding="UTF-8"?><kml xmlns="http://www.opengis.net/kml/2.2"><Document>'
+            '<Folder><Placemark><name>LS-IMPORT</name><ExtendedData><SchemaData>'
+            '<SimpleData name="nom_liaison">LS-IMPORT</SimpleData>'
+            '<SimpleData name="client">Banque Import</SimpleData>'
+            '<SimpleData name="type_organisation">banque</SimpleData></SchemaData></ExtendedData>'
+            '<LineString><coordinates>'
+            + ' '.join(f'{lng},{lat}' for lat, lng in self.TRACE)
+            + f'</coordinates></LineString></Placemark>{placemarks}</Folder></Document></kml>'
+        )
+        import_reseau = self.importer('reseau.kml', contenu, 'kml')
+        self.assertEqual((import_reseau.status, import_reseau.nombre_erreurs), ('termine', 0))
+        self.verifier_liaison()
+    
+    def test_csv(self):
+        lignes = [
+            'nom_liaison;client;type_organisation;type_point;nom;ordre;latitude;longitude;geometrie',
+            'LS-IMPORT;Banque Import;banque;;;;;;LINESTRING (' + ', '.join(f'{lng} {lat}' for lat, lng in self.TRACE) + ')',
+        ] + [
+            f'LS-IMPORT;;;{type_point};{nom};{rang};{str(lat).replace(".", ",")};{lng};'
+            for rang, (type_point, nom, lat, lng) in reversed(list(enumerate(self.POINTS, start=1)))
+        ]
+        import_reseau = self.importer('reseau.csv', '\n'.join(lignes), 'csv')
+        self.assertEqual((import_reseau.status, import_reseau.nombre_erreurs), ('termine', 0))
+        self.verifier_liaison()
+    
+    def test_valeurs_hors_limites(self):
+        points = self.POINTS + [('chambre', 'CH-INF', 48.857, 2.351)]
+        entites = self.entites(points)
+        entites[len(points)]['properties']['ordre'] = 'inf'
+        entites[len(points) + 1]['properties']['capacite_cable_entrant'] = '1e400'
+        contenu = json.dumps({'type': 'FeatureCollection', 'features': entites})
+        import_reseau = self.importer('reseau.geojson', contenu, 'geojson')
+        # Seules les deux entités fautives sont rejetées
+        self.assertEqual((import_reseau.status, import_reseau.nombre_erreurs), ('termine', 4))
+        self.assertFalse(FAT.objects.exists())
+    
+    def test_fichier_illisible(self):
+        import_reseau = self.importer('reseau.geojson', '{"type": "FeatureCollection"}', 'geojson')
+        self.assertEqual(import_reseau.status, 'erreur')
+    
+    @patch.object(ImportReseauService, '_reconstruire_liaisons', side_effect=KeyError('liaison'))
+    def test_erreur_inattendue(self, reconstruire):
+        import_reseau = self.importer_geojson()
+        self.assertEqual(import_reseau.status, 'erreur')
+        self.assertEqual(ImportReseau.objects.get(id=import_reseau.id).status, 'erreur')
+    
+    @patch.object(ImportReseauService, 'lancer_en_arriere_plan')
+    def test_endpoint(self, lancer):
+        with override_settings(MEDIA_ROOT=self.dossier.name):
+            fichier = SimpleUploadedFile('reseau.geojson', json.dumps({'features': []}).encode())
+            response = self.client.post(reverse('import-reseau'), {'fichier': fichier}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['import']['format'], 'geojson')
+        lancer.assert_called_once()
+        
+        response = self.client.get(reverse('suivi-import-reseau', kwargs={'import_id': response.data['import']['id']}))
+        self.assertEqual(response.data['status'], 'en_attente')
+        
+        fichier = SimpleUploadedFile('reseau.shp', b'binaire')
+        response = self.client.post(reverse('import-reseau'), {'fichier': fichier}, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TraceParLotsTest(APITestCase):
+    """Tests pour le relevé du tracé GPS d'un segment par lots numérotés"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='technicien', password='test', role='technicien')
+        self.client.force_authenticate(user=self.user)
+        abonne = Client.objects.create(
+            name='Client Test', type_client='LS', type_organisation='entreprise',
+            address='123 Test Street', phone='+33123456789'
+        )
+        liaison = Liaison.objects.create(
+            nom_liaison='LS-TRACE', client=abonne, type_liaison=TypeLiaison.objects.create(type='LS'),
+            point_central_lat='48.8500', point_central_lng='2.3500',
+            point_client_lat='48.8600', point_client_lng='2.3500'
+        )
+        depart, arrivee = [
+            PointDynamique.objects.create(
+                liaison=liaison, type_point='chambre', nom=f'Chambre {rang}', ordre=rang,
+                latitude=f'{48.85 + rang * 0.01:.6f}', longitude='2.350000'
+            )
+            for rang in range(2)
+        ]
+        self.segment = SegmentService.creer_segment_auto(depart, arrivee)
+        self.url = reverse('segment-ajouter-trace', kwargs={'pk': self.segment.id})
+    
+    def marche(self, debut, nombre):
+        """Relevé en zigzag, un point tous les 11 m environ"""
+        return [[48.85 + rang * 1e-4, 2.35 + (rang % 2) * 1e-4] for rang in range(debut, debut + nombre)]
+    
+    def test_filtrage(self):
+        points = [[48.85 + rang * 1e-4, 2.35] for rang in range(10)]
+        points[4] = [48.86, 2.36]                 # pic isolé
+        points.append([48.8509, 2.35001, 80])     # fix imprécis
+        retenus, rejetes = filtrer_trace([48.8499, 2.35], points, 2.0, 100.0, 30.0)
+        self.assertEqual(rejetes, 2)
+        # La ligne droite se réduit à son dernier point, le premier étant déjà enregistré
+        self.assertEqual(retenus, [[48.8509, 2.35]])
+        self.assertEqual(filtrer_trace([48.85, 2.35], [[48.85, 2.35001]], 2.0, 100.0, 30.0), ([], 0))
+    
+    def test_ajout_par_lots(self):
+        premier, second = self.marche(0, 20), self.marche(20, 20)
+        reponse = self.client.post(self.url, {'sequence': 1, 'points': premier}, format='json')
+        self.assertEqual(reponse.status_code, status.HTTP_200_OK)
+        self.assertEqual(reponse.data['points_retenus'], 20)
+        self.assertFalse(reponse.data['consolide'])
+        
+        with CaptureQueriesContext(connection) as requetes:
+            reponse = self.client.post(self.url, {'sequence': 2, 'points': second}, format='json')
+        self.assertEqual(reponse.status_code, status.HTTP_200_OK)
+        # Ni lecture ni réécriture du tracé complet
+        self.assertFalse([q for q in requetes.captured_queries if 'trace_coords' in q['sql']])
+        
+        longueur, emprise = mesurer_trace(premier + second)
+        mesures = reponse.data['mesures']
+        self.assertAlmostEqual(mesures['longueur_trace'], longueur, places=9)
+        self.assertEqual(
+            (mesures['trace_lat_min'], mesures['trace_lat_max'], mesures['trace_lng_min'], mesures['trace_lng_max']),
+            emprise
+        )
+        self.segment.refresh_from_db()
+        self.assertEqual(self.segment.trace_coords, [])
+        self.assertEqual(LotTrace.objects.filter(segment=self.segment).count(), 2)
+    
+    def test_sequence(self):
+        self.client.post(self.url, {'sequence': 1, 'points': self.marche(0, 5)}, format='json')
+        
+        # Réémission d'un lot déjà appliqué : sans effet
+        reponse = self.client.post(self.url, {'sequence': 1, 'points': self.marche(0, 5)}, format='json')
+        self.assertEqual(reponse.status_code, status.HTTP_200_OK)
+        self.assertEqual(reponse.data['statut'], 'doublon')
+        self.assertEqual(LotTrace.objects.get(segment=self.segment).nombre_points, 5)
+        
+        reponse = self.client.post(self.url, {'sequence': 3, 'points': self.marche(10, 5)}, format='json')
+        self.assertEqual(reponse.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(reponse.data['sequence_attendue'], 2)
+        
+        reponse = self.client.post(self.url, {'sequence': 2, 'points': [[95, 2.35]]}, format='json')
+        self.assertEqual(reponse.status_code, status.HTTP_400_BAD_REQUEST)
+        url = reverse('segment-ajouter-trace', kwargs={'pk': '00000000-0000-0000-0000-000000000000'})
+        reponse = self.client.post(url, {'sequence': 1, 'points': []}, format='json')
+        self.assertEqual(reponse.status_code, status.HTTP_404_NOT_FOUND)
+    
+    def test_consolidation(self):
+        self.client.post(self.url, {'sequence': 1, 'points': self.marche(0, 10)}, format='json')
+        reponse = self.client.post(self.url, {'sequence': 2, 'points': self.marche(10, 10), 'fin': True}, format='json')
+        self.assertTrue(reponse.data['consolide'])
+        self.segment.refresh_from_db()
+        self.assertEqual(self.segment.trace_coords, self.marche(0, 20))
+        self.assertFalse(LotTrace.objects.filter(segment=self.segment).exists())
+        
+        # Le relevé reprend à la suite du tracé consolidé
+        reponse = self.client.post(self.url, {'sequence': 3, 'points': self.marche(20, 2)}, format='json')
+        self.assertEqual(reponse.data['points_retenus'], 2)
+        self.assertAlmostEqual(reponse.data['mesures']['longueur_trace'], mesurer_trace(self.marche(0, 22))[0], places=9)
+        
+        with patch.object(TraceSegmentService, 'POINTS_AVANT_CONSOLIDATION', 3):
+            reponse = self.client.post(self.url, {'sequence': 4, 'points': self.marche(22, 2)}, format='json')
+        self.assertTrue(reponse.data['consolide'])
+        self.segment.refresh_from_db()
+        self.assertEqual(self.segment.trace_coords, self.marche(0, 24))
+    
+    def test_remplacement(self):
+        self.client.post(self.url, {'sequence': 1, 'points': self.marche(0, 10)}, format='json')
+        trace = [[48.85, 2.35], [48.86, 2.35]]
+        reponse = self.client.put(
+            reverse('segment-trace', kwargs={'pk': self.segment.id}), {'trace_coords': trace}, format='json'
+        )
+        self.assertEqual(reponse.status_code, status.HTTP_200_OK)
+        self.segment.refresh_from_db()
+        self.assertEqual(self.segment.trace_sequence, 0)
+        self.assertAlmostEqual(self.segment.longueur_trace, mesurer_trace(trace)[0])
+        self.assertEqual((self.segment.trace_lat_min, self.segment.trace_lat_max), (48.85, 48.86))
+        self.assertFalse(LotTrace.objects.filter(segment=self.segment).exists())
+        
+        reponse = self.client.post(self.url, {'sequence': 1, 'points': [[48.861, 2.35]]}, format='json')
+        self.assertEqual(reponse.data['statut'], 'applique')
+
+class BatchTest(APITestCase):
+    """Tests pour l'application transactionnelle d'un lot d'opérations hors ligne"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='technicien', password='test', role='technicien')
+        self.client.force_authenticate(user=self.user)
+        abonne = Client.objects.create(
+            name='Client Test', type_client='LS', type_organisation='entreprise',
+            address='123 Test Street', phone='+33123456789'
+        )
+        self.liaison = Liaison.objects.create(
+            nom_liaison='LS-BATCH', client=abonne, type_liaison=TypeLiaison.objects.create(type='LS'),
+            point_central_lat='48.8500', point_central_lng='2.3500',
+            point_client_lat='48.8600', point_client_lng='2.3500'
+        )
+        self.central = PointDynamique.objects.create(
+            liaison=self.liaison, type_point='POP_LS', nom='Central', ordre=1024,
+            latitude='48.850000', longitude='2.350000'
+        )
+        self.url = reverse('batch')
+    
+    def point(self, ref, nom, ordre, latitude):
+        return {
+            'ref': ref, 'action': 'creer', 'ressource': 'points-dynamiques',
+            'donnees': {
+                'liaison': str(self.liaison.id), 'type_point': 'chambre', 'nom': nom, 'ordre': ordre,
+                'latitude': latitude, 'longitude': '2.350000'
+            }
+        }
+    
+    def segment(self, ref, depart, arrivee, distance_cable):
+        return {
+            'ref': ref, 'action': 'creer', 'ressource': 'segments',
+            'donnees': {
+                'liaison': str(self.liaison.id), 'point_depart': depart, 'point_arrivee': arrivee,
+                'distance_gps': distance_cable, 'distance_cable': distance_cable
+            }
+        }
+    
+    def test_lot_complet(self):
+        operations = [
+            self.point('c1', 'Chambre 1', 2048, '48.851000'),
+            self.point('c2', 'Chambre 2', 3072, '48.852000'),
+            self.segment('s1', str(self.central.id), {'$ref': 'c1'}, 0.5),
+            self.segment('s2', {'$ref': 'c1'}, {'$ref': 'c2'}, 0.25),
+            {'action': 'details', 'ressource': 'points-dynamiques', 'id': {'$ref': 'c1'}, 'donnees': {
+                'point_dynamique': {'$ref': 'c1'}, 'ignorer_continuite': True,
+                'capacite_cable_central': 48, 'couleur_toron_central': 'blue', 'couleur_brin_central': 'blue',
+                'capacite_cable_client': 48, 'couleur_toron_client': 'blue', 'couleur_brin_client': 'orange',
+                'moue_cable_client': 20,
+            }},
+            {'action': 'ajouter_trace', 'ressource': 'segments', 'id': {'$ref': 's1'}, 'donnees': {
+                'sequence': 1, 'points': [[48.85, 2.35], [48.8505, 2.3502], [48.851, 2.35]], 'fin': True
+            }},
+            {'action': 'creer', 'ressource': 'mesures-otdr', 'donnees': {
+                'liaison': str(self.liaison.id), 'point_mesure': {'$ref': 'c2'}, 'position_technicien': 'intermediaire',
+                'direction_analyse': 'vers_central', 'distance_coupure': 0.6, 'attenuation': 0.3,
+                'type_evenement': 'attenuation'
+            }},
+            {'action': 'modifier', 'ressource': 'points-dynamiques', 'id': {'$ref': 'c2'}, 'donnees': {
+                'commentaire_technicien': 'Regard fissuré'
+            }},
+        ]
+        with CaptureQueriesContext(connection) as requetes:
+            reponse = self.client.post(self.url, {'operations': operations}, format='json')
+        self.assertEqual(reponse.status_code, status.HTTP_200_OK, reponse.data)
+        self.assertEqual([r['statut'] for r in reponse.data['resultats']], [201, 201, 201, 201, 200, 200, 201, 200])
+        self.assertEqual(set(reponse.data['references']), {'c1', 's1', 'c2', 's2'})
+        self.assertEqual(reponse.data['liaisons_recalculees'], [str(self.liaison.id)])
+        
+        # Agrégats recalculés une seule fois, en fin de lot
+        mises_a_jour = [q for q in requetes.captured_queries if q['sql'].startswith('UPDATE "api_liaison"')]
+        self.assertEqual(len(mises_a_jour), 2)
+        liaison = Liaison.objects.get(id=self.liaison.id)
+        self.assertEqual((liaison.nombre_points, liaison.nombre_segments), (3, 2))
+        self.assertAlmostEqual(liaison.distance_totale, 0.75)
+        
+        # Distances cumulées à jour sans appel à recalculer-distance
+        chambre_1 = PointDynamique.objects.get(id=reponse.data['references']['c1'])
+        chambre_2 = PointDynamique.objects.get(id=reponse.data['references']['c2'])
+        self.assertAlmostEqual(chambre_1.distance_depuis_central, 0.5)
+        self.assertAlmostEqual(chambre_2.distance_depuis_central, 0.75)
+        self.assertAlmostEqual(chambre_2.distance_optique_depuis_central, 0.77)
+        self.assertEqual(chambre_2.commentaire_technicien, 'Regard fissuré')
+        
+        segment = Segment.objects.get(id=reponse.data['references']['s1'])
+        self.assertEqual(len(segment.trace_coords), 3)
+        mesure = MesureOTDR.objects.get(point_mesure=chambre_2)
+        self.assertEqual(mesure.technicien, self.user)
+    
+    def test_annulation(self):
+        operations = [
+            self.point('c1', 'Chambre 1', 2048, '48.851000'),
+            self.segment('s1', str(self.central.id), {'$ref': 'c1'}, 0.5),
+            self.point('c2', 'Chambre 2', 2048, '48.852000'),
+        ]
+        reponse = self.client.post(self.url, {'operations': operations}, format='json')
+        self.assertEqual(reponse.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(reponse.data['operation']['index'], 2)
+        self.assertEqual(reponse.data['operation']['ref'], 'c2')
+        self.assertEqual(self.liaison.points_dynamiques.count(), 1)
+        self.assertFalse(Segment.objects.exists())
+        self.assertEqual(Liaison.objects.get(id=self.liaison.id).nombre_points, 1)
+    
+    def test_operations_invalides(self):
+        for operations, index in (
+            ([self.segment('s1', str(self.central.id), {'$ref': 'inconnue'}, 0.5)], 0),
+            ([{'action': 'creer', 'ressource': 'clients', 'donnees': {}}], 0),
+            ([self.point('c1', 'Chambre 1', 2048, '48.851000'),
+              {'action': 'supprimer', 'ressource': 'segments', 'id': '00000000-0000-0000-0000-000000000000'}], 1),
+            ([{'action': 'ajouter_trace', 'ressource': 'segments', 'id': str(self.central.id),
+               'donnees': {'sequence': 1, 'points': []}}], 0),
+        ):
+            reponse = self.client.post(self.url, {'operations': operations}, format='json')
+            self.assertEqual(reponse.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(reponse.data['operation']['index'], index)
+        self.assertEqual(self.liaison.points_dynamiques.count(), 1)
+        
+        reponse = self.client.post(self.url, {'operations': []}, format='json')
+        self.assertEqual(reponse.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_topologie_differee(self):
+        with LiaisonService.topologie_differee() as liaisons:
+            point = PointDynamique.objects.create(
+                liaison=self.liaison, type_point='chambre', nom='Chambre', ordre=2048,
+                latitude='48.851000', longitude='2.350000'
+            )
+            SegmentService.creer_segment_auto(self.central, point, distance_cable=1.5)
+            self.assertEqual(Liaison.objects.get(id=self.liaison.id).nombre_points, 1)
+        self.assertEqual(liaisons, {self.liaison.id})
+        liaison = Liaison.objects.get(id=self.liaison.id)
+        self.assertEqual((liaison.nombre_points, liaison.nombre_segments, liaison.distance_totale), (2, 1, 1.5))
+        point.refresh_from_db()
+        self.assertEqual(point.distance_depuis_central, 1.5)
+
 # Tests d'intégration supplémentaires
 class IntegrationTest(APITestCase):
     """Tests d'intégration pour vérifier les workflows complets"""
@@ -18,13 +18,19 @@ from .views.intervention_views import (
 )
 from .views.diagnostic_views import (
     MesureOTDRViewSet, CoupureViewSet, detecter_coupure, simuler_analyse_otdr, 
-    statistiques_diagnostics
+    statistiques_diagnostics, importer_archive_otdr, suivi_import_otdr, reprendre_import_otdr
 )
 from .views.map_views import (
     liaisons_carte, liaisons_bounds, points_dynamiques_carte, coupures_carte,
     trace_liaison, navigation_vers_point, mettre_a_jour_position, statistiques_carte,
     recherche_geographique, calculer_itineraire_multiple
 )
+from .views.reseau_views import (
+    corridors_critiques, graphe_chemin, graphe_composantes, graphe_atteignables, bilans_optiques,
+    continuite_fibre, inventaire_brins, brins_libres, disponibilite_ports, allouer_port, liberer_port,
+    utilisation_ports, arbre_ftth, couverture, importer_reseau, suivi_import_reseau
+)
+from .views.batch_views import executer_lot
 from .views.notification_views import (
     NotificationViewSet, creer_notification, statistiques_notifications, ParametreApplicationViewSet
 )
@@ -85,6 +91,34 @@ urlpatterns = [
     path('diagnostic/detecter-coupure/', detecter_coupure, name='detecter-coupure'),
     path('diagnostic/simuler-analyse/', simuler_analyse_otdr, name='simuler-analyse-otdr'),
     path('diagnostic/statistiques/', statistiques_diagnostics, name='statistiques-diagnostics'),
+    path('diagnostic/imports-otdr/', importer_archive_otdr, name='importer-archive-otdr'),
+    path('diagnostic/imports-otdr/<uuid:import_id>/', suivi_import_otdr, name='suivi-import-otdr'),
+    path('diagnostic/imports-otdr/<uuid:import_id>/reprendre/', reprendre_import_otdr, name='reprendre-import-otdr'),
+    
+    # ===============================
+    # Réseau
+    # ===============================
+    path('reseau/corridors-critiques/', corridors_critiques, name='corridors-critiques'),
+    path('reseau/graphe/chemin/', graphe_chemin, name='graphe-chemin'),
+    path('reseau/graphe/composantes/', graphe_composantes, name='graphe-composantes'),
+    path('reseau/graphe/atteignables/', graphe_atteignables, name='graphe-atteignables'),
+    path('reseau/bilans-optiques/', bilans_optiques, name='bilans-optiques'),
+    path('reseau/continuite/', continuite_fibre, name='continuite-fibre'),
+    path('reseau/inventaire-brins/', inventaire_brins, name='inventaire-brins'),
+    path('reseau/brins-libres/', brins_libres, name='brins-libres'),
+    path('reseau/ports/', disponibilite_ports, name='disponibilite-ports'),
+    path('reseau/ports/allouer/', allouer_port, name='allouer-port'),
+    path('reseau/ports/liberer/', liberer_port, name='liberer-port'),
+    path('reseau/ports/utilisation/', utilisation_ports, name='utilisation-ports'),
+    path('reseau/arbre-ftth/', arbre_ftth, name='arbre-ftth'),
+    path('reseau/couverture/', couverture, name='couverture'),
+    path('reseau/import/', importer_reseau, name='import-reseau'),
+    path('reseau/import/<uuid:import_id>/', suivi_import_reseau, name='suivi-import-reseau'),
+    
+    # ===============================
+    # Synchronisation hors ligne
+    # ===============================
+    path('batch/', executer_lot, name='batch'),
     
     # ===============================
     # Notifications et administration
@@ -111,7 +145,9 @@ urlpatterns += [
     path('liaisons/<uuid:pk>/trace/', LiaisonViewSet.as_view({'get': 'trace'}), name='liaison-trace'),
     path('liaisons/<uuid:pk>/historique/', LiaisonViewSet.as_view({'get': 'historique'}), name='liaison-historique'),
     path('liaisons/<uuid:pk>/recalculer-distance/', LiaisonViewSet.as_view({'post': 'recalculer_distance'}), name='liaison-recalculer-distance'),
+    path('liaisons/<uuid:pk>/reference-otdr/', LiaisonViewSet.as_view({'get': 'reference_otdr', 'post': 'reference_otdr'}), name='liaison-reference-otdr'),
     path('liaisons/recherche-avancee/', LiaisonViewSet.as_view({'get': 'recherche_avancee'}), name='liaison-recherche'),
+    path('liaisons/creer-en-masse/', LiaisonViewSet.as_view({'post': 'creer_en_masse'}), name='liaison-creer-en-masse'),
     
     # ===============================
     # Endpoints spécialisés POINTS DYNAMIQUES
@@ -124,12 +160,14 @@ urlpatterns += [
     # Endpoints spécialisés SEGMENTS
     # ===============================
     path('segments/<uuid:pk>/mettre-a-jour-trace/', SegmentViewSet.as_view({'put': 'mettre_a_jour_trace'}), name='segment-trace'),
+    path('segments/<uuid:pk>/ajouter-trace/', SegmentViewSet.as_view({'post': 'ajouter_trace'}), name='segment-ajouter-trace'),
     path('segments/<uuid:pk>/recalculer-distance-gps/', SegmentViewSet.as_view({'post': 'recalculer_distance_gps'}), name='segment-distance-gps'),
     
     # ===============================
     # Endpoints spécialisés FAT
     # ===============================
     path('fats/<uuid:pk>/associer-liaison/', FATViewSet.as_view({'post': 'associer_liaison'}), name='fat-associer-liaison'),
+    path('fats/proches/', FATViewSet.as_view({'get': 'proches'}), name='fats-proches'),
     path('fats/<uuid:pk>/creer-point-dynamique/', FATViewSet.as_view({'post': 'creer_point_dynamique'}), name='fat-creer-point'),
     
     # ===============================
@@ -145,12 +183,15 @@ urlpatterns += [
     # Endpoints spécialisés MESURES OTDR
     # ===============================
     path('mesures-otdr/<uuid:pk>/analyser-coupure/', MesureOTDRViewSet.as_view({'post': 'analyser_coupure'}), name='mesure-analyser-coupure'),
+    path('mesures-otdr/<uuid:pk>/apercu-trace/', MesureOTDRViewSet.as_view({'get': 'apercu_trace'}), name='mesure-apercu-trace'),
+    path('mesures-otdr/<uuid:pk>/comparer-reference/', MesureOTDRViewSet.as_view({'get': 'comparer_reference'}), name='mesure-comparer-reference'),
     
     # ===============================
     # Endpoints spécialisés COUPURES
     # ===============================
     path('coupures/<uuid:pk>/status/', CoupureViewSet.as_view({'put': 'changer_status'}), name='coupure-status'),
     path('coupures/<uuid:pk>/recalculer-position/', CoupureViewSet.as_view({'post': 'recalculer_position'}), name='coupure-recalculer-position'),
+    path('coupures/<uuid:pk>/impact/', CoupureViewSet.as_view({'get': 'impact', 'post': 'impact'}), name='coupure-impact'),
     path('coupures/actives/', CoupureViewSet.as_view({'get': 'actives'}), name='coupures-actives'),
     path('coupures/carte/', CoupureViewSet.as_view({'get': 'carte'}), name='coupures-carte-alt'),
     
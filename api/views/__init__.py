@@ -5,4 +5,6 @@ from .intervention_views import *
 from .notification_views import *
 from .diagnostic_views import *
 from .map_views import *
-from .hello_views import *
\ No newline at end of file
+from .hello_views import *
+from .reseau_views import *
+from .batch_views import *
\ No newline at end of file
@@ -0,0 +1,166 @@
+from django.db import IntegrityError, transaction
+from django.http import Http404
+from rest_framework import exceptions, status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from ..services import LiaisonService, TraceSegmentService
+from .diagnostic_views import MesureOTDRViewSet
+from .intervention_views import CommitInterventionViewSet
+from .liaison_views import (
+    FATViewSet, FicheTechniqueViewSet, PhotoPointViewSet, PointDynamiqueViewSet, SegmentViewSet
+)
+
+MAX_OPERATIONS = 500
+
+# Ressources modifiables par lot : celles du routeur, avec leurs serializers et leurs hooks perform_*
+RESSOURCES = {
+    'points-dynamiques': PointDynamiqueViewSet,
+    'segments': SegmentViewSet,
+    'photos-points': PhotoPointViewSet,
+    'fiches-techniques': FicheTechniqueViewSet,
+    'fats': FATViewSet,
+    'mesures-otdr': MesureOTDRViewSet,
+    'commits-interventions': CommitInterventionViewSet,
+}
+ACTIONS = {'creer': 'create', 'modifier': 'partial_update', 'supprimer': 'destroy'}
+# Actions propres à une ressource, hors des opérations CRUD du ViewSet
+ACTIONS_SPECIALES = {('points-dynamiques', 'details'), ('segments', 'ajouter_trace')}
+
+
+class EchecOperation(Exception):
+    """Opération refusée : le lot entier est annulé"""
+
+    def __init__(self, resultat):
+        super().__init__(resultat)
+        self.resultat = resultat
+
+
+def _resoudre(valeur, references):
+    """Remplace les {"$ref": nom} par l'identifiant de l'objet créé plus tôt dans le lot"""
+    if isinstance(valeur, dict):
+        if set(valeur) == {'$ref'}:
+            if valeur['$ref'] not in references:
+                raise exceptions.ValidationError(
+                    {'$ref': f"Référence {valeur['$ref']} inconnue : elle doit être créée par une opération précédente"}
+                )
+            return references[valeur['$ref']]
+        return {cle: _resoudre(element, references) for cle, element in valeur.items()}
+    if isinstance(valeur, list):
+        return [_resoudre(element, references) for element in valeur]
+    return valeur
+
+
+def _vue(classe, request, action, pk=None):
+    """ViewSet prêt à servir une opération du lot, sans passer par le routage ni l'authentification"""
+    vue = classe()
+    vue.request, vue.action, vue.format_kwarg = request, action, None
+    vue.args, vue.kwargs = (), ({'pk': pk} if pk is not None else {})
+    vue.check_permissions(request)
+    return vue
+
+
+def _executer(request, operation, references):
+    """Résultat (code, identifiant, données) d'une opération, exception si elle est refusée"""
+    ressource, action = operation.get('ressource'), operation.get('action')
+    if ressource not in RESSOURCES:
+        raise exceptions.ValidationError({'ressource': f"Ressource inconnue : {ressource}"})
+    if action not in ACTIONS and (ressource, action) not in ACTIONS_SPECIALES:
+        raise exceptions.ValidationError({'action': f"Action {action} non disponible pour {ressource}"})
+    donnees = _resoudre(operation.get('donnees') or {}, references)
+    pk = _resoudre(operation.get('id'), references)
+    if action != 'creer' and not pk:
+        raise exceptions.ValidationError({'id': 'Identifiant requis'})
+
+    if action == 'creer':
+        vue = _vue(RESSOURCES[ressource], request, ACTIONS[action])
+        serializer = vue.get_serializer(data=donnees)
+        serializer.is_valid(raise_exception=True)
+        vue.perform_create(serializer)
+        return status.HTTP_201_CREATED, serializer.instance.pk, serializer.data
+
+    if action == 'ajouter_trace':
+        try:
+            sequence = int(donnees.get('sequence'))
+            points = TraceSegmentService.valider_points(donnees.get('points', []))
+        except (TypeError, ValueError) as erreur:
+            raise exceptions.ValidationError({'points': str(erreur)})
+        resultat = TraceSegmentService.ajouter_lot(
+            pk, sequence, points, fin=donnees.get('fin') in (True, 'true', '1')
+        )
+        if resultat is None:
+            raise exceptions.NotFound('Segment introuvable')
+        if resultat['statut'] == 'hors_sequence':
+            raise EchecOperation({'statut': status.HTTP_409_CONFLICT, 'erreurs': resultat})
+        return status.HTTP_200_OK, pk, resultat
+
+    vue = _vue(RESSOURCES[ressource], request, ACTIONS.get(action, 'retrieve'), pk)
+    instance = vue.get_object()
+    if action == 'details':
+        reponse = PointDynamiqueViewSet.enregistrer_details(instance, donnees)
+        if reponse.status_code >= 400:
+            raise EchecOperation({'statut': reponse.status_code, 'erreurs': reponse.data})
+        return reponse.status_code, pk, reponse.data
+    if action == 'supprimer':
+        vue.perform_destroy(instance)
+        return status.HTTP_204_NO_CONTENT, pk, None
+    serializer = vue.get_serializer(instance, data=donnees, partial=True)
+    serializer.is_valid(raise_exception=True)
+    vue.perform_update(serializer)
+    return status.HTTP_200_OK, pk, serializer.data
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def executer_lot(request):
+    """Applique une liste ordonnée d'opérations en une seule transaction
+
+    Chaque opération passe par le serializer et les hooks du ViewSet de sa ressource.
+    Un objet créé peut être désigné par les opérations suivantes via sa référence
+    temporaire. La topologie des liaisons touchées est recalculée une fois, en fin de
+    lot ; la première opération refusée annule le lot entier.
+    """
+    operations = request.data.get('operations')
+    if not isinstance(operations, list) or not operations:
+        return Response({'error': 'operations (liste non vide) requis'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(operations) > MAX_OPERATIONS:
+        return Response(
+            {'error': f'{MAX_OPERATIONS} opérations au plus par lot'}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    resultats, references = [], {}
+    try:
+        with transaction.atomic(), LiaisonService.topologie_differee() as liaisons:
+            for index, operation in enumerate(operations):
+                resultat = {'index': index}
+                if isinstance(operation, dict) and operation.get('ref'):
+                    resultat['ref'] = operation['ref']
+                try:
+                    if not isinstance(operation, dict):
+                        raise exceptions.ValidationError('Objet attendu')
+                    if operation.get('ref') in references:
+                        raise exceptions.ValidationError({'ref': f"Référence {operation['ref']} déjà utilisée"})
+                    code, objet_id, donnees = _executer(request, operation, references)
+                except EchecOperation as echec:
+                    raise EchecOperation({**resultat, **echec.resultat})
+                except exceptions.APIException as erreur:
+                    raise EchecOperation({**resultat, 'statut': erreur.status_code, 'erreurs': erreur.detail})
+                except Http404:
+                    raise EchecOperation({**resultat, 'statut': status.HTTP_404_NOT_FOUND, 'erreurs': 'Objet introuvable'})
+                except IntegrityError as erreur:
+                    raise EchecOperation({**resultat, 'statut': status.HTTP_409_CONFLICT, 'erreurs': str(erreur)})
+
+                if operation.get('ref') and operation.get('action') == 'creer':
+                    references[operation['ref']] = str(objet_id)
+                resultats.append({**resultat, 'statut': code, 'id': str(objet_id), 'donnees': donnees})
+    except EchecOperation as echec:
+        return Response({
+            'error': f"Opération {echec.resultat['index']} refusée : aucune opération du lot n'a été appliquée",
+            'operation': echec.resultat,
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'resultats': resultats,
+        'references': references,
+        'liaisons_recalculees': sorted(str(liaison_id) for liaison_id in liaisons),
+    })
@@ -3,20 +3,25 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.core.files.storage import default_storage
 from django.shortcuts import get_object_or_404
-from ..models import MesureOTDR, Coupure, Liaison, PointDynamique
+import zipfile
+from ..models import MesureOTDR, Coupure, Liaison, PointDynamique, ImportOTDR, TraceOTDR
 from ..serializers import (
     MesureOTDRSerializer, MesureOTDRCreateSerializer, 
-    CoupureSerializer, LiaisonListSerializer
+    CoupureSerializer, LiaisonListSerializer, ImportOTDRSerializer
+)
+from ..services import (
+    CoupureService, NotificationService, ImportOTDRService, TraceOTDRService, EmpreinteOTDRService,
+    FusionOTDRService, ImpactCoupureService
 )
-from ..services import CoupureService, NotificationService
 
 class MesureOTDRViewSet(viewsets.ModelViewSet):
     """ViewSet pour les mesures OTDR"""
     queryset = MesureOTDR.objects.select_related('liaison', 'technicien', 'point_mesure')
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['liaison', 'technicien', 'type_evenement', 'position_technicien', 'direction_analyse']
+    filterset_fields = ['liaison', 'technicien', 'type_evenement', 'type_evenement_reference', 'position_technicien', 'direction_analyse']
     ordering = ['-date_mesure']
     
     def get_serializer_class(self):
@@ -25,7 +30,56 @@ class MesureOTDRViewSet(viewsets.ModelViewSet):
         return MesureOTDRSerializer
     
     def perform_create(self, serializer):
-        serializer.save(technicien=self.request.user)
+        mesure = serializer.save(technicien=self.request.user)
+        
+        # Décoder le fichier .sor joint : événements et trace compressée
+        if mesure.fichier_otdr:
+            TraceOTDRService.importer_fichier(mesure)
+        
+        # Écart à l'empreinte de référence, enregistré à côté des valeurs saisies
+        EmpreinteOTDRService.appliquer(mesure)
+    
+    @action(detail=True, methods=['get'])
+    def comparer_reference(self, request, pk=None):
+        """Compare la mesure à l'empreinte OTDR de référence de sa liaison"""
+        mesure = self.get_object()
+        comparaison = EmpreinteOTDRService.comparer(mesure)
+        
+        if comparaison is None:
+            return Response(
+                {'error': "Pas de référence ou pas d'événements à comparer pour cette mesure"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(comparaison)
+    
+    @action(detail=True, methods=['get'])
+    def apercu_trace(self, request, pk=None):
+        """Aperçu min/max de la trace OTDR pour une fenêtre de distance"""
+        mesure = self.get_object()
+        
+        try:
+            trace = mesure.trace
+        except TraceOTDR.DoesNotExist:
+            return Response(
+                {'error': 'Aucune trace disponible pour cette mesure'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        try:
+            debut_km = request.query_params.get('debut_km')
+            fin_km = request.query_params.get('fin_km')
+            largeur = request.query_params.get('largeur')
+            debut_km = float(debut_km) if debut_km else None
+            fin_km = float(fin_km) if fin_km else None
+            largeur = min(int(largeur), 2000) if largeur else None
+        except ValueError:
+            return Response(
+                {'error': 'debut_km, fin_km et largeur doivent être numériques'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(TraceOTDRService.apercu(trace, debut_km, fin_km, largeur))
     
     @action(detail=True, methods=['post'])
     def analyser_coupure(self, request, pk=None):
@@ -38,25 +92,31 @@ class MesureOTDRViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Vérifier si une coupure existe déjà pour cette mesure
-        coupure_existante = Coupure.objects.filter(mesure_otdr=mesure).first()
+        # Vérifier si une coupure existe déjà pour cette mesure, créée ou rattachée
+        coupure_existante = CoupureService.coupure_de_mesure(mesure)
         if coupure_existante:
             return Response({
                 'message': 'Coupure déjà analysée',
                 'coupure': CoupureSerializer(coupure_existante).data
             })
         
-        # Créer la coupure
-        coupure = CoupureService.creer_coupure(mesure)
+        # Créer la coupure, ou rattacher la mesure à une coupure déjà signalée
+        coupure, nouvelle, analyse = CoupureService.signaler_coupure(mesure)
         
-        # Notifier les superviseurs
-        NotificationService.notifier_coupure_detectee(coupure)
+        # Notifier les superviseurs une seule fois par coupure
+        if nouvelle:
+            NotificationService.notifier_coupure_detectee(coupure)
+        
+        # Fusionner avec une mesure prise depuis l'autre extrémité
+        coupure_fusionnee = FusionOTDRService.fusionner(mesure)
         
         return Response({
-            'message': 'Coupure analysée et créée',
+            'message': 'Coupure analysée et créée' if nouvelle else 'Mesure rattachée à une coupure existante',
+            'nouvelle_coupure': nouvelle,
             'coupure': CoupureSerializer(coupure).data,
-            'analyse': CoupureService.analyser_coupure(mesure)
-        }, status=status.HTTP_201_CREATED)
+            'coupure_fusionnee': CoupureSerializer(coupure_fusionnee).data if coupure_fusionnee else None,
+            'analyse': analyse
+        }, status=status.HTTP_201_CREATED if nouvelle else status.HTTP_200_OK)
 
 class CoupureViewSet(viewsets.ModelViewSet):
     """ViewSet pour les coupures"""
@@ -96,7 +156,7 @@ class CoupureViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def actives(self, request):
         """Récupère toutes les coupures actives (non réparées)"""
-        coupures_actives = self.get_queryset().exclude(status='reparee')
+        coupures_actives = self.get_queryset().exclude(status='reparee').filter(remplacee_par__isnull=True)
         
         page = self.paginate_queryset(coupures_actives)
         if page is not None:
@@ -109,24 +169,78 @@ class CoupureViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'])
     def carte(self, request):
         """Données optimisées pour l'affichage des coupures sur la carte"""
-        coupures = self.get_queryset().exclude(status='reparee')
+        coupures = self.get_queryset().exclude(status='reparee').filter(remplacee_par__isnull=True)
         
         from ..serializers import CoupureCarteSerializer
         serializer = CoupureCarteSerializer(coupures, many=True)
         return Response(serializer.data)
     
+    @action(detail=True, methods=['get', 'post'])
+    def impact(self, request, pk=None):
+        """Liaisons partageant le corridor de la coupure ; en POST, ouvre leurs coupures"""
+        coupure = self.get_object()
+        parametres = request.query_params if request.method == 'GET' else request.data
+        
+        try:
+            rayon_m = float(parametres.get('rayon_m', ImpactCoupureService.RAYON_IMPACT_M))
+        except (TypeError, ValueError):
+            return Response({'error': 'rayon_m invalide'}, status=status.HTTP_400_BAD_REQUEST)
+        if not 0 < rayon_m <= 500:
+            return Response(
+                {'error': 'rayon_m doit être compris entre 0 et 500 mètres'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        impacts = ImpactCoupureService.analyser_impact(coupure, rayon_m)
+        if impacts is None:
+            return Response(
+                {'error': "La position de la coupure n'est pas estimée"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        donnees = {
+            'coupure': coupure.id,
+            'rayon_m': rayon_m,
+            'nombre_liaisons': len(impacts),
+            'nombre_clients': len({impact['client_id'] for impact in impacts}),
+            'liaisons_impactees': impacts
+        }
+        
+        if request.method == 'POST' and request.data.get('ouvrir_coupures'):
+            coupures_liees = ImpactCoupureService.ouvrir_coupures_liees(coupure, impacts)
+            donnees['coupures_liees'] = CoupureSerializer(coupures_liees, many=True).data
+            return Response(donnees, status=status.HTTP_201_CREATED)
+        
+        return Response(donnees)
+    
     @action(detail=True, methods=['post'])
     def recalculer_position(self, request, pk=None):
         """Recalcule la position estimée de la coupure"""
         coupure = self.get_object()
         
+        # Une coupure liée est positionnée par l'impact de sa coupure d'origine
+        if coupure.coupure_origine_id:
+            return Response(
+                {'error': "Coupure liée : recalculer la position de la coupure d'origine",
+                 'coupure_origine': coupure.coupure_origine_id},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
         # Refaire l'analyse avec les données actuelles
-        analyse = CoupureService.analyser_coupure(coupure.mesure_otdr)
+        analyse = None
+        if coupure.mesure_otdr_opposee:
+            analyse = FusionOTDRService.analyser(coupure.mesure_otdr, coupure.mesure_otdr_opposee)
+            if analyse:
+                coupure.incertitude_km = analyse['incertitude_km']
+                coupure.facteur_longueur = analyse['facteur_longueur']
+        if not analyse:
+            analyse = CoupureService.analyser_coupure(coupure.mesure_otdr)
         
         # Mettre à jour la coupure
         coupure.segment_touche = analyse['segment_touche']
         coupure.distance_sur_segment = analyse['distance_sur_segment']
         coupure.point_dynamique_proche = analyse['point_dynamique_proche']
+        coupure.distance_depuis_central = analyse['distance_absolue']
         
         if analyse['coordonnees_estimees']:
             coupure.point_estime_lat = analyse['coordonnees_estimees']['latitude']
@@ -194,19 +308,27 @@ def detecter_coupure(request):
     
     mesure = MesureOTDR.objects.create(**mesure_data)
     
-    # Analyser et créer la coupure
-    coupure = CoupureService.creer_coupure(mesure)
+    # Analyser et créer la coupure, ou rattacher le signalement à une coupure déjà ouverte
+    coupure, nouvelle, analyse = CoupureService.signaler_coupure(mesure)
     
-    # Notifier
-    NotificationService.notifier_coupure_detectee(coupure)
+    # Notifier une seule fois par coupure
+    if nouvelle:
+        NotificationService.notifier_coupure_detectee(coupure)
     
-    # Analyser pour données supplémentaires
-    analyse = CoupureService.analyser_coupure(mesure)
+    # Fusionner avec une mesure prise depuis l'autre extrémité
+    coupure_fusionnee = FusionOTDRService.fusionner(mesure)
     
     return Response({
-        'message': 'Coupure détectée et analysée',
+        'message': 'Coupure détectée et analysée' if nouvelle else 'Signalement rattaché à une coupure existante',
+        'nouvelle_coupure': nouvelle,
         'mesure_otdr': MesureOTDRSerializer(mesure).data,
         'coupure': CoupureSerializer(coupure).data,
+        'fusion': {
+            'coupure': CoupureSerializer(coupure_fusionnee).data,
+            'distance_absolue_km': coupure_fusionnee.distance_depuis_central,
+            'incertitude_km': coupure_fusionnee.incertitude_km,
+            'facteur_longueur': coupure_fusionnee.facteur_longueur
+        } if coupure_fusionnee else None,
         'analyse': {
             'distance_absolue_km': analyse['distance_absolue'],
             'precision_estimation': analyse['precision_estimation'],
@@ -219,9 +341,10 @@ def detecter_coupure(request):
                 'arrivee': analyse['segment_touche'].point_arrivee.nom if analyse['segment_touche'] else None,
                 'distance_sur_segment_km': analyse['distance_sur_segment']
             } if analyse['segment_touche'] else None,
-            'coordonnees_estimees': analyse['coordonnees_estimees']
+            'coordonnees_estimees': analyse['coordonnees_estimees'],
+            'incertitude': analyse['incertitude']
         }
-    }, status=status.HTTP_201_CREATED)
+    }, status=status.HTTP_201_CREATED if nouvelle else status.HTTP_200_OK)
 
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
@@ -286,6 +409,84 @@ def simuler_analyse_otdr(request):
         }
     })
 
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def importer_archive_otdr(request):
+    """Lance l'import en masse d'une archive zip de fichiers .sor"""
+    archive = request.FILES.get('archive')
+    position_technicien = request.data.get('position_technicien', 'central')
+    direction_analyse = request.data.get('direction_analyse', 'vers_client')
+    
+    if not archive:
+        return Response(
+            {'error': 'Le fichier archive est requis'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if position_technicien not in dict(MesureOTDR.POSITION_CHOICES):
+        return Response(
+            {'error': f'position_technicien invalide : {position_technicien}'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if direction_analyse not in dict(MesureOTDR.DIRECTION_CHOICES):
+        return Response(
+            {'error': f'direction_analyse invalide : {direction_analyse}'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if not zipfile.is_zipfile(archive):
+        return Response(
+            {'error': "L'archive doit être un fichier zip"}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    archive.seek(0)
+    
+    nom = default_storage.save(f'otdr_archives/{archive.name}', archive)
+    import_otdr = ImportOTDR.objects.create(
+        chemin_archive=default_storage.path(nom),
+        position_technicien=position_technicien,
+        direction_analyse=direction_analyse,
+        cree_par=request.user
+    )
+    ImportOTDRService.lancer_en_arriere_plan(import_otdr)
+    
+    return Response({
+        'message': 'Import lancé',
+        'import': ImportOTDRSerializer(import_otdr).data
+    }, status=status.HTTP_202_ACCEPTED)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def suivi_import_otdr(request, import_id):
+    """Progression d'un import d'archive OTDR"""
+    import_otdr = get_object_or_404(ImportOTDR, id=import_id)
+    return Response(ImportOTDRSerializer(import_otdr).data)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def reprendre_import_otdr(request, import_id):
+    """Reprend un import interrompu à partir du dernier lot enregistré"""
+    import_otdr = get_object_or_404(ImportOTDR, id=import_id)
+    
+    # Prise en charge atomique : un seul traitement à la fois pour un même import
+    pris = ImportOTDR.objects.filter(
+        id=import_otdr.id, status__in=['erreur', 'interrompu']
+    ).update(status='en_cours')
+    if not pris:
+        return Response(
+            {'error': f"Seul un import en erreur ou interrompu peut être repris (statut : {import_otdr.status})"}, 
+            status=status.HTTP_409_CONFLICT
+        )
+    import_otdr.refresh_from_db()
+    
+    ImportOTDRService.lancer_en_arriere_plan(import_otdr)
+    
+    return Response({
+        'message': 'Import repris',
+        'import': ImportOTDRSerializer(import_otdr).data
+    }, status=status.HTTP_202_ACCEPTED)
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def statistiques_diagnostics(request):
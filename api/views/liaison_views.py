@@ -3,20 +3,27 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db import transaction
 from django.db.models import Q, Sum
 from django.shortcuts import get_object_or_404
 from ..models import (
     Liaison, PointDynamique, PhotoPoint, FicheTechnique, Segment,
     DetailONT, DetailPOPLS, DetailPOPFTTH, DetailChambre, DetailManchon,
-    FAT, DetailFDT
+    FAT, DetailFDT, MesureOTDR
 )
 from ..serializers import (
     LiaisonListSerializer, LiaisonDetailSerializer, LiaisonCreateSerializer,
     PointDynamiqueListSerializer, PointDynamiqueDetailSerializer, PointDynamiqueCreateSerializer,
+    PointDynamiqueLotSerializer,
     PhotoPointSerializer, FicheTechniqueSerializer, SegmentSerializer,
-    FATSerializer, FATCreateSerializer, ChoixSerializer
+    FATSerializer, FATCreateSerializer, ChoixSerializer, ReferenceOTDRSerializer,
+    DetailONTSerializer, DetailPOPLSSerializer, DetailPOPFTTHSerializer, DetailChambreSerializer,
+    DetailManchonSerializer, DetailFDTSerializer
+)
+from ..services import (
+    LiaisonService, SegmentService, EmpreinteOTDRService, ContinuiteFibreService, ProximiteFATService,
+    TraceSegmentService
 )
-from ..services import LiaisonService, SegmentService
 
 class LiaisonViewSet(viewsets.ModelViewSet):
     """ViewSet pour les liaisons"""
@@ -25,7 +32,10 @@ class LiaisonViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'type_liaison', 'client', 'client__type_client']
     search_fields = ['nom_liaison', 'client__name', 'client__raison_sociale']
-    ordering_fields = ['nom_liaison', 'created_at', 'distance_totale', 'status']
+    ordering_fields = [
+        'nom_liaison', 'created_at', 'distance_totale', 'status', 'nombre_points', 'nombre_segments',
+        'topologie_modifiee_le'
+    ]
     ordering = ['-created_at']
     
     def get_serializer_class(self):
@@ -113,16 +123,46 @@ class LiaisonViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def recalculer_distance(self, request, pk=None):
-        """Recalcule la distance totale de la liaison"""
+        """Recalcule la distance totale de la liaison et les distances cumulées de ses points"""
         liaison = self.get_object()
         distance_totale = liaison.calculer_distance_totale()
+        points_modifies = SegmentService.recalculer_distances_cumulees(liaison)
         
         return Response({
             'message': 'Distance recalculée',
             'distance_totale': distance_totale,
-            'nombre_segments': liaison.segments.count()
+            'nombre_segments': liaison.nombre_segments,
+            'points_modifies': points_modifies
         })
     
+    @action(detail=True, methods=['get', 'post'])
+    def reference_otdr(self, request, pk=None):
+        """Consulter ou définir l'empreinte OTDR de référence de la liaison"""
+        liaison = self.get_object()
+        
+        if request.method == 'GET':
+            reference = EmpreinteOTDRService.reference_de(liaison)
+            if not reference:
+                return Response({'message': 'Aucune référence OTDR'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(ReferenceOTDRSerializer(reference).data)
+        
+        mesure_id = request.data.get('mesure_id')
+        if not mesure_id:
+            return Response(
+                {'error': 'mesure_id requis'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        mesure = get_object_or_404(MesureOTDR, id=mesure_id, liaison=liaison)
+        if not mesure.evenements:
+            return Response(
+                {'error': "La mesure n'a pas de table d'événements"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        reference = EmpreinteOTDRService.definir_reference(mesure, request.user)
+        return Response(ReferenceOTDRSerializer(reference).data)
+    
     @action(detail=True, methods=['get'])
     def historique(self, request, pk=None):
         """Historique des interventions sur une liaison"""
@@ -171,6 +211,53 @@ class LiaisonViewSet(viewsets.ModelViewSet):
         
         serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['post'], url_path='creer-en-masse')
+    def creer_en_masse(self, request):
+        """Crée des liaisons complètes (points et segments) en une seule transaction"""
+        donnees = request.data.get('liaisons')
+        if not isinstance(donnees, list) or not donnees:
+            return Response(
+                {'error': 'liaisons (liste non vide) requis'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        lot, erreurs, noms = [], [], set()
+        for rang, donnee in enumerate(donnees):
+            if not isinstance(donnee, dict):
+                erreurs.append({'index': rang, 'liaison': 'Objet attendu'})
+                continue
+            liaison = LiaisonCreateSerializer(
+                data={champ: valeur for champ, valeur in donnee.items() if champ != 'points'},
+                context={'request': request}
+            )
+            points = PointDynamiqueLotSerializer(data=donnee.get('points', []), many=True)
+            liaison_valide, points_valides = liaison.is_valid(), points.is_valid()
+            if not (liaison_valide and points_valides):
+                erreur = {'index': rang}
+                if not liaison_valide:
+                    erreur['liaison'] = liaison.errors
+                if not points_valides:
+                    erreur['points'] = points.errors
+                erreurs.append(erreur)
+            elif liaison.validated_data['nom_liaison'] in noms:
+                erreurs.append({'index': rang, 'liaison': {'nom_liaison': ['Nom en double dans le lot']}})
+            else:
+                noms.add(liaison.validated_data['nom_liaison'])
+                lot.append(({**liaison.validated_data, 'created_by': request.user}, points.validated_data))
+        
+        if erreurs:
+            return Response({'erreurs': erreurs}, status=status.HTTP_400_BAD_REQUEST)
+        
+        liaisons = LiaisonService.creer_liaisons(lot)
+        return Response({
+            'nombre_liaisons': len(liaisons),
+            'nombre_points': sum(len(points) for _, points in lot),
+            'liaisons': [
+                {'id': liaison.id, 'nom_liaison': liaison.nom_liaison, 'distance_totale': liaison.distance_totale}
+                for liaison in liaisons
+            ]
+        }, status=status.HTTP_201_CREATED)
 
 class PointDynamiqueViewSet(viewsets.ModelViewSet):
     """ViewSet pour les points dynamiques"""
@@ -179,7 +266,7 @@ class PointDynamiqueViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['type_point', 'liaison', 'liaison__client']
     search_fields = ['nom', 'description', 'liaison__nom_liaison']
-    ordering_fields = ['nom', 'ordre', 'distance_depuis_central', 'created_at']
+    ordering_fields = ['nom', 'ordre', 'distance_depuis_central', 'distance_optique_depuis_central', 'created_at']
     ordering = ['liaison', 'ordre']
     
     def get_serializer_class(self):
@@ -236,7 +323,11 @@ class PointDynamiqueViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['put'])
     def mettre_a_jour_details(self, request, pk=None):
         """Met à jour les détails spécifiques selon le type de point"""
-        point = self.get_object()
+        return self.enregistrer_details(self.get_object(), request.data)
+    
+    @staticmethod
+    def enregistrer_details(point, donnees) -> Response:
+        """Crée ou met à jour les détails d'un point, après contrôle de continuité"""
         type_point = point.type_point
         
         # Choisir le bon serializer selon le type
@@ -245,23 +336,23 @@ class PointDynamiqueViewSet(viewsets.ModelViewSet):
         
         try:
             if type_point == 'ONT':
-                detail_instance = point.detail_ont
                 detail_serializer = DetailONTSerializer
+                detail_instance = point.detail_ont
             elif type_point == 'POP_LS':
-                detail_instance = point.detail_pop_ls
                 detail_serializer = DetailPOPLSSerializer
+                detail_instance = point.detail_pop_ls
             elif type_point == 'POP_FTTH':
-                detail_instance = point.detail_pop_ftth
                 detail_serializer = DetailPOPFTTHSerializer
+                detail_instance = point.detail_pop_ftth
             elif type_point == 'chambre':
-                detail_instance = point.detail_chambre
                 detail_serializer = DetailChambreSerializer
+                detail_instance = point.detail_chambre
             elif type_point in ['manchon', 'manchon_aerien']:
-                detail_instance = point.detail_manchon
                 detail_serializer = DetailManchonSerializer
+                detail_instance = point.detail_manchon
             elif type_point == 'FDT':
-                detail_instance = point.detail_fdt
                 detail_serializer = DetailFDTSerializer
+                detail_instance = point.detail_fdt
         except:
             detail_instance = None
         
@@ -273,11 +364,29 @@ class PointDynamiqueViewSet(viewsets.ModelViewSet):
         
         # Créer ou mettre à jour les détails
         if detail_instance:
-            serializer = detail_serializer(detail_instance, data=request.data, partial=True)
+            serializer = detail_serializer(detail_instance, data=donnees, partial=True)
         else:
-            serializer = detail_serializer(data=request.data)
+            serializer = detail_serializer(data=donnees)
         
         if serializer.is_valid():
+            # Contrôle de continuité avec les points voisins avant enregistrement
+            if donnees.get('ignorer_continuite') not in (True, 'true', '1'):
+                valeurs = {}
+                if detail_instance:
+                    valeurs = {
+                        champ.name: getattr(detail_instance, champ.name)
+                        for champ in detail_instance._meta.concrete_fields
+                    }
+                valeurs.update(serializer.validated_data)
+                anomalies = ContinuiteFibreService.verifier_modification(
+                    point, detail_serializer.Meta.model, valeurs
+                )
+                if anomalies:
+                    return Response({
+                        'error': 'Discontinuité de fibre avec les points voisins',
+                        'anomalies': anomalies
+                    }, status=status.HTTP_409_CONFLICT)
+            
             if not detail_instance:
                 serializer.save(point_dynamique=point)
             else:
@@ -315,17 +424,40 @@ class SegmentViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
         
-        segment.trace_coords = trace_coords
-        segment.save()
-        
-        # Recalculer la distance totale si nécessaire
-        segment.liaison.calculer_distance_totale()
+        TraceSegmentService.remplacer(segment, trace_coords)
         
         return Response({
             'message': 'Tracé mis à jour',
             'segment': SegmentSerializer(segment).data
         })
     
+    @action(detail=True, methods=['post'])
+    def ajouter_trace(self, request, pk=None):
+        """Ajoute au tracé un lot numéroté de points GPS relevés sur le terrain"""
+        try:
+            sequence = int(request.data.get('sequence'))
+        except (TypeError, ValueError):
+            return Response({'error': 'sequence doit être un entier'}, status=status.HTTP_400_BAD_REQUEST)
+        if sequence < 1:
+            return Response({'error': 'sequence commence à 1'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            points = TraceSegmentService.valider_points(request.data.get('points', []))
+        except ValueError as erreur:
+            return Response({'error': str(erreur)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Le segment n'est pas chargé : son tracé complet n'est ni lu ni réécrit
+        resultat = TraceSegmentService.ajouter_lot(
+            pk, sequence, points, fin=request.data.get('fin') in (True, 'true', '1')
+        )
+        if resultat is None:
+            return Response({'error': 'Segment introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        if resultat['statut'] == 'hors_sequence':
+            return Response({
+                'error': 'Lot hors séquence : les lots précédents doivent être envoyés d\'abord',
+                **resultat
+            }, status=status.HTTP_409_CONFLICT)
+        return Response(resultat)
+    
     @action(detail=True, methods=['post'])
     def recalculer_distance_gps(self, request, pk=None):
         """Recalcule la distance GPS basée sur les coordonnées"""
@@ -382,6 +514,35 @@ class FATViewSet(viewsets.ModelViewSet):
             return FATCreateSerializer
         return FATSerializer
     
+    @action(detail=False, methods=['get'])
+    def proches(self, request):
+        """FAT les plus proches d'une adresse ayant encore un port de splitter libre"""
+        try:
+            latitude = float(request.query_params['latitude'])
+            longitude = float(request.query_params['longitude'])
+            k = int(request.query_params.get('k', 5))
+            rayon_max_m = float(request.query_params.get('rayon_max_m', ProximiteFATService.RAYON_MAX_M))
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'latitude et longitude (nombres) sont requis'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        tri = request.query_params.get('tri', 'droite')
+        if tri not in ('droite', 'marche'):
+            return Response(
+                {'error': 'tri doit valoir droite ou marche'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        fats = ProximiteFATService.plus_proches(
+            latitude, longitude, k=max(1, min(k, 50)), tri=tri, rayon_max_m=min(rayon_max_m, 50000)
+        )
+        return Response({
+            'position': {'latitude': latitude, 'longitude': longitude},
+            'tri': tri,
+            'fats': fats
+        })
+    
     @action(detail=True, methods=['post'])
     def associer_liaison(self, request, pk=None):
         """Associe un FAT à une liaison existante"""
@@ -427,19 +588,20 @@ class FATViewSet(viewsets.ModelViewSet):
             )
         
         # Créer le point dynamique
-        point_data = {
-            'liaison': fat.liaison,
-            'type_point': 'FAT',
-            'nom': f'FAT {fat.numero_fat}',
-            'latitude': fat.latitude,
-            'longitude': fat.longitude,
-            'ordre': fat.liaison.points_dynamiques.count(),
-            'description': f'FAT {fat.numero_fat} - FDT {fat.numero_fdt}'
-        }
-        
-        point = PointDynamique.objects.create(**point_data)
-        fat.point_dynamique = point
-        fat.save()
+        with transaction.atomic():
+            point_data = {
+                'liaison': fat.liaison,
+                'type_point': 'FAT',
+                'nom': f'FAT {fat.numero_fat}',
+                'latitude': fat.latitude,
+                'longitude': fat.longitude,
+                'ordre': LiaisonService.ordre_pour_position(fat.liaison),
+                'description': f'FAT {fat.numero_fat} - FDT {fat.numero_fdt}'
+            }
+            
+            point = PointDynamique.objects.create(**point_data)
+            fat.point_dynamique = point
+            fat.save()
         
         return Response({
             'message': 'Point dynamique créé pour le FAT',
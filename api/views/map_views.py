@@ -94,7 +94,7 @@ def points_dynamiques_carte(request):
 @permission_classes([IsAuthenticated])
 def coupures_carte(request):
     """Récupère les coupures actives pour la carte"""
-    coupures = Coupure.objects.exclude(status='reparee').select_related(
+    coupures = Coupure.objects.exclude(status='reparee').filter(remplacee_par__isnull=True).select_related(
         'liaison', 'liaison__client'
     )
     
@@ -176,8 +176,8 @@ def trace_liaison(request, liaison_id):
         'liaison': LiaisonCarteSerializer(liaison).data,
         'trace': trace_complet,
         'statistiques': {
-            'nb_points': points.count(),
-            'nb_segments': segments.count(),
+            'nb_points': liaison.nombre_points,
+            'nb_segments': liaison.nombre_segments,
             'distance_totale_km': liaison.distance_totale,
             'distance_gps_directe_km': round(
                 SegmentService.calculer_distance_gps(
@@ -334,7 +334,8 @@ def recherche_geographique(request):
     # Coupures dans la zone
     coupures = Coupure.objects.filter(
         point_estime_lat__range=(lat_min, lat_max),
-        point_estime_lng__range=(lng_min, lng_max)
+        point_estime_lng__range=(lng_min, lng_max),
+        remplacee_par__isnull=True
     ).exclude(status='reparee')
     
     return Response({
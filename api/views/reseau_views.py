@@ -0,0 +1,389 @@
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from django.db.models import Count, Sum
+from ..models import (
+    BilanOptique, CorridorCriticite, ImportReseau, Liaison, NoeudFTTH, OccupationPorts, PointDynamique, TronconCable
+)
+from ..serializers import BilanOptiqueSerializer, CorridorCriticiteSerializer, ImportReseauSerializer
+from ..services import (
+    ArbreFTTHService, BilanOptiqueService, CouvertureService, ContinuiteFibreService, CriticiteCorridorService, GrapheReseauService,
+    ImportReseauService, InventaireBrinsService, OccupationPortsService
+)
+from ..lecteurs_sig import FORMATS, detecter_format
+
+TRIS_CRITICITE = {
+    'clients': ['-nombre_clients', '-nombre_liaisons'],
+    'liaisons': ['-nombre_liaisons', '-nombre_clients'],
+}
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def corridors_critiques(request):
+    """Corridors classés par nombre de clients (ou liaisons) perdus en cas de coupure
+
+    POST relance le calcul de l'indice en arrière-plan.
+    """
+    if request.method == 'POST':
+        CriticiteCorridorService.lancer_en_arriere_plan()
+        return Response({'message': 'Calcul de criticité lancé'}, status=status.HTTP_202_ACCEPTED)
+
+    tri = request.query_params.get('tri', 'clients')
+    if tri not in TRIS_CRITICITE:
+        return Response(
+            {'error': f"tri doit valoir {' ou '.join(TRIS_CRITICITE)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        limite = int(request.query_params.get('limite', 20))
+    except ValueError:
+        return Response({'error': 'limite doit être un entier'}, status=status.HTTP_400_BAD_REQUEST)
+    limite = max(1, min(limite, 500))
+
+    corridors = list(CorridorCriticite.objects.order_by(*TRIS_CRITICITE[tri])[:limite])
+    identifiants = {liaison_id for corridor in corridors for liaison_id in corridor.liaisons}
+    noms_liaisons = {
+        str(liaison_id): nom
+        for liaison_id, nom in Liaison.objects.filter(id__in=identifiants).values_list('id', 'nom_liaison')
+    }
+
+    return Response({
+        'calcule_le': corridors[0].calcule_le if corridors else None,
+        'total_corridors': CorridorCriticite.objects.count(),
+        'corridors': CorridorCriticiteSerializer(
+            corridors, many=True, context={'noms_liaisons': noms_liaisons}
+        ).data
+    })
+
+def _segments_exclus(request):
+    valeur = request.query_params.get('exclure_segments', '')
+    return [segment_id.strip() for segment_id in valeur.split(',') if segment_id.strip()]
+
+def _point_absent(point_id):
+    return Response(
+        {'error': f'Point {point_id} absent du graphe réseau'},
+        status=status.HTTP_404_NOT_FOUND
+    )
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def graphe_chemin(request):
+    """Plus court chemin entre deux points par les corridors physiques, pour proposer un reroutage"""
+    depart_id = request.query_params.get('depart')
+    arrivee_id = request.query_params.get('arrivee')
+    if not depart_id or not arrivee_id:
+        return Response(
+            {'error': 'depart et arrivee sont requis'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    for point_id in (depart_id, arrivee_id):
+        if GrapheReseauService.site_du_point(point_id) is None:
+            return _point_absent(point_id)
+
+    chemin = GrapheReseauService.plus_court_chemin(depart_id, arrivee_id, _segments_exclus(request))
+    if chemin is None:
+        return Response({'chemin_trouve': False, 'message': 'Aucun chemin entre ces points'})
+    return Response({'chemin_trouve': True, **chemin})
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def graphe_composantes(request):
+    """Composantes connexes du réseau physique"""
+    return Response(GrapheReseauService.composantes())
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def graphe_atteignables(request):
+    """Sites et liaisons encore reliés à un point si les segments indiqués sont coupés"""
+    depart_id = request.query_params.get('depart')
+    if not depart_id:
+        return Response({'error': 'depart est requis'}, status=status.HTTP_400_BAD_REQUEST)
+    if GrapheReseauService.site_du_point(depart_id) is None:
+        return _point_absent(depart_id)
+
+    return Response(GrapheReseauService.atteignables(depart_id, _segments_exclus(request)))
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def bilans_optiques(request):
+    """Liaisons classées de la plus faible à la plus forte marge sur leur budget optique
+
+    POST relance le calcul des bilans en arrière-plan.
+    """
+    if request.method == 'POST':
+        BilanOptiqueService.lancer_en_arriere_plan()
+        return Response({'message': 'Calcul des bilans optiques lancé'}, status=status.HTTP_202_ACCEPTED)
+
+    try:
+        limite = int(request.query_params.get('limite', 20))
+    except ValueError:
+        return Response({'error': 'limite doit être un entier'}, status=status.HTTP_400_BAD_REQUEST)
+    limite = max(1, min(limite, 500))
+
+    bilans = BilanOptique.objects.select_related('liaison')
+    statut = request.query_params.get('statut')
+    if statut:
+        bilans = bilans.filter(statut=statut)
+    if request.query_params.get('ecart_min_db'):
+        try:
+            bilans = bilans.filter(ecart_db__gte=float(request.query_params['ecart_min_db']))
+        except ValueError:
+            return Response({'error': 'ecart_min_db doit être un nombre'}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response({
+        'total': bilans.count(),
+        'bilans': BilanOptiqueSerializer(bilans.order_by('marge_db')[:limite], many=True).data
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def continuite_fibre(request):
+    """Rapport de continuité des toron/brin entre points consécutifs, pour tout le réseau ou une liaison"""
+    liaison_id = request.query_params.get('liaison')
+    liaison_ids = None
+    if liaison_id:
+        try:
+            existe = Liaison.objects.filter(id=liaison_id).exists()
+        except ValidationError:
+            existe = False
+        if not existe:
+            return Response({'error': 'Liaison introuvable'}, status=status.HTTP_404_NOT_FOUND)
+        liaison_ids = [liaison_id]
+
+    return Response(ContinuiteFibreService.verifier(liaison_ids))
+
+@api_view(['GET', 'POST'])
+@permission_classes([IsAuthenticated])
+def inventaire_brins(request):
+    """Synthèse de l'occupation des brins par capacité de câble
+
+    POST relance la reconstruction de l'inventaire en arrière-plan.
+    """
+    if request.method == 'POST':
+        InventaireBrinsService.lancer_en_arriere_plan()
+        return Response({'message': "Reconstruction de l'inventaire lancée"}, status=status.HTTP_202_ACCEPTED)
+
+    par_capacite = [
+        {
+            'capacite': ligne['capacite'],
+            'nombre_troncons': ligne['nombre_troncons'],
+            'brins_occupes': ligne['brins_occupes'],
+            'taux_occupation': round(ligne['brins_occupes'] / (ligne['capacite'] * ligne['nombre_troncons']) * 100, 1),
+        }
+        for ligne in TronconCable.objects.values('capacite').annotate(
+            nombre_troncons=Count('id'), brins_occupes=Sum('nombre_brins_occupes')
+        ).order_by('-capacite')
+    ]
+    dernier = TronconCable.objects.values_list('calcule_le', flat=True).first()
+    return Response({
+        'calcule_le': dernier,
+        'nombre_troncons': sum(ligne['nombre_troncons'] for ligne in par_capacite),
+        'troncons_en_conflit': TronconCable.objects.exclude(conflits=[]).count(),
+        'par_capacite': par_capacite,
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def brins_libres(request):
+    """Brins libres de bout en bout entre deux points, pour étudier une nouvelle liaison"""
+    depart_id = request.query_params.get('depart')
+    arrivee_id = request.query_params.get('arrivee')
+    if not depart_id or not arrivee_id:
+        return Response({'error': 'depart et arrivee sont requis'}, status=status.HTTP_400_BAD_REQUEST)
+    capacite = request.query_params.get('capacite')
+    if capacite is not None:
+        try:
+            capacite = int(capacite)
+        except ValueError:
+            return Response({'error': 'capacite doit être un entier'}, status=status.HTTP_400_BAD_REQUEST)
+    for point_id in (depart_id, arrivee_id):
+        if GrapheReseauService.site_du_point(point_id) is None:
+            return _point_absent(point_id)
+
+    resultat = InventaireBrinsService.brins_libres_chemin(depart_id, arrivee_id, capacite)
+    if resultat is None:
+        return Response({'chemin_trouve': False, 'message': 'Aucun chemin entre ces points'})
+    return Response({'chemin_trouve': True, **resultat})
+
+def _cle_equipement(donnees):
+    """Clé (equipement, reference, numero) d'une requête, ou message d'erreur"""
+    equipement = donnees.get('equipement')
+    reference = donnees.get('reference')
+    if equipement not in dict(OccupationPorts.EQUIPEMENT_CHOICES):
+        return None, f"equipement doit valoir {', '.join(dict(OccupationPorts.EQUIPEMENT_CHOICES))}"
+    if not reference:
+        return None, 'reference est requis'
+    try:
+        numero = int(donnees.get('numero', 0))
+    except (TypeError, ValueError):
+        return None, 'numero doit être un entier'
+    return (equipement, str(reference), numero), None
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def disponibilite_ports(request):
+    """Ports libres d'une cassette ou d'un splitter"""
+    cle, erreur = _cle_equipement(request.query_params)
+    if erreur:
+        return Response({'error': erreur}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(OccupationPortsService.disponibilite(cle))
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def allouer_port(request):
+    """Réserve le premier port libre d'une cassette ou d'un splitter"""
+    cle, erreur = _cle_equipement(request.data)
+    if erreur:
+        return Response({'error': erreur}, status=status.HTTP_400_BAD_REQUEST)
+
+    port = OccupationPortsService.allouer(cle, f'reservation:{request.user.username}')
+    if port is None:
+        return Response({'error': 'Aucun port libre sur cet équipement'}, status=status.HTTP_409_CONFLICT)
+    return Response({'port': port, **OccupationPortsService.disponibilite(cle)}, status=status.HTTP_201_CREATED)
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def liberer_port(request):
+    """Libère un port réservé par l'utilisateur ; les ports des équipements enregistrés ne sont pas touchés"""
+    cle, erreur = _cle_equipement(request.data)
+    if erreur:
+        return Response({'error': erreur}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        port = int(request.data.get('port'))
+    except (TypeError, ValueError):
+        return Response({'error': 'port doit être un entier'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 1 <= port <= OccupationPortsService.PORTS_MAX:
+        return Response(
+            {'error': f'port doit être compris entre 1 et {OccupationPortsService.PORTS_MAX}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    if not OccupationPortsService.liberer(cle, port, f'reservation:{request.user.username}'):
+        return Response({'error': "Ce port n'est pas réservé par vous"}, status=status.HTTP_409_CONFLICT)
+    return Response(OccupationPortsService.disponibilite(cle))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def utilisation_ports(request):
+    """Taux d'occupation des ports par FDT, ODF et FAT, et équipements saturés"""
+    return Response(OccupationPortsService.utilisation(
+        request.query_params.get('equipement'), request.query_params.get('reference')
+    ))
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def arbre_ftth(request):
+    """Sous-arbre FTTH d'un OLT, port OLT, FDT ou FAT : équipements et abonnés desservis"""
+    types_noeud = [choix[0] for choix in NoeudFTTH.TYPE_NOEUD_CHOICES]
+    type_noeud = request.query_params.get('type')
+    reference = request.query_params.get('reference')
+    descendants = request.query_params.get('descendants') or None
+    if type_noeud not in types_noeud or not reference or (descendants and descendants not in types_noeud):
+        return Response(
+            {'error': f"type ({', '.join(types_noeud)}) et reference sont requis"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        limite = int(request.query_params.get('limite', 500))
+    except ValueError:
+        return Response({'error': 'limite doit être un entier'}, status=status.HTTP_400_BAD_REQUEST)
+
+    noeud = NoeudFTTH.objects.filter(type_noeud=type_noeud, reference=reference).first()
+    if noeud is None:
+        return Response({'error': 'Nœud non trouvé'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(ArbreFTTHService.impact(noeud, descendants, max(1, min(limite, 5000))))
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def couverture(request):
+    """Actif du réseau le plus proche de chaque adresse, à moins de rayon_m mètres
+
+    Les adresses sont un fichier CSV (champ fichier) ou une liste JSON points ; le résultat
+    est un CSV produit au fil de la lecture.
+    """
+    try:
+        rayon_m = float(request.data.get('rayon_m', CouvertureService.RAYON_DEFAUT_M))
+    except (TypeError, ValueError):
+        return Response({'error': 'rayon_m doit être un nombre'}, status=status.HTTP_400_BAD_REQUEST)
+    if not 0 < rayon_m <= CouvertureService.RAYON_MAX_M:
+        return Response(
+            {'error': f'rayon_m doit être compris entre 0 et {CouvertureService.RAYON_MAX_M}'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    types = request.data.get('types') or CouvertureService.TYPES_DEFAUT
+    if isinstance(types, str):
+        types = [type_point.strip() for type_point in types.split(',') if type_point.strip()]
+    types_valides = {choix[0] for choix in PointDynamique.TYPE_CHOICES}
+    if not types or not set(types) <= types_valides:
+        return Response(
+            {'error': f"types doit être choisi parmi {', '.join(sorted(types_valides))}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    fichier = request.FILES.get('fichier')
+    delimiteur = ','
+    if fichier:
+        colonnes, lignes, delimiteur = CouvertureService.lire_csv(fichier)
+    else:
+        points = request.data.get('points')
+        if not isinstance(points, list):
+            return Response(
+                {'error': 'Un fichier CSV ou une liste points est requis'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        lignes = [point if isinstance(point, dict) else {} for point in points]
+        colonnes = list(dict.fromkeys(colonne for ligne in lignes for colonne in ligne))
+    if not CouvertureService.colonnes_coordonnees(colonnes):
+        return Response(
+            {'error': 'Colonnes latitude et longitude requises'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    grille = CouvertureService.index_actifs(types, request.data.get('type_liaison') or None, rayon_m)
+    response = StreamingHttpResponse(
+        CouvertureService.exporter_csv(lignes, colonnes, grille, rayon_m, delimiteur),
+        content_type='text/csv; charset=utf-8'
+    )
+    response['Content-Disposition'] = 'attachment; filename="couverture.csv"'
+    return response
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def importer_reseau(request):
+    """Lance l'import d'un export SIG (GeoJSON, KML ou CSV) du réseau"""
+    fichier = request.FILES.get('fichier')
+    if not fichier:
+        return Response({'error': 'Le fichier est requis'}, status=status.HTTP_400_BAD_REQUEST)
+
+    format_fichier = request.data.get('format') or detecter_format(fichier.name)
+    if format_fichier not in FORMATS:
+        return Response(
+            {'error': f"format doit valoir {', '.join(FORMATS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    nom = default_storage.save(f'imports_reseau/{fichier.name}', fichier)
+    import_reseau = ImportReseau.objects.create(
+        chemin_fichier=default_storage.path(nom),
+        format=format_fichier,
+        cree_par=request.user
+    )
+    ImportReseauService.lancer_en_arriere_plan(import_reseau)
+
+    return Response({
+        'message': 'Import lancé',
+        'import': ImportReseauSerializer(import_reseau).data
+    }, status=status.HTTP_202_ACCEPTED)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def suivi_import_reseau(request, import_id):
+    """Progression d'un import d'export SIG"""
+    import_reseau = get_object_or_404(ImportReseau, id=import_id)
+    return Response(ImportReseauSerializer(import_reseau).data)